@@ -1,3 +1,4 @@
+from .backend import ExportedModel
 from .base import Exporter
 from .builder import build_exporter
 from .nlp import SbertForSequenceClassificationExporter
@@ -0,0 +1,217 @@
+# Copyright (c) Alibaba, Inc. and its affiliates.
+import hashlib
+import os
+import tempfile
+from threading import Lock
+from typing import Any, Dict, Iterable, Mapping
+
+import numpy as np
+import torch
+
+from modelscope.models import Model
+from modelscope.utils.constant import Backends, ModelFile
+from modelscope.utils.device import create_device
+from modelscope.utils.logger import get_logger
+from .base import Exporter
+
+logger = get_logger(__name__)
+
+EXPORTED_FILES = {
+    Backends.onnxruntime: ModelFile.ONNX_MODEL_FILE,
+    Backends.torchscript: ModelFile.TS_MODEL_FILE,
+}
+
+# the extensions of the checkpoint files, whose changes invalidate the exported files
+CHECKPOINT_EXTENSIONS = ('.bin', '.pt', '.pth', '.ckpt', '.safetensors')
+
+
+def checkpoint_fingerprint(model_dir: str, exclude: Iterable[str] = ()) -> str:
+    """The fingerprint of the checkpoint files in the model dir, which changes when
+    any checkpoint file is added, removed or rewritten.
+
+    Args:
+        model_dir: The model dir.
+        exclude: The paths of the files derived from the checkpoint, which are not
+            part of the fingerprint.
+
+    Returns:
+        The sha256 hex digest of the paths, sizes and mtimes of the checkpoint files.
+    """
+    exclude = {os.path.abspath(path) for path in exclude}
+    sha256 = hashlib.sha256()
+    for root, dirs, files in os.walk(model_dir):
+        dirs.sort()
+        for file in sorted(files):
+            path = os.path.join(root, file)
+            if not file.endswith(CHECKPOINT_EXTENSIONS) \
+                    or os.path.abspath(path) in exclude:
+                continue
+            stat = os.stat(path)
+            sha256.update(f'{os.path.relpath(path, model_dir)}:{stat.st_size}:'
+                          f'{stat.st_mtime_ns};'.encode())
+    return sha256.hexdigest()
+
+
+class ExportedModel(Model):
+    """Run a torch model with the onnx or torch script file exported from it.
+
+    The file is exported by the exporter of the model on the first forward and
+    cached in the export dir, together with the fingerprint of the checkpoint files
+    of the model dir. A cached file is reused only if the checkpoint files are not
+    changed since it was exported, otherwise the model is exported again. The inputs
+    are bound to the exported file by the input names of the exporter, and the
+    outputs are returned as a dict of torch tensors keyed by the output names of the
+    exporter, so the instance can replace the model in a pipeline and feed the
+    postprocess of the pipeline.
+
+    Args:
+        model: A torch model with an exporter which implements the `inputs` and
+            `outputs` specs, see `TorchModelExporter`.
+        backend: `onnxruntime` or `torchscript`.
+        device: The device to run on, should be either cpu, cuda, gpu, gpu:X or cuda:X.
+        export_dir (str, optional): The dir of the exported file, default to the model dir.
+        export_kwargs: Other kwargs fed into `export_onnx` or `export_torch_script`
+            when the file is exported, like the `shape` of the dummy inputs.
+
+    Examples:
+        >>> from modelscope.pipelines import pipeline
+        >>> pipeline_ins = pipeline('sentence-similarity',
+        >>>     model='damo/nlp_structbert_sentence-similarity_chinese-base',
+        >>>     backend='onnxruntime')
+        >>> print(pipeline_ins(('这是个测试', '这也是个测试')))
+    """
+
+    def __init__(self,
+                 model: Model,
+                 backend: str,
+                 device: str = 'cpu',
+                 export_dir: str = None,
+                 **export_kwargs):
+        super().__init__(model.model_dir, device=device)
+        if backend not in EXPORTED_FILES:
+            raise ValueError(
+                f'backend should be one of {list(EXPORTED_FILES.keys())}, '
+                f'but got {backend}')
+        self.torch_model = model
+        self.backend = backend
+        self.device = create_device(device)
+        self.exporter = Exporter.from_model(model)
+        if self.exporter.inputs is None or self.exporter.outputs is None:
+            raise NotImplementedError(
+                f'The exporter {self.exporter.__class__.__name__} does not '
+                f'provide the inputs and outputs specs.')
+        self.input_names = list(self.exporter.inputs.keys())
+        self.output_names = list(self.exporter.outputs.keys())
+        # the config and the pipeline info used to build the pipeline
+        for name in ('cfg', 'name', 'pipeline'):
+            if hasattr(model, name):
+                setattr(self, name, getattr(model, name))
+        export_dir = export_dir if export_dir is not None else model.model_dir
+        self.model_file = os.path.join(export_dir, EXPORTED_FILES[backend])
+        self._export_kwargs = export_kwargs
+        self._runner = None
+        self._load_lock = Lock()
+
+    def _load(self):
+        """Load the exported file, export the model first if the file is missing or
+        outdated.
+        """
+        with self._load_lock:
+            if self._runner is not None:
+                return
+            fingerprint = checkpoint_fingerprint(self.model_dir)
+            fingerprint_file = self.model_file + '.checkpoint'
+            exported_fingerprint = None
+            if os.path.isfile(
+                    self.model_file) and os.path.isfile(fingerprint_file):
+                with open(fingerprint_file) as f:
+                    exported_fingerprint = f.read().strip()
+            if exported_fingerprint == fingerprint:
+                logger.info(f'load the exported model from {self.model_file}')
+            else:
+                self._export()
+                with open(fingerprint_file, 'w') as f:
+                    f.write(fingerprint)
+            if self.backend == Backends.onnxruntime:
+                self._runner = self._create_session()
+            else:
+                self._runner = torch.jit.load(
+                    self.model_file, map_location=self.device)
+                self._runner.eval()
+
+    def _export(self):
+        logger.info(f'export the model to {self.model_file}')
+        export_dir = os.path.dirname(self.model_file)
+        os.makedirs(export_dir, exist_ok=True)
+        export_kwargs = dict(self._export_kwargs)
+        # export to a temporary dir first, so a failed export is not cached
+        with tempfile.TemporaryDirectory(dir=export_dir) as tmp_dir:
+            if self.backend == Backends.onnxruntime:
+                exported_file = self.exporter.export_onnx(
+                    output_dir=tmp_dir, **export_kwargs)['model']
+            else:
+                # the models return dict outputs, which are not allowed in the strict mode
+                export_kwargs.setdefault('strict', False)
+                exported_file = self.exporter.export_torch_script(
+                    output_dir=tmp_dir, **export_kwargs)['model']
+            os.replace(exported_file, self.model_file)
+
+    def _create_session(self):
+        import onnxruntime as ort
+        providers = ['CPUExecutionProvider']
+        if self.device.type == 'cuda' and 'CUDAExecutionProvider' \
+                in ort.get_available_providers():
+            providers.insert(0, ('CUDAExecutionProvider', {
+                'device_id': self.device.index or 0
+            }))
+        session = ort.InferenceSession(self.model_file, providers=providers)
+        # the inputs not used by the graph are removed by the onnx exporter
+        graph_inputs = {node.name for node in session.get_inputs()}
+        self.input_names = [
+            name for name in self.input_names if name in graph_inputs
+        ]
+        return session
+
+    def _bind_inputs(self, *args, **kwargs) -> Dict[str, Any]:
+        if len(args) == 1 and isinstance(args[0], Mapping):
+            inputs = dict(args[0])
+        else:
+            inputs = dict(zip(self.input_names, args))
+        inputs.update(kwargs)
+        missing = [name for name in self.input_names if name not in inputs]
+        if missing:
+            raise ValueError(
+                f'The inputs {missing} of the exported model are not provided.'
+            )
+        return {name: inputs[name] for name in self.input_names}
+
+    def forward(self, *args, **kwargs) -> Dict[str, torch.Tensor]:
+        if self._runner is None:
+            self._load()
+        inputs = self._bind_inputs(*args, **kwargs)
+        if self.backend == Backends.onnxruntime:
+            feed = {
+                name:
+                value.cpu().numpy()
+                if isinstance(value, torch.Tensor) else np.asarray(value)
+                for name, value in inputs.items()
+            }
+            outputs = self._runner.run(self.output_names, feed)
+            return {
+                name: torch.from_numpy(output).to(self.device)
+                for name, output in zip(self.output_names, outputs)
+            }
+
+        with torch.no_grad():
+            outputs = self._runner(*[
+                torch.as_tensor(value).to(self.device)
+                for value in inputs.values()
+            ])
+        if isinstance(outputs, Mapping):
+            return {name: outputs[name] for name in self.output_names}
+        if isinstance(outputs, torch.Tensor):
+            outputs = (outputs, )
+        return dict(zip(self.output_names, outputs))
+
+    def postprocess(self, inputs: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        return self.torch_model.postprocess(inputs, **kwargs)
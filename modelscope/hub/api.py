@@ -371,6 +371,18 @@ class HubApi:
         return tags
 
     def get_valid_revision(self, model_id: str, revision=None, cookies: Optional[CookieJar] = None):
+        revision, _ = self.get_valid_revision_info(model_id, revision=revision, cookies=cookies)
+        return revision
+
+    def get_valid_revision_info(self,
+                                model_id: str,
+                                revision=None,
+                                cookies: Optional[CookieJar] = None) -> Tuple[str, bool]:
+        """Resolve the revision to use like `get_valid_revision`.
+
+        Returns:
+            Tuple[str, bool]: The valid revision and whether it is a tag.
+        """
         release_timestamp = get_release_datetime()
         current_timestamp = int(round(datetime.datetime.now().timestamp()))
         # for active development in library codes (non-release-branches), release_timestamp
@@ -385,6 +397,7 @@ class HubApi:
             if revision not in branches and revision not in tags:
                 raise NotExistError('The model: %s has no branch or tag : %s .' % revision)
             logger.info('Development mode use revision: %s' % revision)
+            return revision, revision in tags
         else:
             if revision is None:  # user not specified revision, use latest revision before release time
                 revisions = self.list_model_revisions(
@@ -403,7 +416,8 @@ class HubApi:
                     raise NotExistError(
                         'The model: %s has no revision: %s !' % (model_id, revision))
                 logger.info('Use user-specified model revision: %s' % revision)
-        return revision
+        # the revisions listed by the hub are tags
+        return revision, True
 
     def get_model_branches_and_tags(
         self,
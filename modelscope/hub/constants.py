@@ -1,5 +1,6 @@
 # Copyright (c) Alibaba, Inc. and its affiliates.
 
+import os
 from pathlib import Path
 
 MODELSCOPE_URL_SCHEME = 'http://'
@@ -20,6 +21,18 @@ MODELSCOPE_CLOUD_ENVIRONMENT = 'MODELSCOPE_ENVIRONMENT'
 MODELSCOPE_CLOUD_USERNAME = 'MODELSCOPE_USERNAME'
 MODELSCOPE_SDK_DEBUG = 'MODELSCOPE_SDK_DEBUG'
 ONE_YEAR_SECONDS = 24 * 365 * 60 * 60
+API_FILE_DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# number of files downloaded concurrently by snapshot_download, and number of
+# ranges downloaded concurrently for one large file
+MODELSCOPE_DOWNLOAD_PARALLELS = int(
+    os.environ.get('MODELSCOPE_DOWNLOAD_PARALLELS', 4))
+# files larger than this are downloaded in parallel http ranges
+MODELSCOPE_PARALLEL_DOWNLOAD_THRESHOLD_MB = int(
+    os.environ.get('MODELSCOPE_PARALLEL_DOWNLOAD_THRESHOLD_MB', 160))
+# cached files of a branch revision are used without checking the hub for
+# updates within this interval, pinned revisions (tags) are never checked again
+MODELSCOPE_REVISION_CHECK_INTERVAL_MINUTES = int(
+    os.environ.get('MODELSCOPE_REVISION_CHECK_INTERVAL_MINUTES', 0))
 
 
 class Licenses(object):
@@ -1,21 +1,30 @@
 # Copyright (c) Alibaba, Inc. and its affiliates.
 
 import copy
+import hashlib
 import os
-import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 from http.cookiejar import CookieJar
 from pathlib import Path
 from typing import Dict, Optional, Union
 
+import json
 import requests
+from filelock import FileLock
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
 
 from modelscope import __version__
 from modelscope.hub.api import HubApi, ModelScopeConfig
 from modelscope.utils.constant import DEFAULT_MODEL_REVISION
 from modelscope.utils.logger import get_logger
-from .constants import FILE_HASH
+from .constants import (API_FILE_DOWNLOAD_CHUNK_SIZE, FILE_HASH,
+                        MODELSCOPE_DOWNLOAD_PARALLELS,
+                        MODELSCOPE_PARALLEL_DOWNLOAD_THRESHOLD_MB,
+                        MODELSCOPE_REVISION_CHECK_INTERVAL_MINUTES)
 from .errors import FileDownloadError, NotExistError
 from .utils.caching import ModelFileSystemCache
 from .utils.utils import (file_integrity_validation, get_cache_dir,
@@ -86,6 +95,17 @@ def model_file_download(
 
     cache = ModelFileSystemCache(cache_dir, group_or_owner, name)
 
+    # resolve the file from the recorded revision manifest without network
+    # if the revision is pinned, or was checked recently
+    manifest = cache.get_revision_manifest(
+        revision,
+        ttl_seconds=float('inf') if local_files_only else
+        MODELSCOPE_REVISION_CHECK_INTERVAL_MINUTES * 60)
+    if manifest is not None:
+        for model_file in manifest['Files']:
+            if model_file['Path'] == file_path and cache.exists(model_file):
+                return cache.get_file_by_info(model_file)
+
     # if local_files_only is `True` and the file already exists in cached_path
     # return the cached path
     if local_files_only:
@@ -108,7 +128,8 @@ def model_file_download(
     if cookies is None:
         cookies = ModelScopeConfig.get_cookies()
 
-    revision = _api.get_valid_revision(
+    requested_revision = revision
+    revision, is_tag = _api.get_valid_revision_info(
         model_id, revision=revision, cookies=cookies)
     file_to_download_info = None
     # we need to confirm the version is up-to-date
@@ -119,6 +140,11 @@ def model_file_download(
         recursive=True,
         use_cookies=False if cookies is None else cookies)
 
+    # record the files of the revision, so that it can be resolved without
+    # network later, see `get_cached_snapshot`
+    cache.save_revision_manifest(requested_revision, revision, model_files,
+                                 is_tag)
+
     for model_file in model_files:
         if model_file['Type'] == 'tree':
             continue
@@ -139,26 +165,32 @@ def model_file_download(
 
     # we need to download again
     url_to_download = get_file_download_url(model_id, file_path, revision)
+    file_size = file_to_download_info.get('Size')
     file_to_download_info = {
         'Path': file_path,
         'Revision': file_to_download_info['Revision'],
         FILE_HASH: file_to_download_info[FILE_HASH]
     }
 
-    temp_file_name = next(tempfile._get_candidate_names())
-    http_get_file(
-        url_to_download,
-        temporary_cache_dir,
-        temp_file_name,
-        headers=headers,
-        cookies=None if cookies is None else cookies.get_dict())
+    # a stable temp file name, so that an interrupted download can be resumed
+    temp_file_name = cache.hash_name(url_to_download)
     temp_file_path = os.path.join(temporary_cache_dir, temp_file_name)
-    # for download with commit we can't get Sha256
-    if file_to_download_info[FILE_HASH] is not None:
-        file_integrity_validation(temp_file_path,
-                                  file_to_download_info[FILE_HASH])
-    return cache.put_file(file_to_download_info,
-                          os.path.join(temporary_cache_dir, temp_file_name))
+    # locked until the file is moved to the cache, the temp file name is shared
+    # by the processes downloading the same file
+    with download_lock(temporary_cache_dir, temp_file_name):
+        file_sha256 = http_get_file(
+            url_to_download,
+            temporary_cache_dir,
+            temp_file_name,
+            headers=headers,
+            cookies=None if cookies is None else cookies.get_dict(),
+            file_size=file_size)
+        # for download with commit we can't get Sha256
+        if file_to_download_info[FILE_HASH] is not None:
+            file_integrity_validation(temp_file_path,
+                                      file_to_download_info[FILE_HASH],
+                                      file_sha256)
+        return cache.put_file(file_to_download_info, temp_file_path)
 
 
 def get_file_download_url(model_id: str, file_path: str, revision: str):
@@ -176,18 +208,53 @@ def get_file_download_url(model_id: str, file_path: str, revision: str):
     )
 
 
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """Get the requests session shared by all downloads of the process.
+
+    The session keeps a pool of connections per host, so that downloading
+    many files, or many ranges of one file, does not reconnect for each request.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            pool_size = MODELSCOPE_DOWNLOAD_PARALLELS * MODELSCOPE_DOWNLOAD_PARALLELS
+            adapter = HTTPAdapter(
+                pool_connections=MODELSCOPE_DOWNLOAD_PARALLELS,
+                pool_maxsize=max(pool_size, 10))
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+    return _session
+
+
 def http_get_file(
     url: str,
     local_dir: str,
     file_name: str,
     cookies: CookieJar,
     headers: Optional[Dict[str, str]] = None,
-):
+    chunk_size: int = API_FILE_DOWNLOAD_CHUNK_SIZE,
+    parallels: int = MODELSCOPE_DOWNLOAD_PARALLELS,
+    file_size: Optional[int] = None,
+) -> str:
     """
     Download remote file. Do not gobble up errors.
     This method is only used by snapshot_download, since the behavior is quite different with single file download
     TODO: consolidate with http_get_file() to avoild duplicate code
 
+    The file is first written to `{file_name}.incomplete` in `local_dir`, an interrupted
+    download is resumed from it with a http Range request the next time the same file
+    name is downloaded. The download holds the file lock `{file_name}.incomplete.lock`,
+    so the processes downloading the same file name wait for each other instead of
+    writing into the same incomplete file. Files larger than
+    MODELSCOPE_PARALLEL_DOWNLOAD_THRESHOLD_MB are downloaded in `parallels` ranges
+    concurrently if `file_size` is given and the server supports Range requests.
+
     Args:
         url(`str`):
             actual download url of the file
@@ -199,43 +266,263 @@ def http_get_file(
             cookies used to authentication the user, which is used for downloading private repos
         headers(`Optional[Dict[str, str]] = None`):
             http headers to carry necessary info when requesting the remote file
+        chunk_size(`int`):
+            the size of the chunks read from the response stream
+        parallels(`int`):
+            the max number of ranges downloaded concurrently for a large file
+        file_size(`Optional[int] = None`):
+            the size of the file, e.g. the `Size` returned by `HubApi.get_model_files`,
+            required by the parallel download
 
+    Returns:
+        The sha256 hash of the downloaded file.
+    """
+    headers = copy.deepcopy(headers) if headers is not None else {}
+    session = get_http_session()
+    temp_file_path = os.path.join(local_dir, file_name + '.incomplete')
+    with FileLock(temp_file_path + '.lock'):
+        logger.info('downloading %s to %s', url, temp_file_path)
+        file_sha256 = None
+        total = file_size
+        if parallels > 1 and file_size is not None \
+                and file_size > MODELSCOPE_PARALLEL_DOWNLOAD_THRESHOLD_MB * 1024 * 1024:
+            file_sha256 = _parallel_download(session, url, headers, cookies,
+                                             temp_file_path, file_size,
+                                             chunk_size, parallels)
+        if file_sha256 is None:
+            _remove_ranged_download(temp_file_path)
+            file_sha256, total = _stream_download(session, url, headers,
+                                                  cookies, temp_file_path,
+                                                  chunk_size)
+
+        logger.info('storing %s in cache at %s', url, local_dir)
+        downloaded_length = os.path.getsize(temp_file_path)
+        if total is not None and total != downloaded_length:
+            os.remove(temp_file_path)
+            msg = 'File %s download incomplete, content_length: %s but the \
+                        file downloaded length: %s, please download again' % (
+                file_name, total, downloaded_length)
+            logger.error(msg)
+            raise FileDownloadError(msg)
+        os.replace(temp_file_path, os.path.join(local_dir, file_name))
+    return file_sha256
+
+
+def download_lock(local_dir: str, file_name: str) -> FileLock:
+    """The file lock of a downloaded file, to be held from the download until the
+    file is moved out of `local_dir`, see `http_get_file`.
     """
-    total = -1
-    temp_file_manager = partial(
-        tempfile.NamedTemporaryFile, mode='wb', dir=local_dir, delete=False)
+    return FileLock(os.path.join(local_dir, file_name + '.lock'))
 
-    with temp_file_manager() as temp_file:
-        logger.info('downloading %s to %s', url, temp_file.name)
-        headers = copy.deepcopy(headers)
 
-        r = requests.get(url, stream=True, headers=headers, cookies=cookies)
-        r.raise_for_status()
+def _stream_download(session, url, headers, cookies, temp_file_path,
+                     chunk_size):
+    """Download the file in one stream, resuming from the incomplete file if any.
 
-        content_length = r.headers.get('Content-Length')
-        total = int(content_length) if content_length is not None else None
-
-        progress = tqdm(
-            unit='B',
-            unit_scale=True,
-            unit_divisor=1024,
-            total=total,
-            initial=0,
-            desc='Downloading',
-        )
-        for chunk in r.iter_content(chunk_size=1024):
+    Returns:
+        A tuple of the sha256 hash and the expected size of the file.
+    """
+    sha256_hash = hashlib.sha256()
+    resume_size = os.path.getsize(temp_file_path) if os.path.exists(
+        temp_file_path) else 0
+    request_headers = headers
+    if resume_size > 0:
+        request_headers = {**headers, 'Range': 'bytes=%d-' % resume_size}
+    r = session.get(url, stream=True, headers=request_headers, cookies=cookies)
+    if resume_size > 0 and r.status_code == 416:
+        # the incomplete file is not a prefix of the remote file, start over
+        r.close()
+        os.remove(temp_file_path)
+        return _stream_download(session, url, headers, cookies, temp_file_path,
+                                chunk_size)
+    r.raise_for_status()
+    if r.status_code != 206:
+        resume_size = 0
+    elif resume_size > 0:
+        logger.info('resume downloading %s from %d bytes', url, resume_size)
+        with open(temp_file_path, 'rb') as f:
+            for block in iter(partial(f.read, chunk_size), b''):
+                sha256_hash.update(block)
+
+    content_length = r.headers.get('Content-Length')
+    total = int(
+        content_length) + resume_size if content_length is not None else None
+
+    progress = tqdm(
+        unit='B',
+        unit_scale=True,
+        unit_divisor=1024,
+        total=total,
+        initial=resume_size,
+        desc='Downloading',
+    )
+    with open(temp_file_path, 'ab' if resume_size > 0 else 'wb') as f:
+        for chunk in r.iter_content(chunk_size=chunk_size):
             if chunk:  # filter out keep-alive new chunks
                 progress.update(len(chunk))
-                temp_file.write(chunk)
+                f.write(chunk)
+                sha256_hash.update(chunk)
+    progress.close()
+    return sha256_hash.hexdigest(), total
+
+
+# the min seconds between two records of the progress of a parallel download
+_RANGES_SAVE_INTERVAL = 1.0
+
+
+class _RangeNotSupportedError(Exception):
+    pass
+
+
+def _remove_ranged_download(temp_file_path):
+    """Remove the incomplete file of an interrupted parallel download, which is
+    preallocated and can not be resumed as a prefix of the file.
+    """
+    ranges_path = temp_file_path + '.ranges'
+    if os.path.exists(ranges_path):
+        if os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
+        os.remove(ranges_path)
+
+
+def _parallel_download(session, url, headers, cookies, temp_file_path, total,
+                       chunk_size, parallels) -> Optional[str]:
+    """Download the ranges of the file concurrently into the incomplete file.
+
+    The incomplete file is preallocated to the file size and each range is written
+    at its offset, so the file is written once. The downloaded bytes of each range
+    are recorded in `{temp_file_path}.ranges` at most every
+    `_RANGES_SAVE_INTERVAL` seconds, to resume an interrupted download.
+
+    The sha256 hash is computed in the order of the file while the ranges are being
+    downloaded: the chunks which extend the hashed prefix are hashed from memory,
+    and the bytes downloaded ahead of the hashed prefix are read back from the file
+    once the prefix reaches them, so no pass over the file is left after the download.
+
+    Returns:
+        The sha256 hash of the file, or None if the server does not support Range
+        requests.
+    """
+    part_size = (total + parallels - 1) // parallels
+    ranges = [(start, min(start + part_size, total) - 1)
+              for start in range(0, total, part_size)]
+    ranges_path = temp_file_path + '.ranges'
+
+    done = None
+    if os.path.exists(ranges_path) and os.path.exists(temp_file_path) \
+            and os.path.getsize(temp_file_path) == total:
+        try:
+            with open(ranges_path) as f:
+                state = json.load(f)
+            if state['total'] == total and len(state['done']) == len(ranges):
+                done = state['done']
+        except (ValueError, KeyError) as e:
+            logger.warning(f'Can not resume from {ranges_path}: {e}')
+    if done is None:
+        done = [0] * len(ranges)
+        with open(temp_file_path, 'wb') as f:
+            f.truncate(total)
+
+    progress = tqdm(
+        unit='B',
+        unit_scale=True,
+        unit_divisor=1024,
+        total=total,
+        initial=sum(done),
+        desc='Downloading',
+    )
+    state_lock = threading.Lock()
+    last_saved = [time.monotonic()]
+
+    def _save_state():
+        with open(ranges_path, 'w') as f:
+            json.dump({'total': total, 'done': done}, f)
+        last_saved[0] = time.monotonic()
+
+    sha256_hash = hashlib.sha256()
+    hash_lock = threading.Lock()
+    # the number of the bytes hashed from the beginning of the file
+    hashed = [0]
+
+    def _hash_downloaded():
+        # hash the downloaded bytes following the hashed prefix, from the file,
+        # unbuffered so that the bytes beyond the downloaded ones are not read ahead
+        with open(temp_file_path, 'rb', buffering=0) as f:
+            while hashed[0] < total:
+                i = hashed[0] // part_size
+                available = ranges[i][0] + done[i] - hashed[0]
+                if available <= 0:
+                    break
+                f.seek(hashed[0])
+                block = f.read(min(available, chunk_size))
+                sha256_hash.update(block)
+                hashed[0] += len(block)
+
+    def _hash(offset, chunk):
+        # the workers downloading ahead of the hashed prefix do not wait here
+        if not hash_lock.acquire(blocking=False):
+            return
+        try:
+            if offset == hashed[0]:
+                sha256_hash.update(chunk)
+                hashed[0] += len(chunk)
+            _hash_downloaded()
+        finally:
+            hash_lock.release()
+
+    def _download_range(i, start, end):
+        if start + done[i] > end:
+            return
+        r = session.get(
+            url,
+            stream=True,
+            headers={
+                **headers, 'Range': 'bytes=%d-%d' % (start + done[i], end)
+            },
+            cookies=cookies)
+        r.raise_for_status()
+        if r.status_code != 206:
+            r.close()
+            raise _RangeNotSupportedError()
+        with open(temp_file_path, 'r+b') as f:
+            f.seek(start + done[i])
+            for chunk in r.iter_content(chunk_size=chunk_size):
+                if chunk:
+                    f.write(chunk)
+                    # flushed before recording it, a recorded range is on disk
+                    f.flush()
+                    offset = start + done[i]
+                    with state_lock:
+                        done[i] += len(chunk)
+                        if time.monotonic(
+                        ) - last_saved[0] >= _RANGES_SAVE_INTERVAL:
+                            _save_state()
+                        progress.update(len(chunk))
+                    _hash(offset, chunk)
+
+    try:
+        with ThreadPoolExecutor(len(ranges)) as executor:
+            futures = [
+                executor.submit(_download_range, i, start, end)
+                for i, (start, end) in enumerate(ranges)
+            ]
+            for future in futures:
+                future.result()
+    except _RangeNotSupportedError:
+        logger.info('Range request of %s is not supported by the server, '
+                    'downloading it in one stream' % url)
+        _remove_ranged_download(temp_file_path)
+        return None
+    except BaseException:
+        # record the progress of the interrupted download
+        with state_lock:
+            _save_state()
+        raise
+    finally:
         progress.close()
 
-    logger.info('storing %s in cache at %s', url, local_dir)
-    downloaded_length = os.path.getsize(temp_file.name)
-    if total != downloaded_length:
-        os.remove(temp_file.name)
-        msg = 'File %s download incomplete, content_length: %s but the \
-                    file downloaded length: %s, please download again' % (
-            file_name, total, downloaded_length)
-        logger.error(msg)
-        raise FileDownloadError(msg)
-    os.replace(temp_file.name, os.path.join(local_dir, file_name))
+    with hash_lock:
+        _hash_downloaded()
+    if os.path.exists(ranges_path):
+        os.remove(ranges_path)
+    return sha256_hash.hexdigest()
@@ -1,7 +1,8 @@
 # Copyright (c) Alibaba, Inc. and its affiliates.
 
 import os
-import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from http.cookiejar import CookieJar
 from pathlib import Path
 from typing import Dict, Optional, Union
@@ -9,8 +10,9 @@ from typing import Dict, Optional, Union
 from modelscope.hub.api import HubApi, ModelScopeConfig
 from modelscope.utils.constant import DEFAULT_MODEL_REVISION
 from modelscope.utils.logger import get_logger
-from .constants import FILE_HASH
-from .file_download import get_file_download_url, http_get_file
+from .constants import (FILE_HASH, MODELSCOPE_DOWNLOAD_PARALLELS,
+                        MODELSCOPE_REVISION_CHECK_INTERVAL_MINUTES)
+from .file_download import download_lock, get_file_download_url, http_get_file
 from .utils.caching import ModelFileSystemCache
 from .utils.utils import (file_integrity_validation, get_cache_dir,
                           model_id_to_group_owner_name)
@@ -18,12 +20,50 @@ from .utils.utils import (file_integrity_validation, get_cache_dir,
 logger = get_logger()
 
 
+def get_cached_snapshot(model_id: str,
+                        revision: Optional[str] = DEFAULT_MODEL_REVISION,
+                        cache_dir: Union[str, Path, None] = None,
+                        check_interval: bool = True) -> Optional[str]:
+    """Resolve a downloaded snapshot from the local revision manifest, without network.
+
+    A snapshot is resolved if it was downloaded with a pinned revision (a tag), or the
+    revision is a branch checked within MODELSCOPE_REVISION_CHECK_INTERVAL_MINUTES,
+    and all its files are still in the cache.
+
+    Args:
+        model_id (`str`): The model id.
+        revision (`str`, *optional*): The revision requested.
+        cache_dir (`str`, `Path`, *optional*): Path to the folder where cached files are stored.
+        check_interval (`bool`): If False, the manifest of a branch never expires, which is
+            used when the network is not allowed.
+
+    Returns:
+        The local folder path of the snapshot, or None if it can not be resolved locally.
+    """
+    if cache_dir is None:
+        cache_dir = get_cache_dir()
+    group_or_owner, name = model_id_to_group_owner_name(model_id)
+    if not os.path.exists(os.path.join(str(cache_dir), group_or_owner, name)):
+        return None
+    cache = ModelFileSystemCache(str(cache_dir), group_or_owner, name)
+    manifest = cache.get_revision_manifest(
+        revision,
+        ttl_seconds=MODELSCOPE_REVISION_CHECK_INTERVAL_MINUTES
+        * 60 if check_interval else float('inf'))
+    if manifest is not None and cache.is_snapshot_cached(manifest):
+        logger.info('Use the cached snapshot of revision: %s'
+                    % manifest['Revision'])
+        return cache.get_root_location()
+    return None
+
+
 def snapshot_download(model_id: str,
                       revision: Optional[str] = DEFAULT_MODEL_REVISION,
                       cache_dir: Union[str, Path, None] = None,
                       user_agent: Optional[Union[Dict, str]] = None,
                       local_files_only: Optional[bool] = False,
-                      cookies: Optional[CookieJar] = None) -> str:
+                      cookies: Optional[CookieJar] = None,
+                      max_workers: int = MODELSCOPE_DOWNLOAD_PARALLELS) -> str:
     """Download all files of a repo.
     Downloads a whole snapshot of a repo's files at the specified revision. This
     is useful when you want all files from a repo, because you don't know which
@@ -45,6 +85,12 @@ def snapshot_download(model_id: str,
         local_files_only (`bool`, *optional*, defaults to `False`):
             If `True`, avoid downloading the file and return the path to the
             local cached file if it exists.
+            Snapshots downloaded with a pinned revision (a tag) are returned without
+            network access even if `False`, and so are snapshots of a branch revision
+            checked within MODELSCOPE_REVISION_CHECK_INTERVAL_MINUTES.
+        max_workers (`int`, *optional*):
+            The max number of files downloaded concurrently, defaults to the
+            MODELSCOPE_DOWNLOAD_PARALLELS environment variable or 4.
     Returns:
         Local folder path (string) of repo snapshot
 
@@ -68,6 +114,11 @@ def snapshot_download(model_id: str,
 
     group_or_owner, name = model_id_to_group_owner_name(model_id)
 
+    cached_snapshot = get_cached_snapshot(
+        model_id, revision, cache_dir, check_interval=not local_files_only)
+    if cached_snapshot is not None:
+        return cached_snapshot
+
     cache = ModelFileSystemCache(cache_dir, group_or_owner, name)
     if local_files_only:
         if len(cache.cached_files) == 0:
@@ -88,7 +139,8 @@ def snapshot_download(model_id: str,
         _api = HubApi()
         if cookies is None:
             cookies = ModelScopeConfig.get_cookies()
-        revision = _api.get_valid_revision(
+        requested_revision = revision
+        revision, is_tag = _api.get_valid_revision_info(
             model_id, revision=revision, cookies=cookies)
 
         snapshot_header = headers if 'CI_TEST' in os.environ else {
@@ -105,37 +157,59 @@ def snapshot_download(model_id: str,
             headers=snapshot_header,
         )
 
-        with tempfile.TemporaryDirectory(
-                dir=temporary_cache_dir) as temp_cache_dir:
-            for model_file in model_files:
-                if model_file['Type'] == 'tree':
-                    continue
-                # check model_file is exist in cache, if existed, skip download, otherwise download
-                if cache.exists(model_file):
-                    file_name = os.path.basename(model_file['Name'])
-                    logger.info(
-                        f'File {file_name} already in cache, skip downloading!'
-                    )
-                    continue
-
-                # get download url
-                url = get_file_download_url(
-                    model_id=model_id,
-                    file_path=model_file['Path'],
-                    revision=revision)
-
-                # First download to /tmp
-                http_get_file(
+        # incomplete downloads are kept here to be resumed by the next call
+        temp_cache_dir = os.path.join(temporary_cache_dir, group_or_owner,
+                                      name)
+        os.makedirs(temp_cache_dir, exist_ok=True)
+
+        files_to_download = []
+        for model_file in model_files:
+            if model_file['Type'] == 'tree':
+                continue
+            # check model_file is exist in cache, if existed, skip download, otherwise download
+            if cache.exists(model_file):
+                file_name = os.path.basename(model_file['Name'])
+                logger.info(
+                    f'File {file_name} already in cache, skip downloading!')
+                continue
+            files_to_download.append(model_file)
+
+        def _download_file(model_file):
+            # get download url
+            url = get_file_download_url(
+                model_id=model_id,
+                file_path=model_file['Path'],
+                revision=revision)
+            temp_file_name = cache.hash_name(url)
+            temp_file = os.path.join(temp_cache_dir, temp_file_name)
+            # locked until the file is moved to the cache, see model_file_download
+            with download_lock(temp_cache_dir, temp_file_name):
+                # First download to the temp dir
+                file_sha256 = http_get_file(
                     url=url,
                     local_dir=temp_cache_dir,
-                    file_name=model_file['Name'],
+                    file_name=temp_file_name,
                     headers=headers,
-                    cookies=cookies)
+                    cookies=cookies,
+                    file_size=model_file.get('Size'))
                 # check file integrity
-                temp_file = os.path.join(temp_cache_dir, model_file['Name'])
                 if FILE_HASH in model_file:
-                    file_integrity_validation(temp_file, model_file[FILE_HASH])
-                # put file to cache
-                cache.put_file(model_file, temp_file)
+                    file_integrity_validation(temp_file, model_file[FILE_HASH],
+                                              file_sha256)
+                # the cache index is not thread safe
+                with put_lock:
+                    cache.put_file(model_file, temp_file)
+
+        put_lock = threading.Lock()
+        with ThreadPoolExecutor(max(1, max_workers)) as executor, \
+                cache.batch_commit():
+            futures = [
+                executor.submit(_download_file, model_file)
+                for model_file in files_to_download
+            ]
+            for future in as_completed(futures):
+                future.result()
 
+        cache.save_revision_manifest(requested_revision, revision, model_files,
+                                     is_tag)
         return os.path.join(cache.get_root_location())
@@ -4,16 +4,28 @@ import hashlib
 import os
 import pickle
 import tempfile
+import time
+from contextlib import contextmanager
 from shutil import move, rmtree
 
+import json
+from filelock import FileLock
+
 from modelscope.utils.logger import get_logger
+from modelscope.version import __version__
 
 logger = get_logger()
 
 
 class FileSystemCache(object):
     KEY_FILE_NAME = '.msc'
+    LOCK_FILE_NAME = '.msc.lock'
     """Local file cache.
+
+    The cached keys are indexed in memory by `index_key`, so lookups do not scan
+    all the keys. The index is persisted to KEY_FILE_NAME as a pickled list of
+    keys, updates are written under a file lock and merged with the keys saved
+    by other processes sharing the same cache location.
     """
 
     def __init__(
@@ -29,11 +41,27 @@ class FileSystemCache(object):
         """
         os.makedirs(cache_root_location, exist_ok=True)
         self.cache_root_location = cache_root_location
+        self._lock = FileLock(
+            os.path.join(cache_root_location, FileSystemCache.LOCK_FILE_NAME))
+        self._batch_depth = 0
+        self._pending = []
         self.load_cache()
 
     def get_root_location(self):
         return self.cache_root_location
 
+    @property
+    def cached_files(self):
+        """All the cached keys."""
+        return list(self._cached_files.values())
+
+    def index_key(self, key):
+        """The key of the in-memory index of a cache key.
+        """
+        if isinstance(key, dict):
+            return tuple(sorted(key.items()))
+        return key
+
     def load_cache(self):
         """Read set of stored blocks from file
         Args:
@@ -48,23 +76,72 @@ class FileSystemCache(object):
             model_id = {owner}/{name}
         </Tip>
         """
-        self.cached_files = []
+        self._cached_files = self._read_cached_files()
+
+    def _read_cached_files(self):
+        cached_files = {}
         cache_keys_file_path = os.path.join(self.cache_root_location,
                                             FileSystemCache.KEY_FILE_NAME)
         if os.path.exists(cache_keys_file_path):
-            with open(cache_keys_file_path, 'rb') as f:
-                self.cached_files = pickle.load(f)
+            try:
+                with open(cache_keys_file_path, 'rb') as f:
+                    keys = pickle.load(f)
+            except (EOFError, pickle.UnpicklingError) as e:
+                logger.warning(
+                    f'Ignore the corrupted cache index {cache_keys_file_path}: {e}'
+                )
+                keys = []
+            for key in keys:
+                cached_files[self.index_key(key)] = key
+        return cached_files
 
     def save_cached_files(self):
-        """Save cache metadata."""
-        # save new meta to tmp and move to KEY_FILE_NAME
+        """Save cache metadata.
+
+        Inside `batch_commit`, the save is deferred to the end of the batch.
+        """
+        if self._batch_depth > 0:
+            return
+        self._commit()
+
+    def _commit(self):
+        # Reload the index under the file lock, apply the pending updates on it and
+        # replace the index file atomically, so updates of other processes are kept.
         cache_keys_file_path = os.path.join(self.cache_root_location,
                                             FileSystemCache.KEY_FILE_NAME)
-        # TODO: Sync file write
-        fd, fn = tempfile.mkstemp()
-        with open(fd, 'wb') as f:
-            pickle.dump(self.cached_files, f)
-        move(fn, cache_keys_file_path)
+        with self._lock:
+            cached_files = self._read_cached_files()
+            for op, key in self._pending:
+                if op == 'put':
+                    cached_files[self.index_key(key)] = key
+                else:
+                    cached_files.pop(self.index_key(key), None)
+            fd, fn = tempfile.mkstemp(
+                prefix=FileSystemCache.KEY_FILE_NAME,
+                dir=self.cache_root_location)
+            with open(fd, 'wb') as f:
+                pickle.dump(list(cached_files.values()), f)
+            os.replace(fn, cache_keys_file_path)
+        self._cached_files = cached_files
+        self._pending = []
+
+    @contextmanager
+    def batch_commit(self):
+        """Defer saving the cache metadata to the end of the context, e.g. at the end
+        of a snapshot download, instead of saving it after every update.
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0 and len(self._pending) > 0:
+                self._commit()
+
+    def _add_key(self, key):
+        self._cached_files[self.index_key(key)] = key
+        self._pending.append(('put', key))
+        self.save_cached_files()
 
     def get_file(self, key):
         """Check the key is in the cache, if exist, return the file, otherwise return None.
@@ -101,16 +178,14 @@ class FileSystemCache(object):
         Args:
             key (dict): The cache key.
         """
-        if key in self.cached_files:
-            self.cached_files.remove(key)
+        index_key = self.index_key(key)
+        if index_key in self._cached_files:
+            del self._cached_files[index_key]
+            self._pending.append(('remove', key))
             self.save_cached_files()
 
     def exists(self, key):
-        for cache_file in self.cached_files:
-            if cache_file == key:
-                return True
-
-        return False
+        return self.index_key(key) in self._cached_files
 
     def clear_cache(self):
         """Remove all files and metadat from the cache
@@ -119,6 +194,8 @@ class FileSystemCache(object):
         which is assumed to be the read/write one.
         """
         rmtree(self.cache_root_location)
+        os.makedirs(self.cache_root_location, exist_ok=True)
+        self._pending = []
         self.load_cache()
 
     def hash_name(self, key):
@@ -149,6 +226,91 @@ class ModelFileSystemCache(FileSystemCache):
         """
         super().__init__(os.path.join(cache_root, owner, name))
 
+    MANIFEST_FILE_NAME = '.msm'
+
+    def index_key(self, key):
+        # only one version is cached for each file path
+        return key['Path']
+
+    def _manifest_key(self, revision):
+        # the default revision is the latest tag before the release of the library,
+        # so the manifest of it is only valid for the current version
+        return revision if revision is not None else f'@{__version__}'
+
+    def _read_manifests(self):
+        manifest_file_path = os.path.join(
+            self.cache_root_location, ModelFileSystemCache.MANIFEST_FILE_NAME)
+        if not os.path.exists(manifest_file_path):
+            return {}
+        try:
+            with open(manifest_file_path, 'r') as f:
+                return json.load(f)
+        except ValueError as e:
+            logger.warning(
+                f'Ignore the corrupted revision manifest {manifest_file_path}: {e}'
+            )
+            return {}
+
+    def save_revision_manifest(self, revision, commit_revision, model_files,
+                               pinned):
+        """Record the file list of a revision, so that it can be resolved locally later.
+
+        Args:
+            revision (str): The revision requested by the user, None for the default revision.
+            commit_revision (str): The valid revision resolved from the hub.
+            model_files (List[dict]): The files returned by get_model_files.
+            pinned (bool): Whether the revision is a tag, whose files never change.
+        """
+        files = [{
+            'Path': f['Path'],
+            'Revision': f['Revision'],
+            'Sha256': f.get('Sha256'),
+            'Size': f.get('Size'),
+        } for f in model_files if f.get('Type') != 'tree']
+        manifest_file_path = os.path.join(
+            self.cache_root_location, ModelFileSystemCache.MANIFEST_FILE_NAME)
+        with self._lock:
+            manifests = self._read_manifests()
+            manifests[self._manifest_key(revision)] = {
+                'Revision': commit_revision,
+                'Pinned': pinned,
+                'Timestamp': time.time(),
+                'Files': files,
+            }
+            fd, fn = tempfile.mkstemp(
+                prefix=ModelFileSystemCache.MANIFEST_FILE_NAME,
+                dir=self.cache_root_location)
+            with open(fd, 'w') as f:
+                json.dump(manifests, f)
+            os.replace(fn, manifest_file_path)
+
+    def get_revision_manifest(self, revision, ttl_seconds=0):
+        """Get the recorded manifest of a revision if it can be trusted without
+        checking the hub.
+
+        Manifests of pinned revisions (tags) never expire, manifests of branches are
+        only valid within `ttl_seconds` after they were recorded.
+
+        Args:
+            revision (str): The revision requested by the user.
+            ttl_seconds (int): How long the manifest of a branch is trusted.
+
+        Returns:
+            The manifest dict with `Revision`, `Pinned`, `Timestamp` and `Files` keys, or None.
+        """
+        manifest = self._read_manifests().get(self._manifest_key(revision))
+        if manifest is None:
+            return None
+        if not manifest['Pinned'] and time.time(
+        ) - manifest['Timestamp'] > ttl_seconds:
+            return None
+        return manifest
+
+    def is_snapshot_cached(self, manifest):
+        """Whether all the files of the revision manifest are in the cache.
+        """
+        return all(self.exists(f) for f in manifest['Files'])
+
     def get_file_by_path(self, file_path):
         """Retrieve the cache if there is file match the path.
         Args:
@@ -156,14 +318,14 @@ class ModelFileSystemCache(FileSystemCache):
         Returns:
             path: the full path of the file.
         """
-        for cached_file in self.cached_files:
-            if file_path == cached_file['Path']:
-                cached_file_path = os.path.join(self.cache_root_location,
-                                                cached_file['Path'])
-                if os.path.exists(cached_file_path):
-                    return cached_file_path
-                else:
-                    self.remove_key(cached_file)
+        cached_file = self._cached_files.get(file_path)
+        if cached_file is not None:
+            cached_file_path = os.path.join(self.cache_root_location,
+                                            cached_file['Path'])
+            if os.path.exists(cached_file_path):
+                return cached_file_path
+            else:
+                self.remove_key(cached_file)
 
         return None
 
@@ -175,15 +337,15 @@ class ModelFileSystemCache(FileSystemCache):
         Returns:
             path: the full path of the file.
         """
-        for cached_file in self.cached_files:
-            if file_path == cached_file['Path'] and \
-               (cached_file['Revision'].startswith(commit_id) or commit_id.startswith(cached_file['Revision'])):
-                cached_file_path = os.path.join(self.cache_root_location,
-                                                cached_file['Path'])
-                if os.path.exists(cached_file_path):
-                    return cached_file_path
-                else:
-                    self.remove_key(cached_file)
+        cached_file = self._cached_files.get(file_path)
+        if cached_file is not None and \
+           (cached_file['Revision'].startswith(commit_id) or commit_id.startswith(cached_file['Revision'])):
+            cached_file_path = os.path.join(self.cache_root_location,
+                                            cached_file['Path'])
+            if os.path.exists(cached_file_path):
+                return cached_file_path
+            else:
+                self.remove_key(cached_file)
 
         return None
 
@@ -197,15 +359,14 @@ class ModelFileSystemCache(FileSystemCache):
             _type_: _description_
         """
         cache_key = self.__get_cache_key(model_file_info)
-        for cached_file in self.cached_files:
-            if cached_file == cache_key:
-                orig_path = os.path.join(self.cache_root_location,
-                                         cached_file['Path'])
-                if os.path.exists(orig_path):
-                    return orig_path
-                else:
-                    self.remove_key(cached_file)
-                    break
+        cached_file = self._cached_files.get(cache_key['Path'])
+        if cached_file == cache_key:
+            orig_path = os.path.join(self.cache_root_location,
+                                     cached_file['Path'])
+            if os.path.exists(orig_path):
+                return orig_path
+            else:
+                self.remove_key(cached_file)
 
         return None
 
@@ -226,13 +387,10 @@ class ModelFileSystemCache(FileSystemCache):
             bool: If exists return True otherwise False
         """
         key = self.__get_cache_key(model_file_info)
-        is_exists = False
-        for cached_key in self.cached_files:
-            if cached_key['Path'] == key['Path'] and (
-                    cached_key['Revision'].startswith(key['Revision'])
-                    or key['Revision'].startswith(cached_key['Revision'])):
-                is_exists = True
-                break
+        cached_key = self._cached_files.get(key['Path'])
+        is_exists = cached_key is not None and (
+            cached_key['Revision'].startswith(key['Revision'])
+            or key['Revision'].startswith(cached_key['Revision']))
         file_path = os.path.join(self.cache_root_location,
                                  model_file_info['Path'])
         if is_exists:
@@ -249,14 +407,13 @@ class ModelFileSystemCache(FileSystemCache):
         Args:
             model_file_info (ModelFileInfo): The model file information from server.
         """
-        for cached_file in self.cached_files:
-            if cached_file['Path'] == model_file_info['Path']:
-                self.remove_key(cached_file)
-                file_path = os.path.join(self.cache_root_location,
-                                         cached_file['Path'])
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                break
+        cached_file = self._cached_files.get(model_file_info['Path'])
+        if cached_file is not None:
+            self.remove_key(cached_file)
+            file_path = os.path.join(self.cache_root_location,
+                                     cached_file['Path'])
+            if os.path.exists(file_path):
+                os.remove(file_path)
 
     def put_file(self, model_file_info, model_file_location):
         """Put model on model_file_location to cache, the model first download to /tmp, and move to cache.
@@ -283,7 +440,6 @@ class ModelFileSystemCache(FileSystemCache):
         Returns:
             str: The location of the cached file.
         """
-        self.remove_if_exists(model_file_info)  # backup old revision
         cache_key = self.__get_cache_key(model_file_info)
         cache_full_path = os.path.join(
             self.cache_root_location,
@@ -291,8 +447,8 @@ class ModelFileSystemCache(FileSystemCache):
         cache_file_dir = os.path.dirname(cache_full_path)
         if not os.path.exists(cache_file_dir):
             os.makedirs(cache_file_dir, exist_ok=True)
-        # We can't make operation transaction
+        # the new file replaces the old revision atomically, the index entry of
+        # the path is overwritten by the new key
         move(model_file_location, cache_full_path)
-        self.cached_files.append(cache_key)
-        self.save_cached_files()
+        self._add_key(cache_key)
         return cache_full_path
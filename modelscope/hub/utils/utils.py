@@ -70,18 +70,21 @@ def compute_hash(file_path):
     return sha256_hash.hexdigest()
 
 
-def file_integrity_validation(file_path, expected_sha256):
+def file_integrity_validation(file_path, expected_sha256, file_sha256=None):
     """Validate the file hash is expected, if not, delete the file
 
     Args:
         file_path (str): The file to validate
         expected_sha256 (str): The expected sha256 hash
+        file_sha256 (str, optional): The sha256 hash of the file computed while
+            downloading, if not given it is computed from the file.
 
     Raises:
         FileIntegrityError: If file_path hash is not expected.
 
     """
-    file_sha256 = compute_hash(file_path)
+    if file_sha256 is None:
+        file_sha256 = compute_hash(file_path)
     if not file_sha256 == expected_sha256:
         os.remove(file_path)
         msg = 'File %s integrity check failed, the download may be incomplete, please try again.' % file_path
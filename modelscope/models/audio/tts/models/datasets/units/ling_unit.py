@@ -253,6 +253,29 @@ class KanTtsLinguisticUnit(LinguisticBaseUnit):
 
         return input_and_label_data
 
+    def dummy_symbol_sequence(self, length):
+        """A symbol sequence of `length` symbols, each made of the first entry of
+        every linguistic feature, which runs the acoustic model without the frontend.
+        """
+        units = {
+            'sy': self.sy,
+            'tone': getattr(self, 'tone', None),
+            'syllable_flag': getattr(self, 'syllable_flag', None),
+            'word_segment': getattr(self, 'word_segment', None),
+            'emo_category': getattr(self, 'emo_category', None),
+            'speaker_category': getattr(self, 'speaker', None),
+        }
+        features = []
+        for lfeat_type in self._lfeat_type_list:
+            if units.get(lfeat_type) is None:
+                raise Exception(
+                    'modelscope error: configuration lfeat type(%s) unknown.'
+                    % lfeat_type)
+            # the symbols of sy are written without the arpabet prefix
+            features.append(units[lfeat_type][0].lstrip('@'))
+        symbol = '{' + '$'.join(features) + '}'
+        return ' '.join([symbol] * length)
+
     def decode_symbol_sequence(self, sequence):
         result = []
         for i, lfeat_type in enumerate(self._lfeat_type_list):
@@ -3,7 +3,6 @@
 from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 import os
-import zipfile
 
 import json
 import numpy as np
@@ -16,6 +15,7 @@ from modelscope.utils.audio.tts_exceptions import (
     TtsFrontendLanguageTypeInvalidException, TtsModelConfigurationException,
     TtsVoiceNotExistsException)
 from modelscope.utils.constant import Tasks
+from modelscope.utils.file_utils import extract_zip_once
 from .voice import Voice
 
 __all__ = ['SambertHifigan']
@@ -26,6 +26,13 @@ __all__ = ['SambertHifigan']
 class SambertHifigan(Model):
 
     def __init__(self, model_dir, *args, **kwargs):
+        """
+        Args:
+            model_dir (str): The model dir.
+            kwargs: The 'am', 'vocoder' and 'lang_type' configurations of the model, and
+                'warm_up' (bool) to load all the voices and run a dummy synthesis with each
+                voice at start-up, instead of loading a voice on its first request.
+        """
         super().__init__(model_dir, *args, **kwargs)
         if 'am' not in kwargs:
             raise TtsModelConfigurationException(
@@ -42,10 +49,8 @@ class SambertHifigan(Model):
         # initialize frontend
         import ttsfrd
         frontend = ttsfrd.TtsFrontendEngine()
-        zip_file = os.path.join(model_dir, 'resource.zip')
-        self.__res_path = os.path.join(model_dir, 'resource')
-        with zipfile.ZipFile(zip_file, 'r') as zip_ref:
-            zip_ref.extractall(model_dir)
+        self.__res_path = extract_zip_once(
+            os.path.join(model_dir, 'resource.zip'), model_dir, 'resource')
         if not frontend.initialize(self.__res_path):
             raise TtsFrontendInitializeFailedException(
                 'modelscope error: resource invalid: {}'.format(
@@ -55,10 +60,8 @@ class SambertHifigan(Model):
                 'modelscope error: language type invalid: {}'.format(
                     kwargs['lang_type']))
         self.__frontend = frontend
-        zip_file = os.path.join(model_dir, 'voices.zip')
-        self.__voice_path = os.path.join(model_dir, 'voices')
-        with zipfile.ZipFile(zip_file, 'r') as zip_ref:
-            zip_ref.extractall(model_dir)
+        self.__voice_path = extract_zip_once(
+            os.path.join(model_dir, 'voices.zip'), model_dir, 'voices')
         voice_cfg_path = os.path.join(self.__voice_path, 'voices.json')
         with open(voice_cfg_path, 'r', encoding='utf-8') as f:
             voice_cfg = json.load(f)
@@ -76,22 +79,56 @@ class SambertHifigan(Model):
         else:
             raise TtsVoiceNotExistsException(
                 'modelscope error: voices is empty in voices.json')
+        if kwargs.get('warm_up', False):
+            self.warm_up()
 
-    def __synthesis_one_sentences(self, voice_name, text):
+    def warm_up(self):
+        """Load all the voices and run a dummy synthesis with each of them.
+        """
+        for voice in self.__voice.values():
+            voice.warm_up()
+
+    def __get_voice(self, voice_name):
+        if voice_name is None:
+            voice_name = self.__default_voice_name
         if voice_name not in self.__voice:
             raise TtsVoiceNotExistsException(
                 f'modelscope error: Voice {voice_name} not exists')
-        return self.__voice[voice_name].forward(text)
+        return self.__voice[voice_name]
+
+    def forward_stream(self,
+                       text: str,
+                       voice_name: str = None,
+                       sentence_batch_size: int = 1):
+        """Synthesis the text sentence by sentence, yield the audio of each sentence
+        as soon as it is vocoded.
 
-    def forward(self, text: str, voice_name: str = None):
-        voice = self.__default_voice_name
-        if voice_name is not None:
-            voice = voice_name
+        Args:
+            text (str): The text to synthesis.
+            voice_name (str): The voice, default to the first voice of the model.
+            sentence_batch_size (int): The number of sentences synthesised in one batch.
+
+        Yields:
+            np.ndarray: The 16bit pcm data of a sentence.
+        """
+        voice = self.__get_voice(voice_name)
         result = self.__frontend.gen_tacotron_symbols(text)
         texts = [s for s in result.splitlines() if s != '']
-        audio_total = np.empty((0), dtype='int16')
-        for line in texts:
-            line = line.strip().split('\t')
-            audio = self.__synthesis_one_sentences(voice, line[1])
-            audio_total = np.append(audio_total, audio, axis=0)
-        return audio_total
+        symbols = [line.strip().split('\t')[1] for line in texts]
+        sentence_batch_size = max(1, sentence_batch_size)
+        for i in range(0, len(symbols), sentence_batch_size):
+            batch = symbols[i:i + sentence_batch_size]
+            if len(batch) == 1:
+                yield voice.forward(batch[0])
+            else:
+                yield from voice.forward_batch(batch)
+
+    def forward(self,
+                text: str,
+                voice_name: str = None,
+                sentence_batch_size: int = 1):
+        audios = list(
+            self.forward_stream(text, voice_name, sentence_batch_size))
+        if len(audios) == 0:
+            return np.empty((0), dtype='int16')
+        return np.concatenate(audios, axis=0)
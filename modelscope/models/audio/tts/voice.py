@@ -8,8 +8,8 @@ import json
 import numpy as np
 import torch
 
-from modelscope.utils.audio.tts_exceptions import \
-    TtsModelConfigurationException
+from modelscope.utils.audio.tts_exceptions import (
+    TtsModelConfigurationException, TtsVocoderMelspecShapeMismatchException)
 from modelscope.utils.constant import ModelFile, Tasks
 from .models.datasets.units import KanTtsLinguisticUnit
 from .models.models.hifigan import Generator
@@ -73,54 +73,73 @@ class Voice:
         self.__generator.remove_weight_norm()
 
     def __am_forward(self, symbol_seq):
+        return self.__am_forward_batch([symbol_seq])[0]
+
+    def __am_forward_batch(self, symbol_seqs):
         with self.__lock:
             with torch.no_grad():
-                inputs_feat_lst = self.__ling_unit.encode_symbol_sequence(
-                    symbol_seq)
-                inputs_sy = torch.from_numpy(inputs_feat_lst[0]).long().to(
-                    self.__device)
-                inputs_tone = torch.from_numpy(inputs_feat_lst[1]).long().to(
-                    self.__device)
-                inputs_syllable = torch.from_numpy(
-                    inputs_feat_lst[2]).long().to(self.__device)
-                inputs_ws = torch.from_numpy(inputs_feat_lst[3]).long().to(
-                    self.__device)
-                inputs_ling = torch.stack(
-                    [inputs_sy, inputs_tone, inputs_syllable, inputs_ws],
-                    dim=-1).unsqueeze(0)
-                inputs_emo = torch.from_numpy(inputs_feat_lst[4]).long().to(
-                    self.__device).unsqueeze(0)
-                inputs_spk = torch.from_numpy(inputs_feat_lst[5]).long().to(
-                    self.__device).unsqueeze(0)
-                inputs_len = torch.zeros(1).to(self.__device).long(
-                ) + inputs_emo.size(1) - 1  # minus 1 for "~"
-                res = self.__am_net(inputs_ling[:, :-1, :], inputs_emo[:, :-1],
-                                    inputs_spk[:, :-1], inputs_len)
-                postnet_outputs = res['postnet_outputs']
-                LR_length_rounded = res['LR_length_rounded']
-                valid_length = int(LR_length_rounded[0].item())
-                postnet_outputs = postnet_outputs[
-                    0, :valid_length, :].cpu().numpy()
-                return postnet_outputs
+                feats = [
+                    self.__ling_unit.encode_symbol_sequence(symbol_seq)
+                    for symbol_seq in symbol_seqs
+                ]
+                # minus 1 for "~"
+                lengths = [len(feat[4]) - 1 for feat in feats]
+                max_length = max(lengths)
+
+                def _pad(feat):
+                    padded = np.zeros(max_length, dtype=np.int64)
+                    padded[:len(feat) - 1] = feat[:-1]
+                    return padded
+
+                def _to_tensor(index):
+                    return torch.from_numpy(
+                        np.stack([_pad(feat[index])
+                                  for feat in feats])).long().to(self.__device)
+
+                inputs_ling = torch.stack([_to_tensor(i) for i in range(4)],
+                                          dim=-1)
+                inputs_emo = _to_tensor(4)
+                inputs_spk = _to_tensor(5)
+                inputs_len = torch.tensor(lengths).long().to(self.__device)
+                res = self.__am_net(inputs_ling, inputs_emo, inputs_spk,
+                                    inputs_len)
+                postnet_outputs = res['postnet_outputs'].cpu().numpy()
+                LR_length_rounded = res['LR_length_rounded'].cpu().numpy()
+                return [
+                    postnet_outputs[i, :int(LR_length_rounded[i]), :]
+                    for i in range(len(symbol_seqs))
+                ]
 
     def __vocoder_forward(self, melspec):
-        dim0 = list(melspec.shape)[-1]
-        if dim0 != self.__voc_config.num_mels:
-            raise TtsVocoderMelspecShapeMismatchException(
-                'modelscope error: input melspec mismatch require {} but {}'.
-                format(self.__voc_config.num_mels, dim0))
+        return self.__vocoder_forward_batch([melspec])[0]
+
+    def __vocoder_forward_batch(self, melspecs):
+        for melspec in melspecs:
+            dim0 = list(melspec.shape)[-1]
+            if dim0 != self.__voc_config.num_mels:
+                raise TtsVocoderMelspecShapeMismatchException(
+                    'modelscope error: input melspec mismatch require {} but {}'.
+                    format(self.__voc_config.num_mels, dim0))
         with torch.no_grad():
-            x = melspec.T
-            x = torch.FloatTensor(x).to(self.__device)
-            if len(x.shape) == 2:
-                x = x.unsqueeze(0)
+            # the vocoder is causal, padding at the end does not change the
+            # audio of the valid frames
+            lengths = [melspec.shape[0] for melspec in melspecs]
+            x = np.zeros((len(melspecs), self.__voc_config.num_mels,
+                          max(lengths)),
+                         dtype=np.float32)
+            for i, melspec in enumerate(melspecs):
+                x[i, :, :lengths[i]] = melspec.T
+            x = torch.from_numpy(x).to(self.__device)
             y_g_hat = self.__generator(x)
-            audio = y_g_hat.squeeze()
-            audio = audio * MAX_WAV_VALUE
+            audio = y_g_hat.squeeze(1) * MAX_WAV_VALUE
             audio = audio.cpu().numpy().astype('int16')
-            return audio
+            samples_per_frame = audio.shape[1] / max(lengths)
+            return [
+                audio[i, :int(round(lengths[i] * samples_per_frame))]
+                for i in range(len(melspecs))
+            ]
 
-    def forward(self, symbol_seq):
+    def __load_models(self):
         with self.__lock:
             if not self.__model_loaded:
                 torch.manual_seed(self.__am_config.seed)
@@ -132,4 +151,28 @@ class Voice:
                 self.__load_am()
                 self.__load_vocoder()
                 self.__model_loaded = True
+
+    def warm_up(self, num_symbols=8):
+        """Load the models and run a dummy synthesis through the am and the vocoder,
+        so the first request does not pay for the loading and the lazy initialization
+        of the kernels.
+        """
+        self.__load_models()
+        self.forward(self.__ling_unit.dummy_symbol_sequence(num_symbols))
+
+    def forward(self, symbol_seq):
+        self.__load_models()
         return self.__vocoder_forward(self.__am_forward(symbol_seq))
+
+    def forward_batch(self, symbol_seqs):
+        """Synthesis several sentences in one batch.
+
+        Args:
+            symbol_seqs (list): The symbol sequences of the sentences.
+
+        Returns:
+            list: The 16bit pcm data of each sentence.
+        """
+        self.__load_models()
+        return self.__vocoder_forward_batch(
+            self.__am_forward_batch(symbol_seqs))
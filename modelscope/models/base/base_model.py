@@ -8,7 +8,8 @@ from modelscope.hub.snapshot_download import snapshot_download
 from modelscope.models.builder import MODELS, build_model
 from modelscope.utils.checkpoint import save_checkpoint, save_pretrained
 from modelscope.utils.config import Config
-from modelscope.utils.constant import DEFAULT_MODEL_REVISION, ModelFile, Tasks
+from modelscope.utils.constant import (DEFAULT_MODEL_REVISION, Backends,
+                                       ModelFile, Tasks)
 from modelscope.utils.device import verify_device
 from modelscope.utils.logger import get_logger
 
@@ -82,6 +83,14 @@ class Model(ABC):
                 read out of config in the `model_name_or_path`. This is useful when the model to be loaded is not
                 equal to the model saved.
                 For example, load a `backbone` into a `text-classification` model.
+                backend(str, `optional`): The inference backend, `torch`(default), `onnxruntime`
+                or `torchscript`. For the latter two, an `ExportedModel` running the exported file
+                of the model is returned, the file is exported on the first use or loaded from the
+                model dir.
+                quantize(str, `optional`): The post-training quantization method of the torch model,
+                only `dynamic-int8` is supported now, which quantizes the Linear and LSTM layers for
+                the inference on cpu, see `modelscope.utils.quantization.quantize_model`. The pipeline
+                of a quantized model should be built with `device='cpu'`.
                 Other kwargs will be directly fed into the `model` key, to replace the default configs.
         Returns:
             A model instance.
@@ -109,6 +118,8 @@ class Model(ABC):
             cfg = Config.from_file(
                 osp.join(local_model_dir, ModelFile.CONFIGURATION))
         task_name = cfg.task
+        backend = kwargs.pop('backend', Backends.torch)
+        quantize = kwargs.pop('quantize', None)
         if 'task' in kwargs:
             task_name = kwargs.pop('task')
         model_cfg = cfg.model
@@ -133,6 +144,13 @@ class Model(ABC):
             model.cfg = cfg
 
         model.name = model_name_or_path
+        if quantize is not None:
+            from modelscope.utils.quantization import quantize_model
+            model = quantize_model(model, quantize)
+        if backend != Backends.torch:
+            from modelscope.exporters import ExportedModel
+            model = ExportedModel(
+                model, backend, device=device if device is not None else 'cpu')
         return model
 
     def save_pretrained(self,
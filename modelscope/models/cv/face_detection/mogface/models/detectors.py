@@ -11,6 +11,7 @@ from modelscope.metainfo import Models
 from modelscope.models.base import TorchModel
 from modelscope.models.builder import MODELS
 from modelscope.utils.constant import Tasks
+from modelscope.utils.cv.anchors import cached_anchors, pad_to_bucket
 from .mogface import MogFace
 from .utils import MogPriorBox, mogdecode, py_cpu_nms
 
@@ -18,7 +19,17 @@ from .utils import MogPriorBox, mogdecode, py_cpu_nms
 @MODELS.register_module(Tasks.face_detection, module_name=Models.mogface)
 class MogFaceDetector(TorchModel):
 
-    def __init__(self, model_path, device='cuda'):
+    def __init__(self, model_path, device='cuda', resolution_buckets=None):
+        """MogFace face detector.
+
+        Args:
+            model_path: The path of the checkpoint.
+            device: The device to run on.
+            resolution_buckets: Pad the inputs to a few canonical sizes so that they
+                share the cached priors, either an int to round the sizes up to its
+                multiples, or a list of (height, width) sizes, see
+                `modelscope.utils.cv.anchors.bucket_size`. None to keep the sizes.
+        """
         super().__init__(model_path)
         cudnn.benchmark = True
         self.model_path = model_path
@@ -26,6 +37,8 @@ class MogFaceDetector(TorchModel):
         self.net = MogFace()
         self.load_model()
         self.net = self.net.to(device)
+        self.resolution_buckets = resolution_buckets
+        self.priorbox = MogPriorBox(scale_list=[0.68])
 
         self.mean = np.array([[104, 117, 123]])
 
@@ -48,8 +61,6 @@ class MogFaceDetector(TorchModel):
             img = cv2.resize(img, (0, 0), fx=ss, fy=ss)
             im_height, im_width = img.shape[:2]
 
-        scale = torch.Tensor(
-            [img.shape[1], img.shape[0], img.shape[1], img.shape[0]])
         img -= np.array([[103.53, 116.28, 123.675]])
         img /= np.array([[57.375, 57.120003, 58.395]])
         img /= 255
@@ -57,7 +68,10 @@ class MogFaceDetector(TorchModel):
         img = img.transpose(2, 0, 1)
         img = torch.from_numpy(img).unsqueeze(0)
         img = img.to(self.device)
-        scale = scale.to(self.device)
+        if self.resolution_buckets is not None:
+            # padded with the mean, which is zero after the normalization
+            img = pad_to_bucket(img, self.resolution_buckets)
+            im_height, im_width = img.shape[-2:]
 
         conf, loc = self.net(img)  # forward pass
 
@@ -66,10 +80,10 @@ class MogFaceDetector(TorchModel):
         top_k = 5000
         keep_top_k = 750
 
-        priorbox = MogPriorBox(scale_list=[0.68])
-        priors = priorbox(im_height, im_width)
-        priors = torch.tensor(priors).to(self.device)
-        prior_data = priors.data
+        prior_data = cached_anchors(
+            lambda: torch.from_numpy(self.priorbox(im_height, im_width)),
+            (Models.mogface, vars(self.priorbox)), im_height, im_width,
+            self.device)
 
         boxes = mogdecode(loc.data.squeeze(0), prior_data)
         boxes = boxes.cpu().numpy()
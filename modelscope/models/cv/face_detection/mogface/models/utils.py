@@ -1,12 +1,12 @@
 # Modified from https://github.com/biubug6/Pytorch_Retinaface
 
-import math
-from itertools import product as product
 from math import ceil
 
 import numpy as np
 import torch
 
+from modelscope.utils.cv.boxes import decode_boxes, decode_landmarks, nms
+
 
 def transform_anchor(anchors):
     """
@@ -48,7 +48,6 @@ class MogPriorBox(object):
         final_anchor_list = []
 
         for idx, stride in enumerate(self.stride_list):
-            anchor_list = []
             cur_img_height = img_height
             cur_img_width = img_width
             tmp_stride = stride
@@ -58,18 +57,19 @@ class MogPriorBox(object):
                 cur_img_height = (cur_img_height + 1) // 2
                 cur_img_width = (cur_img_width + 1) // 2
 
-            for i in range(cur_img_height):
-                for j in range(cur_img_width):
-                    for scale in self.scale_list:
-                        cx = (j + 0.5) * stride
-                        cy = (i + 0.5) * stride
-                        side_x = self.anchor_size_list[idx] * scale
-                        side_y = self.anchor_size_list[idx] * scale
-                        for ratio in self.aspect_ratio_list:
-                            anchor_list.append([
-                                cx, cy, side_x / math.sqrt(ratio),
-                                side_y * math.sqrt(ratio)
-                            ])
+            # (cx, cy, w, h) of the rows i, the columns j, the scales and the ratios
+            cy = (np.arange(cur_img_height) + 0.5) * stride
+            cx = (np.arange(cur_img_width) + 0.5) * stride
+            sides = self.anchor_size_list[idx] * np.array(
+                self.scale_list, dtype=np.float64)
+            sqrt_ratios = np.sqrt(
+                np.array(self.aspect_ratio_list, dtype=np.float64))
+            anchor_list = np.stack(
+                np.broadcast_arrays(cx[None, :, None, None], cy[:, None, None,
+                                                                None],
+                                    sides[None, None, :, None] / sqrt_ratios,
+                                    sides[None, None, :, None] * sqrt_ratios),
+                axis=-1).reshape(-1, 4)
 
             final_anchor_list.append(anchor_list)
         final_anchor_arr = np.concatenate(final_anchor_list, axis=0)
@@ -97,58 +97,30 @@ class PriorBox(object):
     def forward(self):
         anchors = []
         for k, f in enumerate(self.feature_maps):
-            min_sizes = self.min_sizes[k]
-            for i, j in product(range(f[0]), range(f[1])):
-                for min_size in min_sizes:
-                    s_kx = min_size / self.image_size[1]
-                    s_ky = min_size / self.image_size[0]
-                    dense_cx = [
-                        x * self.steps[k] / self.image_size[1]
-                        for x in [j + 0.5]
-                    ]
-                    dense_cy = [
-                        y * self.steps[k] / self.image_size[0]
-                        for y in [i + 0.5]
-                    ]
-                    for cy, cx in product(dense_cy, dense_cx):
-                        anchors += [cx, cy, s_kx, s_ky]
+            min_sizes = np.array(self.min_sizes[k], dtype=np.float64)
+            # (cx, cy, s_kx, s_ky) of the rows i, the columns j and the min sizes
+            cy = (np.arange(f[0]) + 0.5) * self.steps[k] / self.image_size[0]
+            cx = (np.arange(f[1]) + 0.5) * self.steps[k] / self.image_size[1]
+            s_kx = min_sizes / self.image_size[1]
+            s_ky = min_sizes / self.image_size[0]
+            anchors.append(
+                np.stack(
+                    np.broadcast_arrays(cx[None, :, None], cy[:, None, None],
+                                        s_kx[None, None, :], s_ky[None,
+                                                                  None, :]),
+                    axis=-1).reshape(-1, 4))
 
         # back to torch land
-        output = torch.Tensor(anchors).view(-1, 4)
+        output = torch.from_numpy(np.concatenate(anchors).astype(np.float32))
         if self.clip:
             output.clamp_(max=1, min=0)
         return output
 
 
 def py_cpu_nms(dets, thresh):
-    """Pure Python NMS baseline."""
-    x1 = dets[:, 0]
-    y1 = dets[:, 1]
-    x2 = dets[:, 2]
-    y2 = dets[:, 3]
-    scores = dets[:, 4]
-
-    areas = (x2 - x1 + 1) * (y2 - y1 + 1)
-    order = scores.argsort()[::-1]
-
-    keep = []
-    while order.size > 0:
-        i = order[0]
-        keep.append(i)
-        xx1 = np.maximum(x1[i], x1[order[1:]])
-        yy1 = np.maximum(y1[i], y1[order[1:]])
-        xx2 = np.minimum(x2[i], x2[order[1:]])
-        yy2 = np.minimum(y2[i], y2[order[1:]])
-
-        w = np.maximum(0.0, xx2 - xx1 + 1)
-        h = np.maximum(0.0, yy2 - yy1 + 1)
-        inter = w * h
-        ovr = inter / (areas[i] + areas[order[1:]] - inter)
-
-        inds = np.where(ovr <= thresh)[0]
-        order = order[inds + 1]
-
-    return keep
+    """NMS of the detections in (x1, y1, x2, y2, score), see
+    `modelscope.utils.cv.boxes.nms`."""
+    return nms(dets[:, :4], dets[:, 4], thresh, offset=1)
 
 
 def mogdecode(loc, anchors):
@@ -157,16 +129,7 @@ def mogdecode(loc, anchors):
     anchors: 2-d, torch.Tensor (cx, cy, w, h)
     boxes: 2-d, torch.Tensor (x0, y0, x1, y1)
     """
-
-    boxes = torch.cat((anchors[:, :2] + loc[:, :2] * anchors[:, 2:],
-                       anchors[:, 2:] * torch.exp(loc[:, 2:])), 1)
-
-    boxes[:, 0] -= (boxes[:, 2] - 1) / 2
-    boxes[:, 1] -= (boxes[:, 3] - 1) / 2
-    boxes[:, 2] += boxes[:, 0] - 1
-    boxes[:, 3] += boxes[:, 1] - 1
-
-    return boxes
+    return decode_boxes(loc, anchors, (1., 1.), offset=1)
 
 
 # Adapted from https://github.com/Hakuyume/chainer-ssd
@@ -182,13 +145,7 @@ def decode(loc, priors, variances):
     Return:
         decoded bounding box predictions
     """
-
-    boxes = torch.cat(
-        (priors[:, :2] + loc[:, :2] * variances[0] * priors[:, 2:],
-         priors[:, 2:] * torch.exp(loc[:, 2:] * variances[1])), 1)
-    boxes[:, :2] -= boxes[:, 2:] / 2
-    boxes[:, 2:] += boxes[:, :2]
-    return boxes
+    return decode_boxes(loc, priors, variances)
 
 
 def decode_landm(pre, priors, variances):
@@ -203,10 +160,4 @@ def decode_landm(pre, priors, variances):
     Return:
         decoded landm predictions
     """
-    a = priors[:, :2] + pre[:, :2] * variances[0] * priors[:, 2:]
-    b = priors[:, :2] + pre[:, 2:4] * variances[0] * priors[:, 2:]
-    c = priors[:, :2] + pre[:, 4:6] * variances[0] * priors[:, 2:]
-    d = priors[:, :2] + pre[:, 6:8] * variances[0] * priors[:, 2:]
-    e = priors[:, :2] + pre[:, 8:10] * variances[0] * priors[:, 2:]
-    landms = torch.cat((a, b, c, d, e), dim=1)
-    return landms
+    return decode_landmarks(pre, priors, variances)
@@ -1,6 +1,11 @@
 # The implementation is based on mtcnn, available at https://github.com/TropComplique/mtcnn-pytorch
+import math
+
 import numpy as np
-from PIL import Image
+import torch
+import torch.nn.functional as F
+
+from modelscope.utils.cv.boxes import nms as nms_boxes
 
 
 def nms(boxes, overlap_threshold=0.5, mode='union'):
@@ -16,57 +21,11 @@ def nms(boxes, overlap_threshold=0.5, mode='union'):
         list with indices of the selected boxes
     """
 
-    # if there are no boxes, return the empty list
     if len(boxes) == 0:
         return []
-
-    # list of picked indices
-    pick = []
-
-    # grab the coordinates of the bounding boxes
-    x1, y1, x2, y2, score = [boxes[:, i] for i in range(5)]
-
-    area = (x2 - x1 + 1.0) * (y2 - y1 + 1.0)
-    ids = np.argsort(score)  # in increasing order
-
-    while len(ids) > 0:
-
-        # grab index of the largest value
-        last = len(ids) - 1
-        i = ids[last]
-        pick.append(i)
-
-        # compute intersections
-        # of the box with the largest score
-        # with the rest of boxes
-
-        # left top corner of intersection boxes
-        ix1 = np.maximum(x1[i], x1[ids[:last]])
-        iy1 = np.maximum(y1[i], y1[ids[:last]])
-
-        # right bottom corner of intersection boxes
-        ix2 = np.minimum(x2[i], x2[ids[:last]])
-        iy2 = np.minimum(y2[i], y2[ids[:last]])
-
-        # width and height of intersection boxes
-        w = np.maximum(0.0, ix2 - ix1 + 1.0)
-        h = np.maximum(0.0, iy2 - iy1 + 1.0)
-
-        # intersections' areas
-        inter = w * h
-        if mode == 'min':
-            overlap = inter / np.minimum(area[i], area[ids[:last]])
-        elif mode == 'union':
-            # intersection over union (IoU)
-            overlap = inter / (area[i] + area[ids[:last]] - inter)
-
-        # delete all boxes where overlap is too big
-        ids = np.delete(
-            ids,
-            np.concatenate([[last],
-                            np.where(overlap > overlap_threshold)[0]]))
-
-    return pick
+    return nms_boxes(
+        boxes[:, :4], boxes[:, 4], overlap_threshold, offset=1,
+        mode=mode).tolist()
 
 
 def convert_to_square(bboxes):
@@ -125,116 +84,68 @@ def calibrate_box(bboxes, offsets):
     return bboxes
 
 
-def get_image_boxes(bounding_boxes, img, size=24):
-    """Cut out boxes from the image.
+def get_image_boxes(bounding_boxes, img, size=24, max_sampling_ratio=2):
+    """Cut out boxes from the image and resize them, all in one batched sampling.
+
+    Like roi_align, each cutout pixel averages a grid of bilinear samples, which
+    smooths the downscaled cutouts. The parts of the boxes out of the image are
+    black, as the cutouts padded with zeros.
 
     Arguments:
         bounding_boxes: a float numpy array of shape [n, 5].
-        img: an instance of PIL.Image.
+        img: a float tensor of shape [3, h, w], the pixels in [0, 255].
         size: an integer, size of cutouts.
+        max_sampling_ratio: an integer, the max number of samples
+            per cutout pixel along each side.
 
     Returns:
-        a float numpy array of shape [n, 3, size, size].
+        a float tensor of shape [n, 3, size, size].
     """
 
     num_boxes = len(bounding_boxes)
-    width, height = img.size
-
-    [dy, edy, dx, edx, y, ey, x, ex, w,
-     h] = correct_bboxes(bounding_boxes, width, height)
-    img_boxes = np.zeros((num_boxes, 3, size, size), 'float32')
-
-    for i in range(num_boxes):
-        img_box = np.zeros((h[i], w[i], 3), 'uint8')
-
-        img_array = np.asarray(img, 'uint8')
-        img_box[dy[i]:(edy[i] + 1), dx[i]:(edx[i] + 1), :] =\
-            img_array[y[i]:(ey[i] + 1), x[i]:(ex[i] + 1), :]
-
-        # resize
-        img_box = Image.fromarray(img_box)
-        img_box = img_box.resize((size, size), Image.BILINEAR)
-        img_box = np.asarray(img_box, 'float32')
-
-        img_boxes[i, :, :, :] = _preprocess(img_box)
-
-    return img_boxes
-
-
-def correct_bboxes(bboxes, width, height):
-    """Crop boxes that are too big and get coordinates
-    with respect to cutouts.
-
-    Arguments:
-        bboxes: a float numpy array of shape [n, 5],
-            where each row is (xmin, ymin, xmax, ymax, score).
-        width: a float number.
-        height: a float number.
-
-    Returns:
-        dy, dx, edy, edx: a int numpy arrays of shape [n],
-            coordinates of the boxes with respect to the cutouts.
-        y, x, ey, ex: a int numpy arrays of shape [n],
-            corrected ymin, xmin, ymax, xmax.
-        h, w: a int numpy arrays of shape [n],
-            just heights and widths of boxes.
-
-        in the following order:
-            [dy, edy, dx, edx, y, ey, x, ex, w, h].
-    """
-
-    x1, y1, x2, y2 = [bboxes[:, i] for i in range(4)]
-    w, h = x2 - x1 + 1.0, y2 - y1 + 1.0
-    num_boxes = bboxes.shape[0]
-
-    # 'e' stands for end
-    # (x, y) -> (ex, ey)
-    x, y, ex, ey = x1, y1, x2, y2
-
-    # we need to cut out a box from the image.
-    # (x, y, ex, ey) are corrected coordinates of the box
-    # in the image.
-    # (dx, dy, edx, edy) are coordinates of the box in the cutout
-    # from the image.
-    dx, dy = np.zeros((num_boxes, )), np.zeros((num_boxes, ))
-    edx, edy = w.copy() - 1.0, h.copy() - 1.0
-
-    # if box's bottom right corner is too far right
-    ind = np.where(ex > width - 1.0)[0]
-    edx[ind] = w[ind] + width - 2.0 - ex[ind]
-    ex[ind] = width - 1.0
-
-    # if box's bottom right corner is too low
-    ind = np.where(ey > height - 1.0)[0]
-    edy[ind] = h[ind] + height - 2.0 - ey[ind]
-    ey[ind] = height - 1.0
-
-    # if box's top left corner is too far left
-    ind = np.where(x < 0.0)[0]
-    dx[ind] = 0.0 - x[ind]
-    x[ind] = 0.0
-
-    # if box's top left corner is too high
-    ind = np.where(y < 0.0)[0]
-    dy[ind] = 0.0 - y[ind]
-    y[ind] = 0.0
-
-    return_list = [dy, edy, dx, edx, y, ey, x, ex, w, h]
-    return_list = [i.astype('int32') for i in return_list]
-
-    return return_list
+    if num_boxes == 0:
+        return img.new_zeros((0, 3, size, size))
+    height, width = img.shape[-2:]
+
+    boxes = torch.as_tensor(
+        bounding_boxes[:, 0:4], dtype=img.dtype, device=img.device)
+    sides = boxes[:, 2:4] - boxes[:, 0:2] + 1.0
+    ratio = int(
+        min(max(math.ceil(sides.max().item() / size), 1), max_sampling_ratio))
+    num_samples = size * ratio
+
+    # the sampled pixel coordinates of the boxes, in the same convention as
+    # the bilinear resizing of PIL, then normalized to [-1, 1] for grid_sample
+    steps = (torch.arange(num_samples, dtype=img.dtype, device=img.device)
+             + 0.5) / num_samples
+    xs = boxes[:, 0:1] + steps * sides[:, 0:1] - 0.5
+    ys = boxes[:, 1:2] + steps * sides[:, 1:2] - 0.5
+    grid_x = (2.0 * xs + 1.0) / width - 1.0
+    grid_y = (2.0 * ys + 1.0) / height - 1.0
+    grid = torch.stack(
+        torch.broadcast_tensors(grid_x[:, None, :], grid_y[:, :, None]),
+        dim=-1)
+
+    img_boxes = F.grid_sample(
+        img[None],
+        grid.view(1, num_boxes * num_samples, num_samples, 2),
+        mode='bilinear',
+        padding_mode='zeros',
+        align_corners=False)
+    img_boxes = img_boxes.view(3, num_boxes, num_samples,
+                               num_samples).transpose(0, 1)
+    if ratio > 1:
+        img_boxes = F.avg_pool2d(img_boxes, ratio)
+    return _preprocess(img_boxes)
 
 
 def _preprocess(img):
     """Preprocessing step before feeding the network.
 
     Arguments:
-        img: a float numpy array of shape [h, w, c].
+        img: a float tensor of shape [..., c, h, w], the pixels in [0, 255].
 
     Returns:
-        a float numpy array of shape [1, c, h, w].
+        a float tensor of the same shape, the pixels in [-1, 1].
     """
-    img = img.transpose((2, 0, 1))
-    img = np.expand_dims(img, 0)
-    img = (img - 127.5) * 0.0078125
-    return img
+    return (img - 127.5) * 0.0078125
@@ -4,8 +4,6 @@ import os
 import numpy as np
 import torch
 import torch.backends.cudnn as cudnn
-from PIL import Image
-from torch.autograd import Variable
 
 from modelscope.metainfo import Models
 from modelscope.models.base import TorchModel
@@ -19,11 +17,20 @@ from .get_nets import ONet, PNet, RNet
 @MODELS.register_module(Tasks.face_detection, module_name=Models.mtcnn)
 class MtcnnFaceDetector(TorchModel):
 
-    def __init__(self, model_path, device='cuda'):
+    def __init__(self, model_path, device='cuda', batch_size=128):
+        """MTCNN face detector.
+
+        Args:
+            model_path: The dir of the weights of P-Net, R-Net and O-Net.
+            device: The device to run on.
+            batch_size: The max number of the cutouts fed into R-Net or O-Net
+                at a time, larger batches run slower per cutout on cpu.
+        """
         super().__init__(model_path)
         cudnn.benchmark = True
         self.model_path = model_path
         self.device = device
+        self.batch_size = batch_size
 
         self.pnet = PNet(model_path=os.path.join(self.model_path, 'pnet.npy'))
         self.rnet = RNet(model_path=os.path.join(self.model_path, 'rnet.npy'))
@@ -32,117 +39,141 @@ class MtcnnFaceDetector(TorchModel):
         self.pnet = self.pnet.to(device)
         self.rnet = self.rnet.to(device)
         self.onet = self.onet.to(device)
+        self.onet.eval()
 
     def forward(self, input):
-        image = Image.fromarray(np.uint8(input['img'].cpu().numpy()))
-        pnet = self.pnet
-        rnet = self.rnet
-        onet = self.onet
-        onet.eval()
-
-        min_face_size = 20.0
-        thresholds = [0.7, 0.8, 0.9]
-        nms_thresholds = [0.7, 0.7, 0.7]
-
-        # BUILD AN IMAGE PYRAMID
-        width, height = image.size
-        min_length = min(height, width)
-
-        min_detection_size = 12
-        factor = 0.707  # sqrt(0.5)
-
-        # scales for scaling the image
-        scales = []
-
-        m = min_detection_size / min_face_size
-        min_length *= m
-
-        factor_count = 0
-        while min_length > min_detection_size:
-            scales.append(m * factor**factor_count)
-            min_length *= factor
-            factor_count += 1
+        """Detect the faces of an image, or of a list of images.
+
+        Args:
+            input: A dict with the key `img`, an image of shape [h, w, 3] in RGB,
+                or a list of them, as numpy arrays or tensors.
+
+        Returns:
+            The (bounding_boxes, landmarks) of the image, or a list of them for
+            a list of images, see `detect`.
+        """
+        images = input['img']
+        if isinstance(images, (list, tuple)):
+            return self.detect(images)
+        return self.detect([images])[0]
+
+    def detect(self,
+               images,
+               min_face_size=20.0,
+               thresholds=(0.7, 0.8, 0.9),
+               nms_thresholds=(0.7, 0.7, 0.7)):
+        """Detect the faces of a batch of images.
+
+        Each stage runs its net once for all the images: P-Net on the packed
+        image pyramids, R-Net and O-Net on the cutouts of all the candidate
+        boxes, which are cut out in batched samplings.
+
+        Args:
+            images: A list of images of shape [h, w, 3] in RGB, as numpy arrays
+                or tensors.
+            min_face_size: The min size of the faces to detect.
+            thresholds: The thresholds of the face probabilities of the stages.
+            nms_thresholds: The nms thresholds of the stages.
+
+        Returns:
+            A list of (bounding_boxes, landmarks) for the images, float numpy
+            arrays of shape [n, 5] in (x1, y1, x2, y2, score) and [n, 10] in
+            (x1, y1, ..., x5, y5).
+        """
+        images = [
+            torch.as_tensor(
+                np.asarray(img) if not isinstance(img, torch.Tensor) else img).
+            to(self.device).permute(2, 0, 1).float() for img in images
+        ]
 
         # STAGE 1
 
-        # it will be returned
-        bounding_boxes = []
-
-        # run P-Net on different scales
-        for s in scales:
-            boxes = run_first_stage(
-                image,
-                pnet,
-                scale=s,
-                threshold=thresholds[0],
-                device=self.device)
-            bounding_boxes.append(boxes)
-
-        # collect boxes (and offsets, and scores) from different scales
-        bounding_boxes = [i for i in bounding_boxes if i is not None]
-        bounding_boxes = np.vstack(bounding_boxes)
+        all_boxes = run_first_stage(
+            images, self.pnet, thresholds[0], min_face_size=min_face_size)
+        for i, bounding_boxes in enumerate(all_boxes):
+            keep = nms(bounding_boxes[:, 0:5], nms_thresholds[0])
+            bounding_boxes = bounding_boxes[keep]
 
-        keep = nms(bounding_boxes[:, 0:5], nms_thresholds[0])
-        bounding_boxes = bounding_boxes[keep]
+            # use offsets predicted by pnet to transform bounding boxes
+            bounding_boxes = calibrate_box(bounding_boxes[:, 0:5],
+                                           bounding_boxes[:, 5:])
+            # shape [n_boxes, 5]
 
-        # use offsets predicted by pnet to transform bounding boxes
-        bounding_boxes = calibrate_box(bounding_boxes[:, 0:5],
-                                       bounding_boxes[:, 5:])
-        # shape [n_boxes, 5]
-
-        bounding_boxes = convert_to_square(bounding_boxes)
-        bounding_boxes[:, 0:4] = np.round(bounding_boxes[:, 0:4])
+            bounding_boxes = convert_to_square(bounding_boxes)
+            bounding_boxes[:, 0:4] = np.round(bounding_boxes[:, 0:4])
+            all_boxes[i] = bounding_boxes
 
         # STAGE 2
 
-        img_boxes = get_image_boxes(bounding_boxes, image, size=24)
-        img_boxes = Variable(torch.FloatTensor(img_boxes), volatile=True)
-        output = rnet(img_boxes.to(self.device))
-        offsets = output[0].cpu().data.numpy()  # shape [n_boxes, 4]
-        probs = output[1].cpu().data.numpy()  # shape [n_boxes, 2]
-
-        keep = np.where(probs[:, 1] > thresholds[1])[0]
-        bounding_boxes = bounding_boxes[keep]
-        bounding_boxes[:, 4] = probs[keep, 1].reshape((-1, ))
-        offsets = offsets[keep]
-
-        keep = nms(bounding_boxes, nms_thresholds[1])
-        bounding_boxes = bounding_boxes[keep]
-        bounding_boxes = calibrate_box(bounding_boxes, offsets[keep])
-        bounding_boxes = convert_to_square(bounding_boxes)
-        bounding_boxes[:, 0:4] = np.round(bounding_boxes[:, 0:4])
+        outputs = self._run_on_cutouts(
+            self.rnet, images, all_boxes, size=24, output_sizes=(4, 2))
+        for i, (offsets, probs) in enumerate(outputs):
+            bounding_boxes = all_boxes[i]
+            keep = np.where(probs[:, 1] > thresholds[1])[0]
+            bounding_boxes = bounding_boxes[keep]
+            bounding_boxes[:, 4] = probs[keep, 1].reshape((-1, ))
+            offsets = offsets[keep]
+
+            keep = nms(bounding_boxes, nms_thresholds[1])
+            bounding_boxes = bounding_boxes[keep]
+            bounding_boxes = calibrate_box(bounding_boxes, offsets[keep])
+            bounding_boxes = convert_to_square(bounding_boxes)
+            bounding_boxes[:, 0:4] = np.round(bounding_boxes[:, 0:4])
+            all_boxes[i] = bounding_boxes
 
         # STAGE 3
 
-        img_boxes = get_image_boxes(bounding_boxes, image, size=48)
-        if len(img_boxes) == 0:
-            return [], []
-        img_boxes = Variable(torch.FloatTensor(img_boxes), volatile=True)
-        output = onet(img_boxes.to(self.device))
-        landmarks = output[0].cpu().data.numpy()  # shape [n_boxes, 10]
-        offsets = output[1].cpu().data.numpy()  # shape [n_boxes, 4]
-        probs = output[2].cpu().data.numpy()  # shape [n_boxes, 2]
-
-        keep = np.where(probs[:, 1] > thresholds[2])[0]
-        bounding_boxes = bounding_boxes[keep]
-        bounding_boxes[:, 4] = probs[keep, 1].reshape((-1, ))
-        offsets = offsets[keep]
-        landmarks = landmarks[keep]
-
-        # compute landmark points
-        width = bounding_boxes[:, 2] - bounding_boxes[:, 0] + 1.0
-        height = bounding_boxes[:, 3] - bounding_boxes[:, 1] + 1.0
-        xmin, ymin = bounding_boxes[:, 0], bounding_boxes[:, 1]
-        landmarks[:, 0:5] = np.expand_dims(
-            xmin, 1) + np.expand_dims(width, 1) * landmarks[:, 0:5]
-        landmarks[:, 5:10] = np.expand_dims(
-            ymin, 1) + np.expand_dims(height, 1) * landmarks[:, 5:10]
-
-        bounding_boxes = calibrate_box(bounding_boxes, offsets)
-        keep = nms(bounding_boxes, nms_thresholds[2], mode='min')
-        bounding_boxes = bounding_boxes[keep]
-        landmarks = landmarks[keep]
-        landmarks = landmarks.reshape(-1, 2, 5).transpose(
-            (0, 2, 1)).reshape(-1, 10)
-
-        return bounding_boxes, landmarks
+        results = []
+        outputs = self._run_on_cutouts(
+            self.onet, images, all_boxes, size=48, output_sizes=(10, 4, 2))
+        for i, (landmarks, offsets, probs) in enumerate(outputs):
+            bounding_boxes = all_boxes[i]
+            keep = np.where(probs[:, 1] > thresholds[2])[0]
+            bounding_boxes = bounding_boxes[keep]
+            bounding_boxes[:, 4] = probs[keep, 1].reshape((-1, ))
+            offsets = offsets[keep]
+            landmarks = landmarks[keep]
+
+            # compute landmark points
+            width = bounding_boxes[:, 2] - bounding_boxes[:, 0] + 1.0
+            height = bounding_boxes[:, 3] - bounding_boxes[:, 1] + 1.0
+            xmin, ymin = bounding_boxes[:, 0], bounding_boxes[:, 1]
+            landmarks[:, 0:5] = np.expand_dims(
+                xmin, 1) + np.expand_dims(width, 1) * landmarks[:, 0:5]
+            landmarks[:, 5:10] = np.expand_dims(
+                ymin, 1) + np.expand_dims(height, 1) * landmarks[:, 5:10]
+
+            bounding_boxes = calibrate_box(bounding_boxes, offsets)
+            keep = nms(bounding_boxes, nms_thresholds[2], mode='min')
+            bounding_boxes = bounding_boxes[keep]
+            landmarks = landmarks[keep]
+            landmarks = landmarks.reshape(-1, 2, 5).transpose(
+                (0, 2, 1)).reshape(-1, 10)
+            results.append((bounding_boxes, landmarks))
+
+        return results
+
+    def _run_on_cutouts(self, net, images, all_boxes, size, output_sizes):
+        """Run a net on the cutouts of the boxes of all the images, in batches
+        of `batch_size`, and split the numpy outputs by the images."""
+        img_boxes = [
+            get_image_boxes(bounding_boxes, img, size=size)
+            for img, bounding_boxes in zip(images, all_boxes)
+        ]
+        num_boxes = [len(bounding_boxes) for bounding_boxes in all_boxes]
+        img_boxes = torch.cat(img_boxes)
+        if len(img_boxes) > 0:
+            with torch.no_grad():
+                outputs = [
+                    net(batch)
+                    for batch in torch.split(img_boxes, self.batch_size)
+                ]
+            output = [torch.cat(item).cpu().numpy() for item in zip(*outputs)]
+        else:
+            # the flatten layers can not reshape an empty batch
+            output = [
+                np.zeros((0, output_size), dtype=np.float32)
+                for output_size in output_sizes
+            ]
+        splits = np.cumsum(num_boxes)[:-1]
+        return list(zip(*[np.split(item, splits) for item in output]))
@@ -3,49 +3,182 @@ import math
 
 import numpy as np
 import torch
-from PIL import Image
-from torch.autograd import Variable
+import torch.nn.functional as F
+from packaging import version
 
-from .box_utils import _preprocess, nms
+from modelscope.utils.cv.boxes import batched_nms
+from .box_utils import _preprocess
 
+# downscale with an antialiasing filter, like the bilinear resizing of PIL
+_RESIZE_KWARGS = {
+    'antialias': True
+} if version.parse(torch.__version__) >= version.parse('1.11') else {}
+# the levels fed into P-Net alone, the smaller ones are packed into a canvas
+_NUM_UNPACKED_LEVELS = 2
 
-def run_first_stage(image, net, scale, threshold, device='cuda'):
-    """Run P-Net, generate bounding boxes, and do NMS.
+
+def pyramid_scales(height,
+                   width,
+                   min_face_size=20.0,
+                   min_detection_size=12,
+                   factor=0.707):
+    """Scales of the image pyramid.
+
+    Arguments:
+        height, width: integers, the size of the image.
+        min_face_size: a float number, the min size of the faces to detect.
+        min_detection_size: an integer, the input size of P-Net.
+        factor: a float number, the scale ratio of the neighbouring levels.
+
+    Returns:
+        a list of float numbers.
+    """
+    scales = []
+    m = min_detection_size / min_face_size
+    min_length = min(height, width) * m
+
+    factor_count = 0
+    while min_length > min_detection_size:
+        scales.append(m * factor**factor_count)
+        min_length *= factor
+        factor_count += 1
+    return scales
+
+
+def _even(n):
+    return n + n % 2
+
+
+def pack_pyramid(sizes, gap=2):
+    """Place the levels of an image pyramid on one canvas, row by row.
+
+    P-Net has a stride of 2 and a receptive field of 12, so the levels
+    start at even coordinates, and at least 2 pixels away from each other,
+    to keep the outputs of the full 12x12 windows inside a level the same
+    as running the level alone. The last output row or column of an odd
+    sized level is not: running alone, its max pooling window is cut by the
+    edge of the level, while on the canvas it also covers the gap. So only
+    the cells of the full windows of a packed level should be read, see
+    `run_first_stage`.
 
     Arguments:
-        image: an instance of PIL.Image.
+        sizes: a list of (height, width) of the levels, in decreasing order.
+        gap: an even integer, the min distance between the levels.
+
+    Returns:
+        a list of (y, x) offsets of the levels, and the (height, width)
+            of the canvas.
+    """
+    if len(sizes) == 0:
+        return [], (0, 0)
+    # the first two levels side by side, the smaller ones in the next rows
+    canvas_width = sizes[0][1]
+    if len(sizes) > 1:
+        canvas_width = _even(canvas_width + gap) + sizes[1][1]
+
+    offsets = []
+    y, x, row_height, canvas_width_used = 0, 0, 0, 0
+    for height, width in sizes:
+        if x > 0 and x + width > canvas_width:
+            y += _even(row_height + gap)
+            x, row_height = 0, 0
+        offsets.append((y, x))
+        canvas_width_used = max(canvas_width_used, x + width)
+        row_height = max(row_height, height)
+        x += _even(width + gap)
+    return offsets, (y + row_height, canvas_width_used)
+
+
+def _output_size(size):
+    # conv 3x3, max pool 2x2 with ceil mode, conv 3x3, conv 3x3
+    return math.ceil((size - 2) / 2) - 4
+
+
+def run_first_stage(images, net, threshold, min_face_size=20.0):
+    """Run P-Net on the image pyramids of a batch of images, generate
+    bounding boxes, and do NMS on each level.
+
+    The levels of each image are resized with tensor ops. The two largest
+    levels are fed into P-Net alone, and all the smaller ones are packed
+    into one canvas, see `pack_pyramid`, so P-Net runs three times for each
+    image instead of once for each level. For the packed levels of odd
+    sizes, the last output row or column, whose window is cut by the edge
+    of the level, is dropped. Packing the large levels too runs
+    slower on cpu, as the activations of a large canvas fall out of the cache.
+
+    Arguments:
+        images: a list of float tensors of shape [3, h, w] on the device
+            of the net, the pixels in [0, 255].
         net: an instance of pytorch's nn.Module, P-Net.
-        scale: a float number,
-            scale width and height of the image by this number.
         threshold: a float number,
             threshold on the probability of a face when generating
             bounding boxes from predictions of the net.
+        min_face_size: a float number, the min size of the faces to detect.
 
     Returns:
-        a float numpy array of shape [n_boxes, 9],
+        a list of float numpy arrays of shape [n_boxes, 9] for the images,
             bounding boxes with scores and offsets (4 + 1 + 4).
     """
 
-    # scale the image and convert it to a float array
-    width, height = image.size
-    sw, sh = math.ceil(width * scale), math.ceil(height * scale)
-    img = image.resize((sw, sh), Image.BILINEAR)
-    img = np.asarray(img, 'float32')
-
-    img = Variable(
-        torch.FloatTensor(_preprocess(img)), volatile=True).to(device)
-    output = net(img)
-    probs = output[1].cpu().data.numpy()[0, 1, :, :]
-    offsets = output[0].cpu().data.numpy()
-    # probs: probability of a face at each sliding window
-    # offsets: transformations to true bounding boxes
-
-    boxes = _generate_bboxes(probs, offsets, scale, threshold)
-    if len(boxes) == 0:
-        return None
-
-    keep = nms(boxes[:, 0:5], overlap_threshold=0.5)
-    return boxes[keep]
+    all_boxes = []
+    for img in images:
+        height, width = img.shape[-2:]
+        scales = pyramid_scales(height, width, min_face_size)
+        levels = list(range(len(scales)))
+        groups = [[level] for level in levels[:_NUM_UNPACKED_LEVELS]]
+        if len(levels) > _NUM_UNPACKED_LEVELS:
+            groups.append(levels[_NUM_UNPACKED_LEVELS:])
+
+        boxes, box_levels = [], []
+        for group in groups:
+            sizes = [(math.ceil(height * scales[level]),
+                      math.ceil(width * scales[level])) for level in group]
+            offsets, (canvas_height, canvas_width) = pack_pyramid(sizes)
+            # the padding is zero after the normalization, the mean pixel
+            canvas = img.new_zeros((1, 3, canvas_height, canvas_width))
+            for (sh, sw), (y, x) in zip(sizes, offsets):
+                canvas[0, :, y:y + sh, x:x + sw] = _preprocess(
+                    F.interpolate(
+                        img[None],
+                        size=(sh, sw),
+                        mode='bilinear',
+                        align_corners=False,
+                        **_RESIZE_KWARGS)[0])
+
+            with torch.no_grad():
+                output = net(canvas)
+            probs = output[1].cpu().numpy()[0, 1, :, :]
+            offsets_output = output[0].cpu().numpy()
+            # probs: probability of a face at each sliding window
+            # offsets: transformations to true bounding boxes
+
+            packed = len(group) > 1
+            for level, (sh, sw), (y, x) in zip(group, sizes, offsets):
+                if packed:
+                    # only the cells of the full windows, see `pack_pyramid`
+                    sh, sw = sh - sh % 2, sw - sw % 2
+                oh, ow = _output_size(sh), _output_size(sw)
+                y, x = y // 2, x // 2
+                level_boxes = _generate_bboxes(
+                    probs[y:y + oh, x:x + ow], offsets_output[:, :, y:y + oh,
+                                                              x:x + ow],
+                    scales[level], threshold)
+                if len(level_boxes) > 0:
+                    boxes.append(level_boxes)
+                    box_levels.append(np.full(len(level_boxes), level))
+
+        if len(boxes) == 0:
+            all_boxes.append(np.zeros((0, 9)))
+            continue
+        boxes = np.vstack(boxes)
+        keep = batched_nms(
+            boxes[:, 0:4],
+            boxes[:, 4],
+            np.concatenate(box_levels),
+            0.5,
+            offset=1)
+        all_boxes.append(boxes[keep])
+    return all_boxes
 
 
 def _generate_bboxes(probs, offsets, scale, threshold):
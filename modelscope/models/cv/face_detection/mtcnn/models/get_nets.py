@@ -66,7 +66,7 @@ class PNet(nn.Module):
         x = self.features(x)
         a = self.conv4_1(x)
         b = self.conv4_2(x)
-        a = F.softmax(a)
+        a = F.softmax(a, dim=1)
         return b, a
 
 
@@ -106,7 +106,7 @@ class RNet(nn.Module):
         x = self.features(x)
         a = self.conv5_1(x)
         b = self.conv5_2(x)
-        a = F.softmax(a)
+        a = F.softmax(a, dim=1)
         return b, a
 
 
@@ -156,5 +156,5 @@ class ONet(nn.Module):
         a = self.conv6_1(x)
         b = self.conv6_2(x)
         c = self.conv6_3(x)
-        a = F.softmax(a)
+        a = F.softmax(a, dim=1)
         return c, b, a
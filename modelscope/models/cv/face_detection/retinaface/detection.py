@@ -9,6 +9,7 @@ from modelscope.models.base import Tensor, TorchModel
 from modelscope.models.builder import MODELS
 from modelscope.utils.config import Config
 from modelscope.utils.constant import ModelFile, Tasks
+from modelscope.utils.cv.anchors import cached_anchors, pad_to_bucket
 from .models.retinaface import RetinaFace
 from .utils import PriorBox, decode, decode_landm, py_cpu_nms
 
@@ -16,7 +17,17 @@ from .utils import PriorBox, decode, decode_landm, py_cpu_nms
 @MODELS.register_module(Tasks.face_detection, module_name=Models.retinaface)
 class RetinaFaceDetection(TorchModel):
 
-    def __init__(self, model_path, device='cuda'):
+    def __init__(self, model_path, device='cuda', resolution_buckets=None):
+        """RetinaFace face detector.
+
+        Args:
+            model_path: The path of the checkpoint.
+            device: The device to run on.
+            resolution_buckets: Pad the inputs to a few canonical sizes so that they
+                share the cached priors, either an int to round the sizes up to its
+                multiples, or a list of (height, width) sizes, see
+                `modelscope.utils.cv.anchors.bucket_size`. None to keep the sizes.
+        """
         super().__init__(model_path)
         cudnn.benchmark = True
         self.model_path = model_path
@@ -27,6 +38,7 @@ class RetinaFaceDetection(TorchModel):
         self.load_model()
         self.device = device
         self.net = self.net.to(self.device)
+        self.resolution_buckets = resolution_buckets
 
         self.mean = torch.tensor([[[[104]], [[117]], [[123]]]]).to(device)
 
@@ -71,12 +83,15 @@ class RetinaFaceDetection(TorchModel):
             img = cv2.resize(img, (0, 0), fx=ss, fy=ss)
             im_height, im_width = img.shape[:2]
 
-        scale = torch.Tensor(
-            [img.shape[1], img.shape[0], img.shape[1], img.shape[0]])
         img -= (104, 117, 123)
         img = img.transpose(2, 0, 1)
         img = torch.from_numpy(img).unsqueeze(0)
         img = img.to(self.device)
+        if self.resolution_buckets is not None:
+            # padded with the mean, which is zero after the mean is subtracted
+            img = pad_to_bucket(img, self.resolution_buckets)
+            im_height, im_width = img.shape[-2:]
+        scale = torch.Tensor([im_width, im_height, im_width, im_height])
         scale = scale.to(self.device)
 
         loc, conf, landms = self.net(img)  # forward pass
@@ -87,10 +102,10 @@ class RetinaFaceDetection(TorchModel):
         top_k = 5000
         keep_top_k = 750
 
-        priorbox = PriorBox(self.cfg, image_size=(im_height, im_width))
-        priors = priorbox.forward()
-        priors = priors.to(self.device)
-        prior_data = priors.data
+        prior_data = cached_anchors(
+            PriorBox(self.cfg, image_size=(im_height, im_width)).forward,
+            (Models.retinaface, self.cfg['min_sizes'], self.cfg['steps'],
+             self.cfg['clip']), im_height, im_width, self.device)
         boxes = decode(loc.data.squeeze(0), prior_data, self.cfg['variance'])
         boxes = boxes * scale
         boxes = boxes.cpu().numpy()
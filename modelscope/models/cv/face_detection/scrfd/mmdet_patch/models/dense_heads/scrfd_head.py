@@ -16,6 +16,7 @@ from mmdet.core import (anchor_inside_flags, bbox2distance, bbox_overlaps,
 from mmdet.models.builder import HEADS, build_loss
 from mmdet.models.dense_heads.anchor_head import AnchorHead
 
+from modelscope.utils.cv.anchors import cached_anchors
 from ....mmdet_patch.core.bbox import distance2kps, kps2distance
 from ....mmdet_patch.core.post_processing import multiclass_nms
 
@@ -688,8 +689,12 @@ class SCRFDHead(AnchorHead):
 
         device = cls_scores[0].device
         featmap_sizes = [cls_scores[i].shape[-2:] for i in range(num_levels)]
-        mlvl_anchors = self.anchor_generator.grid_anchors(
-            featmap_sizes, device=device)
+        # the anchors only depend on the generator and the feature map sizes
+        mlvl_anchors = cached_anchors(
+            lambda: self.anchor_generator.grid_anchors(
+                featmap_sizes, device=device),
+            (repr(self.anchor_generator), featmap_sizes[1:]),
+            *featmap_sizes[0], device)
 
         result_list = []
         # bbox_preds and kps_preds are list of 3 tensor, each tensor is NCHW
@@ -2,8 +2,12 @@
 # https://github.com/Linzaer/Ultra-Light-Fast-Generic-Face-Detector-1MB
 import math
 
+import numpy as np
 import torch
 
+from modelscope.utils.cv.boxes import nms as boxes_nms
+from modelscope.utils.cv.boxes import soft_nms
+
 
 def hard_nms(box_scores, iou_threshold, top_k=-1, candidate_size=200):
     """
@@ -16,25 +20,12 @@ def hard_nms(box_scores, iou_threshold, top_k=-1, candidate_size=200):
     Returns:
          picked: a list of indexes of the kept boxes
     """
-    scores = box_scores[:, -1]
-    boxes = box_scores[:, :-1]
-    picked = []
-    _, indexes = scores.sort(descending=True)
-    indexes = indexes[:candidate_size]
-    while len(indexes) > 0:
-        current = indexes[0]
-        picked.append(current.item())
-        if 0 < top_k == len(picked) or len(indexes) == 1:
-            break
-        current_box = boxes[current, :]
-        indexes = indexes[1:]
-        rest_boxes = boxes[indexes, :]
-        iou = iou_of(
-            rest_boxes,
-            current_box.unsqueeze(0),
-        )
-        indexes = indexes[iou <= iou_threshold]
-
+    picked = boxes_nms(
+        box_scores[:, :-1],
+        box_scores[:, -1],
+        iou_threshold,
+        top_k=top_k,
+        max_candidates=candidate_size)
     return box_scores[picked, :]
 
 
@@ -45,6 +36,15 @@ def nms(box_scores,
         sigma=0.5,
         top_k=-1,
         candidate_size=200):
+    if nms_method == 'soft':
+        picked, scores = soft_nms(
+            box_scores[:, :-1],
+            box_scores[:, -1],
+            iou_threshold,
+            sigma=sigma,
+            score_threshold=score_threshold,
+            top_k=top_k)
+        return torch.cat([box_scores[picked, :-1], scores[:, None]], dim=1)
     return hard_nms(
         box_scores, iou_threshold, top_k, candidate_size=candidate_size)
 
@@ -58,16 +58,18 @@ def generate_priors(feature_map_list,
     for index in range(0, len(feature_map_list[0])):
         scale_w = image_size[0] / shrinkage_list[0][index]
         scale_h = image_size[1] / shrinkage_list[1][index]
-        for j in range(0, feature_map_list[1][index]):
-            for i in range(0, feature_map_list[0][index]):
-                x_center = (i + 0.5) / scale_w
-                y_center = (j + 0.5) / scale_h
-
-                for min_box in min_boxes[index]:
-                    w = min_box / image_size[0]
-                    h = min_box / image_size[1]
-                    priors.append([x_center, y_center, w, h])
-    priors = torch.tensor(priors)
+        # (x_center, y_center, w, h) of the rows j, the columns i and the min boxes
+        x_center = (np.arange(feature_map_list[0][index]) + 0.5) / scale_w
+        y_center = (np.arange(feature_map_list[1][index]) + 0.5) / scale_h
+        min_box = np.array(min_boxes[index], dtype=np.float64)
+        priors.append(
+            np.stack(
+                np.broadcast_arrays(x_center[None, :, None], y_center[:, None,
+                                                                      None],
+                                    min_box[None, None, :] / image_size[0],
+                                    min_box[None, None, :] / image_size[1]),
+                axis=-1).reshape(-1, 4))
+    priors = torch.from_numpy(np.concatenate(priors).astype(np.float32))
     if clamp:
         torch.clamp(priors, 0.0, 1.0, out=priors)
     return priors
@@ -8,6 +8,7 @@ import torch
 import torch.backends.cudnn as cudnn
 import torch.nn.functional as F
 
+from modelscope.utils.cv.anchors import cached_anchors
 from .models.retinaface import RetinaFace
 from .utils import PriorBox, decode, decode_landm, py_cpu_nms
 
@@ -100,10 +101,10 @@ class RetinaFaceDetection(object):
         loc, conf, landms = self.net(img)  # forward pass
         del img
 
-        priorbox = PriorBox(self.cfg, image_size=(im_height, im_width))
-        priors = priorbox.forward()
-        priors = priors.to(self.device)
-        prior_data = priors.data
+        prior_data = cached_anchors(
+            PriorBox(self.cfg, image_size=(im_height, im_width)).forward,
+            ('retinaface', self.cfg['min_sizes'], self.cfg['steps'],
+             self.cfg['clip']), im_height, im_width, self.device)
         boxes = decode(loc.data.squeeze(0), prior_data, self.cfg['variance'])
         boxes = boxes * scale / resize
         boxes = boxes.cpu().numpy()
@@ -167,10 +168,10 @@ class RetinaFaceDetection(object):
 
         loc, conf, landms = self.net(img)  # forward pass
 
-        priorbox = PriorBox(self.cfg, image_size=(im_height, im_width))
-        priors = priorbox.forward()
-        priors = priors.to(self.device)
-        prior_data = priors.data
+        prior_data = cached_anchors(
+            PriorBox(self.cfg, image_size=(im_height, im_width)).forward,
+            ('retinaface', self.cfg['min_sizes'], self.cfg['steps'],
+             self.cfg['clip']), im_height, im_width, self.device)
         boxes = decode(loc.data.squeeze(0), prior_data, self.cfg['variance'])
         boxes = boxes * scale / resize
         boxes = boxes.cpu().numpy()
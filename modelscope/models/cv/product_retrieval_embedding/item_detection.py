@@ -2,6 +2,8 @@
 import cv2
 import numpy as np
 
+from modelscope.utils.cv.boxes import batched_nms, nms
+
 
 class YOLOXONNX(object):
     """
@@ -124,57 +126,24 @@ class YOLOXONNX(object):
         """
             Single class NMS implemented in Numpy.
         """
-        x1 = boxes[:, 0]
-        y1 = boxes[:, 1]
-        x2 = boxes[:, 2]
-        y2 = boxes[:, 3]
-
-        areas = (x2 - x1 + 1) * (y2 - y1 + 1)
-        order = scores.argsort()[::-1]
-
-        keep = []
-        while order.size > 0:
-            i = order[0]
-            keep.append(i)
-            xx1 = np.maximum(x1[i], x1[order[1:]])
-            yy1 = np.maximum(y1[i], y1[order[1:]])
-            xx2 = np.minimum(x2[i], x2[order[1:]])
-            yy2 = np.minimum(y2[i], y2[order[1:]])
-
-            w = np.maximum(0.0, xx2 - xx1 + 1)
-            h = np.maximum(0.0, yy2 - yy1 + 1)
-            inter = w * h
-            ovr = inter / (areas[i] + areas[order[1:]] - inter)
-
-            inds = np.where(ovr <= nms_thr)[0]
-            order = order[inds + 1]
-
-        return keep
+        return nms(boxes, scores, nms_thr, offset=1)
 
     def multiclass_nms(self, boxes, scores, nms_thr, score_thr):
         """
             Multiclass NMS implemented in Numpy
         """
-        final_dets = []
-        num_classes = scores.shape[1]
-        for cls_ind in range(num_classes):
-            cls_scores = scores[:, cls_ind]
-            valid_score_mask = cls_scores > score_thr
-            if valid_score_mask.sum() == 0:
-                continue
-            else:
-                valid_scores = cls_scores[valid_score_mask]
-                valid_boxes = boxes[valid_score_mask]
-                keep = self.nms(valid_boxes, valid_scores, nms_thr)
-                if len(keep) > 0:
-                    cls_inds = np.ones((len(keep), 1)) * cls_ind
-                    dets = np.concatenate([
-                        valid_boxes[keep], valid_scores[keep, None], cls_inds
-                    ], 1)
-                    final_dets.append(dets)
-        if len(final_dets) == 0:
+        box_inds, cls_inds = np.nonzero(scores > score_thr)
+        if len(box_inds) == 0:
             return None
-        return np.concatenate(final_dets, 0)
+        valid_boxes = boxes[box_inds]
+        valid_scores = scores[box_inds, cls_inds]
+        keep = batched_nms(
+            valid_boxes, valid_scores, cls_inds, nms_thr, offset=1)
+        # grouped by the classes, in the descending order of the scores
+        keep = keep[np.lexsort((-valid_scores[keep], cls_inds[keep]))]
+        return np.concatenate([
+            valid_boxes[keep], valid_scores[keep, None], cls_inds[keep, None]
+        ], 1)
 
     def postprocess(self, outputs, img_size, p6=False):
         grids = []
@@ -5,6 +5,8 @@ import math
 
 import torch
 
+from modelscope.utils.multi_modal.guidance import guided_forward
+
 __all__ = ['GaussianDiffusion', 'beta_schedule']
 
 
@@ -207,8 +209,8 @@ class GaussianDiffusion(object):
             # (model_kwargs[0]: conditional kwargs; model_kwargs[1]: non-conditional kwargs)
             assert isinstance(model_kwargs, list) and len(model_kwargs) == 2
             assert self.mean_type == 'eps'
-            y_out = model(xt, self._scale_timesteps(t), **model_kwargs[0])
-            u_out = model(xt, self._scale_timesteps(t), **model_kwargs[1])
+            y_out, u_out = guided_forward(model, xt, self._scale_timesteps(t),
+                                          model_kwargs)
             a = u_out[:, :3]
             b = guide_scale * (y_out[:, :3] - u_out[:, :3])
             c = y_out[:, 3:]
@@ -2,6 +2,8 @@ import torch
 import torch.nn.functional as F
 import math
 
+from modelscope.utils.multi_modal.guidance import guided_forward
+
 
 class NoiseScheduleVP:
 
@@ -368,19 +370,16 @@ def model_wrapper(
                 sigma_t, dims=cond_grad.dim()) * cond_grad
         elif guidance_type == "classifier-free":
             if isinstance(model_kwargs, list) and len(model_kwargs) == 2:
-                # TODO
-                #import pdb;pdb.set_trace()
-                t_input = get_model_input_time(t_continuous)
-                print(t_continuous, t_input)
-                noise_cond = noise_pred_fn(x, t_input, None, model_kwargs[0])
-                noise_uncond = noise_pred_fn(x, t_continuous, None,
-                                             model_kwargs[1])
+                # run the two branches in one batch if possible
+                noise_cond, noise_uncond = guided_forward(
+                    lambda x, t, **kwargs: noise_pred_fn(x, t, None, kwargs),
+                    x, t_continuous, model_kwargs)
                 a = noise_uncond[:, :3]
                 b = guidance_scale * (noise_cond[:, :3] - noise_uncond[:, :3])
                 return a + b
             elif guidance_scale == 1. or unconditional_condition is None:
-                return noise_pred_fn(
-                    x, t_continuous, cond=condition, model_kwargs)
+                kwargs = model_kwargs or {}
+                return noise_pred_fn(x, t_continuous, condition, kwargs)
             else:
                 x_in = torch.cat([x] * 2)
                 t_in = torch.cat([t_continuous] * 2)
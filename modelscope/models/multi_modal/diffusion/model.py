@@ -224,20 +224,29 @@ class DiffusionForTextToImageSynthesis(Model):
             raise ValueError(
                 f'input should contain "text", but got {input.keys()}')
 
+        # a list of prompts and several images per prompt are synthesized in
+        # one batch, so that all the images share each sampling step
+        texts = input['text']
+        if isinstance(texts, str):
+            texts = [texts]
+        num_images = input.get('num_images', 1)
+        batch_size = len(texts) * num_images
+
         # encode text
-        input_ids, token_type_ids, attention_mask = self.tokenizer(
-            input['text'])
-        input_ids = input_ids.to(self.device).unsqueeze(0)
-        token_type_ids = token_type_ids.to(self.device).unsqueeze(0)
-        attention_mask = attention_mask.to(self.device).unsqueeze(0)
+        input_ids, token_type_ids, attention_mask = [
+            torch.stack(u).to(self.device)
+            for u in zip(*[self.tokenizer(text) for text in texts])
+        ]
         context, y = self.text_encoder(
             input_ids=input_ids,
             token_type_ids=token_type_ids,
             attention_mask=attention_mask)
-        context = context[-1]
+        context = context[-1].repeat_interleave(num_images, dim=0)
+        y = y.repeat_interleave(num_images, dim=0)
+        attention_mask = attention_mask.repeat_interleave(num_images, dim=0)
 
         # generation
-        noise = torch.randn(1, 3, 64, 64).to(self.device)
+        noise = torch.randn(batch_size, 3, 64, 64).to(self.device)
         model_kwargs = [{
             'y': y,
             'context': context,
@@ -272,13 +281,13 @@ class DiffusionForTextToImageSynthesis(Model):
         noise = torch.randn_like(img)
         model_kwargs = [{
             'lx': img,
-            'lt': torch.zeros(1).to(self.device),
+            'lt': torch.zeros(batch_size).to(self.device),
             'y': y,
             'context': context,
             'mask': attention_mask
         }, {
             'lx': img,
-            'lt': torch.zeros(1).to(self.device),
+            'lt': torch.zeros(batch_size).to(self.device),
             'y': torch.zeros_like(y),
             'context': torch.zeros_like(context),
             'mask': torch.zeros_like(attention_mask)
@@ -324,6 +333,8 @@ class DiffusionForTextToImageSynthesis(Model):
                 eta=input.get('upsampler_1024_ddim_eta', 0.0))
 
         # output
-        img = img.clamp(-1, 1).add(1).mul(127.5).squeeze(0).permute(
-            1, 2, 0).cpu().numpy().astype(np.uint8)
-        return img
+        imgs = img.clamp(-1, 1).add(1).mul(127.5).permute(
+            0, 2, 3, 1).cpu().numpy().astype(np.uint8)
+        if batch_size == 1:
+            return imgs[0]
+        return list(imgs)
@@ -6,6 +6,8 @@ import math
 
 import torch
 
+from modelscope.utils.multi_modal.guidance import guided_forward
+
 __all__ = ['GaussianDiffusion', 'beta_schedule']
 
 
@@ -224,8 +226,8 @@ class GaussianDiffusion(object):
             # classifier-free guidance
             # (model_kwargs[0]: conditional kwargs; model_kwargs[1]: non-conditional kwargs)
             assert isinstance(model_kwargs, list) and len(model_kwargs) == 2
-            y_out = model(xt, self._scale_timesteps(t), **model_kwargs[0])
-            u_out = model(xt, self._scale_timesteps(t), **model_kwargs[1])
+            y_out, u_out = guided_forward(model, xt, self._scale_timesteps(t),
+                                          model_kwargs)
             cond = self.var_type.startswith('fixed')
             dim = y_out.size(1) if cond else y_out.size(1) // 2
             u1 = u_out[:, :dim]
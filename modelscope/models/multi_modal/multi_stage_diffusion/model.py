@@ -113,10 +113,12 @@ class UnCLIP(nn.Module):
         ])
         assert batch_size >= 1 and batch_size <= 16
 
-        # tokenize the text
+        # tokenize the text, a list of texts and `batch_size` images of each text
+        # are synthesized in one batch
+        texts = [text] if isinstance(text, str) else list(text)
         if tokenizer == 'clip':
             y = F.normalize(
-                self.clip.textual(self.clip_tokenizer([text]).to(device)),
+                self.clip.textual(self.clip_tokenizer(texts).to(device)),
                 p=2,
                 dim=1)
             zero_y = F.normalize(
@@ -125,7 +127,7 @@ class UnCLIP(nn.Module):
                 dim=1)
         elif tokenizer == 'xglm':
             y = F.normalize(
-                self.xglm(*to_device(self.xglm_tokenizer([text]), device)),
+                self.xglm(*to_device(self.xglm_tokenizer(texts), device)),
                 p=2,
                 dim=1)
             zero_y = F.normalize(
@@ -136,8 +138,8 @@ class UnCLIP(nn.Module):
             raise ValueError(
                 f'Expected tokenizer to be one of "clip" or "xglm", but got {tokenizer}'
             )
-        y = math.sqrt(y.size(1)) * y.repeat(batch_size, 1)
-        zero_y = math.sqrt(zero_y.size(1)) * zero_y.repeat(batch_size, 1)
+        y = math.sqrt(y.size(1)) * y.repeat_interleave(batch_size, dim=0)
+        zero_y = math.sqrt(zero_y.size(1)) * zero_y.repeat(y.size(0), 1)
 
         # synthesis
         with amp.autocast(enabled=True):
@@ -156,7 +158,7 @@ class UnCLIP(nn.Module):
 
             # decoder
             imgs64 = self.decoder_diffusion.ddim_sample_loop(
-                noise=torch.randn(batch_size, 3, 64, 64).to(device),
+                noise=torch.randn(y.size(0), 3, 64, 64).to(device),
                 model=self.decoder,
                 model_kwargs=[{
                     'y': x0
@@ -26,6 +26,42 @@ from transformers.modeling_utils import PreTrainedModel
 from modelscope.utils.constant import ModelFile
 from .configuration import GPT3Config
 
+try:
+    from transformers import GenerationMixin
+except ImportError:
+    # the old versions export it from `generation_utils` only
+    from transformers.generation_utils import GenerationMixin
+
+
+class InferenceParams:
+    """Inference parameters that are passed to the main model in order
+    to efficienly calculate and store the context during inference."""
+
+    def __init__(self, max_batch_size, max_sequence_len):
+        """Note that offsets are set to zero and we always set the
+        flag to allocate memory. After the first call, make sure to
+        set this flag to False."""
+        self.max_sequence_len = max_sequence_len
+        self.max_batch_size = max_batch_size
+        self.sequence_len_offset = 0
+        self.batch_size_offset = 0
+        self.key_value_memory_dict = {}
+
+    def swap_key_value_dict(self, batch_idx):
+        'swap between batches'
+        if len(self.key_value_memory_dict) == 0:
+            raise ValueError('should not swap when dict in empty')
+
+        for layer_number in self.key_value_memory_dict.keys():
+            inference_key_memory, inference_value_memory = self.key_value_memory_dict[
+                layer_number]
+            assert len(batch_idx) == inference_key_memory.shape[
+                1]  # make sure batch size is the same
+            new_inference_key_memory = inference_key_memory[:, batch_idx]
+            new_inference_value_memory = inference_value_memory[:, batch_idx]
+            self.key_value_memory_dict[layer_number] = (
+                new_inference_key_memory, new_inference_value_memory)
+
 
 class GPT3SelfAttention(nn.Module):
     """Parallel self-attention layer abstract class.
@@ -34,9 +70,10 @@ class GPT3SelfAttention(nn.Module):
     and returns output of the same size.
     """
 
-    def __init__(self, config):
+    def __init__(self, config, layer_number=1):
         super().__init__()
 
+        self.layer_number = layer_number
         self.hidden_size = config.hidden_size
         self.num_attention_heads = config.num_attention_heads
         # Per attention head
@@ -77,13 +114,66 @@ class GPT3SelfAttention(nn.Module):
 
         return tensor_list
 
-    def forward(self, hidden_states, ltor_mask, is_infer=False):
+    def _allocate_memory(self, inference_max_sequence_len, batch_size, like):
+        # zeros, the masked slots are multiplied by zero attention probs, which
+        # would still turn the nan of uninitialized memory into nan outputs
+        return like.new_zeros(inference_max_sequence_len, batch_size,
+                              self.num_attention_heads,
+                              self.hidden_size_per_attention_head)
+
+    def _update_memory(self, key_layer, value_layer, inference_params):
+        """Copy the keys and values [b, np, s, hn] of the new tokens into the
+        memory [s, b, np, hn], and return the keys and values of all the tokens.
+
+        The memory grows geometrically up to `max_sequence_len`, instead of
+        being allocated for the max length before the first token.
+        """
+        batch_start = inference_params.batch_size_offset
+        batch_end = batch_start + key_layer.size(0)
+        assert batch_end <= inference_params.max_batch_size
+        sequence_start = inference_params.sequence_len_offset
+        sequence_end = sequence_start + key_layer.size(2)
+        assert sequence_end <= inference_params.max_sequence_len
+
+        memory = inference_params.key_value_memory_dict.get(self.layer_number)
+        if memory is None or sequence_end > memory[0].size(0):
+            capacity = 0 if memory is None else memory[0].size(0)
+            capacity = min(inference_params.max_sequence_len,
+                           max(sequence_end, 2 * capacity))
+            new_memory = tuple(
+                self._allocate_memory(
+                    capacity, inference_params.max_batch_size, key_layer)
+                for _ in range(2))
+            if memory is not None:
+                for new, old in zip(new_memory, memory):
+                    new[:sequence_start] = old[:sequence_start]
+            memory = new_memory
+            inference_params.key_value_memory_dict[self.layer_number] = memory
+        inference_key_memory, inference_value_memory = memory
+
+        # Copy key and values.
+        inference_key_memory[sequence_start:sequence_end,
+                             batch_start:batch_end,
+                             ...] = key_layer.permute(2, 0, 1, 3)
+        inference_value_memory[sequence_start:sequence_end,
+                               batch_start:batch_end,
+                               ...] = value_layer.permute(2, 0, 1, 3)
+        key_layer = inference_key_memory[:sequence_end, batch_start:batch_end,
+                                         ...]
+        value_layer = inference_value_memory[:sequence_end,
+                                             batch_start:batch_end, ...]
+        return key_layer.permute(1, 2, 0, 3), value_layer.permute(1, 2, 0, 3)
+
+    def forward(self,
+                hidden_states,
+                ltor_mask,
+                is_infer=False,
+                inference_params=None):
         # hidden_states: [b, s, h]
         # ltor_mask: [1, 1, s, s]
 
         # Attention heads. [b, s, hp]
         tgt_len = hidden_states.size(1)
-        ltor_mask = torch.reshape(ltor_mask, [1, 1, tgt_len, tgt_len])
         mixed_x_layer = self.query_key_value(hidden_states)
         (mixed_query_layer, mixed_key_layer, mixed_value_layer) = \
             self._split_tensor_along_last_dim(mixed_x_layer, 3)
@@ -93,16 +183,23 @@ class GPT3SelfAttention(nn.Module):
         key_layer = self._transpose_for_scores(mixed_key_layer)
         value_layer = self._transpose_for_scores(mixed_value_layer)
 
+        # Adjust key and value for inference, the new tokens attend to all the
+        # tokens in the memory. [b, np, sk, hn]
+        if inference_params is not None:
+            key_layer, value_layer = self._update_memory(
+                key_layer, value_layer, inference_params)
+        src_len = key_layer.size(2)
+        ltor_mask = torch.reshape(ltor_mask, [-1, 1, tgt_len, src_len])
+
         previous_type = value_layer.type()
 
-        # Raw attention scores. [b, np, s, s]
+        # Raw attention scores. [b, np, sq, sk]
         attention_scores = torch.matmul(query_layer,
                                         key_layer.transpose(-1, -2))
         attention_scores = attention_scores / math.sqrt(
             self.hidden_size_per_attention_head)
         # Apply the left to right attention mask.
         if is_infer:
-            src_len = key_layer.size(2)
             ltor_mask = torch.tril(
                 torch.ones((1, tgt_len, src_len),
                            device=hidden_states.device)).view(
@@ -172,7 +269,7 @@ class GPT3TransformerLayer(nn.Module):
     output of the same size.
     """
 
-    def __init__(self, config):
+    def __init__(self, config, layer_number=1):
         super().__init__()
 
         # Layernorm on the input data.
@@ -180,7 +277,7 @@ class GPT3TransformerLayer(nn.Module):
             config.hidden_size, eps=config.layernorm_epsilon)
 
         # Self attention.
-        self.attention = GPT3SelfAttention(config)
+        self.attention = GPT3SelfAttention(config, layer_number)
 
         # Layernorm on the attention output
         self.post_attention_layernorm = nn.LayerNorm(
@@ -189,14 +286,15 @@ class GPT3TransformerLayer(nn.Module):
         # MLP
         self.mlp = GPT3MLP(config)
 
-    def forward(self, hidden_states, ltor_mask):
+    def forward(self, hidden_states, ltor_mask, inference_params=None):
         # hidden_states: [b, s, h]
         # ltor_mask: [1, 1, s, s]
 
         # Layer norm at the begining of the transformer layer.
         layernorm_output = self.input_layernorm(hidden_states)
         # Self attention.
-        attention_output = self.attention(layernorm_output, ltor_mask)
+        attention_output = self.attention(
+            layernorm_output, ltor_mask, inference_params=inference_params)
         # Residual connection.
         layernorm_input = hidden_states + attention_output
         # Layer norm post the self attention.
@@ -220,8 +318,9 @@ class GPT3Transformer(nn.Module):
         # Number of layers.
         self.num_layers = config.num_hidden_layers
 
-        self.layers = torch.nn.ModuleList(
-            [GPT3TransformerLayer(config) for _ in range(self.num_layers)])
+        self.layers = torch.nn.ModuleList([
+            GPT3TransformerLayer(config, i + 1) for i in range(self.num_layers)
+        ])
 
         # Final layer norm before output.
         self.final_layernorm = nn.LayerNorm(
@@ -230,12 +329,15 @@ class GPT3Transformer(nn.Module):
     def _get_layer(self, layer_number):
         return self.layers[layer_number]
 
-    def forward(self, hidden_states, attention_mask):
+    def forward(self, hidden_states, attention_mask, inference_params=None):
         # hidden_states: [s, b, h]
 
         for index in range(self.num_layers):
             layer = self._get_layer(index)
-            hidden_states = layer(hidden_states, attention_mask)
+            hidden_states = layer(
+                hidden_states,
+                attention_mask,
+                inference_params=inference_params)
 
         # Final layer norm.
         hidden_states = self.final_layernorm(hidden_states)
@@ -269,20 +371,26 @@ class GPT3TransformerLanguageModel(nn.Module):
         # Transformer.
         self.transformer = GPT3Transformer(config)
 
-    def forward(self, input_ids, attention_mask, position_ids):
+    def forward(self,
+                input_ids,
+                attention_mask,
+                position_ids,
+                inference_params=None):
         words_embeddings = self.word_embeddings(input_ids)
         position_embeddings = self.position_embeddings(position_ids)
 
         embeddings = words_embeddings + position_embeddings
         transformer_input = self.embedding_dropout(embeddings)
-        transformer_output = self.transformer(transformer_input,
-                                              attention_mask)
+        transformer_output = self.transformer(
+            transformer_input,
+            attention_mask,
+            inference_params=inference_params)
 
         logits = F.linear(transformer_output, self.word_embeddings.weight)
         return logits
 
 
-class GPT3Model(PreTrainedModel):
+class GPT3Model(PreTrainedModel, GenerationMixin):
 
     config_class = GPT3Config
 
@@ -313,24 +421,49 @@ class GPT3Model(PreTrainedModel):
                 attention_mask=None,
                 position_ids=None,
                 labels=None,
+                inference_params=None,
                 **kwargs):
+        """
+        Args:
+            attention_mask (Tensor, optional): Only a [b or 1, 1, sq, sk] mask of the
+                visible tokens is used, other masks are replaced by the causal mask.
+            inference_params (InferenceParams, optional): The keys and values of the
+                previous tokens. If given, `input_ids` are the new tokens following
+                them, and the keys and values of `input_ids` are appended to it.
+        """
         seq_length = input_ids.size(1)
-        attention_mask = torch.tril(
-            torch.ones((1, 1, seq_length, seq_length),
-                       dtype=torch.long,
-                       device=input_ids.device))
+        past_length = 0 if inference_params is None \
+            else inference_params.sequence_len_offset
+        if attention_mask is not None and attention_mask.dim() == 4:
+            attention_mask = attention_mask.long()
+        else:
+            attention_mask = torch.tril(
+                torch.ones((1, 1, seq_length, past_length + seq_length),
+                           dtype=torch.long,
+                           device=input_ids.device),
+                diagonal=past_length)
         if position_ids is None:
             position_ids = torch.arange(
-                seq_length, dtype=torch.long, device=input_ids.device)
+                past_length,
+                past_length + seq_length,
+                dtype=torch.long,
+                device=input_ids.device)
             position_ids = position_ids.unsqueeze(0).expand_as(input_ids)
 
-        logits = self.language_model(input_ids, attention_mask, position_ids)
+        logits = self.language_model(
+            input_ids,
+            attention_mask,
+            position_ids,
+            inference_params=inference_params)
+        if inference_params is not None:
+            inference_params.sequence_len_offset += seq_length
         loss = None
         if labels is not None:
             loss_fct = nn.CrossEntropyLoss()
             loss = loss_fct(
                 logits.view(-1, self.config.vocab_size), labels.view(-1))
-        return addict.Dict(loss=loss, logits=logits)
+        return addict.Dict(
+            loss=loss, logits=logits, past_key_values=inference_params)
 
     @classmethod
     def from_pretrained(
@@ -351,5 +484,29 @@ class GPT3Model(PreTrainedModel):
         model.load_state_dict(state_dict)
         return model
 
-    def prepare_inputs_for_generation(self, input_ids, *args, **kwargs):
-        return {'input_ids': input_ids}
+    def prepare_inputs_for_generation(self,
+                                      input_ids,
+                                      past=None,
+                                      past_key_values=None,
+                                      use_cache=True,
+                                      **kwargs):
+        """Only feed the tokens which are not in the key/value memory yet, the
+        memory is carried between the steps as the `past_key_values` output.
+        """
+        if not use_cache:
+            return {'input_ids': input_ids}
+        inference_params = past_key_values if past_key_values is not None \
+            else past
+        # the cache objects created by `generate` of transformers, e.g.
+        # `DynamicCache`, are replaced by the key/value memory of the model
+        if not isinstance(inference_params, InferenceParams):
+            inference_params = InferenceParams(
+                input_ids.size(0), self.config.max_position_embeddings)
+        return {
+            'input_ids': input_ids[:, inference_params.sequence_len_offset:],
+            'inference_params': inference_params
+        }
+
+    def _reorder_cache(self, past, beam_idx):
+        past.swap_key_value_dict(beam_idx)
+        return past
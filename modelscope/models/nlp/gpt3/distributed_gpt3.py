@@ -14,6 +14,7 @@
 # limitations under the License.
 
 import math
+from typing import List
 
 import torch
 from megatron import mpu
@@ -27,6 +28,10 @@ from transformers.modeling_utils import PreTrainedModel
 
 from modelscope.models import TorchModel
 from modelscope.models.nlp.gpt3 import GPT3Config
+from modelscope.models.nlp.gpt3.backbone import InferenceParams
+from modelscope.models.nlp.gpt3.generation_scheduler import (
+    ContinuousBatchingScheduler, GenerationRequest,
+    modify_logits_for_top_k_filtering, modify_logits_for_top_p_filtering)
 from modelscope.utils.nlp.distributed import initialize_distributed
 from modelscope.utils.nlp.load_checkpoint import pre_load
 from modelscope.utils.torch_utils import set_random_seed_mpu
@@ -802,35 +807,6 @@ class GPT3Model(PreTrainedModel):
         return output.transpose(0, 1).contiguous()
 
 
-def modify_logits_for_top_k_filtering(logits, top_k):
-    """Set the logits for none top-k values to -inf."""
-
-    filter_ = logits < torch.topk(logits, top_k)[0][..., -1, None]
-    logits.masked_fill_(filter_, float('-Inf'))
-
-
-def modify_logits_for_top_p_filtering(logits, top_p):
-    """Set the logits for none top-p values to -inf."""
-
-    # First sort and calculate cumulative sum of probabilities.
-    sorted_logits, sorted_indices = torch.sort(logits, descending=True)
-    cumulative_probs = sorted_logits.softmax(dim=-1).cumsum(dim=-1)
-
-    # Filteration based on the cumulative sum.
-    filter_ = cumulative_probs > top_p
-    # This shift by 1 is weird and I cannot justify it. This existed
-    # in the original implementation:
-    #   https://github.com/ari-holtzman/degen/blob/master/gen.py
-    # and I guess it is needed so keeping it for now.
-    filter_[:, 1:] = filter_[:, :-1].clone()
-    # Make sure we at least have one token to select from.
-    filter_[..., 0] = 0
-
-    # Fill in the filtered part
-    filter_ = filter_.scatter(1, sorted_indices, filter_)
-    logits.masked_fill_(filter_, float('-Inf'))
-
-
 def sample(logits, top_k=0, top_p=0.0, temperature=1.0, vocab_size=None):
     """ Sample and generate a token.
     Note: logits has the dimension [b, v] where b is the batch size
@@ -881,36 +857,6 @@ def sample(logits, top_k=0, top_p=0.0, temperature=1.0, vocab_size=None):
     return samples
 
 
-class InferenceParams:
-    """Inference parameters that are passed to the main model in order
-    to efficienly calculate and store the context during inference."""
-
-    def __init__(self, max_batch_size, max_sequence_len):
-        """Note that offsets are set to zero and we always set the
-        flag to allocate memory. After the first call, make sure to
-        set this flag to False."""
-        self.max_sequence_len = max_sequence_len
-        self.max_batch_size = max_batch_size
-        self.sequence_len_offset = 0
-        self.batch_size_offset = 0
-        self.key_value_memory_dict = {}
-
-    def swap_key_value_dict(self, batch_idx):
-        'swap between batches'
-        if len(self.key_value_memory_dict) == 0:
-            raise ValueError('should not swap when dict in empty')
-
-        for layer_number in self.key_value_memory_dict.keys():
-            inference_key_memory, inference_value_memory = self.key_value_memory_dict[
-                layer_number]
-            assert len(batch_idx) == inference_key_memory.shape[
-                1]  # make sure batch size is the same
-            new_inference_key_memory = inference_key_memory[:, batch_idx]
-            new_inference_value_memory = inference_value_memory[:, batch_idx]
-            self.key_value_memory_dict[layer_number] = (
-                new_inference_key_memory, new_inference_value_memory)
-
-
 class DistributedGPT3(TorchModel):
 
     def __init__(self,
@@ -961,10 +907,19 @@ class DistributedGPT3(TorchModel):
                  temperature=1.0,
                  use_eod_token_for_early_termination=True,
                  stop_on_double_eol=False,
-                 stop_on_eol=False):
+                 stop_on_eol=False,
+                 streamer=None,
+                 tokens_to_generate=None,
+                 top_k=None,
+                 top_p=None):
+        # the sampling params default to the ones of the config
+        tokens_to_generate = tokens_to_generate \
+            if tokens_to_generate is not None else self.config.tokens_to_generate
+        top_k = top_k if top_k is not None else self.config.top_k
+        top_p = top_p if top_p is not None else self.config.top_p
         lengths = torch.tensor([tokens.size(1)], device=tokens.device)
         pads = torch.ones(
-            1, self.config.tokens_to_generate,
+            1, tokens_to_generate,
             device=tokens.device).long() * self.config.eod_id
         tokens = torch.cat((tokens, pads), dim=-1)
 
@@ -1016,8 +971,8 @@ class DistributedGPT3(TorchModel):
                 last_token_logits = logits[:, -1, :]
                 new_sample = sample(
                     last_token_logits,
-                    top_k=self.config.top_k,
-                    top_p=self.config.top_p,
+                    top_k=top_k,
+                    top_p=top_p,
                     temperature=temperature,
                     vocab_size=self.config.vocab_size)
 
@@ -1030,6 +985,9 @@ class DistributedGPT3(TorchModel):
                 # Update the context length for the next token generation.
                 prev_context_length = context_length
 
+                if streamer is not None:
+                    streamer.put(tokens[0, :context_length + 1])
+
                 # instead tokenization should be in the inference loop so stop sequences can be used
                 if stop_on_double_eol:
                     hit_double_eol = (new_sample
@@ -1055,3 +1013,42 @@ class DistributedGPT3(TorchModel):
 
         tokens = tokens[:, :(context_length + 1)]
         return tokens
+
+    def _scheduler_forward_step(self, tokens, visible_mask, position_ids,
+                                inference_params):
+        # the attention mask of megatron marks the invisible tokens
+        return self.dist_model(
+            tokens,
+            ~visible_mask,
+            position_ids,
+            inference_params=inference_params)
+
+    def generate_batch(self,
+                       requests: List[GenerationRequest],
+                       max_batch_size=8,
+                       max_sequence_length=None):
+        """Generate several requests with continuous batching, a finished request
+        leaves the batch immediately and a waiting request takes its place.
+
+        Args:
+            requests (List[GenerationRequest]): The prompts and their sampling
+                parameters.
+            max_batch_size (int): The max number of requests generated together.
+            max_sequence_length (int, optional): The length of the key/value memory,
+                default to `max_position_embeddings`.
+
+        Returns:
+            List[GenerationRequest]: The finished requests.
+        """
+        max_sequence_length = min(
+            max_sequence_length or self.config.max_position_embeddings,
+            self.config.max_position_embeddings)
+        scheduler = ContinuousBatchingScheduler(
+            self._scheduler_forward_step,
+            max_batch_size,
+            max_sequence_length,
+            self.config.eod_id,
+            vocab_size=self.config.vocab_size,
+            device=torch.cuda.current_device())
+        with torch.no_grad():
+            return scheduler.run(requests)
@@ -0,0 +1,292 @@
+# Copyright (c) Alibaba, Inc. and its affiliates.
+from collections import deque
+from typing import Callable, List, Optional
+
+import torch
+
+from modelscope.utils.logger import get_logger
+from .backbone import InferenceParams
+
+logger = get_logger()
+
+__all__ = ['GenerationRequest', 'ContinuousBatchingScheduler']
+
+
+def modify_logits_for_top_k_filtering(logits, top_k):
+    """Set the logits for none top-k values to -inf."""
+
+    filter_ = logits < torch.topk(logits, top_k)[0][..., -1, None]
+    logits.masked_fill_(filter_, float('-Inf'))
+
+
+def modify_logits_for_top_p_filtering(logits, top_p):
+    """Set the logits for none top-p values to -inf."""
+
+    # First sort and calculate cumulative sum of probabilities.
+    sorted_logits, sorted_indices = torch.sort(logits, descending=True)
+    cumulative_probs = sorted_logits.softmax(dim=-1).cumsum(dim=-1)
+
+    # Filteration based on the cumulative sum.
+    filter_ = cumulative_probs > top_p
+    # This shift by 1 is weird and I cannot justify it. This existed
+    # in the original implementation:
+    #   https://github.com/ari-holtzman/degen/blob/master/gen.py
+    # and I guess it is needed so keeping it for now.
+    filter_[:, 1:] = filter_[:, :-1].clone()
+    # Make sure we at least have one token to select from.
+    filter_[..., 0] = 0
+
+    # Fill in the filtered part
+    filter_ = filter_.scatter(1, sorted_indices, filter_)
+    logits.masked_fill_(filter_, float('-Inf'))
+
+
+class GenerationRequest:
+    """A prompt to generate and its sampling parameters.
+
+    Args:
+        tokens (List[int]): The tokens of the prompt.
+        tokens_to_generate (int): The max number of the generated tokens.
+        top_k (int): Sample from the top k tokens, 1 for greedy search, 0 to disable.
+        top_p (float): Sample from the top tokens whose probabilities sum up to
+            top_p, 0 to disable.
+        temperature (float): The temperature of the sampling.
+    """
+
+    def __init__(self,
+                 tokens: List[int],
+                 tokens_to_generate: int = 100,
+                 top_k: int = 0,
+                 top_p: float = 0.9,
+                 temperature: float = 1.0):
+        if len(tokens) == 0:
+            raise ValueError('the prompt should not be empty')
+        self.tokens = list(tokens)
+        self.prompt_length = len(self.tokens)
+        self.tokens_to_generate = tokens_to_generate
+        self.top_k = top_k
+        self.top_p = top_p
+        self.temperature = temperature
+        self.done = False
+
+    @property
+    def generated_tokens(self) -> List[int]:
+        return self.tokens[self.prompt_length:]
+
+
+class ContinuousBatchingScheduler:
+    """Generate the requests in a batch whose rows are reused as soon as a request
+    finishes, instead of generating the requests one by one.
+
+    Every step, the waiting requests are admitted into the free rows of the batch,
+    one token is generated for all the running requests in one forward, and the
+    finished requests are retired. The keys and values of the running requests stay
+    in the memory of `InferenceParams` ([s, b, np, hn] for each layer): the rows of
+    the running requests are kept at the front of the memory by
+    `InferenceParams.swap_key_value_dict`, and each request owns the memory
+    columns marked in a visibility mask, so the requests of different lengths can be
+    decoded together. The new tokens of all the rows are written at the same column,
+    and the columns are compacted when the memory is full.
+
+    The model is run by `forward_step(tokens, visible_mask, position_ids,
+    inference_params)` which returns the logits [b, s, v]. The keys and values of
+    `tokens` should be written into the memory from the column
+    `inference_params.sequence_len_offset` and the row
+    `inference_params.batch_size_offset`, and `visible_mask` is a [b, 1, sq, sk] bool
+    tensor of the memory columns each token can attend to.
+
+    In model parallel inference, all the ranks should add the same requests in the
+    same order and use the same random seed, so that they run the same steps.
+
+    Args:
+        forward_step (Callable): The forward function of the model.
+        max_batch_size (int): The max number of requests generated together.
+        max_sequence_len (int): The number of columns of the memory, the length of a
+            request (prompt and generated tokens) is limited to it.
+        eod_id (int): The token which terminates a request.
+        vocab_size (int, optional): If given, the sampled tokens are clamped into
+            [0, vocab_size).
+        device (torch.device, optional): The device of the model inputs.
+    """
+
+    def __init__(self,
+                 forward_step: Callable,
+                 max_batch_size: int,
+                 max_sequence_len: int,
+                 eod_id: int,
+                 vocab_size: Optional[int] = None,
+                 device: Optional[torch.device] = None):
+        self.forward_step = forward_step
+        self.max_batch_size = max_batch_size
+        self.max_sequence_len = max_sequence_len
+        self.eod_id = eod_id
+        self.vocab_size = vocab_size
+        self.device = device
+        self.inference_params = InferenceParams(max_batch_size,
+                                                max_sequence_len)
+        self.waiting = deque()
+        # the running requests, the i-th request owns the i-th row of the memory
+        self.running = []
+        # the memory column to write the next tokens
+        self.offset = 0
+        # the memory columns owned by each row
+        self.visible = torch.zeros(
+            max_batch_size, max_sequence_len, dtype=torch.bool, device=device)
+
+    def add_request(self, request: GenerationRequest):
+        """Add a request to the waiting queue, it is admitted in the following steps.
+        """
+        if request.prompt_length >= self.max_sequence_len:
+            raise ValueError(
+                f'the prompt of length {request.prompt_length} is too long, '
+                f'the max sequence length is {self.max_sequence_len}')
+        self.waiting.append(request)
+
+    def has_unfinished_requests(self) -> bool:
+        return len(self.waiting) > 0 or len(self.running) > 0
+
+    def step(self) -> List[GenerationRequest]:
+        """Admit the waiting requests and generate one token for the running requests.
+
+        Returns:
+            List[GenerationRequest]: The requests finished in this step.
+        """
+        finished = []
+        while self.waiting and len(self.running) < self.max_batch_size:
+            if not self._prefill(self.waiting[0]):
+                break
+            self.running.append(self.waiting.popleft())
+        finished.extend(self._retire())
+
+        if self.running:
+            self._decode()
+            finished.extend(self._retire())
+        return finished
+
+    def run(self, requests: List[GenerationRequest]) -> List[GenerationRequest]:
+        """Generate the requests until all of them finish.
+        """
+        for request in requests:
+            self.add_request(request)
+        while self.has_unfinished_requests():
+            self.step()
+        return requests
+
+    def _prefill(self, request: GenerationRequest) -> bool:
+        """Forward the prompt of a request into a free row of the memory and sample
+        its first token, return False if the memory can not hold the prompt now.
+        """
+        length = request.prompt_length
+        if self.offset + length > self.max_sequence_len:
+            self._compact()
+            if self.offset + length > self.max_sequence_len:
+                return False
+        row = len(self.running)
+        tokens = torch.tensor([request.tokens], device=self.device)
+        start, end = self.offset, self.offset + length
+        self.visible[row] = False
+        self.visible[row, start:end] = True
+        visible_mask = self.visible[row:row + 1, :end].clone()
+        visible_mask = visible_mask.view(1, 1, 1, end).repeat(1, 1, length, 1)
+        # causal inside the prompt
+        visible_mask[..., start:end] &= torch.ones(
+            length, length, dtype=torch.bool, device=self.device).tril()
+        position_ids = torch.arange(length, device=tokens.device).unsqueeze(0)
+
+        self.inference_params.sequence_len_offset = start
+        self.inference_params.batch_size_offset = row
+        logits = self.forward_step(tokens, visible_mask, position_ids,
+                                   self.inference_params)
+        self.offset = end
+        self._append(request, self._sample(logits[0, -1], request))
+        return True
+
+    def _decode(self):
+        """Generate one token for all the running requests in one forward.
+        """
+        if self.offset >= self.max_sequence_len:
+            self._compact()
+        batch_size = len(self.running)
+        tokens = torch.tensor([[request.tokens[-1]]
+                               for request in self.running],
+                              device=self.device)
+        position_ids = torch.tensor(
+            [[len(request.tokens) - 1] for request in self.running],
+            device=tokens.device)
+        self.visible[:batch_size, self.offset] = True
+        visible_mask = self.visible[:batch_size, :self.offset + 1].view(
+            batch_size, 1, 1, self.offset + 1)
+
+        self.inference_params.sequence_len_offset = self.offset
+        self.inference_params.batch_size_offset = 0
+        logits = self.forward_step(tokens, visible_mask, position_ids,
+                                   self.inference_params)
+        self.offset += 1
+        for i, request in enumerate(self.running):
+            self._append(request, self._sample(logits[i, -1], request))
+
+    def _sample(self, logits, request: GenerationRequest) -> int:
+        logits = logits.float().unsqueeze(0)
+        if request.top_k == 1:
+            sample = torch.argmax(logits, dim=-1)
+        else:
+            logits = logits.clone()
+            if request.temperature != 1.0:
+                logits.div_(request.temperature)
+            if request.top_k > 1:
+                modify_logits_for_top_k_filtering(logits, request.top_k)
+            elif request.top_p > 0.0:
+                modify_logits_for_top_p_filtering(logits, request.top_p)
+            probs = logits.softmax(dim=-1)
+            sample = torch.multinomial(probs, num_samples=1).view(-1)
+        if self.vocab_size:
+            sample = torch.clamp(sample, min=0, max=(self.vocab_size - 1))
+        return sample.item()
+
+    def _append(self, request: GenerationRequest, token: int):
+        request.tokens.append(token)
+        if token == self.eod_id \
+                or len(request.generated_tokens) >= request.tokens_to_generate \
+                or len(request.tokens) >= self.max_sequence_len:
+            request.done = True
+
+    def _retire(self) -> List[GenerationRequest]:
+        """Remove the finished requests and move the rows of the running requests to
+        the front of the memory.
+        """
+        finished = [request for request in self.running if request.done]
+        if not finished:
+            return finished
+        running = [i for i, request in enumerate(self.running) if not request.done]
+        done = [i for i, request in enumerate(self.running) if request.done]
+        free = list(range(len(self.running), self.max_batch_size))
+        batch_idx = running + done + free
+        if self.inference_params.key_value_memory_dict:
+            self.inference_params.swap_key_value_dict(batch_idx)
+        self.visible = self.visible[batch_idx]
+        self.visible[len(running):] = False
+        self.running = [self.running[i] for i in running]
+        if not self.running:
+            self.offset = 0
+        return finished
+
+    def _compact(self):
+        """Move the visible columns of each row to the beginning of the memory.
+        """
+        if not self.running:
+            self.offset = 0
+            return
+        counts = self.visible[:len(self.running)].sum(dim=1)
+        memory_dict = self.inference_params.key_value_memory_dict
+        for layer_number, memory in memory_dict.items():
+            new_memory = tuple(torch.zeros_like(m) for m in memory)
+            for row in range(len(self.running)):
+                columns = self.visible[row].nonzero().squeeze(1)
+                for new, old in zip(new_memory, memory):
+                    new[:len(columns), row] = old[columns, row]
+            memory_dict[layer_number] = new_memory
+        self.visible.zero_()
+        for row, count in enumerate(counts.tolist()):
+            self.visible[row, :count] = True
+        self.offset = int(counts.max())
+        logger.debug(f'compacted the memory to {self.offset} columns')
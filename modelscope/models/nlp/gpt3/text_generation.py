@@ -1,11 +1,13 @@
 # Copyright (c) Alibaba, Inc. and its affiliates.
-from typing import Dict
+from typing import Dict, Optional
 
 from modelscope.metainfo import Models
 from modelscope.models.base import Tensor, TorchModel
 from modelscope.models.builder import MODELS
 from modelscope.outputs import OutputKeys
 from modelscope.utils.constant import Tasks
+from modelscope.utils.nlp.streaming import (TokenStreamer,
+                                            build_streamer_logits_processor)
 
 __all__ = ['GPT3ForTextGeneration']
 
@@ -42,7 +44,20 @@ class GPT3ForTextGeneration(TorchModel):
         """
         return self.model(**input)
 
-    def generate(self, input: Dict[str, Tensor]) -> Dict[str, Tensor]:
+    def generate(
+            self,
+            input: Dict[str, Tensor],
+            streamer: Optional[TokenStreamer] = None) -> Dict[str, Tensor]:
+        """Generate the text from the prompt.
+
+        Args:
+            input (Dict[str, Tensor]): the preprocessed data and the generation params.
+            streamer (TokenStreamer, optional): If given, the generated sequence is put
+                into the streamer at each step.
+
+        Returns:
+            Dict[str, Tensor]: the generated sequence.
+        """
         assert 'input_ids' in input, "generate function must accept 'input_ids' key"
         input_ids = input['input_ids']
         if 'attention_mask' in input:
@@ -58,5 +73,12 @@ class GPT3ForTextGeneration(TorchModel):
         gen_params['max_length'] = input.pop('max_length', 128)
         gen_params['top_k'] = input.pop('top_k', 10)
         gen_params['top_p'] = input.pop('top_p', None)
+        gen_params['use_cache'] = input.pop('use_cache', True)
+        if streamer is not None:
+            from transformers import LogitsProcessorList
+            gen_params['logits_processor'] = LogitsProcessorList(
+                [build_streamer_logits_processor(streamer)])
         sample_output = self.model.generate(**gen_params)
+        if streamer is not None:
+            streamer.put(sample_output[0])
         return {'sequences': sample_output[0]}
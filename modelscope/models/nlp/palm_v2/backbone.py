@@ -1050,7 +1050,10 @@ class Translator(object):
                 print("'Dev eval result: Bleu-4={}, {}".format(
                     bleu_score, rouge_score))
 
-    def translate_batch(self, batch: 'Batch', fast: bool = False):
+    def translate_batch(self,
+                        batch: 'Batch',
+                        fast: bool = False,
+                        streamer=None):
         """
         Translate a batch of sentences.
 
@@ -1060,6 +1063,8 @@ class Translator(object):
            batch (:obj:`Batch`): a batch from a dataset object
            data (:obj:`Dataset`): the dataset object
            fast (bool): enables fast beam search (may not support all features)
+           streamer (:obj:`TokenStreamer`, optional): receives the part of the first
+               sentence which is decided at each step
 
         Todo:
            Shouldn't need the original dataset.
@@ -1067,7 +1072,10 @@ class Translator(object):
         self.model.eval()
         with torch.no_grad():
             return self._fast_translate_batch(
-                batch, self.max_length, min_length=self.min_length)
+                batch,
+                self.max_length,
+                min_length=self.min_length,
+                streamer=streamer)
 
     def _tile(self, x, count, dim=0):
         perm = list(range(len(x.size())))
@@ -1125,7 +1133,8 @@ class Translator(object):
     def _fast_translate_batch(self,
                               batch: 'Batch',
                               max_length: int,
-                              min_length: int = 0):
+                              min_length: int = 0,
+                              streamer=None):
         # TODO: faster code path for beam_size == 1.
         # TODO: support these blacklisted features.
 
@@ -1269,6 +1278,9 @@ class Translator(object):
                 is_finished.fill_(self.end_token)
             # End condition is top beam is finished.
             end_condition = is_finished[:, 0].eq(1)
+            if streamer is not None and batch_offset[0] == 0:
+                self._put_decided_prefix(streamer, alive_seq[:beam_size, 1:],
+                                         hypotheses[0])
             # Save finished hypotheses.
             if is_finished.any():
                 predictions = alive_seq.view(-1, beam_size, alive_seq.size(-1))
@@ -1314,14 +1326,27 @@ class Translator(object):
 
         return results
 
-    def __call__(self, input_ids: torch.Tensor, attention_mask: torch.Tensor,
+    @staticmethod
+    def _put_decided_prefix(streamer, beams: torch.Tensor, hypotheses: List):
+        """Put the common prefix of the alive beams and the finished hypotheses
+        of a sentence into the streamer, which can not be changed by the following
+        steps.
+        """
+        candidates = beams.tolist() + [pred.tolist() for _, pred in hypotheses]
+        prefix = os.path.commonprefix(candidates)
+        streamer.put(prefix)
+
+    def __call__(self,
+                 input_ids: torch.Tensor,
+                 attention_mask: torch.Tensor,
+                 streamer=None,
                  **kwargs) -> Dict[str, torch.Tensor]:
         batch = self.Batch(
             batch_size=input_ids.size()[0],
             src=input_ids,
             tgt=None,
             mask_src=attention_mask)
-        translation_batch = self.translate_batch(batch)
+        translation_batch = self.translate_batch(batch, streamer=streamer)
 
         preds = translation_batch['predictions']
         return {'predictions': preds}
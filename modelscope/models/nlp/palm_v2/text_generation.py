@@ -1,11 +1,12 @@
 # Copyright (c) Alibaba, Inc. and its affiliates.
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from modelscope.metainfo import Models
 from modelscope.models.base import Tensor, TorchModel
 from modelscope.models.builder import MODELS
 from modelscope.outputs import OutputKeys
 from modelscope.utils.constant import Tasks
+from modelscope.utils.nlp.streaming import TokenStreamer
 
 __all__ = ['PalmForTextGeneration']
 
@@ -44,7 +45,22 @@ class PalmForTextGeneration(TorchModel):
         """
         return self.model(**input)
 
-    def generate(self, input: Dict[str, Tensor]) -> Dict[str, Tensor]:
-        outputs = self.generator(**input)
+    def generate(
+            self,
+            input: Dict[str, Tensor],
+            streamer: Optional[TokenStreamer] = None) -> Dict[str, Tensor]:
+        """Generate the text from the input.
+
+        Args:
+            input (Dict[str, Tensor]): the preprocessed data
+            streamer (TokenStreamer, optional): If given, the decided part of the
+                first prediction is put into the streamer at each step.
+
+        Returns:
+            Dict[str, Tensor]: the predictions
+        """
+        outputs = self.generator(**input, streamer=streamer)
         preds = outputs['predictions']
+        if streamer is not None:
+            streamer.put(preds[0][0])
         return {'sequences': [pred[0] for pred in preds]}
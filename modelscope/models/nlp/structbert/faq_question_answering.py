@@ -201,6 +201,9 @@ class SbertForFaqQuestionAnswering(BaseTaskModel):
                     The support set.
                 support_label(:obj:`torch.LongTensor` of shape :obj:`(support_size, )`):
                     The labels of support set.
+                support_prototypes(:obj:`torch.FloatTensor` of shape :obj:`(num_cls, hidden_size)`):
+                    Optional, the prototypes of a support set computed by `compute_prototypes`,
+                    used instead of `support` and `support_labels` so only the query is encoded.
 
         Returns:
             Dict[str, Tensor]: result, it contains the following key:
@@ -239,21 +242,29 @@ class SbertForFaqQuestionAnswering(BaseTaskModel):
         """
         assert not self.training
         query = input['query']
-        support = input['support']
         if isinstance(query, list):
             query = torch.stack(query)
+        n_query = query.shape[0]
+        query_mask = torch.ne(query, 0).view([n_query, -1])
+
+        if 'support_prototypes' in input:
+            z_query = self.forward_sentence_embedding({
+                'input_ids':
+                query,
+                'attention_mask':
+                query_mask
+            })
+            return {
+                'scores': self.compute_scores(z_query,
+                                              input['support_prototypes'])
+            }
+
+        support = input['support']
         if isinstance(support, list):
             support = torch.stack(support)
-        n_query = query.shape[0]
         n_support = support.shape[0]
-        query_mask = torch.ne(query, 0).view([n_query, -1])
         support_mask = torch.ne(support, 0).view([n_support, -1])
 
-        support_labels = input['support_labels']
-        num_cls = torch.max(support_labels) + 1
-        onehot_labels = self._get_onehot_labels(support_labels, n_support,
-                                                num_cls)
-
         input_ids = torch.cat([query, support])
         input_mask = torch.cat([query_mask, support_mask], dim=0)
         pooled_representation = self.forward_sentence_embedding({
@@ -264,13 +275,41 @@ class SbertForFaqQuestionAnswering(BaseTaskModel):
         })
         z_query = pooled_representation[:n_query]
         z_support = pooled_representation[n_query:]
+        protos = self.compute_prototypes(z_support, input['support_labels'])
+        return {'scores': self.compute_scores(z_query, protos)}
+
+    def compute_prototypes(self, z_support: Tensor,
+                           support_labels: Tensor) -> Tensor:
+        """Average the sentence embeddings of the support set by class.
+
+        Args:
+            z_support (Tensor): The sentence embeddings of the support set, of shape
+                (support_size, hidden_size).
+            support_labels (Tensor): The label ids of the support set, of shape
+                (support_size, ).
+
+        Returns:
+            Tensor: The prototypes of the classes, of shape (num_cls, hidden_size).
+        """
+        n_support = z_support.shape[0]
+        num_cls = torch.max(support_labels) + 1
+        onehot_labels = self._get_onehot_labels(support_labels, n_support,
+                                                num_cls)
         cls_n_support = torch.sum(onehot_labels, dim=-2) + 1e-5
-        protos = torch.matmul(onehot_labels.transpose(0, 1),
-                              z_support) / cls_n_support.unsqueeze(-1)
+        return torch.matmul(onehot_labels.transpose(0, 1),
+                            z_support) / cls_n_support.unsqueeze(-1)
+
+    def compute_scores(self, z_query: Tensor, protos: Tensor) -> Tensor:
+        """Score the query embeddings against the class prototypes.
+
+        Returns:
+            Tensor: The scores of shape (n_query, num_cls).
+        """
+        n_query, num_cls = z_query.shape[0], protos.shape[0]
         scores = self.metrics_layer(z_query, protos).view([n_query, num_cls])
         if self.metrics_layer.name == 'relation':
             scores = torch.sigmoid(scores)
-        return {'scores': scores}
+        return scores
 
     def _get_onehot_labels(self, labels, support_size, num_cls):
         labels_ = labels.view(support_size, 1)
@@ -2,6 +2,7 @@
 from typing import Any, Dict
 
 import numpy as np
+from transformers import LogitsProcessorList
 from transformers.modeling_utils import GenerationMixin
 
 from modelscope.metainfo import TaskModels
@@ -11,6 +12,7 @@ from modelscope.models.nlp.task_models.task_model import \
 from modelscope.outputs import (OutputKeys, TextGenerationModelOutput,
                                 TokenGeneratorOutput)
 from modelscope.utils.constant import Tasks
+from modelscope.utils.nlp.streaming import build_streamer_logits_processor
 
 __all__ = ['TaskModelForTextGeneration']
 
@@ -75,9 +77,23 @@ class TaskModelForTextGeneration(SingleBackboneTaskModelBase, GenerationMixin):
             'attention_mask': attention_mask,
         }
 
-    def generate(self, inputs, *args, **kwargs):
+    def generate(self, inputs, *args, streamer=None, **kwargs):
         input_ids = inputs['input_ids'] if isinstance(inputs, Dict) else inputs
+        num_beams = kwargs.get('num_beams', getattr(self.config, 'num_beams',
+                                                    1))
+        if streamer is not None and (num_beams is None or num_beams <= 1):
+            # put the sequence of the first sample into the streamer at each
+            # step, the first beam of a beam search may not be the final result,
+            # so the streamer only gets the result of a beam search
+            logits_processor = LogitsProcessorList(
+                kwargs.pop('logits_processor', None) or [])
+            logits_processor.append(build_streamer_logits_processor(streamer))
+            kwargs['logits_processor'] = logits_processor
         generate_output = super().generate(input_ids, *args, **kwargs)
+        if streamer is not None:
+            sequences = generate_output.sequences if isinstance(
+                generate_output, Dict) else generate_output
+            streamer.put(sequences[0])
         if isinstance(generate_output, Dict):
             return TokenGeneratorOutput(
                 sequences=generate_output.sequences,
@@ -5,3 +5,4 @@ from modelscope.utils.import_utils import LazyImportModule
 from . import audio, cv, multi_modal, nlp
 from .base import Pipeline
 from .builder import pipeline
+from .cache import PipelineCache, get_pipeline_cache
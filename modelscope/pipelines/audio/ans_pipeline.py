@@ -1,7 +1,7 @@
 # Copyright (c) Alibaba, Inc. and its affiliates.
 
 import io
-from typing import Any, Dict
+from typing import Any, Dict, Generator, Iterable, Union
 
 import librosa
 import numpy as np
@@ -15,6 +15,9 @@ from modelscope.pipelines.base import Input, Pipeline
 from modelscope.pipelines.builder import PIPELINES
 from modelscope.utils.audio.audio_utils import audio_norm
 from modelscope.utils.constant import Tasks
+from modelscope.utils.logger import get_logger
+
+logger = get_logger()
 
 
 @PIPELINES.register_module(
@@ -25,8 +28,20 @@ class ANSPipeline(Pipeline):
 
     When invoke the class with pipeline.__call__(), it accept only one parameter:
         inputs(str): the path of wav file
+
+    Audio longer than `SEGMENT_SECONDS` is denoised in 1 second windows with 75%
+    stride, `segment_batch_size` windows are run by the model at a time:
+        >>> ans(wav_path, segment_batch_size=64)
+
+    Use `stream` to denoise an audio stream block by block.
     """
     SAMPLE_RATE = 16000
+    WINDOW = 16000
+    STRIDE = int(WINDOW * 0.75)
+    # the samples dropped at both sides of a window, the center of the windows are
+    # contiguous as STRIDE == WINDOW - 2 * GIVE_UP_LENGTH
+    GIVE_UP_LENGTH = (WINDOW - STRIDE) // 2
+    SEGMENT_SECONDS = 120
 
     def __init__(self, model, **kwargs):
         """
@@ -54,63 +69,154 @@ class ANSPipeline(Pipeline):
         inputs = np.reshape(data, [1, data.shape[0]])
         return {'ndarray': inputs, 'nsamples': data.shape[0]}
 
+    def _sanitize_parameters(self, **pipeline_parameters):
+        forward_params = {}
+        if 'segment_batch_size' in pipeline_parameters:
+            forward_params['segment_batch_size'] = pipeline_parameters.pop(
+                'segment_batch_size')
+        return {}, forward_params, pipeline_parameters
+
+    def _forward_windows(self, windows: torch.Tensor,
+                         segment_batch_size: int) -> np.ndarray:
+        """Denoise the windows of shape [N, WINDOW] in batches.
+        """
+        outputs = []
+        with torch.no_grad():
+            for i in range(0, windows.shape[0], segment_batch_size):
+                batch = windows[i:i + segment_batch_size].to(self.device)
+                outputs.append(
+                    self.model(dict(noisy=batch))['wav_l2'].cpu().numpy())
+        return np.concatenate(outputs, axis=0)
+
+    def _denoise_segments(self, ndarray: np.ndarray,
+                          segment_batch_size: int) -> np.ndarray:
+        t = ndarray.shape[0]
+        # pad to WINDOW + k * STRIDE, and keep the valid samples out of the
+        # give up length of the last window
+        padding = self.WINDOW - t if t < self.WINDOW else -(
+            t - self.WINDOW) % self.STRIDE
+        if padding < self.GIVE_UP_LENGTH:
+            padding += self.STRIDE
+        ndarray = np.concatenate([ndarray, np.zeros(padding, np.float32)])
+        windows = torch.from_numpy(ndarray).unfold(0, self.WINDOW,
+                                                   self.STRIDE)
+        outputs = self._forward_windows(windows, segment_batch_size)
+        g = self.GIVE_UP_LENGTH
+        return np.concatenate(
+            [outputs[0, :-g], outputs[1:, g:-g].reshape(-1)])[:t]
+
     def forward(self, inputs: Dict[str, Any],
                 **forward_params) -> Dict[str, Any]:
         ndarray = inputs['ndarray']
         if isinstance(ndarray, torch.Tensor):
             ndarray = ndarray.cpu().numpy()
         nsamples = inputs['nsamples']
-        decode_do_segement = False
-        window = 16000
-        stride = int(window * 0.75)
-        print('inputs:{}'.format(ndarray.shape))
+        window = self.WINDOW
+        stride = self.STRIDE
         b, t = ndarray.shape  # size()
-        if t > window * 120:
-            decode_do_segement = True
-
-        if t < window:
-            ndarray = np.concatenate(
-                [ndarray, np.zeros((ndarray.shape[0], window - t))], 1)
-        elif t < window + stride:
-            padding = window + stride - t
-            print('padding: {}'.format(padding))
-            ndarray = np.concatenate(
-                [ndarray, np.zeros((ndarray.shape[0], padding))], 1)
+        if t > window * self.SEGMENT_SECONDS:
+            outputs = self._denoise_segments(
+                np.float32(ndarray[0]),
+                forward_params.get('segment_batch_size', 16))
         else:
-            if (t - window) % stride != 0:
-                padding = t - (t - window) // stride * stride
-                print('padding: {}'.format(padding))
+            if t < window:
+                ndarray = np.concatenate(
+                    [ndarray, np.zeros((ndarray.shape[0], window - t))], 1)
+            elif t < window + stride:
+                padding = window + stride - t
                 ndarray = np.concatenate(
                     [ndarray, np.zeros((ndarray.shape[0], padding))], 1)
-        print('inputs after padding:{}'.format(ndarray.shape))
-        with torch.no_grad():
-            ndarray = torch.from_numpy(np.float32(ndarray)).to(self.device)
-            b, t = ndarray.shape
-            if decode_do_segement:
-                outputs = np.zeros(t)
-                give_up_length = (window - stride) // 2
-                current_idx = 0
-                while current_idx + window <= t:
-                    print('current_idx: {}'.format(current_idx))
-                    tmp_input = dict(noisy=ndarray[:, current_idx:current_idx
-                                                   + window])
-                    tmp_output = self.model(
-                        tmp_input, )['wav_l2'][0].cpu().numpy()
-                    end_index = current_idx + window - give_up_length
-                    if current_idx == 0:
-                        outputs[current_idx:
-                                end_index] = tmp_output[:-give_up_length]
-                    else:
-                        outputs[current_idx
-                                + give_up_length:end_index] = tmp_output[
-                                    give_up_length:-give_up_length]
-                    current_idx += stride
             else:
+                if (t - window) % stride != 0:
+                    padding = t - (t - window) // stride * stride
+                    ndarray = np.concatenate(
+                        [ndarray, np.zeros((ndarray.shape[0], padding))], 1)
+            logger.debug(f'ans inputs after padding: {ndarray.shape}')
+            with torch.no_grad():
+                ndarray = torch.from_numpy(np.float32(ndarray)).to(self.device)
                 outputs = self.model(
                     dict(noisy=ndarray))['wav_l2'][0].cpu().numpy()
         outputs = (outputs[:nsamples] * 32768).astype(np.int16).tobytes()
         return {OutputKeys.OUTPUT_PCM: outputs}
 
+    def stream(self,
+               blocks: Iterable[Union[bytes, np.ndarray]],
+               segment_batch_size: int = 1) -> Generator[bytes, None, None]:
+        """Denoise an audio stream block by block.
+
+        The stream is denoised in the same windows as the long audio, a denoised block
+        is emitted as soon as its windows are complete, so the latency is bounded by
+        the window (1 second) plus the block size. The input is not normalized as the
+        whole audio is unknown.
+
+        Examples:
+            >>> for pcm in ans.stream(microphone_blocks()):
+            >>>     play(pcm)
+
+        Args:
+            blocks: The blocks of 16k audio, each is 16bit pcm bytes or a float ndarray
+                in [-1, 1].
+            segment_batch_size (int): The max number of windows run by the model at a time.
+
+        Yields:
+            bytes: The 16bit pcm bytes of the denoised audio.
+        """
+        g = self.GIVE_UP_LENGTH
+        buffer = np.zeros(0, np.float32)
+        # the absolute position of buffer[0], and the next window start
+        buffer_start = 0
+        window_start = 0
+        nsamples = 0
+        # the number of the emitted samples
+        emitted = 0
+
+        def _run(buffer, buffer_start, window_start):
+            n = (buffer_start + buffer.shape[0] - window_start
+                 - self.WINDOW) // self.STRIDE + 1
+            if n <= 0:
+                return [], window_start
+            offset = window_start - buffer_start
+            windows = torch.from_numpy(
+                buffer[offset:offset + self.WINDOW + (n - 1)
+                       * self.STRIDE]).unfold(0, self.WINDOW, self.STRIDE)
+            outputs = self._forward_windows(windows, segment_batch_size)
+            pieces = []
+            for i in range(n):
+                if window_start == 0 and i == 0:
+                    pieces.append(outputs[i, :-g])
+                else:
+                    pieces.append(outputs[i, g:-g])
+            return pieces, window_start + n * self.STRIDE
+
+        for block in blocks:
+            if isinstance(block, bytes):
+                block = np.frombuffer(block, dtype=np.int16) / 32768
+            block = np.asarray(block, dtype=np.float32).reshape(-1)
+            nsamples += block.shape[0]
+            buffer = np.concatenate([buffer, block])
+            pieces, window_start = _run(buffer, buffer_start, window_start)
+            # keep the samples from the next window start
+            buffer = buffer[window_start - buffer_start:]
+            buffer_start = window_start
+            if pieces:
+                outputs = np.concatenate(pieces)
+                emitted += outputs.shape[0]
+                yield (outputs * 32768).astype(np.int16).tobytes()
+
+        if nsamples > emitted:
+            # pad the tail, so that the last valid samples are out of the give up
+            # length of the last window
+            n = max(0, -(
+                (window_start + self.WINDOW - g - nsamples) // self.STRIDE)) + 1
+            end = window_start + (n - 1) * self.STRIDE + self.WINDOW
+            buffer = np.concatenate([
+                buffer,
+                np.zeros(end - buffer_start - buffer.shape[0], np.float32)
+            ])
+            pieces, _ = _run(buffer, buffer_start, window_start)
+            outputs = np.concatenate(pieces)[:nsamples - emitted]
+            yield (outputs * 32768).astype(np.int16).tobytes()
+
     def postprocess(self, inputs: Dict[str, Any], **kwargs) -> Dict[str, Any]:
         if 'output_path' in kwargs.keys():
             sf.write(
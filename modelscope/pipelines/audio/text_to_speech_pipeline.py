@@ -1,6 +1,6 @@
 # Copyright (c) Alibaba, Inc. and its affiliates.
 
-from typing import Any, Dict, List
+from typing import Any, Dict, Generator, List
 
 import numpy as np
 
@@ -31,13 +31,37 @@ class TextToSpeechSambertHifiganPipeline(Pipeline):
         """synthesis text from inputs with pipeline
         Args:
             input (str): text to synthesis
-            forward_params: valid param is 'voice' used to setting speaker vocie
+            forward_params: valid params are 'voice' used to setting speaker vocie, and
+                'sentence_batch_size' used to synthesis several sentences in one batch
         Returns:
             Dict[str, np.ndarray]: {OutputKeys.OUTPUT_PCM : np.ndarray(16bit pcm data)}
         """
-        output_wav = self.model.forward(input, forward_params.get('voice'))
+        output_wav = self.model.forward(
+            input, forward_params.get('voice'),
+            forward_params.get('sentence_batch_size', 1))
         return {OutputKeys.OUTPUT_PCM: output_wav}
 
+    def stream(self, input: str,
+               **forward_params) -> Generator[Dict[str, np.ndarray], None, None]:
+        """synthesis text and yield the audio sentence by sentence, the first audio
+        is available after its sentence is synthesized rather than the whole text.
+
+        Examples:
+            >>> tts = pipeline(Tasks.text_to_speech, model='damo/speech_sambert-hifigan_tts_zh-cn_16k')
+            >>> for output in tts.stream('今天北京天气怎么样。明天呢？'):
+            >>>     play(output[OutputKeys.OUTPUT_PCM])
+
+        Args:
+            input (str): text to synthesis
+            forward_params: the same with `forward`
+        Yields:
+            Dict[str, np.ndarray]: {OutputKeys.OUTPUT_PCM : np.ndarray(16bit pcm data of a sentence)}
+        """
+        for output_wav in self.model.forward_stream(
+                input, forward_params.get('voice'),
+                forward_params.get('sentence_batch_size', 1)):
+            yield {OutputKeys.OUTPUT_PCM: output_wav}
+
     def postprocess(self, inputs: Dict[str, Any],
                     **postprocess_params) -> Dict[str, Any]:
         return inputs
@@ -2,10 +2,15 @@
 
 import os
 import os.path as osp
+import queue
+import time
 from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import is_dataclass
 from functools import partial
 from multiprocessing import Pool
-from threading import Lock
+from threading import Lock, Thread
 from typing import Any, Dict, Generator, List, Mapping, Union
 
 import numpy as np
@@ -16,7 +21,7 @@ from modelscope.outputs import TASK_OUTPUTS
 from modelscope.pipeline_inputs import TASK_INPUTS, check_input_type
 from modelscope.preprocessors import Preprocessor
 from modelscope.utils.config import Config
-from modelscope.utils.constant import Frameworks, ModelFile
+from modelscope.utils.constant import Backends, Frameworks, ModelFile
 from modelscope.utils.device import (create_device, device_placement,
                                      verify_device)
 from modelscope.utils.hub import read_config, snapshot_download
@@ -37,9 +42,36 @@ InputModel = Union[str, Model, 'torch.nn.Module']
 
 logger = get_logger()
 
+# the preprocessor of a preprocess worker process of the pipelined executor
+_worker_preprocessor = None
+
+
+def _init_preprocess_worker(preprocessor):
+    global _worker_preprocessor
+    _worker_preprocessor = preprocessor
+
+
+def _preprocess_in_worker(input, preprocess_params):
+    return _worker_preprocessor(input, **preprocess_params)
+
 
 class Pipeline(ABC):
 
+    # Whether the inputs can be processed in micro batches, see `_process_batch`.
+    # Only the pipelines whose preprocessed samples have a real batch dimension,
+    # and whose forward outputs are aligned with it, should set this to True,
+    # otherwise `batch_size` falls back to per-sample processing.
+    _support_batch = False
+    # The keys of the preprocessed tensors which are right-padded to the longest
+    # sample of a micro batch, usually the ones covered by an attention mask.
+    # The tensors of the other keys must have the same shape in all the samples.
+    _batch_padding_keys = ()
+    # Whether `preprocess` can run concurrently in the threads of the pipelined
+    # executor. Preprocessors are usually stateful or not thread safe (e.g. the
+    # fast tokenizers of transformers), so by default the preprocess pool has one
+    # thread, which still overlaps with forward and postprocess.
+    _thread_safe_preprocess = False
+
     def initiate_single_model(self, model):
         if isinstance(model, str):
             logger.info(f'initiate model from {model}')
@@ -64,6 +96,8 @@ class Pipeline(ABC):
                  preprocessor: Union[Preprocessor, List[Preprocessor]] = None,
                  device: str = 'gpu',
                  auto_collate=True,
+                 backend: str = Backends.torch,
+                 quantize: str = None,
                  **kwargs):
         """ Base class for pipeline.
 
@@ -77,11 +111,22 @@ class Pipeline(ABC):
             preprocessor: (list of) Preprocessor object
             device (str): device str, should be either cpu, cuda, gpu, gpu:X or cuda:X
             auto_collate (bool): automatically to convert data to tensor or not.
+            backend (str): The inference backend of the torch model, `torch`, `onnxruntime`
+                or `torchscript`. For the latter two, the model is exported on the first
+                use or loaded from the exported file in the model dir, see `ExportedModel`.
+            quantize (str): The post-training quantization method of the torch model, only
+                `dynamic-int8` is supported now, the quantized model runs on cpu, see
+                `modelscope.utils.quantization.quantize_model`.
         """
         if config_file is not None:
             self.cfg = Config.from_file(config_file)
 
         verify_device(device)
+        if quantize is not None and device != 'cpu':
+            logger.warning(
+                f'The model quantized by {quantize} runs on cpu only, '
+                f'the device is changed from {device} to cpu.')
+            device = 'cpu'
         self.device_name = device
 
         if not isinstance(model, List):
@@ -101,10 +146,33 @@ class Pipeline(ABC):
 
         if self.framework == Frameworks.torch:
             self.device = create_device(self.device_name)
+        if quantize is not None:
+            self.model = self._quantize_single_model(self.model, quantize)
+            self.models = [self.model]
+        if backend != Backends.torch:
+            self.model = self._export_single_model(self.model, backend)
+            self.models = [self.model]
         self._model_prepare = False
         self._model_prepare_lock = Lock()
         self._auto_collate = auto_collate
 
+    def _quantize_single_model(self, model, quantize: str):
+        from modelscope.utils.quantization import quantize_model
+        if self.has_multiple_models or self.framework != Frameworks.torch:
+            raise ValueError(
+                f'The quantization {quantize} only supports a single torch model.'
+            )
+        return quantize_model(model, quantize)
+
+    def _export_single_model(self, model, backend: str):
+        from modelscope.exporters import ExportedModel
+        if self.has_multiple_models or self.framework != Frameworks.torch:
+            raise ValueError(
+                f'The backend {backend} only supports a single torch model.')
+        if isinstance(model, ExportedModel):
+            return model
+        return ExportedModel(model, backend, device=self.device_name)
+
     def prepare_model(self):
         """ Place model on certain device for pytorch models before first inference
         """
@@ -149,6 +217,32 @@ class Pipeline(ABC):
 
     def __call__(self, input: Union[Input, List[Input]], *args,
                  **kwargs) -> Union[Dict[str, Any], Generator]:
+        """Run the pipeline on a single input, a list of inputs or a dataset.
+
+        Args:
+            input: A single input, a list of inputs or a `MsDataset`.
+            batch_size (int, optional): If set to a value larger than 1, list and
+                dataset inputs are grouped into micro batches of this size, which
+                share one forward call. Pipelines which do not support batching
+                fall back to per-sample processing.
+            max_wait_ms (float, optional): Only valid for dataset inputs with
+                `batch_size`, the max time to wait for a micro batch to be filled
+                before running an incomplete batch.
+            num_workers (int, optional): If set, list and dataset inputs are processed
+                by the pipelined executor, which overlaps preprocess and postprocess
+                in pools of up to `num_workers` workers with forward on the calling
+                thread, see `_process_pipelined`.
+            worker_type (str, optional): `thread` (default) or `process`, the worker
+                type of the preprocess pool of the pipelined executor.
+            stream (bool, optional): Only valid for a single input of the pipelines
+                which implement `stream`, yield the partial results as they are
+                produced, see the `stream` method of the pipeline.
+            kwargs: Other pipeline parameters, see `_sanitize_parameters`.
+
+        Returns:
+            A dict of results for a single input, a list of dicts for a list of inputs,
+            or a generator of dicts for a dataset or a stream.
+        """
         # model provider should leave it as it is
         # modelscope library developer will handle this function
         # place model to cpu or gpu
@@ -159,6 +253,20 @@ class Pipeline(ABC):
         # simple showcase, need to support iterator type for both tensorflow and pytorch
         # input_dict = self._handle_input(input)
 
+        batch_size = kwargs.pop('batch_size', None)
+        max_wait_ms = kwargs.pop('max_wait_ms', None)
+        num_workers = kwargs.pop('num_workers', None)
+        worker_type = kwargs.pop('worker_type', 'thread')
+
+        if kwargs.pop('stream', False):
+            if not hasattr(self, 'stream'):
+                raise ValueError(
+                    f'{self.__class__.__name__} does not support stream output'
+                )
+            if isinstance(input, (list, MsDataset)):
+                raise ValueError('stream output supports a single input only')
+            return self.stream(input, *args, **kwargs)
+
         # sanitize the parameters
         preprocess_params, forward_params, postprocess_params = self._sanitize_parameters(
             **kwargs)
@@ -166,12 +274,30 @@ class Pipeline(ABC):
         kwargs['forward_params'] = forward_params
         kwargs['postprocess_params'] = postprocess_params
 
+        pipelined = num_workers is not None and num_workers > 0 \
+            and self._can_pipeline()
+        if pipelined and isinstance(input, (list, MsDataset)):
+            output = self._process_pipelined(input, num_workers, worker_type,
+                                             batch_size, *args, **kwargs)
+            return list(output) if isinstance(input, list) else output
+
         if isinstance(input, list):
-            output = []
-            for ele in input:
-                output.append(self._process_single(ele, *args, **kwargs))
+            if self._can_batch(batch_size):
+                output = []
+                for i in range(0, len(input), batch_size):
+                    output.extend(
+                        self._process_batch(input[i:i + batch_size], *args,
+                                            **kwargs))
+            else:
+                output = []
+                for ele in input:
+                    output.append(self._process_single(ele, *args, **kwargs))
 
         elif isinstance(input, MsDataset):
+            if self._can_batch(batch_size):
+                return self._process_batch_iterator(input, batch_size,
+                                                    max_wait_ms, *args,
+                                                    **kwargs)
             return self._process_iterator(input, *args, **kwargs)
 
         else:
@@ -195,9 +321,238 @@ class Pipeline(ABC):
         for ele in input:
             yield self._process_single(ele, *args, **kwargs)
 
+    def _process_batch_iterator(self, input: Input, batch_size: int,
+                                max_wait_ms: float, *args, **kwargs):
+        """Group the elements of an iterable input into micro batches.
+
+        A batch is processed once it holds `batch_size` elements, or, if `max_wait_ms`
+        is set, once `max_wait_ms` milliseconds have passed since its first element
+        arrived, so slow streaming sources do not delay results indefinitely.
+        """
+        if max_wait_ms is None:
+            batch = []
+            for ele in input:
+                batch.append(ele)
+                if len(batch) == batch_size:
+                    yield from self._process_batch(batch, *args, **kwargs)
+                    batch = []
+            if len(batch) > 0:
+                yield from self._process_batch(batch, *args, **kwargs)
+            return
+
+        # read the source in a background thread so that waiting for the next
+        # element can be bounded by the timeout.
+        _end = object()
+        buffer = queue.Queue(maxsize=batch_size * 2)
+
+        def _reader():
+            try:
+                for ele in input:
+                    buffer.put(ele)
+            finally:
+                buffer.put(_end)
+
+        Thread(target=_reader, daemon=True).start()
+        finished = False
+        while not finished:
+            batch = [buffer.get()]
+            if batch[0] is _end:
+                break
+            deadline = time.monotonic() + max_wait_ms / 1000.
+            while len(batch) < batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    ele = buffer.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if ele is _end:
+                    finished = True
+                    break
+                batch.append(ele)
+            yield from self._process_batch(batch, *args, **kwargs)
+
+    def _can_batch(self, batch_size: int) -> bool:
+        """Whether the inputs can be processed in micro batches of `batch_size`.
+        """
+        if batch_size is None or batch_size <= 1:
+            return False
+        if not self._support_batch or not self._auto_collate \
+                or self.framework != Frameworks.torch:
+            return False
+        return self._can_pipeline()
+
+    def _process_batch(self, inputs: List[Input], *args,
+                       **kwargs) -> List[Dict[str, Any]]:
+        """Process a micro batch of inputs with one forward call.
+
+        Each input is preprocessed separately, the results are padded and
+        concatenated by `_batch_collate_fn`, fed into one `forward`, and the
+        outputs are split back by `_split_batch` before per-sample postprocess.
+        If the preprocessed data can not be batched, or the forward outputs can
+        not be split, this falls back to per-sample forward calls.
+        """
+        preprocess_params = kwargs.get('preprocess_params', {})
+        forward_params = kwargs.get('forward_params', {})
+        postprocess_params = kwargs.get('postprocess_params', {})
+        samples = [
+            self._preprocess_sample(ele, preprocess_params) for ele in inputs
+        ]
+        outs = self._forward_batch(samples, forward_params)
+        return [
+            self._postprocess_sample(out, postprocess_params) for out in outs
+        ]
+
+    def _process_pipelined(self, input: Input, num_workers: int,
+                           worker_type: str, batch_size: int, *args, **kwargs):
+        """Process the inputs with overlapped preprocess, forward and postprocess.
+
+        Preprocess runs in a pool of `num_workers` threads or processes, forward runs
+        on the calling thread, and postprocess runs in a pool of `num_workers` threads.
+        The stages are connected by bounded queues of futures, so the outputs are
+        yielded in the order of the inputs and at most a few samples are buffered.
+
+        Args:
+            input: A list of inputs or an iterable input like `MsDataset`.
+            num_workers: The number of workers of the preprocess and postprocess pools.
+            worker_type: `thread` or `process`, the worker type of the preprocess pool.
+                The process pool is only used with the default `preprocess` method,
+                the preprocessor is sent to each worker process once. The thread pool
+                has one thread unless the pipeline sets `_thread_safe_preprocess`.
+            batch_size: If larger than 1, ready samples are forwarded in micro batches,
+                see `_process_batch`.
+        """
+        preprocess_params = kwargs.get('preprocess_params', {})
+        forward_params = kwargs.get('forward_params', {})
+        postprocess_params = kwargs.get('postprocess_params', {})
+        batch_size = batch_size if self._can_batch(batch_size) else 1
+        max_pending = max(num_workers * 2, batch_size)
+
+        use_process = worker_type == 'process'
+        if use_process and type(self).preprocess is not Pipeline.preprocess:
+            logger.warning(
+                f'{type(self).__name__} overrides preprocess, which can not run in '
+                f'worker processes, using threads instead')
+            use_process = False
+        if use_process:
+            pre_pool = ProcessPoolExecutor(
+                num_workers,
+                initializer=_init_preprocess_worker,
+                initargs=(self.preprocessor, ))
+        else:
+            pre_pool = ThreadPoolExecutor(
+                num_workers if self._thread_safe_preprocess else 1)
+        post_pool = ThreadPoolExecutor(num_workers)
+
+        pre_futures = deque()
+        post_futures = deque()
+        source = iter(input)
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(pre_futures) < max_pending:
+                    try:
+                        ele = next(source)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    if use_process:
+                        self._check_input(ele)
+                        future = pre_pool.submit(_preprocess_in_worker, ele,
+                                                 preprocess_params)
+                    else:
+                        future = pre_pool.submit(self._preprocess_sample, ele,
+                                                 preprocess_params)
+                    pre_futures.append(future)
+                if len(pre_futures) == 0:
+                    break
+
+                samples = [
+                    pre_futures.popleft().result()
+                    for _ in range(min(batch_size, len(pre_futures)))
+                ]
+                if len(samples) > 1:
+                    outs = self._forward_batch(samples, forward_params)
+                else:
+                    outs = [self._forward_sample(samples[0], forward_params)]
+                for out in outs:
+                    post_futures.append(
+                        post_pool.submit(self._postprocess_sample, out,
+                                         postprocess_params))
+
+                while len(post_futures) > max_pending or (
+                        len(post_futures) > 0 and post_futures[0].done()):
+                    yield post_futures.popleft().result()
+
+            while len(post_futures) > 0:
+                yield post_futures.popleft().result()
+        finally:
+            for future in pre_futures:
+                future.cancel()
+            pre_pool.shutdown(wait=False)
+            post_pool.shutdown(wait=False)
+
+    def _can_pipeline(self) -> bool:
+        """Whether the pipelined executor can be used for this pipeline.
+        """
+        # pipelines overriding the single-sample logic define their own flow
+        return type(self)._process_single is Pipeline._process_single
+
+    def _preprocess_sample(self, input, preprocess_params: Dict[str, Any]):
+        self._check_input(input)
+        return self.preprocess(input, **preprocess_params)
+
+    def _forward_sample(self, data, forward_params: Dict[str, Any]):
+        with device_placement(self.framework, self.device_name):
+            if self.framework == Frameworks.torch:
+                with torch.no_grad():
+                    if self._auto_collate:
+                        data = self._collate_fn(data)
+                    return self.forward(data, **forward_params)
+            else:
+                return self.forward(data, **forward_params)
+
+    def _forward_batch(self, samples: List[Any],
+                       forward_params: Dict[str, Any]) -> List[Any]:
+        """Forward the preprocessed samples in one batch and split the outputs.
+
+        Falls back to per-sample forward calls if the samples can not be batched
+        or the outputs can not be split, the errors of `forward` are raised.
+        """
+        with device_placement(self.framework, self.device_name):
+            with torch.no_grad():
+                try:
+                    batch, sizes = self._batch_collate_fn(samples)
+                except ValueError as e:
+                    logger.warning(
+                        f'falling back to per-sample forward, reason: {e}')
+                else:
+                    outputs = self.forward(batch, **forward_params)
+                    try:
+                        return self._split_batch(outputs, sizes)
+                    except ValueError as e:
+                        logger.warning(
+                            f'falling back to per-sample forward, reason: {e}')
+        return [
+            self._forward_sample(sample, forward_params) for sample in samples
+        ]
+
+    def _postprocess_sample(self, data, postprocess_params: Dict[str, Any]):
+        out = self.postprocess(data, **postprocess_params)
+        self._check_output(out)
+        return out
+
     def _collate_fn(self, data):
         return collate_fn(data, self.device)
 
+    def _batch_collate_fn(self, data_list):
+        return batch_collate_fn(
+            data_list, self.device, padding_keys=self._batch_padding_keys)
+
+    def _split_batch(self, data, sizes):
+        return split_batch(data, sizes)
+
     def _process_single(self, input: Input, *args, **kwargs) -> Dict[str, Any]:
         preprocess_params = kwargs.get('preprocess_params', {})
         forward_params = kwargs.get('forward_params', {})
@@ -414,6 +769,168 @@ class DistributedPipeline(Pipeline):
         pass
 
 
+def _batch_rows(data, rows=None):
+    """Get the number of rows in the batch dimension of a preprocessed sample.
+
+    Raises:
+        ValueError: If the tensors of the sample do not share the first dimension.
+    """
+    if isinstance(data, Mapping):
+        for v in data.values():
+            rows = _batch_rows(v, rows)
+        return rows
+    if isinstance(data, np.ndarray) and data.dtype.type is not np.str_:
+        size = data.shape[0] if data.ndim > 0 else None
+    elif isinstance(data, torch.Tensor):
+        size = data.shape[0] if data.dim() > 0 else None
+    else:
+        return rows
+    if size is None:
+        return rows
+    if rows is not None and size != rows:
+        raise ValueError(
+            'The tensors of a sample do not share the batch dimension')
+    return size
+
+
+def _pad_and_concat(tensors, padding_value, padding):
+    if tensors[0].dim() == 0:
+        return torch.stack(tensors)
+    if any(t.dim() != tensors[0].dim() for t in tensors):
+        raise ValueError('tensors of different ranks can not be batched')
+    max_shape = [
+        max(t.shape[i] for t in tensors) for i in range(tensors[0].dim())
+    ]
+    padded = []
+    for t in tensors:
+        pad = []
+        # F.pad takes the padding of the last dimension first
+        for i in reversed(range(1, t.dim())):
+            pad.extend([0, max_shape[i] - t.shape[i]])
+        if any(pad):
+            if not padding:
+                raise ValueError(
+                    'tensors of different shapes can not be batched without '
+                    'padding')
+            t = torch.nn.functional.pad(t, pad, value=padding_value)
+        padded.append(t)
+    return torch.cat(padded, dim=0)
+
+
+def batch_collate_fn(data_list, device, padding_value=0, padding_keys=()):
+    """Merge a list of preprocessed samples into one batch on the device.
+
+    Tensors and arrays are concatenated along the first (batch) dimension, those
+    of `padding_keys` are right-padded with `padding_value` to the same shape first.
+    Other values are kept only if they are identical across the samples.
+
+    Args:
+        data_list: The preprocessed samples, each one is the input of a single forward call.
+        device: The device to move data to.
+        padding_value: The value to pad the tensors with.
+        padding_keys: The keys of the tensors which can be padded, the padding must
+            be masked in the forward call, e.g. by an attention mask.
+
+    Returns: A tuple of the batched data and the number of rows each sample takes
+        in the batch dimension, which is needed to split the outputs.
+
+    Raises:
+        ValueError: If the samples can not be batched.
+    """
+    sizes = []
+    for data in data_list:
+        rows = _batch_rows(data)
+        if rows is None:
+            raise ValueError(
+                f'Can not find the batch dimension of type {type(data)}')
+        sizes.append(rows)
+
+    def _merge(values, key=None):
+        first = values[0]
+        if isinstance(first, Mapping):
+            if any(v.keys() != first.keys() for v in values):
+                raise ValueError(
+                    'samples with different keys can not be batched')
+            return type(first)({
+                k: _merge([v[k] for v in values], k)
+                for k in first.keys()
+            })
+        values = [
+            torch.from_numpy(v)
+            if isinstance(v, np.ndarray) and v.dtype.type is not np.str_ else v
+            for v in values
+        ]
+        first = values[0]
+        if isinstance(first, torch.Tensor):
+            if not all(isinstance(v, torch.Tensor) for v in values):
+                raise ValueError('tensors can not be batched with other types')
+            padding = key in padding_keys
+            return _pad_and_concat(values, padding_value, padding).to(device)
+        if isinstance(first, (bytes, str, int, float, bool, type(None))) \
+                and all(type(v) is type(first) and v == first for v in values):
+            return first
+        raise ValueError(f'Values of type {type(first)} can not be batched')
+
+    return _merge(data_list), sizes
+
+
+def split_batch(data, sizes):
+    """Split the outputs of a batched forward call into per-sample outputs.
+
+    Tensors and arrays whose first dimension equals the total rows of the batch are
+    sliced with `sizes` and keep their batch dimension, so each sample looks like
+    the output of a single forward call. Other non-sequence values are shared.
+
+    Args:
+        data: The outputs of the forward call.
+        sizes: The number of rows each sample takes, see `batch_collate_fn`.
+
+    Returns: A list of per-sample outputs.
+
+    Raises:
+        ValueError: If the outputs can not be split.
+    """
+    total = sum(sizes)
+    offsets = np.cumsum([0] + list(sizes))
+    if isinstance(data, Mapping) or is_dataclass(data):
+        items = dict(data.items())
+        parts = {k: split_batch(v, sizes) for k, v in items.items()}
+        results = []
+        for i in range(len(sizes)):
+            sample = {k: part[i] for k, part in parts.items()}
+            # dataclass outputs, e.g. `ModelOutputBase`, are built from kwargs
+            results.append(
+                type(data)(
+                    **sample) if is_dataclass(data) else type(data)(sample))
+        return results
+    elif isinstance(data, (torch.Tensor, np.ndarray)):
+        if data.ndim == 0 or data.shape[0] != total:
+            raise ValueError(
+                f'Output of shape {tuple(data.shape)} does not match the batch size {total}'
+            )
+        return [data[offsets[i]:offsets[i + 1]] for i in range(len(sizes))]
+    elif isinstance(data, (tuple, list)):
+        if len(data) > 0 and all(
+                isinstance(v, (torch.Tensor, np.ndarray, Mapping, tuple, list))
+                for v in data):
+            parts = [split_batch(v, sizes) for v in data]
+            return [
+                type(data)(part[i] for part in parts)
+                for i in range(len(sizes))
+            ]
+        if len(data) == total:
+            return [
+                type(data)(data[offsets[i]:offsets[i + 1]])
+                for i in range(len(sizes))
+            ]
+        raise ValueError(
+            f'Output of length {len(data)} does not match the batch size {total}'
+        )
+    elif isinstance(data, (bytes, str, int, float, bool, type(None))):
+        return [data] * len(sizes)
+    raise ValueError(f'Output of type {type(data)} can not be split')
+
+
 def collate_fn(data, device):
     """Prepare the input just before the forward function.
     This method will move the tensors to the right device.
@@ -9,9 +9,13 @@ from modelscope.models.base import Model
 from modelscope.utils.config import ConfigDict, check_config
 from modelscope.utils.constant import DEFAULT_MODEL_REVISION, Tasks
 from modelscope.utils.hub import read_config
+from modelscope.utils.logger import get_logger
 from modelscope.utils.registry import Registry, build_from_cfg
 from .base import Pipeline
-from .util import is_official_hub_path
+from .cache import get_pipeline_cache
+from .util import is_model, is_official_hub_path
+
+logger = get_logger()
 
 PIPELINES = Registry('pipelines')
 
@@ -251,6 +255,8 @@ def pipeline(task: str = None,
              framework: str = None,
              device: str = 'gpu',
              model_revision: Optional[str] = DEFAULT_MODEL_REVISION,
+             use_cache: bool = False,
+             share_model: bool = False,
              **kwargs) -> Pipeline:
     """ Factory method to build an obj:`Pipeline`.
 
@@ -265,6 +271,12 @@ def pipeline(task: str = None,
         model_revision: revision of model(s) if getting from model hub, for multiple models, expecting
         all models to have the same revision
         device (str, optional): whether to use gpu or cpu is used to do inference.
+        use_cache (bool, optional): reuse the pipeline built with the same task, model, revision,
+            device and arguments from the process-wide cache, see `get_pipeline_cache`.
+            Only pipelines built from model ids or model dirs without a preprocessor object are cached.
+        share_model (bool, optional): load the model through the process-wide cache, so that
+            several pipelines built from the same model share one `Model` instance.
+            Ignored with `quantize`, which changes the model in place.
 
     Return:
         pipeline (obj:`Pipeline`): pipeline object for certain task.
@@ -284,7 +296,44 @@ def pipeline(task: str = None,
     if task is None and pipeline_name is None:
         raise ValueError('task or pipeline_name is required')
 
+    if use_cache:
+        if preprocessor is None and (model is None or isinstance(model, str)
+                                     or (isinstance(model, list)
+                                         and isinstance(model[0], str))):
+            # key the model ids by their local dirs, so that a model id and its
+            # local dir share one cached pipeline
+            model = normalize_model_input(
+                list(model) if isinstance(model, list) else model,
+                model_revision)
+            key = get_pipeline_cache().make_key(
+                'pipeline',
+                task,
+                model,
+                model_revision,
+                device,
+                config_file=config_file,
+                pipeline_name=pipeline_name,
+                framework=framework,
+                share_model=share_model,
+                **kwargs)
+            return get_pipeline_cache().get_or_create(
+                key, lambda: pipeline(
+                    task,
+                    model=model,
+                    config_file=config_file,
+                    pipeline_name=pipeline_name,
+                    framework=framework,
+                    device=device,
+                    model_revision=model_revision,
+                    share_model=share_model,
+                    **kwargs))
+        logger.warning('pipelines built from model or preprocessor objects '
+                       'are not cached')
+
     model = normalize_model_input(model, model_revision)
+    if share_model and kwargs.get('quantize') is None \
+            and isinstance(model, str) and is_model(model):
+        model = get_pipeline_cache().get_model(model, model_revision, device)
     if pipeline_name is None:
         # get default pipeline for this task
         if isinstance(model, str) \
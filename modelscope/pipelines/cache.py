@@ -0,0 +1,230 @@
+# Copyright (c) Alibaba, Inc. and its affiliates.
+
+import os.path as osp
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, List, Optional, Union
+
+import json
+
+from modelscope.utils.import_utils import is_torch_available
+from modelscope.utils.logger import get_logger
+
+if is_torch_available():
+    import torch
+
+logger = get_logger()
+
+__all__ = ['PipelineCache', 'get_pipeline_cache']
+
+
+def _module_bytes(module) -> int:
+    """The bytes taken by the parameters and buffers of a torch module.
+    """
+    size = 0
+    for t in list(module.parameters()) + list(module.buffers()):
+        size += t.numel() * t.element_size()
+    return size
+
+
+def _torch_modules(obj) -> List[Any]:
+    """Collect the torch modules held by a `Pipeline` or a `Model`.
+    """
+    if not is_torch_available():
+        return []
+    candidates = getattr(obj, 'models', None) or [obj]
+    modules = []
+    for m in candidates:
+        if isinstance(m, torch.nn.Module):
+            modules.append(m)
+        elif isinstance(getattr(m, 'model', None), torch.nn.Module):
+            modules.append(m.model)
+    return modules
+
+
+class PipelineCache(object):
+    """A process-wide LRU cache of built `Pipeline` and `Model` instances.
+
+    Entries are evicted in least recently used order when the number of entries
+    exceeds `max_entries`, or the bytes of the torch weights held by the cached
+    objects exceed `max_bytes`. Weights shared by several entries, e.g. one
+    `Model` shared by several pipelines, are only counted once.
+
+    Examples:
+        >>> from modelscope.pipelines import pipeline, get_pipeline_cache
+        >>> p1 = pipeline('text-classification', model='damo/nlp_structbert_sentiment-classification_chinese-base',
+        >>>               use_cache=True)
+        >>> p2 = pipeline('text-classification', model='damo/nlp_structbert_sentiment-classification_chinese-base',
+        >>>               use_cache=True)
+        >>> assert p1 is p2
+        >>> print(get_pipeline_cache().stats())
+    """
+
+    def __init__(self,
+                 max_entries: Optional[int] = 16,
+                 max_bytes: Optional[int] = None):
+        """
+        Args:
+            max_entries (int, `optional`): The max number of cached pipelines and models,
+                None means no limit.
+            max_bytes (int, `optional`): The memory budget of the cached weights in bytes,
+                None means no limit.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self._key_locks: Dict[Hashable, Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(kind: str, task: Optional[str], model: Union[str, List[str]],
+                 revision: Optional[str], device: Optional[str],
+                 **kwargs) -> tuple:
+        """Build the cache key of a pipeline or a model.
+
+        Local model dirs are normalized to absolute paths, and the other build
+        arguments are serialized so that different configurations of the same
+        model are cached separately.
+        """
+
+        def _normalize(m):
+            return osp.abspath(m) if osp.exists(m) else m
+
+        if isinstance(model, (list, tuple)):
+            model = tuple(_normalize(m) for m in model)
+        elif isinstance(model, str):
+            model = _normalize(model)
+        extra = json.dumps(kwargs, sort_keys=True, default=repr)
+        return kind, task, model, revision, device, extra
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Get the cached object of the key, or create it by the factory and cache it.
+
+        Concurrent calls with the same key only create the object once, calls with
+        different keys do not block each other.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            key_lock = self._key_locks.setdefault(key, Lock())
+
+        with key_lock:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key]
+                self.misses += 1
+            try:
+                obj = factory()
+            except Exception:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+                raise
+            # cache the object before dropping the key lock, so that a new call
+            # either finds the object or waits on the key lock
+            with self._lock:
+                self._entries[key] = obj
+                self._key_locks.pop(key, None)
+                self._shrink()
+        return obj
+
+    def get_model(self,
+                  model_dir: str,
+                  revision: Optional[str] = None,
+                  device: Optional[str] = None):
+        """Get a shared `Model` instance loaded from the model dir.
+        """
+        from modelscope.models.base import Model
+        key = self.make_key('model', None, model_dir, revision, device)
+        return self.get_or_create(
+            key, lambda: Model.from_pretrained(
+                model_dir, model_prefetched=True, device=device))
+
+    def evict(self, key: Hashable = None, model: str = None) -> int:
+        """Evict cached entries explicitly.
+
+        Args:
+            key: Evict the entry of this key.
+            model (str): Evict all the entries built from this model id or model dir.
+
+        Returns:
+            The number of evicted entries.
+        """
+        if model is not None and osp.exists(model):
+            model = osp.abspath(model)
+        with self._lock:
+            keys = []
+            for k in self._entries:
+                models = k[2] if isinstance(k[2], tuple) else (k[2], )
+                if k == key or (model is not None and model in models):
+                    keys.append(k)
+            for k in keys:
+                del self._entries[k]
+            self.evictions += len(keys)
+        return len(keys)
+
+    def clear(self):
+        """Remove all the cached entries and reset the stats.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> Dict[str, int]:
+        """The hits, misses, evictions, number of entries and bytes of weights of the cache.
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._total_bytes(),
+            }
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _total_bytes(self) -> int:
+        seen = set()
+        total = 0
+        for obj in self._entries.values():
+            for module in _torch_modules(obj):
+                if id(module) not in seen:
+                    seen.add(id(module))
+                    total += _module_bytes(module)
+        return total
+
+    def _over_budget(self) -> bool:
+        if self.max_entries is not None and len(
+                self._entries) > self.max_entries:
+            return True
+        return self.max_bytes is not None and self._total_bytes(
+        ) > self.max_bytes
+
+    def _shrink(self):
+        # the latest entry is kept even if it exceeds the budget alone
+        while len(self._entries) > 1 and self._over_budget():
+            key, _ = self._entries.popitem(last=False)
+            self.evictions += 1
+            logger.info(f'evict {key[0]} {key[2]} from the pipeline cache')
+
+
+_pipeline_cache = PipelineCache()
+
+
+def get_pipeline_cache() -> PipelineCache:
+    """Get the process-wide cache used by `pipeline(use_cache=True)`.
+    """
+    return _pipeline_cache
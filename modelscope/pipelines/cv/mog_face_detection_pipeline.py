@@ -20,16 +20,22 @@ logger = get_logger()
     Tasks.face_detection, module_name=Pipelines.mog_face_detection)
 class MogFaceDetectionPipeline(Pipeline):
 
-    def __init__(self, model: str, **kwargs):
+    def __init__(self, model: str, resolution_buckets=None, **kwargs):
         """
         use `model` to create a face detection pipeline for prediction
         Args:
             model: model id on modelscope hub.
+            resolution_buckets: Pad the images to a few canonical sizes to reuse the
+                cached priors, e.g. 32 or [(480, 640), (720, 1280)], see
+                `modelscope.utils.cv.anchors.bucket_size`.
         """
         super().__init__(model=model, **kwargs)
         ckpt_path = osp.join(model, ModelFile.TORCH_MODEL_FILE)
         logger.info(f'loading model from {ckpt_path}')
-        detector = MogFaceDetector(model_path=ckpt_path, device=self.device)
+        detector = MogFaceDetector(
+            model_path=ckpt_path,
+            device=self.device,
+            resolution_buckets=resolution_buckets)
         self.detector = detector
         logger.info('load model done')
 
@@ -1,23 +1,42 @@
 # Copyright (c) Alibaba, Inc. and its affiliates.
 
-from typing import Any, Dict
+from multiprocessing import Manager
+from typing import Any, Dict, Generator, List
 
 import torch
 
 from modelscope.metainfo import Pipelines
 from modelscope.models.nlp.gpt3.distributed_gpt3 import DistributedGPT3
-from modelscope.pipelines.base import DistributedPipeline
+from modelscope.models.nlp.gpt3.generation_scheduler import GenerationRequest
+from modelscope.outputs import OutputKeys
+from modelscope.pipelines.base import DistributedPipeline, Input
 from modelscope.pipelines.builder import PIPELINES
 from modelscope.preprocessors import TextGenerationJiebaPreprocessor
 from modelscope.utils.constant import Tasks
+from modelscope.utils.nlp.streaming import TokenStreamer, stream_decode
 
 
 @PIPELINES.register_module(
     Tasks.text_generation, module_name=Pipelines.gpt3_generation)
 class DistributedGPT3Pipeline(DistributedPipeline):
     """This class is used to instantiate the gpt3 model.
+
+    A list of inputs with `batch_size` is generated with continuous batching, at
+    most `max_batch_size` prompts are generated together and a finished prompt
+    leaves the batch immediately.
+
+    Examples:
+        >>> pipe = pipeline(Tasks.text_generation, model='damo/nlp_gpt3_text-generation_1.3B')
+        >>> pipe(['今天', '明天'], batch_size=16, max_batch_size=8, top_k=1)
+        >>> # yield the text as it is generated
+        >>> for output in pipe('今天', stream=True):
+        >>>     print(output['text'], end='')
     """
 
+    # the lists of prompts are generated by `_forward_batch`
+    _support_batch = True
+    _sampling_params = ('tokens_to_generate', 'top_k', 'top_p', 'temperature')
+
     model = None
 
     def __init__(self, model, preprocessor=None, **kwargs):
@@ -35,7 +54,105 @@ class DistributedGPT3Pipeline(DistributedPipeline):
     def _forward_one(cls, inputs: Dict[str, Any]) -> Dict[str, Any]:
         tokens = inputs['inputs']['input_ids'].cuda(
             torch.cuda.current_device())
-        return cls.model.generate(tokens)
+        return cls.model.generate(
+            tokens, **cls._generate_params(inputs['forward_params']))
+
+    @classmethod
+    def _generate_params(cls, params: Dict[str, Any]) -> Dict[str, Any]:
+        # max_batch_size only applies to a list of prompts
+        return {k: v for k, v in params.items() if k in cls._sampling_params}
+
+    def stream(self, input: Input,
+               **kwargs) -> Generator[Dict[str, str], None, None]:
+        """Generate the text and yield the new text at each step, so the beginning of
+        the text is available before the generation finishes.
+
+        The first model rank puts the tokens into a queue shared with the main
+        process at each step.
+
+        Args:
+            input: The prompt.
+            kwargs: The sampling params, `tokens_to_generate`, `top_k`, `top_p` and
+                `temperature`.
+
+        Yields:
+            Dict[str, str]: {OutputKeys.TEXT: the new text}, the concatenation of the
+                new text is the text returned by `__call__`.
+        """
+        _, forward_params, unknown_params = self._sanitize_parameters(**kwargs)
+        if unknown_params:
+            raise ValueError(
+                f'unknown parameters {list(unknown_params)} of stream output')
+        self._check_input(input)
+        inputs = self.preprocess(input)
+        if self._auto_collate:
+            inputs = self._collate_fn(inputs)
+        with Manager() as manager:
+            token_queue = manager.Queue()
+            inputs = {
+                'inputs': inputs,
+                'forward_params': forward_params,
+                'token_queue': token_queue
+            }
+            result = self.model_pool.map_async(
+                self.__class__._forward_stream_one, [inputs] * self.world_size)
+            for text in stream_decode(
+                    TokenStreamer(token_queue), self._decode_text):
+                yield {OutputKeys.TEXT: text}
+            # raise the errors of the model ranks
+            result.get()
+
+    @classmethod
+    def _forward_stream_one(cls, inputs: Dict[str, Any]):
+        tokens = inputs['inputs']['input_ids'].cuda(
+            torch.cuda.current_device())
+        # only one rank feeds the stream
+        streamer = TokenStreamer(inputs['token_queue']) \
+            if torch.distributed.get_rank() == 0 else None
+        try:
+            cls.model.generate(
+                tokens,
+                streamer=streamer,
+                **cls._generate_params(inputs['forward_params']))
+        finally:
+            if streamer is not None:
+                streamer.end()
+
+    def _sanitize_parameters(self, **pipeline_parameters):
+        forward_params = {
+            k: pipeline_parameters.pop(k)
+            for k in self._sampling_params + ('max_batch_size', )
+            if k in pipeline_parameters
+        }
+        return {}, forward_params, pipeline_parameters
+
+    def _forward_batch(self, samples: List[Dict[str, Any]],
+                       forward_params: Dict[str, Any]) -> List[Any]:
+        inputs = {
+            'inputs': samples,
+            'forward_params': forward_params,
+        }
+        res = self.model_pool.map(self.__class__._forward_batch_one,
+                                  [inputs] * self.world_size)
+        return res[0]
+
+    @classmethod
+    def _forward_batch_one(cls, inputs: Dict[str, Any]) -> List[Any]:
+        forward_params = dict(inputs['forward_params'])
+        max_batch_size = forward_params.pop('max_batch_size', 8)
+        sampling_params = {
+            'tokens_to_generate': cls.model.config.tokens_to_generate,
+            'top_k': cls.model.config.top_k,
+            'top_p': cls.model.config.top_p,
+            **forward_params
+        }
+        requests = [
+            GenerationRequest(sample['input_ids'][0].tolist(),
+                              **sampling_params) for sample in inputs['inputs']
+        ]
+        requests = cls.model.generate_batch(
+            requests, max_batch_size=max_batch_size)
+        return [torch.tensor([request.tokens]) for request in requests]
 
     def postprocess(self, inputs: Dict[str, Any],
                     **postprocess_params) -> Dict[str, str]:
@@ -47,8 +164,7 @@ class DistributedGPT3Pipeline(DistributedPipeline):
         Returns:
             Dict[str, str]: the prediction results
         """
-        from modelscope.outputs import OutputKeys
-        return {
-            OutputKeys.TEXT:
-            self.preprocessor.tokenizer.detokenize(inputs[0].tolist())
-        }
+        return {OutputKeys.TEXT: self._decode_text(inputs[0].tolist())}
+
+    def _decode_text(self, tokens: List[int]) -> str:
+        return self.preprocessor.tokenizer.detokenize(tokens)
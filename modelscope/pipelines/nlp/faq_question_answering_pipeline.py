@@ -1,6 +1,8 @@
 # Copyright (c) Alibaba, Inc. and its affiliates.
 
-from typing import Any, Dict, Union
+from typing import Any, Dict, List, Union
+
+import torch
 
 from modelscope.metainfo import Pipelines
 from modelscope.models import Model
@@ -9,6 +11,9 @@ from modelscope.pipelines.base import Pipeline
 from modelscope.pipelines.builder import PIPELINES
 from modelscope.preprocessors import Preprocessor
 from modelscope.utils.constant import Tasks
+from modelscope.utils.logger import get_logger
+
+logger = get_logger()
 
 __all__ = ['FaqQuestionAnsweringPipeline']
 
@@ -16,6 +21,22 @@ __all__ = ['FaqQuestionAnsweringPipeline']
 @PIPELINES.register_module(
     Tasks.faq_question_answering, module_name=Pipelines.faq_question_answering)
 class FaqQuestionAnsweringPipeline(Pipeline):
+    """Score the queries against the classes of a support set.
+
+    The support set is either given with each input, or registered once by
+    `register_support_set`, whose prototypes are cached, so the following inputs
+    with `query_set` only encode the queries.
+
+    Examples:
+        >>> pipeline_ins = pipeline(Tasks.faq_question_answering,
+        >>>    model='damo/nlp_structbert_faq-question-answering_chinese-base')
+        >>> pipeline_ins.register_support_set([{'text': '怎么使用优惠券', 'label': '6527856'},
+        >>>    {'text': '购物等级怎么长', 'label': '13421097'}])
+        >>> pipeline_ins.save_support_set('support_set.pt')
+        >>> print(pipeline_ins({'query_set': ['如何使用优惠券']}))
+        >>> # restore the support set without encoding it again
+        >>> pipeline_ins.load_support_set('support_set.pt')
+    """
 
     def __init__(self,
                  model: Union[str, Model],
@@ -27,6 +48,7 @@ class FaqQuestionAnsweringPipeline(Pipeline):
             preprocessor = Preprocessor.from_pretrained(
                 model.model_dir, **kwargs)
         super().__init__(model=model, preprocessor=preprocessor, **kwargs)
+        self.support_set = None
 
     def _sanitize_parameters(self, **pipeline_parameters):
         return pipeline_parameters, pipeline_parameters, pipeline_parameters
@@ -37,8 +59,102 @@ class FaqQuestionAnsweringPipeline(Pipeline):
         sentence_vecs = sentence_vecs.detach().tolist()
         return sentence_vecs
 
+    def register_support_set(self,
+                             support_set: List[Dict[str, str]],
+                             batch_size: int = 32,
+                             **preprocess_params):
+        """Encode a support set and cache its class prototypes, the following inputs
+        without `support_set` are scored against them.
+
+        Args:
+            support_set (List[Dict[str, str]]): The support set, a list of
+                {'text': ..., 'label': ...} like the `support_set` of the input.
+            batch_size (int): The number of the sentences encoded in one forward.
+            preprocess_params: The preprocess params, e.g. `max_seq_length`.
+        """
+        if not self._model_prepare:
+            self.prepare_model()
+        support_set = sorted(support_set, key=lambda d: d['label'])
+        labels = []
+        label_index = {}
+        for item in support_set:
+            if item['label'] not in label_index:
+                label_index[item['label']] = len(labels)
+                labels.append(item['label'])
+        label_ids = [label_index[item['label']] for item in support_set]
+
+        # batch the sentences of similar lengths to reduce the padding
+        order = sorted(
+            range(len(support_set)), key=lambda i: len(support_set[i]['text']))
+        embeddings = [None] * len(support_set)
+        for start in range(0, len(order), batch_size):
+            indices = order[start:start + batch_size]
+            inputs = self.preprocessor(
+                {'query_set': [support_set[i]['text'] for i in indices]},
+                **preprocess_params)
+            input_ids = torch.tensor(inputs['query'], device=self.device)
+            with torch.no_grad():
+                vecs = self.model.forward_sentence_embedding({
+                    'input_ids':
+                    input_ids,
+                    'attention_mask':
+                    torch.ne(input_ids, 0)
+                })
+            for i, vec in zip(indices, vecs):
+                embeddings[i] = vec
+        self._set_support_set(labels, torch.stack(embeddings),
+                              torch.tensor(label_ids, device=self.device))
+        logger.info(f'registered a support set of {len(support_set)} '
+                    f'sentences and {len(labels)} labels')
+
+    def save_support_set(self, path: str):
+        """Save the registered support set, it should be loaded by a pipeline of the
+        same model.
+        """
+        if self.support_set is None:
+            raise ValueError('no support set is registered')
+        torch.save(
+            {
+                'labels': self.support_set['labels'],
+                'embeddings': self.support_set['embeddings'].cpu(),
+                'label_ids': self.support_set['label_ids'].cpu(),
+            }, path)
+
+    def load_support_set(self, path: str):
+        """Load a support set saved by `save_support_set`.
+        """
+        if not self._model_prepare:
+            self.prepare_model()
+        state = torch.load(path, map_location='cpu')
+        self._set_support_set(state['labels'],
+                              state['embeddings'].to(self.device),
+                              state['label_ids'].to(self.device))
+
+    def _set_support_set(self, labels, embeddings, label_ids):
+        with torch.no_grad():
+            prototypes = self.model.compute_prototypes(embeddings, label_ids)
+        self.support_set = {
+            'labels': labels,
+            'embeddings': embeddings,
+            'label_ids': label_ids,
+            'prototypes': prototypes,
+        }
+
+    def preprocess(self, inputs: Dict[str, Any],
+                   **preprocess_params) -> Dict[str, Any]:
+        if 'support_set' not in inputs:
+            if self.support_set is None:
+                raise ValueError(
+                    'the support set should be given in the input or '
+                    'registered by `register_support_set`')
+            self.preprocessor.set_label_dict(self.support_set['labels'])
+        return super().preprocess(inputs, **preprocess_params)
+
     def forward(self, inputs: [list, Dict[str, Any]],
                 **forward_params) -> Dict[str, Any]:
+        if 'support' not in inputs:
+            inputs = dict(
+                inputs, support_prototypes=self.support_set['prototypes'])
         return self.model(inputs)
 
     def postprocess(self, inputs: [list, Dict[str, Any]],
@@ -1,5 +1,5 @@
 # Copyright (c) Alibaba, Inc. and its affiliates.
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, Generator, List, Optional, Union
 
 import torch
 from numpy import isin
@@ -12,6 +12,8 @@ from modelscope.pipelines.builder import PIPELINES
 from modelscope.preprocessors import Text2TextGenerationPreprocessor
 from modelscope.utils.config import use_task_specific_params
 from modelscope.utils.constant import Tasks
+from modelscope.utils.nlp.streaming import (build_streamer_logits_processor,
+                                            stream_generate)
 
 __all__ = ['Text2TextGenerationPipeline']
 
@@ -60,6 +62,9 @@ class Text2TextGenerationPipeline(Pipeline):
             >>> # Or use the dict input:
             >>> print(pipeline_ins({'sentence': sentence1}))
             >>> # 北京
+            >>> # Or yield the text as it is generated:
+            >>> for output in pipeline_ins(sentence1, stream=True):
+            >>>     print(output['text'], end='')
 
             To view other examples plese check the tests/pipelines/test_text_generation.py.
         """
@@ -88,15 +93,64 @@ class Text2TextGenerationPipeline(Pipeline):
 
     def forward(self, inputs: Dict[str, Any],
                 **forward_params) -> Dict[str, Any]:
+        forward_params = self._generation_params(forward_params)
+        with torch.no_grad():
+            output_ids = self.model.generate(**inputs, **forward_params)
+            return {'output_ids': output_ids}
 
+    def stream(self, input: Input,
+               **kwargs) -> Generator[Dict[str, str], None, None]:
+        """Generate the text and yield the new text at each step, so the beginning of
+        the text is available before the generation finishes.
+
+        Args:
+            input: The same with `__call__`.
+            kwargs: The generation params, the same with `__call__`.
+
+        Yields:
+            Dict[str, str]: {OutputKeys.TEXT: the new text}, the concatenation of the
+                new text is the text returned by `__call__`. With beam search
+                (`num_beams` > 1), the best beam is only known at the end, so the text
+                is yielded once the generation finishes.
+        """
+        if not self._model_prepare:
+            self.prepare_model()
+        preprocess_params, forward_params, _ = self._sanitize_parameters(
+            **kwargs)
+        self._check_input(input)
+        inputs = self.preprocess(input, **preprocess_params)
+        if self._auto_collate:
+            inputs = self._collate_fn(inputs)
+        forward_params = self._generation_params(forward_params)
+        num_beams = forward_params.get(
+            'num_beams', getattr(self.model.config, 'num_beams', 1))
+
+        def _generate(streamer):
+            from transformers import LogitsProcessorList
+            logits_processor = LogitsProcessorList(
+                forward_params.pop('logits_processor', None) or [])
+            if num_beams is None or num_beams <= 1:
+                logits_processor.append(
+                    build_streamer_logits_processor(streamer))
+            with torch.no_grad():
+                output_ids = self.model.generate(
+                    **inputs,
+                    logits_processor=logits_processor,
+                    **forward_params)
+            streamer.put(output_ids[0])
+
+        for text in stream_generate(_generate, self._decode_text):
+            yield {OutputKeys.TEXT: text}
+
+    def _generation_params(self, forward_params):
         forward_params['min_length'] = forward_params.get(
             'min_length', self.model.config.min_length)
         forward_params['max_length'] = forward_params.get(
             'max_length', self.model.config.max_length)
+        return forward_params
 
-        with torch.no_grad():
-            output_ids = self.model.generate(**inputs, **forward_params)
-            return {'output_ids': output_ids}
+    def _decode_text(self, output_ids) -> str:
+        return self.tokenizer.decode(output_ids, skip_special_tokens=True)
 
     def postprocess(self, inputs: Dict[str, Tensor],
                     **postprocess_params) -> Dict[str, str]:
@@ -108,8 +162,4 @@ class Text2TextGenerationPipeline(Pipeline):
         Returns:
             Dict[str, str]: the prediction results
         """
-        output = self.tokenizer.decode(
-            inputs['output_ids'][0],
-            skip_special_tokens=True,
-        )
-        return {OutputKeys.TEXT: output}
+        return {OutputKeys.TEXT: self._decode_text(inputs['output_ids'][0])}
@@ -28,6 +28,10 @@ from modelscope.utils.constant import Fields, Tasks
     module_name=Pipelines.sentiment_classification)
 class TextClassificationPipeline(Pipeline):
 
+    # the tokenized inputs are padded and masked by the attention mask
+    _support_batch = True
+    _batch_padding_keys = ('input_ids', 'attention_mask', 'token_type_ids')
+
     def __init__(self,
                  model: Union[Model, str],
                  preprocessor: Preprocessor = None,
@@ -72,6 +76,8 @@ class TextClassificationPipeline(Pipeline):
                     sequence_length=kwargs.pop('sequence_length', 512))
 
         super().__init__(model=model, preprocessor=preprocessor, **kwargs)
+        if self.model.__class__.__name__ == 'OfaForAllTasks':
+            self._support_batch = False
         self.id2label = kwargs.get('id2label')
         if self.id2label is None and hasattr(self.preprocessor, 'id2label'):
             self.id2label = self.preprocessor.id2label
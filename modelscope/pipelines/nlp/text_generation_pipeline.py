@@ -1,18 +1,19 @@
 # Copyright (c) Alibaba, Inc. and its affiliates.
 
-from typing import Any, Dict, Optional, Union
+from typing import Any, Dict, Generator, List, Optional, Union
 
 import torch
 
 from modelscope.metainfo import Pipelines
 from modelscope.models.base import Model
 from modelscope.outputs import OutputKeys
-from modelscope.pipelines.base import Pipeline, Tensor
+from modelscope.pipelines.base import Input, Pipeline, Tensor
 from modelscope.pipelines.builder import PIPELINES
 from modelscope.preprocessors import Preprocessor, build_preprocessor
 from modelscope.utils.chinese_utils import remove_space_between_chinese_chars
 from modelscope.utils.constant import Fields, Tasks
 from modelscope.utils.hub import read_config
+from modelscope.utils.nlp.streaming import stream_generate
 
 __all__ = ['TextGenerationPipeline']
 
@@ -48,6 +49,9 @@ class TextGenerationPipeline(Pipeline):
             >>> print(pipeline_ins(sentence1))
             >>> # Or use the dict input:
             >>> print(pipeline_ins({'sentence': sentence1}))
+            >>> # Or yield the text as it is generated:
+            >>> for output in pipeline_ins(sentence1, stream=True):
+            >>>     print(output['text'], end='')
 
             To view other examples plese check the tests/pipelines/test_text_generation.py.
         """
@@ -79,6 +83,42 @@ class TextGenerationPipeline(Pipeline):
         with torch.no_grad():
             return self.model.generate(inputs, **forward_params)
 
+    def stream(self, input: Input,
+               **kwargs) -> Generator[Dict[str, str], None, None]:
+        """Generate the text and yield the new text at each step, so the beginning of
+        the text is available before the generation finishes.
+
+        Args:
+            input: The same with `__call__`.
+            kwargs: The generation params, the same with `__call__`.
+
+        Yields:
+            Dict[str, str]: {OutputKeys.TEXT: the new text}, the concatenation of the
+                new text is the text returned by `__call__`.
+        """
+        if not self._model_prepare:
+            self.prepare_model()
+        preprocess_params, forward_params, _ = self._sanitize_parameters(
+            **kwargs)
+        self._check_input(input)
+        inputs = self.preprocess(input, **preprocess_params)
+        if self._auto_collate:
+            inputs = self._collate_fn(inputs)
+
+        def _generate(streamer):
+            with torch.no_grad():
+                self.model.generate(
+                    inputs, streamer=streamer, **forward_params)
+
+        for text in stream_generate(_generate, self._decode_text):
+            yield {OutputKeys.TEXT: text}
+
+    def _decode_text(self, inputs: Union[Tensor, List[int]]) -> str:
+        if not isinstance(inputs, torch.Tensor):
+            inputs = torch.tensor(inputs, dtype=torch.long)
+        decoded = getattr(self, self.postprocessor)(inputs)
+        return remove_space_between_chinese_chars(decoded)
+
     def decode(self, inputs) -> str:
         tokenizer = self.preprocessor.tokenizer
         return tokenizer.decode(inputs.tolist(), skip_special_tokens=True)
@@ -106,6 +146,4 @@ class TextGenerationPipeline(Pipeline):
         inputs = inputs['sequences']
         if isinstance(inputs, list) or len(inputs.shape) > 1:
             inputs = inputs[0]
-        decoded = getattr(self, self.postprocessor)(inputs)
-        text = remove_space_between_chinese_chars(decoded)
-        return {OutputKeys.TEXT: text}
+        return {OutputKeys.TEXT: self._decode_text(inputs)}
@@ -1,8 +1,9 @@
 # Copyright (c) Alibaba, Inc. and its affiliates.
 
-from typing import Any, Dict, Optional, Union
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
+import torch
 
 from modelscope.metainfo import Pipelines
 from modelscope.models import Model
@@ -15,9 +16,26 @@ from modelscope.utils.constant import Tasks
 __all__ = ['TextRankingPipeline']
 
 
+def _sigmoid(logits):
+    return np.exp(logits) / (1 + np.exp(logits))
+
+
 @PIPELINES.register_module(
     Tasks.text_ranking, module_name=Pipelines.text_ranking)
 class TextRankingPipeline(Pipeline):
+    """Score the passages against a query with a cross encoder.
+
+    Besides the pipeline call which scores all the passages of an input in one
+    forward, `rerank` ranks many candidate passages of a query in length-sorted
+    batches, optionally after pruning them by a cheaper first stage score.
+
+    Examples:
+        >>> pipeline_ins = pipeline(Tasks.text_ranking, model='damo/nlp_rom_passage-ranking_chinese-base')
+        >>> # the first stage scores, e.g. the dot products of the cached sentence embeddings
+        >>> first_stage_scores = passage_embeddings @ query_embedding
+        >>> pipeline_ins.rerank(query, passages, top_k=10, batch_size=32,
+        >>>    first_stage_scores=first_stage_scores, first_stage_top_m=50)
+    """
 
     def __init__(self,
                  model: Union[Model, str],
@@ -45,6 +63,71 @@ class TextRankingPipeline(Pipeline):
                 **forward_params) -> Dict[str, Any]:
         return self.model(**inputs, **forward_params)
 
+    def rerank(
+            self,
+            query: str,
+            passages: List[str],
+            top_k: Optional[int] = None,
+            batch_size: int = 32,
+            first_stage_scores: Optional[Sequence[float]] = None,
+            first_stage_top_m: Optional[int] = None
+    ) -> List[Tuple[int, float]]:
+        """Rank the passages by the scores of the cross encoder.
+
+        The query-passage pairs are tokenized without padding, sorted by their lengths
+        and scored in batches, each batch is only padded to its longest pair.
+
+        Args:
+            query (str): The query.
+            passages (List[str]): The candidate passages.
+            top_k (int, optional): Return the top k passages only.
+            batch_size (int): The number of the pairs scored in one forward.
+            first_stage_scores (Sequence[float], optional): The cheaper scores of the
+                passages, e.g. from the sentence embeddings. If given with
+                `first_stage_top_m`, only the top m passages of these scores are
+                scored by the cross encoder.
+            first_stage_top_m (int, optional): The number of the passages kept by
+                the first stage.
+
+        Returns:
+            List[Tuple[int, float]]: The indices of the passages and their scores, in
+                the descending order of the scores.
+        """
+        candidates = np.arange(len(passages))
+        if first_stage_scores is not None and first_stage_top_m is not None:
+            first_stage_scores = np.asarray(
+                first_stage_scores, dtype=np.float32).reshape(-1)
+            if first_stage_scores.shape[0] != len(passages):
+                raise ValueError(
+                    f'got {first_stage_scores.shape[0]} first stage scores '
+                    f'for {len(passages)} passages')
+            candidates = np.argsort(
+                -first_stage_scores, kind='stable')[:first_stage_top_m]
+        if len(candidates) == 0:
+            return []
+        if not self._model_prepare:
+            self.prepare_model()
+
+        tokenizer = self.preprocessor.tokenizer
+        features = tokenizer(
+            [query] * len(candidates), [passages[i] for i in candidates],
+            truncation=True,
+            max_length=self.preprocessor.sequence_length)
+        lengths = [len(input_ids) for input_ids in features['input_ids']]
+        order = np.argsort(lengths, kind='stable')
+        scores = np.empty(len(candidates), dtype=np.float32)
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            batch = {k: [v[i] for i in rows] for k, v in features.items()}
+            batch = tokenizer.pad(batch, return_tensors='pt')
+            batch = self._collate_fn(dict(batch))
+            with torch.no_grad():
+                logits = self.model(**batch)[OutputKeys.LOGITS]
+            scores[rows] = _sigmoid(logits.squeeze(-1).float().cpu().numpy())
+
+        ranking = np.argsort(-scores, kind='stable')[:top_k]
+        return [(int(candidates[i]), float(scores[i])) for i in ranking]
+
     def postprocess(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
         """process the prediction results
         Args:
@@ -53,10 +136,6 @@ class TextRankingPipeline(Pipeline):
         Returns:
             Dict[str, Any]: the predicted text representation
         """
-
-        def sigmoid(logits):
-            return np.exp(logits) / (1 + np.exp(logits))
-
         logits = inputs[OutputKeys.LOGITS].squeeze(-1).detach().cpu().numpy()
-        pred_list = sigmoid(logits).tolist()
+        pred_list = _sigmoid(logits).tolist()
         return {OutputKeys.SCORES: pred_list}
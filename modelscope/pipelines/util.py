@@ -4,6 +4,7 @@ from typing import List, Optional, Union
 
 from modelscope.hub.api import HubApi
 from modelscope.hub.file_download import model_file_download
+from modelscope.hub.snapshot_download import get_cached_snapshot
 from modelscope.utils.config import Config
 from modelscope.utils.constant import DEFAULT_MODEL_REVISION, ModelFile
 from modelscope.utils.logger import get_logger
@@ -30,6 +31,9 @@ def is_official_hub_path(path: Union[str, List],
         if osp.exists(path):
             cfg_file = osp.join(path, ModelFile.CONFIGURATION)
             return osp.exists(cfg_file)
+        elif get_cached_snapshot(path, revision) is not None:
+            # downloaded before, no need to ask the hub
+            return True
         else:
             try:
                 _ = HubApi().get_model(path, revision=revision)
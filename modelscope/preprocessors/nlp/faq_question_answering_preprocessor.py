@@ -62,10 +62,16 @@ class FaqQuestionAnsweringPreprocessor(NLPBasePreprocessor):
         queryset = data['query_set']
         if not isinstance(queryset, list):
             queryset = [queryset]
+        queryset_tokenized = [self.encode_plus(text) for text in queryset]
+        if 'support_set' not in data:
+            # the support set is encoded in advance, see
+            # `FaqQuestionAnsweringPipeline.register_support_set`
+            max_len = min(TMP_MAX_LEN,
+                          max([len(seq) for seq in queryset_tokenized]))
+            return {'query': self.pad(queryset_tokenized, max_len)}
         supportset = data['support_set']
         supportset = sorted(supportset, key=lambda d: d['label'])
 
-        queryset_tokenized = [self.encode_plus(text) for text in queryset]
         supportset_tokenized = [
             self.encode_plus(item['text']) for item in supportset
         ]
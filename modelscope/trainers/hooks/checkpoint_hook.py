@@ -7,7 +7,8 @@ import torch
 
 from modelscope import __version__
 from modelscope.metainfo import Hooks
-from modelscope.utils.checkpoint import load_checkpoint, save_checkpoint
+from modelscope.utils.checkpoint import (AsyncCheckpointSaver, load_checkpoint,
+                                         save_checkpoint)
 from modelscope.utils.constant import LogKeys, ModelFile
 from modelscope.utils.logger import get_logger
 from modelscope.utils.torch_utils import get_dist_info, is_master
@@ -28,6 +29,13 @@ class CheckpointHook(Hook):
         save_dir (str): The directory to save checkpoints. If is None, use `trainer.work_dir`
         save_last (bool): Whether to save the last checkpoint. Default: True.
         checkpoint_file (str): The checkpoint file to be loaded.
+        async_save (bool): Write checkpoints in a background thread, the training only
+            waits for the states to be copied to cpu memory. Default: False.
+        max_in_flight (int): The max number of the checkpoints queued or being written
+            when `async_save=True`, each of them holds a cpu copy of the states until it
+            is written. The checkpoints are written one at a time. Default: 1.
+        max_keep (int): The max number of the latest checkpoints to keep, the older ones
+            are removed. None means keeping all the checkpoints. Default: None.
     """
 
     PRIORITY = Priority.LOW
@@ -38,7 +46,10 @@ class CheckpointHook(Hook):
                  save_optimizer=True,
                  save_dir=None,
                  save_last=True,
-                 checkpoint_file=None):
+                 checkpoint_file=None,
+                 async_save=False,
+                 max_in_flight=1,
+                 max_keep=None):
         self.interval = interval
         self.by_epoch = by_epoch
         self.save_optimizer = save_optimizer
@@ -47,6 +58,11 @@ class CheckpointHook(Hook):
         self.save_last = save_last
         self.rng_state = None
         self.need_load_rng_state = False
+        self.async_save = async_save
+        self.max_in_flight = max_in_flight
+        self.max_keep = max_keep
+        self._async_saver = None
+        self._saved_checkpoints = []
 
     def before_run(self, trainer):
         if not self.save_dir:
@@ -69,6 +85,14 @@ class CheckpointHook(Hook):
             self.rng_state = meta.get('rng_state')
             self.need_load_rng_state = True
 
+        if self.async_save and is_master():
+            self._async_saver = AsyncCheckpointSaver(self.max_in_flight)
+
+    def after_run(self, trainer):
+        if self._async_saver is not None:
+            self._async_saver.close()
+            self._async_saver = None
+
     def before_train_iter(self, trainer):
         if self.need_load_rng_state:
             if self.rng_state is not None:
@@ -107,6 +131,9 @@ class CheckpointHook(Hook):
         trainer._epoch = meta.get('epoch', trainer._epoch)
         trainer._iter = meta.get('iter', trainer._iter)
         trainer._inner_iter = meta.get('inner_iter', trainer._inner_iter)
+        sampler = cls._get_sampler(trainer)
+        if sampler is not None and 'sampler' in meta:
+            sampler.load_state_dict(meta['sampler'])
 
         for i, hook in enumerate(trainer.hooks):
             # hook: Hook
@@ -128,6 +155,15 @@ class CheckpointHook(Hook):
             f'Checkpoint {filename} saving time: {meta.get("time")}')
         return meta
 
+    @staticmethod
+    def _get_sampler(trainer):
+        # the sampler which can skip the trained samples when resuming
+        sampler = getattr(
+            getattr(trainer, 'train_dataloader', None), 'sampler', None)
+        resumable = hasattr(sampler, 'state_dict') \
+            and hasattr(sampler, 'load_state_dict')
+        return sampler if resumable else None
+
     def _save_checkpoint(self, trainer):
         if self.by_epoch:
             cur_save_name = os.path.join(
@@ -148,21 +184,45 @@ class CheckpointHook(Hook):
             'inner_iter': trainer.inner_iter + 1,
             'rng_state': self.rng_state,
         }
+        sampler = self._get_sampler(trainer)
+        if sampler is not None:
+            meta['sampler'] = sampler.state_dict()
         for i, hook in enumerate(trainer.hooks):
             if hasattr(hook, 'state_dict'):
                 meta[f'{hook.__class__}-{i}'] = hook.state_dict()
 
-        save_checkpoint(
-            trainer.model,
-            cur_save_name,
-            trainer.optimizer,
-            trainer.lr_scheduler,
-            meta=meta)
+        if self._async_saver is not None:
+            self._async_saver.save(
+                trainer.model,
+                cur_save_name,
+                trainer.optimizer,
+                trainer.lr_scheduler,
+                meta=meta,
+                callback=self._remove_old_checkpoints)
+        else:
+            save_checkpoint(
+                trainer.model,
+                cur_save_name,
+                trainer.optimizer,
+                trainer.lr_scheduler,
+                meta=meta)
+            self._remove_old_checkpoints(cur_save_name)
         if (self.is_last_epoch(trainer)
                 and self.by_epoch) or (self.is_last_iter(trainer)
                                        and not self.by_epoch):
             self._save_pretrained(trainer)
 
+    def _remove_old_checkpoints(self, filename):
+        if filename in self._saved_checkpoints:
+            self._saved_checkpoints.remove(filename)
+        self._saved_checkpoints.append(filename)
+        if self.max_keep is None:
+            return
+        while len(self._saved_checkpoints) > max(self.max_keep, 1):
+            old_filename = self._saved_checkpoints.pop(0)
+            if os.path.isfile(old_filename):
+                os.remove(old_filename)
+
     def _save_pretrained(self, trainer):
         output_dir = os.path.join(self.save_dir, ModelFile.TRAIN_OUTPUT_DIR)
         from modelscope.trainers.parallel.utils import is_parallel
@@ -291,6 +351,9 @@ class BestCkptSaverHook(CheckpointHook):
             'inner_iter': trainer.inner_iter + 1,
             'rng_state': self.rng_state,
         }
+        sampler = self._get_sampler(trainer)
+        if sampler is not None:
+            meta['sampler'] = sampler.state_dict()
         for i, hook in enumerate(trainer.hooks):
             meta[f'{hook.__class__}-{i}'] = hook.state_dict()
 
@@ -315,5 +378,6 @@ class BestCkptSaverHook(CheckpointHook):
             )
 
     def after_run(self, trainer):
+        super().after_run(trainer)
         if self.restore_best:
             self.load_checkpoint(self._best_ckpt_file, trainer)
@@ -12,7 +12,6 @@ from torch import distributed as dist
 from torch import nn
 from torch.utils.data import DataLoader, Dataset
 from torch.utils.data.dataloader import default_collate
-from torch.utils.data.distributed import DistributedSampler
 
 from modelscope.hub.snapshot_download import snapshot_download
 from modelscope.metainfo import Trainers
@@ -45,6 +44,7 @@ from .default_config import merge_cfg
 from .hooks.hook import Hook
 from .parallel.builder import build_parallel
 from .parallel.utils import is_parallel
+from .utils.sampler import ResumableSampler
 
 
 @TRAINERS.register_module(module_name=Trainers.default)
@@ -806,11 +806,19 @@ class EpochBasedTrainer(BaseTrainer):
             batch_size = batch_size_per_gpu
             num_workers = workers_per_gpu
 
-        if dist and not isinstance(dataset, torch.utils.data.IterableDataset):
-            sampler = DistributedSampler(
-                dataset, num_replicas=world_size, rank=rank, shuffle=shuffle)
-        else:
+        if isinstance(dataset, torch.utils.data.IterableDataset):
             sampler = None
+        elif dist:
+            sampler = ResumableSampler(
+                dataset,
+                num_replicas=world_size,
+                rank=rank,
+                shuffle=shuffle,
+                seed=seed or 0)
+        else:
+            # keep the sequential order of the non-distributed training,
+            # the sampler is used to skip the trained samples when resuming
+            sampler = ResumableSampler(dataset, shuffle=False)
 
         batch_sampler = None
 
@@ -843,9 +851,17 @@ class EpochBasedTrainer(BaseTrainer):
         self.invoke_hook(TrainerStages.before_run)
         kwargs = {}
         self.model.train()
+        sampler = getattr(data_loader, 'sampler', None)
         for _ in range(self._epoch, self._max_epochs):
             self.invoke_hook(TrainerStages.before_train_epoch)
-            for i, data_batch in enumerate(data_loader):
+            start = 0
+            if isinstance(sampler, ResumableSampler):
+                sampler.set_epoch(self._epoch)
+                if self.inner_iter > 0 and data_loader.batch_size is not None:
+                    # inner_iter may be read out from the checkpoint file, skip the trained samples in the sampler
+                    start = self.inner_iter
+                    sampler.set_start_index(start * data_loader.batch_size)
+            for i, data_batch in enumerate(data_loader, start):
                 if i < self.inner_iter:
                     # inner_iter may be read out from the checkpoint file, so skip the trained iters in the epoch.
                     continue
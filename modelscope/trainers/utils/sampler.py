@@ -0,0 +1,62 @@
+# Copyright (c) Alibaba, Inc. and its affiliates.
+
+from typing import Optional
+
+from torch.utils.data import Dataset
+from torch.utils.data.distributed import DistributedSampler
+
+
+class ResumableSampler(DistributedSampler):
+    """A `DistributedSampler` which can start from the middle of an epoch.
+
+    The order of the samples only depends on the seed and the epoch, so a resumed
+    training skips the trained samples by `set_start_index` directly, instead of
+    loading and dropping the trained batches from the data loader.
+
+    Args:
+        dataset (Dataset): The dataset to sample.
+        num_replicas (int): The number of processes in the distributed training, 1 for
+            non-distributed training.
+        rank (int): The rank of the current process.
+        shuffle (bool): Whether to shuffle the indices.
+        seed (int): The random seed of the shuffle, the order of an epoch is decided
+            by `seed + epoch`.
+        drop_last (bool): Whether to drop the tail of the data to make it evenly
+            divisible across the replicas.
+    """
+
+    def __init__(self,
+                 dataset: Dataset,
+                 num_replicas: Optional[int] = 1,
+                 rank: Optional[int] = 0,
+                 shuffle: bool = True,
+                 seed: int = 0,
+                 drop_last: bool = False):
+        super().__init__(
+            dataset,
+            num_replicas=num_replicas,
+            rank=rank,
+            shuffle=shuffle,
+            seed=seed,
+            drop_last=drop_last)
+        self.start_index = 0
+
+    def set_start_index(self, start_index: int):
+        """Skip the first `start_index` samples of the next iteration.
+
+        Only the next iteration is affected, the following epochs start from the
+        beginning again.
+        """
+        self.start_index = start_index
+
+    def __iter__(self):
+        indices = list(super().__iter__())
+        start_index, self.start_index = self.start_index, 0
+        return iter(indices[start_index:])
+
+    def state_dict(self):
+        return {'seed': self.seed, 'epoch': self.epoch}
+
+    def load_state_dict(self, state_dict):
+        self.seed = state_dict.get('seed', self.seed)
+        self.epoch = state_dict.get('epoch', self.epoch)
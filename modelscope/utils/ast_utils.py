@@ -4,16 +4,19 @@ import ast
 import contextlib
 import hashlib
 import importlib
+import multiprocessing
 import os
 import os.path as osp
+import pickle
 import time
 import traceback
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
 from functools import reduce
 from pathlib import Path
 from typing import Generator, Union
 
 import gast
-import json
 
 from modelscope import __version__
 from modelscope.fileio.file import LocalStorage
@@ -36,7 +39,8 @@ IGNORED_PACKAGES = ['modelscope', '.']
 SCAN_SUB_FOLDERS = [
     'models', 'metrics', 'pipelines', 'preprocessors', 'trainers', 'msdatasets'
 ]
-INDEXER_FILE = 'ast_indexer'
+# pickled, the json index of the older versions is kept under 'ast_indexer'
+INDEXER_FILE = 'ast_indexer.pkl'
 DECORATOR_KEY = 'decorators'
 EXPRESS_KEY = 'express'
 FROM_IMPORT_KEY = 'from_imports'
@@ -46,8 +50,22 @@ VERSION_KEY = 'version'
 MD5_KEY = 'md5'
 INDEX_KEY = 'index'
 REQUIREMENT_KEY = 'requirements'
+FILES_KEY = 'files'
+BUILD_HASH_KEY = 'build_hash'
+MTIME_KEY = 'mtime'
+SIZE_KEY = 'size'
 MODULE_KEY = 'module'
 CLASS_NAME = 'class_name'
+# the index shipped in the package, trusted without checking the source files
+PREBUILT_INDEX_FILE = osp.join(str(MODELSCOPE_PATH), INDEXER_FILE)
+TRUST_PREBUILT_INDEX = os.environ.get('MODELSCOPE_TRUST_PREBUILT_INDEX',
+                                      'true').lower() in ('true', '1')
+# scan the changed files with a process pool if there are more of them than this
+PARALLEL_SCAN_THRESHOLD = 64
+# the number of processes to scan the files when importing modelscope, the pool
+# forks the importing process which may have started threads already, so the
+# files are scaned serially unless it is set explicitly
+AST_SCAN_WORKERS = int(os.environ.get('MODELSCOPE_AST_SCAN_WORKERS', 1))
 GROUP_KEY = 'group_key'
 MODULE_NAME = 'module_name'
 MODULE_CLS = 'module_cls'
@@ -533,9 +551,37 @@ class FilesAstScaning(object):
             del inverted_index[('LR_SCHEDULER', 'default', 'name')]
         return inverted_index
 
+    def _files_stat(self, target_dir, target_folders):
+        self.traversal_files(target_dir, target_folders)
+        files_stat = dict()
+        for file in self.file_dirs:
+            stat = os.stat(file)
+            files_stat[file] = (stat.st_mtime, stat.st_size)
+        return files_stat
+
+    def _scan_files(self, files, num_workers=None):
+        if num_workers is None:
+            num_workers = AST_SCAN_WORKERS
+        # only fork is safe here, a spawned worker would re-import modelscope and
+        # build the index again while the index is being built
+        if (num_workers > 1 and len(files) > PARALLEL_SCAN_THRESHOLD
+                and 'fork' in multiprocessing.get_all_start_methods()):
+            with ProcessPoolExecutor(
+                    num_workers,
+                    mp_context=multiprocessing.get_context('fork')) as pool:
+                return list(
+                    pool.map(
+                        _scan_single_file,
+                        files,
+                        chunksize=max(1,
+                                      len(files) // (num_workers * 4))))
+        return [self._get_single_file_scan_result(file) for file in files]
+
     def get_files_scan_results(self,
                                target_dir=MODELSCOPE_PATH,
-                               target_folders=SCAN_SUB_FOLDERS):
+                               target_folders=SCAN_SUB_FOLDERS,
+                               cached_files=None,
+                               num_workers=None):
         """the entry method of the ast scan method
 
         Args:
@@ -543,41 +589,65 @@ class FilesAstScaning(object):
             target_folder (list, optional): the list of
             sub-folders to be scaned in the target folder.
             Defaults to SCAN_SUB_FOLDERS.
+            cached_files (dict, optional): the per-file scan results of a previous index,
+            only the files whose mtime or size changed are scaned again.
+            num_workers (int, optional): the number of forked processes to scan the files,
+            defaults to the environment variable MODELSCOPE_AST_SCAN_WORKERS or 1.
 
         Returns:
             dict: indexer of registry
         """
 
-        self.traversal_files(target_dir, target_folders)
+        files_stat = self._files_stat(target_dir, target_folders)
         start = time.time()
+        cached_files = cached_files or dict()
+        changed_files = [
+            file for file, stat in files_stat.items()
+            if file not in cached_files or stat != (
+                cached_files[file][MTIME_KEY], cached_files[file][SIZE_KEY])
+        ]
         logger.info(
-            f'AST-Scaning the path "{target_dir}" with the following sub folders {target_folders}'
-        )
+            f'AST-Scaning the path "{target_dir}" with the following sub folders {target_folders}, '
+            f'{len(changed_files)} of {len(files_stat)} files changed')
 
+        scanned = dict(
+            zip(changed_files, self._scan_files(changed_files, num_workers)))
         result = dict()
-        for file in self.file_dirs:
-            filepath = file[file.rfind('modelscope'):]
-            module_name = filepath.replace(osp.sep, '.').replace('.py', '')
-            decorator_list, import_list = self._get_single_file_scan_result(
-                file)
-            result[file] = {
-                DECORATOR_KEY: decorator_list,
-                IMPORT_KEY: import_list,
-                MODULE_KEY: module_name
-            }
+        for file, (mtime, size) in files_stat.items():
+            if file in scanned:
+                filepath = file[file.rfind('modelscope'):]
+                module_name = filepath.replace(osp.sep, '.').replace('.py', '')
+                decorator_list, import_list = scanned[file]
+                result[file] = {
+                    DECORATOR_KEY: decorator_list,
+                    IMPORT_KEY: import_list,
+                    MODULE_KEY: module_name,
+                    MTIME_KEY: mtime,
+                    SIZE_KEY: size,
+                }
+            else:
+                result[file] = cached_files[file]
         inverted_index_with_results = self._inverted_index(result)
         inverted_index_with_results = self._ignore_useless_keys(
             inverted_index_with_results)
         module_import = self._module_import(result)
         index = {
             INDEX_KEY: inverted_index_with_results,
-            REQUIREMENT_KEY: module_import
+            REQUIREMENT_KEY: module_import,
+            FILES_KEY: result,
+            VERSION_KEY: __version__,
+            MD5_KEY: self._stat_md5(files_stat),
         }
         logger.info(
             f'Scaning done! A number of {len(inverted_index_with_results)}'
             f' files indexed! Time consumed {time.time()-start}s')
         return index
 
+    @staticmethod
+    def _stat_md5(files_stat):
+        md5 = hashlib.md5(repr(sorted(files_stat.items())).encode())
+        return md5.hexdigest()
+
     def files_mtime_md5(self,
                         target_path=MODELSCOPE_PATH,
                         target_subfolder=SCAN_SUB_FOLDERS):
@@ -594,38 +664,111 @@ class FilesAstScaning(object):
 file_scanner = FilesAstScaning()
 
 
+def _scan_single_file(file):
+    return file_scanner._get_single_file_scan_result(file)
+
+
+class _LazyDict(Mapping):
+    """A dict unpickled on the first access.
+    """
+
+    def __init__(self, data: bytes):
+        self._data = data
+        self._dict = None
+
+    def _get(self):
+        if self._dict is None:
+            self._dict = pickle.loads(self._data)
+            self._data = None
+        return self._dict
+
+    def __getitem__(self, key):
+        return self._get()[key]
+
+    def __contains__(self, key):
+        return key in self._get()
+
+    def __iter__(self):
+        return iter(self._get())
+
+    def __len__(self):
+        return len(self._get())
+
+
+def _build_hash(wrapped_index):
+    md5 = hashlib.md5(wrapped_index[VERSION_KEY].encode())
+    md5.update(wrapped_index[INDEX_KEY])
+    md5.update(wrapped_index[REQUIREMENT_KEY])
+    return md5.hexdigest()
+
+
 def _save_index(index, file_path):
-    # convert tuple key to str key
-    index[INDEX_KEY] = {str(k): v for k, v in index[INDEX_KEY].items()}
-    index[VERSION_KEY] = __version__
-    index[MD5_KEY] = file_scanner.files_mtime_md5()
-    json_index = json.dumps(index)
-    storage.write(json_index.encode(), file_path)
-    index[INDEX_KEY] = {
-        ast.literal_eval(k): v
-        for k, v in index[INDEX_KEY].items()
+    # pickle keeps the tuple keys, and is much faster to load than json,
+    # the requirements and files are pickled separately to be loaded lazily
+    wrapped_index = {
+        VERSION_KEY: index[VERSION_KEY],
+        MD5_KEY: index[MD5_KEY],
     }
+    for key in (INDEX_KEY, REQUIREMENT_KEY, FILES_KEY):
+        if key in index:
+            wrapped_index[key] = pickle.dumps(
+                dict(index[key]), protocol=pickle.HIGHEST_PROTOCOL)
+    wrapped_index[BUILD_HASH_KEY] = _build_hash(wrapped_index)
+    storage.write(
+        pickle.dumps(wrapped_index, protocol=pickle.HIGHEST_PROTOCOL),
+        file_path)
 
 
 def _load_index(file_path):
-    bytes_index = storage.read(file_path)
-    wrapped_index = json.loads(bytes_index)
-    # convert str key to tuple key
-    wrapped_index[INDEX_KEY] = {
-        ast.literal_eval(k): v
-        for k, v in wrapped_index[INDEX_KEY].items()
-    }
+    try:
+        wrapped_index = pickle.loads(storage.read(file_path))
+        if wrapped_index[BUILD_HASH_KEY] != _build_hash(wrapped_index):
+            raise ValueError('build hash mismatch')
+    except Exception as e:
+        # e.g. a corrupted or truncated index file
+        logger.info(f'Failed to load ast index from {file_path}: {e}')
+        return None
+    wrapped_index[INDEX_KEY] = pickle.loads(wrapped_index[INDEX_KEY])
+    for key in (REQUIREMENT_KEY, FILES_KEY):
+        if key in wrapped_index:
+            wrapped_index[key] = _LazyDict(wrapped_index[key])
     return wrapped_index
 
 
+def generate_prebuilt_index(target_dir=MODELSCOPE_PATH):
+    """Generate the index shipped in the package, e.g. when building the wheel.
+
+    The prebuilt index is only validated by the version and its build hash, so the
+    source files are never scaned or stat-ed when importing modelscope. Set the
+    environment variable MODELSCOPE_TRUST_PREBUILT_INDEX to false to ignore it.
+
+    Args:
+        target_dir (str, optional): the path of the package 'modelscope' to be scaned.
+
+    Returns:
+        str: the path of the prebuilt index file.
+    """
+    # a build step in its own process, forking it for the scan is safe
+    index = FilesAstScaning().get_files_scan_results(
+        target_dir=target_dir, num_workers=min(os.cpu_count() or 1, 8))
+    # the file paths are meaningless after the package is installed
+    del index[FILES_KEY]
+    file_path = osp.join(str(target_dir), INDEXER_FILE)
+    _save_index(index, file_path)
+    return file_path
+
+
 def load_index(force_rebuild=False):
     """get the index from scan results or cache
 
+    A prebuilt index shipped in the package is used without checking the source
+    files if its version matches, see `generate_prebuilt_index`.
+
     Args:
         force_rebuild: If set true, rebuild and load index
     Returns:
         dict: the index information for all registred modules, including key:
-        index, requirments, version and md5, the detail is shown below example:
+        index, requirments, files, version and md5, the detail is shown below example:
         {
             'index': {
                 ('MODELS', 'nlp', 'bert'):{
@@ -638,21 +781,48 @@ def load_index(force_rebuild=False):
                 'modelscope.models.nlp.bert': ['os', 'torch', 'typeing'],
                 'modelscope.models.nlp.structbert': ['os', 'torch', 'typeing'],
                 ...
+            }, 'files': {
+                'path/to/the/registered/model.py': {
+                    'decorators': [('MODELS', 'nlp', 'bert')], 'imports':
+                    ['os', 'torch', 'typeing'], 'module':
+                    'modelscope.models.nlp.bert', 'mtime': 1666000000.0,
+                    'size': 1024
+                },
+                ...
             }, 'version': '0.2.3', 'md5': '8616924970fe6bc119d1562832625612',
+            'build_hash': '6c2f4be1b0a5a2c3e1c9d4d2f0c9a8b7',
         }
     """
+    if (not force_rebuild and TRUST_PREBUILT_INDEX
+            and os.path.exists(PREBUILT_INDEX_FILE)):
+        index = _load_index(PREBUILT_INDEX_FILE)
+        if index is not None and index[VERSION_KEY] == __version__:
+            logger.info(
+                f'Loading prebuilt ast index from {PREBUILT_INDEX_FILE}')
+            return index
+
     cache_dir = os.getenv('MODELSCOPE_CACHE', get_default_cache_dir())
     file_path = os.path.join(cache_dir, INDEXER_FILE)
     logger.info(f'Loading ast index from {file_path}')
-    index = None
+    wrapped_index = None
     if not force_rebuild and os.path.exists(file_path):
         wrapped_index = _load_index(file_path)
-        md5 = file_scanner.files_mtime_md5()
-        if (wrapped_index[VERSION_KEY] == __version__
-                and wrapped_index[MD5_KEY] == md5):
+        if wrapped_index is not None:
+            if wrapped_index.get(VERSION_KEY) != __version__ \
+                    or FILES_KEY not in wrapped_index:
+                wrapped_index = None
+
+    if wrapped_index is not None:
+        md5 = FilesAstScaning._stat_md5(
+            file_scanner._files_stat(MODELSCOPE_PATH, SCAN_SUB_FOLDERS))
+        if wrapped_index[MD5_KEY] == md5:
             index = wrapped_index
-
-    if index is None:
+        else:
+            logger.info('Some files changed, updating ast index')
+            index = file_scanner.get_files_scan_results(
+                cached_files=wrapped_index[FILES_KEY])
+            _save_index(index, file_path)
+    else:
         if force_rebuild:
             logger.info('Force rebuilding ast index')
         else:
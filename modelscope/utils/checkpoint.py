@@ -1,9 +1,12 @@
 # Copyright (c) Alibaba, Inc. and its affiliates.
 
+import copy
 import io
 import os
+import threading
 import time
 from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from shutil import copytree, ignore_patterns, rmtree
 from typing import Callable, List, Optional, Union
 
@@ -40,25 +43,36 @@ def weights_to_cpu(state_dict):
     return state_dict_cpu
 
 
-def save_checkpoint(model: torch.nn.Module,
-                    filename: str,
-                    optimizer: Optional[Optimizer] = None,
-                    lr_scheduler: Optional[_LRScheduler] = None,
-                    meta: Optional[dict] = None,
-                    with_meta: bool = True) -> None:
-    """Save checkpoint to file.
-
-    The checkpoint will have 3 fields: ``meta``, ``state_dict`` and
-    ``optimizer``. By default, ``meta`` will contain version and time info.
+def _snapshot_to_cpu(obj, pin_memory=False):
+    """Copy all the tensors in a (nested) state dict to cpu memory.
 
-    Args:
-        model (Module): Module whose params are to be saved.
-        filename (str): Checkpoint filename.
-        optimizer (:obj:`Optimizer`, optional): Optimizer to be saved.
-        lr_scheduler(:obj:`_LRScheduler`, optional): LRScheduler to be saved.
-        meta (dict, optional): Metadata to be saved in checkpoint.
-        with_meta (bool, optional):
+    Unlike `weights_to_cpu`, cpu tensors are copied too, so the snapshot is not
+    changed by the following training steps.
     """
+    if isinstance(obj, torch.Tensor):
+        if pin_memory and obj.is_cuda:
+            cpu_tensor = torch.empty(
+                obj.size(), dtype=obj.dtype, pin_memory=True)
+            return cpu_tensor.copy_(obj.detach(), non_blocking=True)
+        return obj.detach().to('cpu', copy=True)
+    if isinstance(obj, dict):
+        snapshot = obj.__class__()
+        for key, val in obj.items():
+            snapshot[key] = _snapshot_to_cpu(val, pin_memory)
+        if hasattr(obj, '_metadata'):
+            snapshot._metadata = copy.deepcopy(obj._metadata)
+        return snapshot
+    if isinstance(obj, (list, tuple)):
+        return obj.__class__(_snapshot_to_cpu(val, pin_memory) for val in obj)
+    return copy.deepcopy(obj)
+
+
+def _build_checkpoint(model: torch.nn.Module,
+                      optimizer: Optional[Optimizer] = None,
+                      lr_scheduler: Optional[_LRScheduler] = None,
+                      meta: Optional[dict] = None,
+                      with_meta: bool = True,
+                      to_cpu: Callable = weights_to_cpu) -> dict:
     if meta is None:
         meta = {}
     elif not isinstance(meta, dict):
@@ -73,10 +87,7 @@ def save_checkpoint(model: torch.nn.Module,
         meta.update(CLASSES=model.CLASSES)
 
     if with_meta:
-        checkpoint = {
-            'meta': meta,
-            'state_dict': weights_to_cpu(model.state_dict())
-        }
+        checkpoint = {'meta': meta, 'state_dict': to_cpu(model.state_dict())}
 
         # save optimizer state dict in the checkpoint
         if isinstance(optimizer, Optimizer):
@@ -90,11 +101,124 @@ def save_checkpoint(model: torch.nn.Module,
         if lr_scheduler is not None and hasattr(lr_scheduler, 'state_dict'):
             checkpoint['lr_scheduler'] = lr_scheduler.state_dict()
     else:
-        checkpoint = weights_to_cpu(model.state_dict())
+        checkpoint = to_cpu(model.state_dict())
+    return checkpoint
+
 
+def _write_checkpoint(checkpoint, filename: str) -> None:
+    # write to a temp file and rename, so the file is never seen half written
+    tmp_filename = f'{filename}.tmp'
     with io.BytesIO() as f:
         torch.save(checkpoint, f)
-        File.write(f.getvalue(), filename)
+        File.write(f.getvalue(), tmp_filename)
+    os.replace(tmp_filename, filename)
+
+
+def save_checkpoint(model: torch.nn.Module,
+                    filename: str,
+                    optimizer: Optional[Optimizer] = None,
+                    lr_scheduler: Optional[_LRScheduler] = None,
+                    meta: Optional[dict] = None,
+                    with_meta: bool = True) -> None:
+    """Save checkpoint to file.
+
+    The checkpoint will have 3 fields: ``meta``, ``state_dict`` and
+    ``optimizer``. By default, ``meta`` will contain version and time info.
+
+    Args:
+        model (Module): Module whose params are to be saved.
+        filename (str): Checkpoint filename.
+        optimizer (:obj:`Optimizer`, optional): Optimizer to be saved.
+        lr_scheduler(:obj:`_LRScheduler`, optional): LRScheduler to be saved.
+        meta (dict, optional): Metadata to be saved in checkpoint.
+        with_meta (bool, optional):
+    """
+    checkpoint = _build_checkpoint(model, optimizer, lr_scheduler, meta,
+                                   with_meta)
+    _write_checkpoint(checkpoint, filename)
+
+
+class AsyncCheckpointSaver(object):
+    """Save checkpoints in a background thread.
+
+    The states are copied to cpu memory on the calling thread, so the training can
+    continue while the checkpoint is serialized and written. The checkpoints are
+    written one by one by a single thread in the order of the saves, so the
+    callbacks (e.g. the removal of the old checkpoints) also run in order. The number
+    of the in-flight saves is bounded by `max_in_flight`, a new save waits for the
+    oldest one to finish when the limit is reached.
+
+    Args:
+        max_in_flight (int): The max number of the saves queued or being written. Each
+            of them holds a cpu copy of the states until it is written, so the cpu
+            memory of the copies grows with this number, while the writing is not
+            faster. A value above 1 only helps when the saves come in bursts.
+        pin_memory (bool): Copy the cuda tensors to pinned cpu memory asynchronously.
+    """
+
+    def __init__(self, max_in_flight: int = 1, pin_memory: bool = True):
+        self.max_in_flight = max(1, max_in_flight)
+        self.pin_memory = pin_memory and torch.cuda.is_available()
+        self._executor = ThreadPoolExecutor(
+            1, thread_name_prefix='checkpoint')
+        self._futures: List[Future] = []
+        self._lock = threading.Lock()
+
+    def save(self,
+             model: torch.nn.Module,
+             filename: str,
+             optimizer: Optional[Optimizer] = None,
+             lr_scheduler: Optional[_LRScheduler] = None,
+             meta: Optional[dict] = None,
+             with_meta: bool = True,
+             callback: Optional[Callable[[str], None]] = None) -> Future:
+        """Save a checkpoint asynchronously, the arguments are the same with `save_checkpoint`.
+
+        Args:
+            callback (Callable, optional): Called with the filename in the background
+                thread after the checkpoint is written.
+
+        Returns:
+            The future of the save.
+        """
+        with self._lock:
+            while len(self._futures) >= self.max_in_flight:
+                self._futures.pop(0).result()
+
+        def to_cpu(state_dict):
+            return _snapshot_to_cpu(state_dict, self.pin_memory)
+
+        checkpoint = _build_checkpoint(model, optimizer, lr_scheduler, meta,
+                                       with_meta, to_cpu)
+        if with_meta:
+            checkpoint = {
+                key: val if key == 'state_dict' else to_cpu(val)
+                for key, val in checkpoint.items()
+            }
+        if self.pin_memory:
+            torch.cuda.synchronize()
+
+        def _write():
+            _write_checkpoint(checkpoint, filename)
+            if callback is not None:
+                callback(filename)
+
+        future = self._executor.submit(_write)
+        with self._lock:
+            self._futures.append(future)
+        return future
+
+    def wait(self) -> None:
+        """Wait for all the in-flight saves, the errors of the saves are raised here.
+        """
+        with self._lock:
+            futures, self._futures = self._futures, []
+        for future in futures:
+            future.result()
+
+    def close(self) -> None:
+        self.wait()
+        self._executor.shutdown()
 
 
 def load_checkpoint(filename,
@@ -329,6 +329,15 @@ class Frameworks(object):
     kaldi = 'kaldi'
 
 
+class Backends(object):
+    """ Inference backends of torch models, the models are exported to onnx or
+    torch script files to run with the backends other than torch.
+    """
+    torch = 'torch'
+    onnxruntime = 'onnxruntime'
+    torchscript = 'torchscript'
+
+
 DEFAULT_MODEL_REVISION = None
 MASTER_MODEL_BRANCH = 'master'
 DEFAULT_REPOSITORY_REVISION = 'master'
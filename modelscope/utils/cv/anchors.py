@@ -0,0 +1,152 @@
+# Copyright (c) Alibaba, Inc. and its affiliates.
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from math import ceil
+from typing import Any, Callable, Hashable, Sequence, Tuple, Union
+
+import torch
+import torch.nn.functional as F
+
+Buckets = Union[int, Sequence[Tuple[int, int]]]
+
+
+def _freeze(obj) -> Hashable:
+    """Convert the (nested) dicts and lists of a config to a hashable key."""
+    if isinstance(obj, Mapping):
+        return tuple(sorted((k, _freeze(v)) for k, v in obj.items()))
+    if isinstance(obj, (list, tuple)):
+        return tuple(_freeze(v) for v in obj)
+    if isinstance(obj, torch.Tensor):
+        return tuple(obj.tolist())
+    return obj
+
+
+class AnchorCache(object):
+    """A bounded LRU cache of the priors (anchors) of the detectors.
+
+    The priors of a detector only depend on its config, the input resolution and
+    the device, but most of the detectors generate them again for every image. The
+    cache keeps the most recently used `maxsize` of them. The cached values are shared
+    by the callers, so they must not be modified in place.
+
+    Args:
+        maxsize (int): The max number of the cached priors.
+    """
+
+    def __init__(self, maxsize: int = 32):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, generate: Callable[[], Any]) -> Any:
+        """Get the value of the key, or generate and cache it on a miss."""
+        with self._lock:
+            if key in self._cache:
+                self.hits += 1
+                self._cache.move_to_end(key)
+                return self._cache[key]
+            self.misses += 1
+        value = generate()
+        with self._lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._cache)
+
+
+anchor_cache = AnchorCache()
+
+
+def cached_anchors(generate: Callable[[], Any],
+                   config: Any,
+                   height: int,
+                   width: int,
+                   device=None,
+                   cache: AnchorCache = None) -> Any:
+    """Get the priors of a detector from the cache, keyed by (config, height, width,
+    device).
+
+    Args:
+        generate: Generate the priors on a miss, the tensors in the returned value are
+            moved to `device`.
+        config: The config of the priors, any (nested) dicts, lists and hashable values.
+        height (int): The height of the input.
+        width (int): The width of the input.
+        device: The device of the priors, None to keep them where they are generated.
+        cache (AnchorCache, optional): The cache, default to the shared `anchor_cache`.
+
+    Returns:
+        The cached priors, which must not be modified in place.
+    """
+    cache = cache if cache is not None else anchor_cache
+    device_key = str(torch.device(device)) if device is not None else None
+    key = (_freeze(config), int(height), int(width), device_key)
+
+    def _generate():
+        anchors = generate()
+        if device is None:
+            return anchors
+        if isinstance(anchors, (list, tuple)):
+            return type(anchors)(anchor.to(device) for anchor in anchors)
+        return anchors.to(device)
+
+    return cache.get(key, _generate)
+
+
+def bucket_size(height: int, width: int, buckets: Buckets) -> Tuple[int, int]:
+    """The canonical size to pad an input of (height, width) to.
+
+    Args:
+        height (int): The height of the input.
+        width (int): The width of the input.
+        buckets: Either an int, to round both sides up to its multiples, or a list of
+            (height, width) sizes, to take the smallest one which holds the input.
+            The input larger than all the sizes is rounded up to the multiples of 32.
+
+    Returns:
+        The (height, width) of the bucket.
+    """
+    if isinstance(buckets, int):
+        return ceil(height / buckets) * buckets, ceil(
+            width / buckets) * buckets
+    fitted = [(h, w) for h, w in buckets if h >= height and w >= width]
+    if len(fitted) == 0:
+        return bucket_size(height, width, 32)
+    return min(fitted, key=lambda size: size[0] * size[1])
+
+
+def pad_to_bucket(img: torch.Tensor,
+                  buckets: Buckets,
+                  value: float = 0.) -> torch.Tensor:
+    """Pad the right and the bottom of an image to its bucket size, see `bucket_size`.
+
+    Padding keeps the coordinates of the image, and the inputs of a few sizes hit the
+    cached priors of the detector instead of generating new ones.
+
+    Args:
+        img (torch.Tensor): The image of shape (..., H, W).
+        buckets: The buckets, see `bucket_size`.
+        value (float): The padding value.
+
+    Returns:
+        The padded image of shape (..., bucket height, bucket width).
+    """
+    height, width = img.shape[-2:]
+    bucket_height, bucket_width = bucket_size(height, width, buckets)
+    if (bucket_height, bucket_width) == (height, width):
+        return img
+    return F.pad(
+        img, (0, bucket_width - width, 0, bucket_height - height), value=value)
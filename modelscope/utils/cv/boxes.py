@@ -0,0 +1,334 @@
+# Copyright (c) Alibaba, Inc. and its affiliates.
+import importlib
+from typing import Sequence, Tuple, Union
+
+import numpy as np
+import torch
+
+Boxes = Union[np.ndarray, torch.Tensor]
+
+_torchvision_available = importlib.util.find_spec('torchvision') is not None
+
+# the number of candidates resolved together by the numpy nms
+NMS_BLOCK_SIZE = 256
+
+
+def _is_tensor(boxes) -> bool:
+    return isinstance(boxes, torch.Tensor)
+
+
+def center_to_corner(boxes: Boxes) -> Boxes:
+    """Convert the boxes from (cx, cy, w, h) to (x1, y1, x2, y2)."""
+    cat = torch.cat if _is_tensor(boxes) else np.concatenate
+    return cat((boxes[..., :2] - boxes[..., 2:] / 2,
+                boxes[..., :2] + boxes[..., 2:] / 2), -1)
+
+
+def corner_to_center(boxes: Boxes) -> Boxes:
+    """Convert the boxes from (x1, y1, x2, y2) to (cx, cy, w, h)."""
+    cat = torch.cat if _is_tensor(boxes) else np.concatenate
+    return cat(((boxes[..., :2] + boxes[..., 2:]) / 2,
+                boxes[..., 2:] - boxes[..., :2]), -1)
+
+
+def box_area(boxes: Boxes, offset: float = 0) -> Boxes:
+    """The areas of the boxes in (x1, y1, x2, y2).
+
+    Args:
+        boxes: The boxes of shape (..., 4).
+        offset: 1 for the legacy pixel convention, in which a box covers
+            `x2 - x1 + 1` pixels, or 0.
+
+    Returns:
+        The areas of shape (...).
+    """
+    return (boxes[..., 2] - boxes[..., 0] + offset) \
+        * (boxes[..., 3] - boxes[..., 1] + offset)
+
+
+def box_iou(boxes1: Boxes,
+            boxes2: Boxes,
+            offset: float = 0,
+            mode: str = 'union') -> Boxes:
+    """The pairwise overlaps of two sets of boxes in (x1, y1, x2, y2).
+
+    Args:
+        boxes1: The boxes of shape (N, 4).
+        boxes2: The boxes of shape (M, 4).
+        offset: 1 for the legacy pixel convention, see `box_area`.
+        mode: `union` for the intersection over union, or `min` for the intersection
+            over the smaller area.
+
+    Returns:
+        The overlaps of shape (N, M).
+    """
+    maximum, minimum = (torch.maximum,
+                        torch.minimum) if _is_tensor(boxes1) else (np.maximum,
+                                                                   np.minimum)
+    left_top = maximum(boxes1[:, None, :2], boxes2[None, :, :2])
+    right_bottom = minimum(boxes1[:, None, 2:], boxes2[None, :, 2:])
+    wh = (right_bottom - left_top + offset).clip(min=0)
+    inter = wh[..., 0] * wh[..., 1]
+    area1 = box_area(boxes1, offset)[:, None]
+    area2 = box_area(boxes2, offset)[None, :]
+    if mode == 'union':
+        return inter / (area1 + area2 - inter)
+    if mode == 'min':
+        return inter / minimum(area1, area2)
+    raise ValueError(f'Unsupported overlap mode {mode}')
+
+
+def _suppression(boxes1: np.ndarray, areas1: np.ndarray, boxes2: np.ndarray,
+                 areas2: np.ndarray, iou_threshold: float, offset: float,
+                 mode: str) -> np.ndarray:
+    # the same as `box_iou(boxes1, boxes2) > iou_threshold`, with fewer temporary
+    # arrays and without the division
+    inter = np.minimum(boxes1[:, None, 2], boxes2[None, :, 2])
+    inter -= np.maximum(boxes1[:, None, 0], boxes2[None, :, 0])
+    inter += offset
+    np.maximum(inter, 0, out=inter)
+    h = np.minimum(boxes1[:, None, 3], boxes2[None, :, 3])
+    h -= np.maximum(boxes1[:, None, 1], boxes2[None, :, 1])
+    h += offset
+    np.maximum(h, 0, out=h)
+    inter *= h
+    if mode == 'union':
+        # inter / (area1 + area2 - inter) > t <=> inter * (1 + t) > t * (area1 + area2)
+        inter *= 1 + iou_threshold
+        return inter > iou_threshold * (areas1[:, None] + areas2[None, :])
+    if mode == 'min':
+        return inter > iou_threshold * np.minimum(areas1[:, None],
+                                                  areas2[None, :])
+    raise ValueError(f'Unsupported overlap mode {mode}')
+
+
+def _nms_numpy(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float,
+               offset: float, mode: str, top_k: int) -> np.ndarray:
+    order = np.argsort(-scores, kind='stable')
+    boxes = boxes[order]
+    areas = box_area(boxes, offset)
+    alive = np.ones(len(order), dtype=bool)
+    num_kept = 0
+    # Greedy nms in blocks of candidates: the overlaps within a block are computed
+    # at once and resolved in score order, then the boxes kept in the block suppress
+    # all the later candidates at once.
+    for start in range(0, len(order), NMS_BLOCK_SIZE):
+        end = min(start + NMS_BLOCK_SIZE, len(order))
+        block = start + np.flatnonzero(alive[start:end])
+        if len(block) == 0:
+            continue
+        suppress = _suppression(boxes[block], areas[block], boxes[block],
+                                areas[block], iou_threshold, offset, mode)
+        block_alive = np.ones(len(block), dtype=bool)
+        for i in range(len(block)):
+            if block_alive[i]:
+                block_alive[i + 1:] &= ~suppress[i, i + 1:]
+        alive[block[~block_alive]] = False
+        kept = block[block_alive]
+        num_kept += len(kept)
+        if 0 < top_k <= num_kept:
+            alive[kept[len(kept) - (num_kept - top_k):]] = False
+            alive[end:] = False
+            break
+        rest = end + np.flatnonzero(alive[end:])
+        if len(rest) > 0:
+            suppressed = _suppression(boxes[kept], areas[kept], boxes[rest],
+                                      areas[rest], iou_threshold, offset,
+                                      mode).any(0)
+            alive[rest[suppressed]] = False
+    return order[alive]
+
+
+def nms(boxes: Boxes,
+        scores: Boxes,
+        iou_threshold: float,
+        offset: float = 0,
+        mode: str = 'union',
+        top_k: int = -1,
+        max_candidates: int = -1) -> Boxes:
+    """Greedy non-maximum suppression.
+
+    A box is suppressed if its overlap with a kept box of a higher score is larger
+    than the threshold. Tensors are suppressed by `torchvision.ops.nms` if it is
+    available and the mode is `union`, otherwise by a blocked numpy implementation.
+
+    Args:
+        boxes: The boxes of shape (N, 4) in (x1, y1, x2, y2).
+        scores: The scores of shape (N, ).
+        iou_threshold: The overlap threshold.
+        offset: 1 for the legacy pixel convention, see `box_area`.
+        mode: `union` for the intersection over union, or `min` for the intersection
+            over the smaller area.
+        top_k: Keep at most `top_k` boxes if positive.
+        max_candidates: Only suppress among the `max_candidates` boxes of the highest
+            scores if positive.
+
+    Returns:
+        The indices of the kept boxes in decreasing score order, an int64 array or a
+        tensor on the device of the boxes.
+    """
+    if _is_tensor(boxes):
+        candidates = None
+        if 0 < max_candidates < len(scores):
+            candidates = torch.topk(scores, max_candidates).indices
+            boxes, scores = boxes[candidates], scores[candidates]
+        if mode == 'union' and _torchvision_available:
+            from torchvision.ops import nms as tv_nms
+            if offset:
+                boxes = torch.cat((boxes[:, :2], boxes[:, 2:] + offset), 1)
+            keep = tv_nms(boxes.float(), scores.float(), iou_threshold)
+            if top_k > 0:
+                keep = keep[:top_k]
+        else:
+            keep = torch.from_numpy(
+                _nms_numpy(boxes.detach().cpu().numpy(),
+                           scores.detach().cpu().numpy(), iou_threshold,
+                           offset, mode, top_k)).to(boxes.device)
+        return keep if candidates is None else candidates[keep]
+
+    boxes = np.asarray(boxes)
+    scores = np.asarray(scores)
+    if 0 < max_candidates < len(scores):
+        candidates = np.argsort(-scores, kind='stable')[:max_candidates]
+        return candidates[_nms_numpy(boxes[candidates], scores[candidates],
+                                     iou_threshold, offset, mode, top_k)]
+    return _nms_numpy(boxes, scores, iou_threshold, offset, mode, top_k)
+
+
+def batched_nms(boxes: Boxes,
+                scores: Boxes,
+                idxs: Boxes,
+                iou_threshold: float,
+                offset: float = 0,
+                mode: str = 'union',
+                top_k: int = -1) -> Boxes:
+    """Class aware non-maximum suppression, the boxes of different classes do not
+    suppress each other.
+
+    The boxes of each class are moved apart so that all the classes are suppressed
+    in one `nms` call.
+
+    Args:
+        boxes: The boxes of shape (N, 4) in (x1, y1, x2, y2).
+        scores: The scores of shape (N, ).
+        idxs: The class indices of shape (N, ).
+        iou_threshold: The overlap threshold.
+        offset: 1 for the legacy pixel convention, see `box_area`.
+        mode: `union` or `min`, see `nms`.
+        top_k: Keep at most `top_k` boxes of all the classes if positive.
+
+    Returns:
+        The indices of the kept boxes in decreasing score order.
+    """
+    if len(boxes) == 0:
+        return nms(boxes, scores, iou_threshold)
+    span = boxes.max() - boxes.min() + offset + 1
+    shifts = idxs * span
+    return nms(boxes + shifts[:, None], scores, iou_threshold, offset, mode,
+               top_k)
+
+
+def soft_nms(boxes: Boxes,
+             scores: Boxes,
+             iou_threshold: float = 0.3,
+             sigma: float = 0.5,
+             score_threshold: float = 0.001,
+             method: str = 'gaussian',
+             offset: float = 0,
+             top_k: int = -1) -> Tuple[Boxes, Boxes]:
+    """Soft non-maximum suppression, which decays the scores of the overlapped boxes
+    instead of dropping them.
+
+    Args:
+        boxes: The boxes of shape (N, 4) in (x1, y1, x2, y2).
+        scores: The scores of shape (N, ).
+        iou_threshold: Only for the `linear` method, the boxes overlapped more than
+            it are decayed by `1 - iou`.
+        sigma: Only for the `gaussian` method, the scores are decayed by
+            `exp(-iou ** 2 / sigma)`.
+        score_threshold: The boxes with lower decayed scores are dropped.
+        method: `gaussian` or `linear`.
+        offset: 1 for the legacy pixel convention, see `box_area`.
+        top_k: Keep at most `top_k` boxes if positive.
+
+    Returns:
+        The indices of the kept boxes in the order they are kept, and their decayed
+        scores.
+    """
+    if method not in ('gaussian', 'linear'):
+        raise ValueError(f'Unsupported soft nms method {method}')
+    is_tensor = _is_tensor(boxes)
+    if is_tensor:
+        device = boxes.device
+        boxes = boxes.detach().cpu().numpy()
+        scores = scores.detach().cpu().numpy()
+    boxes = np.asarray(boxes, dtype=np.float64)
+    decayed = np.array(scores, dtype=np.float64)
+    rest = np.flatnonzero(decayed > score_threshold)
+    keep, keep_scores = [], []
+    while len(rest) > 0 and (top_k <= 0 or len(keep) < top_k):
+        best = np.argmax(decayed[rest])
+        i = rest[best]
+        keep.append(i)
+        keep_scores.append(decayed[i])
+        rest = np.delete(rest, best)
+        if len(rest) == 0:
+            break
+        iou = box_iou(boxes[i:i + 1], boxes[rest], offset)[0]
+        if method == 'linear':
+            decay = np.where(iou > iou_threshold, 1 - iou, 1.)
+        else:
+            decay = np.exp(-iou * iou / sigma)
+        decayed[rest] *= decay
+        rest = rest[decayed[rest] > score_threshold]
+    keep = np.array(keep, dtype=np.int64)
+    keep_scores = np.array(keep_scores, dtype=np.asarray(scores).dtype)
+    if is_tensor:
+        return torch.from_numpy(keep).to(device), torch.from_numpy(
+            keep_scores).to(device)
+    return keep, keep_scores
+
+
+def decode_boxes(loc: Boxes,
+                 priors: Boxes,
+                 variances: Sequence[float] = (0.1, 0.2),
+                 offset: float = 0) -> Boxes:
+    """Decode the regressed locations of the priors (anchors) to boxes.
+
+    Args:
+        loc: The regressed locations of shape (..., N, 4), the offsets of the centers
+            and the log scales of the sizes.
+        priors: The priors of shape (N, 4) in (cx, cy, w, h).
+        variances: The variances of the centers and the sizes used in the encoding.
+        offset: 1 for the legacy pixel convention, see `box_area`.
+
+    Returns:
+        The boxes of shape (..., N, 4) in (x1, y1, x2, y2).
+    """
+    exp, cat = (torch.exp, torch.cat) if _is_tensor(loc) else (np.exp,
+                                                               np.concatenate)
+    centers = priors[..., :2] + loc[..., :2] * variances[0] * priors[..., 2:]
+    sizes = priors[..., 2:] * exp(loc[..., 2:] * variances[1])
+    left_top = centers - (sizes - offset) / 2
+    return cat((left_top, left_top + sizes - offset), -1)
+
+
+def decode_landmarks(pre: Boxes,
+                     priors: Boxes,
+                     variances: Sequence[float] = (0.1, 0.2)) -> Boxes:  # yapf: disable
+    """Decode the regressed landmarks of the priors (anchors).
+
+    Args:
+        pre: The regressed landmarks of shape (..., N, 2 * K), the offsets of K
+            points from the centers of the priors.
+        priors: The priors of shape (N, 4) in (cx, cy, w, h).
+        variances: The variances used in the encoding, only the first one is used.
+
+    Returns:
+        The landmarks of shape (..., N, 2 * K) in (x1, y1, x2, y2, ...).
+    """
+    shape = pre.shape
+    points = pre.reshape(*shape[:-1], -1, 2)
+    points = priors[..., None, :2] \
+        + points * variances[0] * priors[..., None, 2:]
+    return points.reshape(shape)
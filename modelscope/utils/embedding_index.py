@@ -0,0 +1,546 @@
+# Copyright (c) Alibaba, Inc. and its affiliates.
+"""Top-k retrieval over the embeddings produced by the embedding pipelines.
+
+Two indexes are provided, both in NumPy:
+
+* `FlatIndex` scores the queries against all the vectors with blocked matrix
+    multiplications, the results are exact.
+* `IVFPQIndex` clusters the vectors into inverted lists and compresses them with
+    product quantization, a query only scores the vectors of the nearest lists
+    against the compressed codes, the results are approximate.
+
+Both indexes can be built incrementally from the outputs of the
+`sentence-embedding`, `multi-modal-embedding` and `product-retrieval-embedding`
+pipelines, saved to a directory and loaded back with the arrays memory-mapped.
+
+Examples:
+    >>> from modelscope.pipelines import pipeline
+    >>> from modelscope.utils.embedding_index import FlatIndex
+    >>> pipe = pipeline(Tasks.sentence_embedding, model='damo/nlp_corom_sentence-embedding_chinese-base')
+    >>> index = FlatIndex(768)
+    >>> for batch in corpus_batches:
+    >>>     index.add_outputs(pipe({'source_sentence': batch}))
+    >>> index.save('corpus_index')
+    >>> index = FlatIndex.load('corpus_index')
+    >>> scores, ids = index.search(pipe({'source_sentence': ['query']}), k=10)
+"""
+
+import os
+from collections.abc import Mapping
+from typing import Any, List, Optional, Tuple
+
+import json
+import numpy as np
+
+from modelscope.outputs import OutputKeys
+from modelscope.utils.logger import get_logger
+
+logger = get_logger()
+
+__all__ = ['FlatIndex', 'IVFPQIndex']
+
+METRICS = ('ip', 'cosine')
+EMBEDDING_KEYS = (OutputKeys.TEXT_EMBEDDING, OutputKeys.IMG_EMBEDDING,
+                  OutputKeys.VIDEO_EMBEDDING)
+META_FILE = 'meta.json'
+
+
+def _to_numpy(data) -> np.ndarray:
+    if hasattr(data, 'detach'):
+        data = data.detach().cpu().numpy()
+    return np.asarray(data)
+
+
+def embeddings_from_outputs(outputs: Any,
+                            key: Optional[str] = None) -> np.ndarray:
+    """Get the embeddings from the outputs of an embedding pipeline.
+
+    Args:
+        outputs: The output dict of a pipeline, a list of output dicts, or the
+            embeddings.
+        key (str, optional): The output key of the embeddings. By default the only
+            one of `text_embedding`, `img_embedding` and `video_embedding` in the
+            outputs.
+
+    Returns:
+        np.ndarray: The embeddings of shape (n, dim).
+    """
+    if isinstance(outputs, (list, tuple)) and len(outputs) > 0 \
+            and isinstance(outputs[0], Mapping):
+        return np.concatenate(
+            [embeddings_from_outputs(output, key) for output in outputs])
+    if isinstance(outputs, Mapping):
+        if key is None:
+            keys = [
+                k for k in EMBEDDING_KEYS
+                if k in outputs and outputs[k] is not None
+            ]
+            if len(keys) != 1:
+                raise ValueError(
+                    f'can not decide the embedding key of the outputs with keys '
+                    f'{list(outputs.keys())}, please specify the key')
+            key = keys[0]
+        outputs = outputs[key]
+    embeddings = _to_numpy(outputs)
+    if embeddings.ndim == 1:
+        embeddings = embeddings[None]
+    return embeddings
+
+
+def _topk(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """The top k scores of each row in the descending order and their columns.
+    """
+    k = min(k, scores.shape[1])
+    if k < scores.shape[1]:
+        columns = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        columns = np.broadcast_to(np.arange(k), scores.shape)
+    topk_scores = np.take_along_axis(scores, columns, axis=1)
+    order = np.argsort(-topk_scores, axis=1, kind='stable')
+    topk_scores = np.take_along_axis(topk_scores, order, axis=1)
+    return topk_scores, np.take_along_axis(columns, order, axis=1)
+
+
+class _TopkHeap:
+    """Merge the candidates of the queries into the top k scores and ids.
+    """
+
+    def __init__(self, num_queries: int, k: int):
+        self.k = k
+        self.scores = np.full((num_queries, 0), -np.inf, dtype=np.float32)
+        self.ids = np.full((num_queries, 0), -1, dtype=np.int64)
+
+    def push(self, scores: np.ndarray, ids: np.ndarray, rows=slice(None)):
+        """Push the candidates (scores and ids of the same shape) of the queries in
+        `rows`.
+        """
+        scores = np.concatenate([self.scores[rows], scores], axis=1)
+        ids = np.concatenate([self.ids[rows], ids], axis=1)
+        scores, columns = _topk(scores, self.k)
+        ids = np.take_along_axis(ids, columns, axis=1)
+        if scores.shape[1] > self.scores.shape[1]:
+            self.scores = self._pad(self.scores, -np.inf, scores.shape[1])
+            self.ids = self._pad(self.ids, -1, scores.shape[1])
+        self.scores[rows, :scores.shape[1]] = scores
+        self.ids[rows, :ids.shape[1]] = ids
+
+    def _pad(self, array, value, width=None):
+        width = width or self.scores.shape[1]
+        if array.shape[1] >= width:
+            return array
+        pad = np.full((array.shape[0], width - array.shape[1]),
+                      value,
+                      dtype=array.dtype)
+        return np.concatenate([array, pad], axis=1)
+
+    def result(self) -> Tuple[np.ndarray, np.ndarray]:
+        """The scores and ids of shape (num_queries, k), padded with -inf and -1 if
+        there are less than k candidates.
+        """
+        scores = self._pad(self.scores, -np.inf, self.k)
+        return scores, self._pad(self.ids, -1, self.k)
+
+
+class _BaseIndex:
+
+    def __init__(self, dim: int, metric: str = 'ip'):
+        if metric not in METRICS:
+            raise ValueError(
+                f'metric should be one of {METRICS}, but got {metric}')
+        self.dim = dim
+        self.metric = metric
+        self.ntotal = 0
+
+    def __len__(self):
+        return self.ntotal
+
+    def _prepare(self, embeddings) -> np.ndarray:
+        embeddings = np.ascontiguousarray(
+            embeddings_from_outputs(embeddings), dtype=np.float32)
+        if embeddings.ndim != 2 or embeddings.shape[1] != self.dim:
+            raise ValueError(
+                f'the embeddings should be of shape (n, {self.dim}), '
+                f'but got {embeddings.shape}')
+        if self.metric == 'cosine':
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.maximum(norms, 1e-12)
+        return embeddings
+
+    def _new_ids(self, n: int, ids=None) -> np.ndarray:
+        if ids is None:
+            return np.arange(self.ntotal, self.ntotal + n, dtype=np.int64)
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        if ids.shape[0] != n:
+            raise ValueError(f'got {ids.shape[0]} ids for {n} embeddings')
+        return ids
+
+    def add_outputs(self, outputs, key: Optional[str] = None, ids=None):
+        """Add the embeddings in the outputs of an embedding pipeline, see
+        `embeddings_from_outputs`.
+        """
+        self.add(embeddings_from_outputs(outputs, key), ids)
+
+    def _save_meta(self, path: str, meta: dict):
+        os.makedirs(path, exist_ok=True)
+        meta = {
+            'type': self.__class__.__name__,
+            'dim': self.dim,
+            'metric': self.metric,
+            **meta
+        }
+        with open(os.path.join(path, META_FILE), 'w') as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def _load_meta(cls, path: str) -> dict:
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        if meta.pop('type') != cls.__name__:
+            raise ValueError(f'{path} is not saved by {cls.__name__}')
+        return meta
+
+
+class FlatIndex(_BaseIndex):
+    """The exact index which scores the queries against all the vectors.
+
+    The vectors are kept in the chunks as they are added, and scored in blocks of
+    `block_size` vectors, so the memory of the scores is bounded and a memory-mapped
+    index is read block by block.
+
+    Args:
+        dim (int): The dimension of the embeddings.
+        metric (str): `ip` for the inner product, or `cosine` for the cosine
+            similarity, the embeddings are normalized when they are added.
+        block_size (int): The number of the vectors scored in one matrix
+            multiplication.
+    """
+
+    def __init__(self, dim: int, metric: str = 'ip', block_size: int = 65536):
+        super().__init__(dim, metric)
+        self.block_size = block_size
+        self._vectors: List[np.ndarray] = []
+        self._ids: List[np.ndarray] = []
+
+    def add(self, embeddings, ids=None):
+        """Add the embeddings.
+
+        Args:
+            embeddings: The embeddings of shape (n, dim), or the outputs of an
+                embedding pipeline.
+            ids (optional): The int ids of the embeddings returned by `search`, by
+                default the order of the embeddings added.
+        """
+        embeddings = self._prepare(embeddings)
+        ids = self._new_ids(embeddings.shape[0], ids)
+        self._vectors.append(embeddings)
+        self._ids.append(ids)
+        self.ntotal += embeddings.shape[0]
+
+    def search(self, queries, k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """Find the top k vectors of each query.
+
+        Args:
+            queries: The query embeddings of shape (nq, dim), or the outputs of an
+                embedding pipeline.
+            k (int): The number of the results of each query.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The scores and the ids of shape (nq, k) in
+                the descending order of the scores, padded with -inf and -1 if the
+                index has less than k vectors.
+        """
+        queries = self._prepare(queries)
+        heap = _TopkHeap(queries.shape[0], k)
+        for vectors, ids in zip(self._vectors, self._ids):
+            for start in range(0, vectors.shape[0], self.block_size):
+                block = vectors[start:start + self.block_size]
+                scores, columns = _topk(queries @ block.T, k)
+                heap.push(scores, ids[start:start + self.block_size][columns])
+        return heap.result()
+
+    def save(self, path: str):
+        """Save the index to the directory `path`.
+        """
+        self._save_meta(path, {'block_size': self.block_size})
+        # the chunks may be memory-mapped from the file being saved, write them to
+        # a new file and replace the old one after all of them are copied
+        vectors_file = os.path.join(path, 'vectors.npy')
+        tmp_file = os.path.join(path, 'vectors.tmp.npy')
+        vectors = np.lib.format.open_memmap(
+            tmp_file,
+            mode='w+',
+            dtype=np.float32,
+            shape=(self.ntotal, self.dim))
+        start = 0
+        for chunk in self._vectors:
+            vectors[start:start + chunk.shape[0]] = chunk
+            start += chunk.shape[0]
+        vectors.flush()
+        del vectors
+        os.replace(tmp_file, vectors_file)
+        np.save(
+            os.path.join(path, 'ids.npy'),
+            np.concatenate(self._ids) if self._ids else np.zeros(
+                0, dtype=np.int64))
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'FlatIndex':
+        """Load an index saved by `save`.
+
+        Args:
+            path (str): The directory of the index.
+            mmap (bool): Memory-map the vectors instead of reading them into memory.
+        """
+        meta = cls._load_meta(path)
+        index = cls(**meta)
+        vectors = np.load(
+            os.path.join(path, 'vectors.npy'), mmap_mode='r' if mmap else None)
+        ids = np.load(os.path.join(path, 'ids.npy'))
+        if vectors.shape[0] > 0:
+            index._vectors.append(vectors)
+            index._ids.append(ids)
+            index.ntotal = vectors.shape[0]
+        return index
+
+
+def _kmeans(data: np.ndarray,
+            k: int,
+            iterations: int,
+            rng: np.random.RandomState,
+            block_size: int = 65536) -> np.ndarray:
+    """Lloyd's k-means on the rows of `data`, return the centroids of shape
+    (k, dim).
+    """
+    if data.shape[0] < k:
+        raise ValueError(
+            f'need at least {k} vectors to train {k} centroids, but got '
+            f'{data.shape[0]}')
+    centroids = data[rng.choice(data.shape[0], k, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = _assign(data, centroids, block_size)
+        order = np.argsort(assignments, kind='stable')
+        counts = np.bincount(assignments, minlength=k)
+        empty = counts == 0
+        # the sums of the vectors of each non-empty cluster
+        starts = np.cumsum(counts) - counts
+        sums = np.add.reduceat(data[order], starts[~empty], axis=0)
+        centroids[~empty] = sums / counts[~empty, None]
+        # restart the empty clusters from random vectors
+        if empty.any():
+            centroids[empty] = data[rng.choice(
+                data.shape[0], int(empty.sum()), replace=False)]
+    return centroids
+
+
+def _assign(data: np.ndarray,
+            centroids: np.ndarray,
+            block_size: int = 65536) -> np.ndarray:
+    """The nearest centroid in the l2 distance of each row of `data`.
+    """
+    half_norms = 0.5 * (centroids**2).sum(axis=1)
+    assignments = np.empty(data.shape[0], dtype=np.int64)
+    for start in range(0, data.shape[0], block_size):
+        block = data[start:start + block_size]
+        assignments[start:start + block_size] = np.argmax(
+            block @ centroids.T - half_norms, axis=1)
+    return assignments
+
+
+class IVFPQIndex(_BaseIndex):
+    """The approximate index of inverted lists and product quantization.
+
+    The vectors are assigned to `nlist` clusters (the inverted lists), and the
+    residual of a vector to its cluster centroid is split into `m` sub-vectors, each
+    is encoded by the id of its nearest codeword among 2 ** `nbits` codewords. A
+    query is scored against the `nprobe` lists of the highest scores with the lookup
+    tables of the query and the codewords, the vectors themselves are not kept.
+
+    `train` should be called on a sample of the vectors before `add`.
+
+    Args:
+        dim (int): The dimension of the embeddings.
+        nlist (int): The number of the inverted lists.
+        m (int): The number of the sub-vectors, `dim` should be divisible by it.
+        nbits (int): The number of bits of a code, at most 8.
+        nprobe (int): The number of the lists searched for a query.
+        metric (str): `ip` or `cosine`, see `FlatIndex`.
+        seed (int): The random seed of the training.
+    """
+
+    def __init__(self,
+                 dim: int,
+                 nlist: int = 1024,
+                 m: int = 8,
+                 nbits: int = 8,
+                 nprobe: int = 16,
+                 metric: str = 'ip',
+                 seed: int = 0):
+        super().__init__(dim, metric)
+        if dim % m != 0:
+            raise ValueError(f'dim {dim} is not divisible by m {m}')
+        if not 1 <= nbits <= 8:
+            raise ValueError(f'nbits should be in [1, 8], but got {nbits}')
+        self.nlist = nlist
+        self.m = m
+        self.nbits = nbits
+        self.nprobe = nprobe
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        # the codewords of shape (m, 2 ** nbits, dim // m)
+        self.codebooks: Optional[np.ndarray] = None
+        self._codes = [[] for _ in range(nlist)]
+        self._ids = [[] for _ in range(nlist)]
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def train(self, embeddings, iterations: int = 20):
+        """Train the centroids of the lists and the codewords.
+
+        Args:
+            embeddings: A sample of the vectors, at least `nlist` and 2 ** `nbits`
+                vectors, about 50 times of them is enough.
+            iterations (int): The number of the k-means iterations.
+        """
+        data = self._prepare(embeddings)
+        rng = np.random.RandomState(self.seed)
+        self.centroids = _kmeans(data, self.nlist, iterations, rng)
+        residuals = data - self.centroids[_assign(data, self.centroids)]
+        dsub = self.dim // self.m
+        self.codebooks = np.stack([
+            _kmeans(
+                np.ascontiguousarray(residuals[:, j * dsub:(j + 1) * dsub]),
+                2**self.nbits, iterations, rng) for j in range(self.m)
+        ])
+        logger.info(f'trained {self.nlist} lists and {self.m}x'
+                    f'{2 ** self.nbits} codewords on {data.shape[0]} vectors')
+
+    def _encode(self, residuals: np.ndarray) -> np.ndarray:
+        dsub = self.dim // self.m
+        codes = np.empty((residuals.shape[0], self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codes[:, j] = _assign(
+                np.ascontiguousarray(residuals[:, j * dsub:(j + 1) * dsub]),
+                self.codebooks[j])
+        return codes
+
+    def add(self, embeddings, ids=None):
+        """Add the embeddings, see `FlatIndex.add`.
+        """
+        if not self.is_trained:
+            raise RuntimeError('the index should be trained before adding')
+        embeddings = self._prepare(embeddings)
+        ids = self._new_ids(embeddings.shape[0], ids)
+        lists = _assign(embeddings, self.centroids)
+        codes = self._encode(embeddings - self.centroids[lists])
+        order = np.argsort(lists, kind='stable')
+        bounds = np.searchsorted(lists[order], np.arange(self.nlist + 1))
+        for list_no in np.nonzero(np.diff(bounds))[0]:
+            rows = order[bounds[list_no]:bounds[list_no + 1]]
+            self._codes[list_no].append(codes[rows])
+            self._ids[list_no].append(ids[rows])
+        self.ntotal += embeddings.shape[0]
+
+    def _list(self, list_no: int) -> Tuple[np.ndarray, np.ndarray]:
+        """The codes and the ids of a list, the chunks are merged on the first use.
+        """
+        codes, ids = self._codes[list_no], self._ids[list_no]
+        if len(codes) > 1:
+            self._codes[list_no] = codes = [np.concatenate(codes)]
+            self._ids[list_no] = ids = [np.concatenate(ids)]
+        if not codes:
+            return np.zeros((0, self.m), dtype=np.uint8), np.zeros(
+                0, dtype=np.int64)
+        return codes[0], ids[0]
+
+    def search(self,
+               queries,
+               k: int = 10,
+               nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Find the approximate top k vectors of each query.
+
+        Args:
+            queries: The query embeddings of shape (nq, dim), or the outputs of an
+                embedding pipeline.
+            k (int): The number of the results of each query.
+            nprobe (int, optional): The number of the lists searched, default to the
+                `nprobe` of the index.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The scores and the ids, see
+                `FlatIndex.search`.
+        """
+        if not self.is_trained:
+            raise RuntimeError('the index should be trained before searching')
+        queries = self._prepare(queries)
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        coarse_scores = queries @ self.centroids.T
+        _, probes = _topk(coarse_scores, nprobe)
+        dsub = self.dim // self.m
+        # the inner products of the sub-queries and the codewords, (nq, m, ksub)
+        tables = np.einsum('qjd,jkd->qjk', queries.reshape(-1, self.m, dsub),
+                           self.codebooks)
+        heap = _TopkHeap(queries.shape[0], k)
+        # score the queries probing the same list together
+        for list_no in np.unique(probes):
+            codes, ids = self._list(list_no)
+            if codes.shape[0] == 0:
+                continue
+            rows = np.nonzero((probes == list_no).any(axis=1))[0]
+            scores = coarse_scores[rows, list_no][:, None] + sum(
+                tables[rows, j][:, codes[:, j]] for j in range(self.m))
+            scores, columns = _topk(scores, k)
+            heap.push(scores, ids[columns], rows)
+        return heap.result()
+
+    def save(self, path: str):
+        """Save the index to the directory `path`, the codes of the lists are saved
+        in one array.
+        """
+        if not self.is_trained:
+            raise RuntimeError('the index should be trained before saving')
+        self._save_meta(
+            path, {
+                'nlist': self.nlist,
+                'm': self.m,
+                'nbits': self.nbits,
+                'nprobe': self.nprobe,
+                'seed': self.seed
+            })
+        lists = [self._list(list_no) for list_no in range(self.nlist)]
+        offsets = np.cumsum([0] + [ids.shape[0] for _, ids in lists])
+        np.save(os.path.join(path, 'centroids.npy'), self.centroids)
+        np.save(os.path.join(path, 'codebooks.npy'), self.codebooks)
+        np.save(os.path.join(path, 'offsets.npy'), offsets)
+        np.save(
+            os.path.join(path, 'codes.npy'),
+            np.concatenate([codes for codes, _ in lists]))
+        np.save(
+            os.path.join(path, 'ids.npy'),
+            np.concatenate([ids for _, ids in lists]))
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'IVFPQIndex':
+        """Load an index saved by `save`.
+
+        Args:
+            path (str): The directory of the index.
+            mmap (bool): Memory-map the codes and the ids instead of reading them
+                into memory.
+        """
+        meta = cls._load_meta(path)
+        index = cls(**meta)
+        mmap_mode = 'r' if mmap else None
+        index.centroids = np.load(os.path.join(path, 'centroids.npy'))
+        index.codebooks = np.load(os.path.join(path, 'codebooks.npy'))
+        offsets = np.load(os.path.join(path, 'offsets.npy'))
+        codes = np.load(os.path.join(path, 'codes.npy'), mmap_mode=mmap_mode)
+        ids = np.load(os.path.join(path, 'ids.npy'), mmap_mode=mmap_mode)
+        for list_no in range(index.nlist):
+            start, end = offsets[list_no], offsets[list_no + 1]
+            if end > start:
+                index._codes[list_no].append(codes[start:end])
+                index._ids[list_no].append(ids[start:end])
+        index.ntotal = int(offsets[-1])
+        return index
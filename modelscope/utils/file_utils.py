@@ -1,9 +1,18 @@
 # Copyright (c) Alibaba, Inc. and its affiliates.
 
+import hashlib
 import inspect
 import os
+import shutil
+import tempfile
+import zipfile
 from pathlib import Path
 
+import json
+from filelock import FileLock
+
+EXTRACTED_MARKER_FILE = '.extracted'
+
 
 # TODO: remove this api, unify to flattened args
 def func_receive_dict_inputs(func):
@@ -43,3 +52,88 @@ def read_file(path):
     with open(path, 'r') as f:
         text = f.read()
     return text
+
+
+def _file_sha256(path, chunk_size=1024 * 1024):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def extract_zip_once(zip_file, target_dir, folder_name):
+    """Extract the folder `folder_name` of a zip file to `target_dir`, once.
+
+    A marker with the sha256 of the zip file is saved in the extracted folder, the
+    extraction is skipped if the marker is up to date. The zip file is extracted to
+    a temp dir and renamed, under a file lock, so concurrent processes sharing
+    the target dir never see a half extracted folder.
+
+    Args:
+        zip_file (str): The zip file, which contains the folder `folder_name`.
+        target_dir (str): The dir to extract to.
+        folder_name (str): The top folder in the zip file.
+
+    Returns:
+        str: The path of the extracted folder.
+    """
+    folder = os.path.join(target_dir, folder_name)
+    marker_file = os.path.join(folder, EXTRACTED_MARKER_FILE)
+    stat = os.stat(zip_file)
+
+    def _read_marker():
+        try:
+            with open(marker_file, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _is_up_to_date(marker, sha256=None):
+        if marker is None:
+            return False
+        if (marker.get('size'), marker.get('mtime')) == (stat.st_size,
+                                                         stat.st_mtime):
+            return True
+        return sha256 is not None and marker.get('sha256') == sha256
+
+    def _write_marker(path, sha256):
+        with open(path, 'w') as f:
+            json.dump(
+                {
+                    'sha256': sha256,
+                    'size': stat.st_size,
+                    'mtime': stat.st_mtime
+                }, f)
+
+    if _is_up_to_date(_read_marker()):
+        return folder
+
+    with FileLock(os.path.join(target_dir, f'.{folder_name}.lock')):
+        marker = _read_marker()
+        if _is_up_to_date(marker):
+            return folder
+        sha256 = _file_sha256(zip_file)
+        if _is_up_to_date(marker, sha256):
+            # the zip file is touched but not changed, record the new mtime so
+            # that the next call does not hash the zip file again
+            marker_temp_file = marker_file + '.tmp'
+            _write_marker(marker_temp_file, sha256)
+            os.replace(marker_temp_file, marker_file)
+            return folder
+
+        temp_dir = tempfile.mkdtemp(dir=target_dir, prefix=f'.{folder_name}.')
+        try:
+            with zipfile.ZipFile(zip_file, 'r') as zip_ref:
+                zip_ref.extractall(temp_dir)
+            extracted = os.path.join(temp_dir, folder_name)
+            _write_marker(
+                os.path.join(extracted, EXTRACTED_MARKER_FILE), sha256)
+            if os.path.exists(folder):
+                # move the stale folder away first, a rename is atomic
+                stale_folder = os.path.join(temp_dir, f'{folder_name}.stale')
+                os.rename(folder, stale_folder)
+            os.rename(extracted, folder)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    return folder
@@ -0,0 +1,54 @@
+# Copyright (c) Alibaba, Inc. and its affiliates.
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import torch
+from torch import Tensor
+
+
+def cat_guidance_kwargs(y_kwargs: Dict[str, Any], u_kwargs: Dict[str, Any],
+                        batch_size: int) -> Optional[Dict[str, Any]]:
+    r"""Concatenate the conditional and the non-conditional kwargs of
+    classifier-free guidance along the batch dimension.
+
+    The tensors of the same shape with `batch_size` samples are concatenated,
+    the other values must be the same object in both kwargs.
+
+    Returns:
+        the concatenated kwargs, or None if the kwargs can not be batched.
+    """
+    if y_kwargs.keys() != u_kwargs.keys():
+        return None
+    kwargs = {}
+    for k, y in y_kwargs.items():
+        u = u_kwargs[k]
+        if torch.is_tensor(y) and torch.is_tensor(u) and y.ndim > 0 \
+                and y.shape == u.shape and y.size(0) == batch_size:
+            kwargs[k] = torch.cat([y, u], dim=0)
+        elif y is u and not torch.is_tensor(y):
+            kwargs[k] = y
+        else:
+            return None
+    return kwargs
+
+
+def guided_forward(
+        model: Callable, xt: Tensor, t: Tensor,
+        model_kwargs: List[Dict[str, Any]]) -> Tuple[Tensor, Tensor]:
+    r"""Run the conditional and the non-conditional branches of classifier-free
+    guidance in one forward, fall back to two forwards if the kwargs can not be
+    batched.
+
+    Args:
+        model: the denoising model, called as `model(xt, t, **kwargs)`.
+        xt: the noisy inputs.
+        t: the (scaled) timesteps.
+        model_kwargs: [conditional kwargs, non-conditional kwargs].
+
+    Returns:
+        the outputs of the conditional and the non-conditional branches.
+    """
+    kwargs = cat_guidance_kwargs(*model_kwargs, xt.size(0))
+    if kwargs is None:
+        return model(xt, t, **model_kwargs[0]), model(xt, t, **model_kwargs[1])
+    out = model(torch.cat([xt, xt], dim=0), torch.cat([t, t], dim=0), **kwargs)
+    return out.chunk(2, dim=0)
@@ -0,0 +1,125 @@
+# Copyright (c) Alibaba, Inc. and its affiliates.
+import os
+import queue
+from threading import Thread
+from typing import Callable, Generator, Iterable, List
+
+import torch
+
+
+class TokenStreamer:
+    """Pass the tokens of a running generation to a consumer.
+
+    The generation loop calls `put` with the whole token sequence of the first sample
+    every time it grows, and `end` when the generation finishes. The consumer
+    iterates the streamer to get the latest sequences, the sequences put while the
+    consumer is busy are skipped except the latest one.
+
+    Args:
+        token_queue (optional): The queue between the producer and the consumer, for
+            example a `multiprocessing.Manager().Queue()` if the generation runs in
+            another process. A thread safe queue is created by default.
+    """
+
+    def __init__(self, token_queue=None):
+        self.queue = token_queue if token_queue is not None else queue.Queue()
+
+    def put(self, tokens):
+        if isinstance(tokens, torch.Tensor):
+            tokens = tokens.tolist()
+        self.queue.put(list(tokens))
+
+    def end(self):
+        self.queue.put(None)
+
+    def __iter__(self) -> Generator[List[int], None, None]:
+        tokens = self.queue.get()
+        while tokens is not None:
+            # the sequences only grow, skip to the latest one
+            try:
+                latest = self.queue.get_nowait()
+            except queue.Empty:
+                yield tokens
+                tokens = self.queue.get()
+                continue
+            if latest is None:
+                yield tokens
+            tokens = latest
+
+
+def build_streamer_logits_processor(streamer: TokenStreamer):
+    """Build a logits processor of huggingface `generate` which puts the sequence
+    of the first sample into the streamer at each step.
+    """
+    from transformers import LogitsProcessor
+
+    class StreamerLogitsProcessor(LogitsProcessor):
+
+        def __call__(self, input_ids, scores):
+            streamer.put(input_ids[0])
+            return scores
+
+    return StreamerLogitsProcessor()
+
+
+def stream_decode(
+        token_stream: Iterable[List[int]],
+        decode_fn: Callable[[List[int]], str]) -> Generator[str, None, None]:
+    """Decode the growing token sequences and yield the newly decoded text.
+
+    The whole sequence is decoded every time, so the word pieces and sentence pieces
+    are merged by the tokenizer as in the final result. The text is held back while it
+    ends with an incomplete character, or while it does not extend the text yielded
+    before, which may happen when a piece changes how the previous pieces are joined.
+    The yielded text can not be taken back, so in the latter case the rest of the
+    final text is yielded from where it differs.
+
+    Args:
+        token_stream: The growing token sequences, like a `TokenStreamer`.
+        decode_fn: The function to decode a token sequence to text.
+
+    Yields:
+        The new text, the concatenation of the yielded text is the decoded text of the
+        last sequence unless a yielded text is changed by the later pieces.
+    """
+    emitted = ''
+    text = ''
+    for tokens in token_stream:
+        text = decode_fn(tokens)
+        if text.endswith('\ufffd') or not text.startswith(emitted):
+            continue
+        if len(text) > len(emitted):
+            yield text[len(emitted):]
+            emitted = text
+    # flush the held back text
+    common = len(os.path.commonprefix([text, emitted]))
+    if len(text) > common:
+        yield text[common:]
+
+
+def stream_generate(
+        generate_fn: Callable[[TokenStreamer], None],
+        decode_fn: Callable[[List[int]], str],
+        streamer: TokenStreamer = None) -> Generator[str, None, None]:
+    """Run `generate_fn(streamer)` in a background thread and yield the new text
+    decoded from the streamer, see `stream_decode`.
+
+    The errors raised by `generate_fn` are raised again after the stream ends.
+    """
+    streamer = streamer if streamer is not None else TokenStreamer()
+    errors = []
+
+    def _generate():
+        try:
+            generate_fn(streamer)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            streamer.end()
+
+    thread = Thread(target=_generate, daemon=True)
+    thread.start()
+    yield from stream_decode(streamer, decode_fn)
+    thread.join()
+    if errors:
+        raise errors[0]
@@ -0,0 +1,235 @@
+# Copyright (c) Alibaba, Inc. and its affiliates.
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, List, Mapping
+
+import numpy as np
+import torch
+from packaging import version
+from torch import nn
+
+from modelscope.exporters.backend import checkpoint_fingerprint
+from modelscope.outputs import OutputKeys
+from modelscope.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DYNAMIC_INT8 = 'dynamic-int8'
+QUANTIZED_MODEL_FILE = 'pytorch_model.{method}.bin'
+PREDICTION_KEYS = (OutputKeys.LABELS, OutputKeys.LABEL, OutputKeys.TEXT,
+                   OutputKeys.OUTPUT)
+
+
+def _torch_module(model) -> nn.Module:
+    if isinstance(model, nn.Module):
+        return model
+    if hasattr(model, 'model') and isinstance(model.model, nn.Module):
+        return model.model
+    raise TypeError(
+        f'Only torch models can be quantized, but got {type(model)}')
+
+
+def _load_quantized_state_dict(cache_file: str):
+    # the packed params of the quantized layers are not plain tensors
+    kwargs = {
+        'weights_only': False
+    } if version.parse(torch.__version__) >= version.parse('1.13') else {}
+    return torch.load(cache_file, map_location='cpu', **kwargs)
+
+
+def quantize_model(model, method: str = DYNAMIC_INT8, cache_dir: str = None):
+    """Quantize the Linear and LSTM layers of a trained torch model in place.
+
+    With `dynamic-int8`, the weights are quantized to int8 ahead of time and the
+    activations are quantized on the fly at each forward, which cuts the memory and
+    the latency of the inference on cpu. The quantized model runs on cpu only.
+
+    The quantized state dict is cached in `cache_dir`, together with the fingerprint
+    of the checkpoint files of the model dir, and loaded from there when the model is
+    quantized again, so all the later runs use the same quantized weights. The model
+    is quantized again if the checkpoint files have changed since, e.g. after the
+    model is fine-tuned into the same dir.
+
+    Args:
+        model: A torch model, or a model holding a torch module in its `model` attribute.
+        method: The quantization method, only `dynamic-int8` is supported now.
+        cache_dir (str, optional): The dir of the cached state dict, default to the model
+            dir. Nothing is cached if the model has no model dir.
+
+    Returns:
+        The quantized model.
+    """
+    if method != DYNAMIC_INT8:
+        raise ValueError(f'Unsupported quantization method {method}, '
+                         f'only {DYNAMIC_INT8} is supported now.')
+    module = _torch_module(model)
+    module.cpu().eval()
+    torch.quantization.quantize_dynamic(
+        module, {nn.Linear, nn.LSTM}, dtype=torch.qint8, inplace=True)
+
+    model_dir = getattr(model, 'model_dir', None)
+    if cache_dir is None:
+        cache_dir = model_dir
+    if cache_dir is None:
+        return model
+    cache_file = os.path.join(cache_dir,
+                              QUANTIZED_MODEL_FILE.format(method=method))
+    fingerprint_file = cache_file + '.checkpoint'
+    fingerprint = checkpoint_fingerprint(
+        model_dir, exclude=[cache_file]) if model_dir is not None else ''
+    cached_fingerprint = None
+    if os.path.isfile(cache_file) and os.path.isfile(fingerprint_file):
+        with open(fingerprint_file) as f:
+            cached_fingerprint = f.read().strip()
+    if cached_fingerprint is not None and cached_fingerprint != fingerprint:
+        logger.info(f'the checkpoint files of {model_dir} have changed since '
+                    f'{cache_file} was cached, quantize again')
+    elif cached_fingerprint is not None:
+        try:
+            module.load_state_dict(_load_quantized_state_dict(cache_file))
+            logger.info(f'load the quantized state dict from {cache_file}')
+            return model
+        except Exception as e:
+            logger.warning(f'Failed to load the quantized state dict '
+                           f'{cache_file}, quantize again: {e}')
+
+    try:
+        # save to a temporary file first, so a broken file is not cached
+        tmp_file = f'{cache_file}.tmp'
+        torch.save(module.state_dict(), tmp_file)
+        os.replace(tmp_file, cache_file)
+        with open(fingerprint_file, 'w') as f:
+            f.write(fingerprint)
+        logger.info(f'cache the quantized state dict to {cache_file}')
+    except OSError as e:
+        logger.warning(f'Failed to cache the quantized state dict: {e}')
+    return model
+
+
+def _numeric_leaves(output, prefix=''):
+    if isinstance(output, torch.Tensor):
+        output = output.detach().cpu().numpy()
+    if isinstance(output, Mapping):
+        for key, value in output.items():
+            yield from _numeric_leaves(value, f'{prefix}.{key}')
+    elif isinstance(output, (list, tuple)):
+        try:
+            array = np.asarray(output, dtype=np.float64)
+        except (TypeError, ValueError):
+            for i, value in enumerate(output):
+                yield from _numeric_leaves(value, f'{prefix}.{i}')
+        else:
+            yield prefix, array
+    elif isinstance(output, (int, float, np.number, np.ndarray)) \
+            and np.asarray(output).dtype.kind in 'biuf':
+        yield prefix, np.asarray(output, dtype=np.float64)
+
+
+def _prediction(output: Mapping, key: str = None):
+    if key is None:
+        key = next((k for k in PREDICTION_KEYS if k in output), None)
+        if key is None:
+            raise ValueError(f'None of {PREDICTION_KEYS} is in the outputs, '
+                             f'please specify the key of the prediction.')
+    prediction = output[key]
+    if isinstance(prediction, (torch.Tensor, np.ndarray)):
+        prediction = prediction.tolist()
+    if isinstance(prediction, (list, tuple)) and len(prediction) > 0:
+        scores = output.get(OutputKeys.SCORES)
+        if isinstance(scores, (torch.Tensor, np.ndarray)):
+            scores = scores.tolist()
+        if isinstance(scores, (list, tuple)) and len(scores) == len(prediction) \
+                and all(isinstance(score, (int, float)) for score in scores):
+            # the labels with their scores, which may not be ranked
+            return prediction[int(np.argmax(scores))]
+        # the top-1 of the ranked predictions
+        prediction = prediction[0]
+    return prediction
+
+
+def quantization_report(float_fn: Callable,
+                        quantized_fn: Callable,
+                        samples: Iterable,
+                        labels: List = None,
+                        key: str = None) -> Dict[str, Any]:
+    """Compare a quantized pipeline or model with the float one on a sample set.
+
+    Args:
+        float_fn: The float pipeline or model.
+        quantized_fn: The quantized pipeline or model.
+        samples: The inputs, each of them is fed into both callables.
+        labels (`List`, optional): The expected predictions of the samples, to report
+            the accuracy of both callables.
+        key (`str`, optional): The output key of the prediction, default to the first
+            of `labels`, `label`, `text` and `output` found in the outputs. If the
+            prediction is a list, the item with the highest score in `scores` is taken,
+            or the first item if there are no scores for the items.
+
+    Returns:
+        A dict of:
+            num_samples: The number of samples.
+            agreement: The ratio of the samples with the same predictions.
+            max_abs_diff: The max absolute difference of the numeric outputs.
+            mean_abs_diff: The mean absolute difference of the numeric outputs.
+            float_latency: The mean seconds per sample of the float callable.
+            quantized_latency: The mean seconds per sample of the quantized callable.
+            float_accuracy, quantized_accuracy, accuracy_delta: Only if `labels` is
+                given, the accuracy delta is the quantized one minus the float one.
+
+    Examples:
+        >>> from modelscope.pipelines import pipeline
+        >>> from modelscope.utils.quantization import quantization_report
+        >>> model_id = 'damo/nlp_structbert_sentence-similarity_chinese-base'
+        >>> float_pipeline = pipeline('sentence-similarity', model=model_id, device='cpu')
+        >>> quantized_pipeline = pipeline('sentence-similarity', model=model_id,
+        >>>     quantize='dynamic-int8')
+        >>> print(quantization_report(float_pipeline, quantized_pipeline,
+        >>>     [('这是个测试', '这也是个测试'), ('今天天气好', '明天天气好吗')]))
+    """
+    samples = list(samples)
+    if labels is not None and len(labels) != len(samples):
+        raise ValueError(
+            f'Got {len(labels)} labels for {len(samples)} samples')
+    if len(samples) == 0:
+        raise ValueError('The sample set is empty')
+
+    float_time = quantized_time = 0.
+    agreed = float_correct = quantized_correct = 0
+    abs_diffs = []
+    for i, sample in enumerate(samples):
+        start = time.perf_counter()
+        float_output = float_fn(sample)
+        float_time += time.perf_counter() - start
+        start = time.perf_counter()
+        quantized_output = quantized_fn(sample)
+        quantized_time += time.perf_counter() - start
+
+        float_prediction = _prediction(float_output, key)
+        quantized_prediction = _prediction(quantized_output, key)
+        agreed += float_prediction == quantized_prediction
+        if labels is not None:
+            float_correct += float_prediction == labels[i]
+            quantized_correct += quantized_prediction == labels[i]
+
+        quantized_leaves = dict(_numeric_leaves(quantized_output))
+        for name, value in _numeric_leaves(float_output):
+            quantized_value = quantized_leaves.get(name)
+            if quantized_value is not None \
+                    and quantized_value.shape == value.shape:
+                abs_diffs.append(np.abs(value - quantized_value).ravel())
+
+    abs_diffs = np.concatenate(abs_diffs) if abs_diffs else np.zeros(1)
+    report = {
+        'num_samples': len(samples),
+        'agreement': agreed / len(samples),
+        'max_abs_diff': float(abs_diffs.max()),
+        'mean_abs_diff': float(abs_diffs.mean()),
+        'float_latency': float_time / len(samples),
+        'quantized_latency': quantized_time / len(samples),
+    }
+    if labels is not None:
+        report['float_accuracy'] = float_correct / len(samples)
+        report['quantized_accuracy'] = quantized_correct / len(samples)
+        report['accuracy_delta'] = report['quantized_accuracy'] \
+            - report['float_accuracy']
+    return report
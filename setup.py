@@ -165,6 +165,10 @@ def pack_resource():
     shutil.copy('./MANIFEST.in', 'package/MANIFEST.in')
     shutil.copy('./README.md', 'package/README.md')
 
+    # ship the ast index, so that importing modelscope does not scan the source files
+    from modelscope.utils.ast_utils import generate_prebuilt_index
+    generate_prebuilt_index(proj_dir)
+
 
 if __name__ == '__main__':
     # write_version_py()
@@ -5,8 +5,13 @@ import tempfile
 import unittest
 from collections import OrderedDict
 
-from modelscope.exporters import Exporter, TorchModelExporter
+import numpy as np
+
+from modelscope.exporters import ExportedModel, Exporter, TorchModelExporter
 from modelscope.models import Model
+from modelscope.outputs import OutputKeys
+from modelscope.pipelines import pipeline
+from modelscope.utils.constant import Tasks
 from modelscope.utils.test_utils import test_level
 
 
@@ -33,6 +38,23 @@ class TestExportSbertSequenceClassification(unittest.TestCase):
             TorchModelExporter.from_model(model).export_torch_script(
                 shape=(2, 256), output_dir=self.tmp_dir))
 
+    @unittest.skipUnless(test_level() >= 1, 'skip test in current test level')
+    def test_exported_model_backend(self):
+        model = Model.from_pretrained(self.model_id)
+        inputs = ('这是个测试', '这也是个测试')
+        result = pipeline(Tasks.sentence_similarity, model=model)(inputs)
+        for backend in ['torchscript', 'onnxruntime']:
+            exported_model = ExportedModel(
+                model, backend, export_dir=self.tmp_dir)
+            pipeline_ins = pipeline(
+                Tasks.sentence_similarity, model=exported_model)
+            np.testing.assert_allclose(
+                pipeline_ins(inputs)[OutputKeys.SCORES],
+                result[OutputKeys.SCORES],
+                atol=1e-4)
+            # the exported file is cached in the export dir
+            self.assertTrue(os.path.isfile(exported_model.model_file))
+
     @unittest.skipUnless(test_level() >= 1, 'skip test in current test level')
     def test_export_outer_module(self):
         from transformers import BertForSequenceClassification, BertTokenizerFast
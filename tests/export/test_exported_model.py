@@ -0,0 +1,117 @@
+# Copyright (c) Alibaba, Inc. and its affiliates.
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from collections import OrderedDict
+
+import json
+import torch
+from torch import nn
+
+from modelscope.exporters import ExportedModel, TorchModelExporter
+from modelscope.exporters.builder import EXPORTERS
+from modelscope.models import Model
+from modelscope.models.base import TorchModel
+from modelscope.outputs import OutputKeys
+from modelscope.utils.constant import Backends, Frameworks, ModelFile
+from modelscope.utils.test_utils import test_level
+
+_TASK = 'dummy-export-task'
+_MODEL = 'dummy-export-model'
+
+
+class _LinearModel(TorchModel):
+
+    def __init__(self, model_dir):
+        super().__init__(model_dir)
+        self.linear = nn.Linear(4, 3)
+
+    def forward(self, input):
+        return {OutputKeys.LOGITS: self.linear(input)}
+
+
+@EXPORTERS.register_module(_TASK, module_name=_MODEL)
+class _LinearModelExporter(TorchModelExporter):
+
+    def generate_dummy_inputs(self, **kwargs):
+        return {'input': torch.randn(2, 4)}
+
+    @property
+    def inputs(self):
+        return OrderedDict([('input', {0: 'batch'})])
+
+    @property
+    def outputs(self):
+        return OrderedDict([(OutputKeys.LOGITS, {0: 'batch'})])
+
+
+class ExportedModelTest(unittest.TestCase):
+
+    def setUp(self):
+        print(('Testing %s.%s' % (type(self).__name__, self._testMethodName)))
+        self.model_dir = tempfile.mkdtemp()
+        with open(os.path.join(self.model_dir, ModelFile.CONFIGURATION),
+                  'w') as f:
+            json.dump(
+                {
+                    'framework': Frameworks.torch,
+                    'task': _TASK,
+                    'model': {
+                        'type': _MODEL
+                    }
+                }, f)
+        torch.manual_seed(0)
+        self.model = _LinearModel(self.model_dir)
+        self._save_checkpoint()
+        self.inputs = torch.randn(5, 4)
+
+    def tearDown(self):
+        shutil.rmtree(self.model_dir)
+        super().tearDown()
+
+    def _save_checkpoint(self):
+        checkpoint = os.path.join(self.model_dir,
+                                  ModelFile.TORCH_MODEL_BIN_FILE)
+        torch.save(self.model.state_dict(), checkpoint)
+        # a new mtime even if saved within the timestamp resolution
+        mtime = time.time() + len(os.listdir(self.model_dir))
+        os.utime(checkpoint, (mtime, mtime))
+
+    def _export(self):
+        # the outputs are compared with the torch model below
+        return ExportedModel(
+            self.model, Backends.torchscript, validation=False)
+
+    def _assert_outputs_equal(self, exported_model):
+        with torch.no_grad():
+            expected = self.model(self.inputs)[OutputKeys.LOGITS]
+        torch.testing.assert_close(
+            exported_model(self.inputs)[OutputKeys.LOGITS], expected)
+
+    @unittest.skipUnless(test_level() >= 0, 'skip test in current test level')
+    def test_torch_script(self):
+        exported_model = self._export()
+        self.assertIsInstance(exported_model, Model)
+        # exported on the first use
+        self.assertFalse(os.path.exists(exported_model.model_file))
+        self._assert_outputs_equal(exported_model)
+        self.assertTrue(os.path.isfile(exported_model.model_file))
+
+        # the cached file is loaded while the checkpoint is not changed
+        mtime = os.path.getmtime(exported_model.model_file)
+        exported_model = self._export()
+        self._assert_outputs_equal(exported_model)
+        self.assertEqual(os.path.getmtime(exported_model.model_file), mtime)
+
+        # and exported again with the new weights
+        with torch.no_grad():
+            self.model.linear.weight.mul_(2)
+        self._save_checkpoint()
+        exported_model = self._export()
+        self._assert_outputs_equal(exported_model)
+
+
+if __name__ == '__main__':
+    unittest.main()
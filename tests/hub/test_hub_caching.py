@@ -0,0 +1,125 @@
+# Copyright (c) Alibaba, Inc. and its affiliates.
+
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from modelscope.hub.snapshot_download import get_cached_snapshot
+from modelscope.hub.utils.caching import FileSystemCache, ModelFileSystemCache
+
+
+class ModelFileSystemCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_root = tempfile.mkdtemp()
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_root)
+        shutil.rmtree(self.tmp_dir)
+
+    def _put(self, cache, path, revision):
+        temp_file = os.path.join(self.tmp_dir, os.path.basename(path))
+        with open(temp_file, 'w') as f:
+            f.write(revision)
+        return cache.put_file({'Path': path, 'Revision': revision}, temp_file)
+
+    def _read_index(self):
+        index_file = os.path.join(self.cache_root, 'damo', 'model',
+                                  FileSystemCache.KEY_FILE_NAME)
+        with open(index_file, 'rb') as f:
+            return pickle.load(f)
+
+    def test_put_and_lookup(self):
+        cache = ModelFileSystemCache(self.cache_root, 'damo', 'model')
+        self._put(cache, 'a/config.json', 'abcdef')
+        self._put(cache, 'a/config.json', '123456')
+        self.assertEqual(len(cache.cached_files), 1)
+        self.assertTrue(
+            cache.exists({
+                'Path': 'a/config.json',
+                'Revision': '123'
+            }))
+        self.assertFalse(
+            cache.exists({
+                'Path': 'a/config.json',
+                'Revision': 'abcdef'
+            }))
+        self.assertIsNotNone(cache.get_file_by_path('a/config.json'))
+        self.assertIsNotNone(
+            cache.get_file_by_info({
+                'Path': 'a/config.json',
+                'Revision': '123456'
+            }))
+        self.assertEqual(self._read_index(), [{
+            'Path': 'a/config.json',
+            'Revision': '123456'
+        }])
+
+    def test_batch_commit(self):
+        cache = ModelFileSystemCache(self.cache_root, 'damo', 'model')
+        with cache.batch_commit():
+            self._put(cache, 'model.bin', 'r1')
+            self._put(cache, 'config.json', 'r1')
+            self.assertFalse(
+                os.path.exists(
+                    os.path.join(cache.get_root_location(),
+                                 FileSystemCache.KEY_FILE_NAME)))
+        self.assertEqual(len(self._read_index()), 2)
+
+    def test_merge_concurrent_updates(self):
+        cache1 = ModelFileSystemCache(self.cache_root, 'damo', 'model')
+        cache2 = ModelFileSystemCache(self.cache_root, 'damo', 'model')
+        self._put(cache1, 'model.bin', 'r1')
+        self._put(cache2, 'config.json', 'r1')
+        paths = sorted(key['Path'] for key in self._read_index())
+        self.assertEqual(paths, ['config.json', 'model.bin'])
+        cache1.load_cache()
+        self.assertEqual(len(cache1.cached_files), 2)
+
+    def test_revision_manifest(self):
+        cache = ModelFileSystemCache(self.cache_root, 'damo', 'model')
+        self._put(cache, 'model.bin', 'c1')
+        model_files = [{
+            'Path': 'model.bin',
+            'Revision': 'c1',
+            'Sha256': None,
+            'Size': 2,
+            'Type': 'blob'
+        }, {
+            'Path': 'sub',
+            'Revision': 'c1',
+            'Type': 'tree'
+        }]
+        cache.save_revision_manifest('v1.0.0', 'v1.0.0', model_files, True)
+        cache.save_revision_manifest('master', 'master', model_files, False)
+
+        manifest = cache.get_revision_manifest('v1.0.0')
+        self.assertEqual(len(manifest['Files']), 1)
+        self.assertTrue(cache.is_snapshot_cached(manifest))
+        self.assertIsNone(cache.get_revision_manifest('master'))
+        self.assertIsNotNone(
+            cache.get_revision_manifest('master', ttl_seconds=60))
+        self.assertIsNone(cache.get_revision_manifest('v2.0.0'))
+
+        # the default revision is resolved again by a new version of the library
+        cache.save_revision_manifest(None, 'v1.0.0', model_files, True)
+        self.assertIsNotNone(cache.get_revision_manifest(None))
+        with mock.patch('modelscope.hub.utils.caching.__version__', '99.0.0'):
+            self.assertIsNone(cache.get_revision_manifest(None))
+
+        self.assertEqual(
+            get_cached_snapshot('damo/model', 'v1.0.0', self.cache_root),
+            cache.get_root_location())
+        self.assertIsNone(
+            get_cached_snapshot('damo/model', 'master', self.cache_root))
+        os.remove(os.path.join(cache.get_root_location(), 'model.bin'))
+        self.assertIsNone(
+            get_cached_snapshot('damo/model', 'v1.0.0', self.cache_root))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+# Copyright (c) Alibaba, Inc. and its affiliates.
+
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import json
+
+from modelscope.hub import file_download
+from modelscope.hub.file_download import http_get_file
+
+FILE_CONTENT = os.urandom(3 * 1024 * 1024 + 17)
+
+
+class RangeRequestHandler(BaseHTTPRequestHandler):
+    """A local stand-in of the file server, supporting http Range requests.
+    """
+    support_range = True
+    range_headers = []
+
+    def do_GET(self):
+        start, end = 0, len(FILE_CONTENT) - 1
+        range_header = self.headers.get('Range')
+        self.range_headers.append(range_header)
+        if range_header is not None and self.support_range:
+            match = re.match(r'bytes=(\d+)-(\d*)', range_header)
+            start = int(match.group(1))
+            if match.group(2):
+                end = min(int(match.group(2)), end)
+            if start > end:
+                self.send_response(416)
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header(
+                'Content-Range', 'bytes %d-%d/%d' %
+                (start, end, len(FILE_CONTENT)))
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+        self.wfile.write(FILE_CONTENT[start:end + 1])
+
+    def log_message(self, *args):
+        pass
+
+
+class DownloadEngineTest(unittest.TestCase):
+
+    def setUp(self):
+        RangeRequestHandler.support_range = True
+        RangeRequestHandler.range_headers = []
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0),
+                                          RangeRequestHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = 'http://127.0.0.1:%d/file' % self.server.server_port
+        self.tmp_dir = tempfile.mkdtemp()
+        self.expected_sha256 = hashlib.sha256(FILE_CONTENT).hexdigest()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmp_dir)
+
+    def _read(self, file_name):
+        with open(os.path.join(self.tmp_dir, file_name), 'rb') as f:
+            return f.read()
+
+    def test_stream_download(self):
+        sha256 = http_get_file(
+            self.url, self.tmp_dir, 'file', cookies=None, parallels=1)
+        self.assertEqual(sha256, self.expected_sha256)
+        self.assertEqual(self._read('file'), FILE_CONTENT)
+
+    def test_resume_download(self):
+        with open(os.path.join(self.tmp_dir, 'file.incomplete'), 'wb') as f:
+            f.write(FILE_CONTENT[:1000])
+        sha256 = http_get_file(
+            self.url, self.tmp_dir, 'file', cookies=None, parallels=1)
+        self.assertEqual(sha256, self.expected_sha256)
+        self.assertEqual(self._read('file'), FILE_CONTENT)
+
+    def _parallel_download(self):
+        with mock.patch.object(file_download,
+                               'MODELSCOPE_PARALLEL_DOWNLOAD_THRESHOLD_MB', 1):
+            return http_get_file(
+                self.url,
+                self.tmp_dir,
+                'file',
+                cookies=None,
+                parallels=4,
+                file_size=len(FILE_CONTENT))
+
+    def test_parallel_download(self):
+        # an interrupted download with 100 bytes of the second range written
+        temp_path = os.path.join(self.tmp_dir, 'file.incomplete')
+        part_size = (len(FILE_CONTENT) + 3) // 4
+        with open(temp_path, 'wb') as f:
+            f.truncate(len(FILE_CONTENT))
+            f.seek(part_size)
+            f.write(FILE_CONTENT[part_size:part_size + 100])
+        with open(temp_path + '.ranges', 'w') as f:
+            json.dump({'total': len(FILE_CONTENT), 'done': [0, 100, 0, 0]}, f)
+        sha256 = self._parallel_download()
+        self.assertEqual(sha256, self.expected_sha256)
+        self.assertEqual(self._read('file'), FILE_CONTENT)
+        self.assertFalse(os.path.exists(temp_path + '.ranges'))
+        # only the rest of the second range is requested again
+        self.assertEqual(
+            sorted(RangeRequestHandler.range_headers),
+            sorted([
+                'bytes=0-%d' % (part_size - 1),
+                'bytes=%d-%d' % (part_size + 100, 2 * part_size - 1),
+                'bytes=%d-%d' % (2 * part_size, 3 * part_size - 1),
+                'bytes=%d-%d' % (3 * part_size, len(FILE_CONTENT) - 1)
+            ]))
+
+    def test_parallel_download_without_range(self):
+        RangeRequestHandler.support_range = False
+        sha256 = self._parallel_download()
+        self.assertEqual(sha256, self.expected_sha256)
+        self.assertEqual(self._read('file'), FILE_CONTENT)
+        self.assertFalse(
+            os.path.exists(
+                os.path.join(self.tmp_dir, 'file.incomplete.ranges')))
+
+    def test_concurrent_download(self):
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(self._parallel_download()))
+            for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [self.expected_sha256] * 3)
+        self.assertEqual(self._read('file'), FILE_CONTENT)
+
+
+if __name__ == '__main__':
+    unittest.main()
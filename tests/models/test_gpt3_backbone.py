@@ -0,0 +1,74 @@
+# Copyright (c) Alibaba, Inc. and its affiliates.
+
+import unittest
+from unittest import mock
+
+import torch
+
+from modelscope.models.nlp.gpt3 import GPT3Config, GPT3Model
+from modelscope.models.nlp.gpt3.backbone import InferenceParams
+
+
+class GPT3BackboneTest(unittest.TestCase):
+
+    def setUp(self):
+        config = GPT3Config(
+            vocab_size=100,
+            hidden_size=32,
+            num_hidden_layers=2,
+            num_attention_heads=4,
+            max_position_embeddings=64)
+        torch.manual_seed(0)
+        self.model = GPT3Model(config).eval()
+
+    def test_incremental_decoding(self):
+        input_ids = torch.randint(0, 100, (2, 12))
+        with torch.no_grad():
+            logits = self.model(input_ids).logits
+            inference_params = InferenceParams(2, 64)
+            # the prefix in one step, then one token per step
+            outputs = [
+                self.model(
+                    input_ids[:, :5], inference_params=inference_params).logits
+            ]
+            for i in range(5, 12):
+                inputs = self.model.prepare_inputs_for_generation(
+                    input_ids[:, :i + 1], past_key_values=inference_params)
+                self.assertEqual(inputs['input_ids'].size(1), 1)
+                outputs.append(self.model(**inputs).logits)
+        self.assertEqual(inference_params.sequence_len_offset, 12)
+        self.assertTrue(
+            torch.allclose(logits, torch.cat(outputs, dim=1), atol=1e-5))
+
+    def test_generate_with_cache(self):
+        input_ids = torch.randint(0, 100, (2, 6))
+        forward = self.model.forward
+        lengths = []
+
+        def counting_forward(input_ids, **kwargs):
+            lengths.append(input_ids.size(1))
+            return forward(input_ids, **kwargs)
+
+        for num_beams in [1, 3]:
+            expected = self.model.generate(
+                inputs=input_ids,
+                do_sample=False,
+                max_length=16,
+                num_beams=num_beams,
+                use_cache=False)
+            lengths.clear()
+            with mock.patch.object(self.model, 'forward', counting_forward):
+                output = self.model.generate(
+                    inputs=input_ids,
+                    do_sample=False,
+                    max_length=16,
+                    num_beams=num_beams,
+                    use_cache=True)
+            self.assertTrue(torch.equal(output, expected))
+            # the prompt in the first step, then one token per step
+            self.assertEqual(lengths[0], 6)
+            self.assertTrue(all(length == 1 for length in lengths[1:]))
+
+
+if __name__ == '__main__':
+    unittest.main()
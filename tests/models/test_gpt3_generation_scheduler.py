@@ -0,0 +1,88 @@
+# Copyright (c) Alibaba, Inc. and its affiliates.
+
+import unittest
+
+import torch
+
+from modelscope.models.nlp.gpt3 import GPT3Config, GPT3Model
+from modelscope.models.nlp.gpt3.generation_scheduler import (
+    ContinuousBatchingScheduler, GenerationRequest)
+
+
+class ContinuousBatchingSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        config = GPT3Config(
+            vocab_size=50,
+            hidden_size=32,
+            num_hidden_layers=2,
+            num_attention_heads=4,
+            max_position_embeddings=64)
+        torch.manual_seed(0)
+        # double precision to keep the greedy search stable between the batched
+        # and the unbatched forward of the small random model
+        self.model = GPT3Model(config).double().eval()
+
+    def _forward_step(self, tokens, visible_mask, position_ids,
+                      inference_params):
+        return self.model(
+            tokens,
+            visible_mask,
+            position_ids,
+            inference_params=inference_params).logits
+
+    def _greedy(self, tokens, tokens_to_generate, eod_id):
+        tokens = list(tokens)
+        for _ in range(tokens_to_generate):
+            logits = self.model(torch.tensor([tokens])).logits
+            tokens.append(logits[0, -1].argmax().item())
+            if tokens[-1] == eod_id:
+                break
+        return tokens
+
+    def test_continuous_batching(self):
+        prompts = [[1, 2, 3], [4, 5, 6, 7, 8, 9], [10], [11, 12, 13, 14],
+                   [15, 16]]
+        lengths = [6, 3, 10, 4, 8]
+        requests = [
+            GenerationRequest(p, tokens_to_generate=n, top_k=1)
+            for p, n in zip(prompts, lengths)
+        ]
+        # a small memory to admit the requests in several steps and compact it
+        scheduler = ContinuousBatchingScheduler(
+            self._forward_step,
+            max_batch_size=2,
+            max_sequence_len=24,
+            eod_id=0)
+        with torch.no_grad():
+            scheduler.run(requests)
+            expected = [
+                self._greedy(p, n, eod_id=0) for p, n in zip(prompts, lengths)
+            ]
+        self.assertFalse(scheduler.has_unfinished_requests())
+        for request, tokens in zip(requests, expected):
+            self.assertTrue(request.done)
+            self.assertEqual(request.tokens, tokens)
+
+    def test_add_request_between_steps(self):
+        scheduler = ContinuousBatchingScheduler(
+            self._forward_step,
+            max_batch_size=4,
+            max_sequence_len=32,
+            eod_id=0)
+        first = GenerationRequest([1, 2, 3], tokens_to_generate=5, top_k=1)
+        second = GenerationRequest([4, 5], tokens_to_generate=5, top_k=1)
+        finished = []
+        with torch.no_grad():
+            scheduler.add_request(first)
+            finished.extend(scheduler.step())
+            scheduler.add_request(second)
+            while scheduler.has_unfinished_requests():
+                finished.extend(scheduler.step())
+            self.assertEqual(second.tokens,
+                             self._greedy([4, 5], 5, eod_id=0))
+        self.assertEqual(finished, [first, second])
+
+
+if __name__ == '__main__':
+    unittest.main()
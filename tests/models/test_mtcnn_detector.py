@@ -0,0 +1,151 @@
+# Copyright (c) Alibaba, Inc. and its affiliates.
+
+import math
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import torch
+from PIL import Image
+
+from modelscope.models.cv.face_detection.mtcnn import MtcnnFaceDetector
+from modelscope.models.cv.face_detection.mtcnn.models.box_utils import (
+    _preprocess, get_image_boxes)
+from modelscope.models.cv.face_detection.mtcnn.models.first_stage import (
+    _RESIZE_KWARGS, _generate_bboxes, _output_size, pack_pyramid,
+    pyramid_scales, run_first_stage)
+from modelscope.models.cv.face_detection.mtcnn.models.get_nets import (ONet,
+                                                                       PNet,
+                                                                       RNet)
+from modelscope.utils.cv.boxes import batched_nms
+
+
+def random_nets(model_dir):
+    """Save the random weights of P-Net, R-Net and O-Net to `model_dir`."""
+    torch.manual_seed(0)
+    for name, cls in [('pnet', PNet), ('rnet', RNet), ('onet', ONet)]:
+        with mock.patch('numpy.load'), mock.patch.object(
+                cls, 'named_parameters', return_value=[]):
+            net = cls()
+        weights = {n: p.detach().numpy() for n, p in net.state_dict().items()}
+        np.save(os.path.join(model_dir, f'{name}.npy'), weights)
+
+
+class MtcnnDetectorTest(unittest.TestCase):
+
+    def setUp(self):
+        print(('Testing %s.%s' % (type(self).__name__, self._testMethodName)))
+        self.tmp_dir = tempfile.mkdtemp()
+        random_nets(self.tmp_dir)
+        self.detector = MtcnnFaceDetector(self.tmp_dir, device='cpu')
+        rng = np.random.RandomState(0)
+        self.images = [
+            rng.randint(0, 256, (60, 80, 3)).astype(np.uint8),
+            rng.randint(0, 256, (48, 40, 3)).astype(np.uint8)
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+        super().tearDown()
+
+    def test_pack_pyramid(self):
+        torch.manual_seed(0)
+        sizes = [(37, 45), (26, 31), (19, 23), (13, 16), (12, 12)]
+        levels = [torch.rand(3, h, w) * 2 - 1 for h, w in sizes]
+        offsets, canvas_size = pack_pyramid(sizes)
+        canvas = torch.zeros(1, 3, *canvas_size)
+        for level, (y, x) in zip(levels, offsets):
+            self.assertEqual((y % 2, x % 2), (0, 0))
+            canvas[0, :, y:y + level.shape[1], x:x + level.shape[2]] = level
+
+        with torch.no_grad():
+            packed = self.detector.pnet(canvas)
+            for level, (y, x) in zip(levels, offsets):
+                expected = self.detector.pnet(level[None])
+                # the cells of the full windows, the last cell of an odd
+                # sized level sees the padding in place of the max pooling
+                oh = _output_size(level.shape[1] - 1)
+                ow = _output_size(level.shape[2] - 1)
+                y, x = y // 2, x // 2
+                for output, expected_output in zip(packed, expected):
+                    torch.testing.assert_close(output[..., y:y + oh, x:x + ow],
+                                               expected_output[..., :oh, :ow])
+
+    def test_run_first_stage(self):
+        img = torch.from_numpy(self.images[0]).permute(2, 0, 1).float()
+        height, width = img.shape[-2:]
+        boxes = []
+        with torch.no_grad():
+            for level, scale in enumerate(
+                    pyramid_scales(height, width, min_face_size=10)):
+                sh, sw = math.ceil(height * scale), math.ceil(width * scale)
+                level_img = torch.nn.functional.interpolate(
+                    img[None],
+                    size=(sh, sw),
+                    mode='bilinear',
+                    align_corners=False,
+                    **_RESIZE_KWARGS)
+                offsets, probs = self.detector.pnet(_preprocess(level_img))
+                if level >= 2:
+                    # the packed levels keep the cells of the full windows
+                    oh = _output_size(sh - sh % 2)
+                    ow = _output_size(sw - sw % 2)
+                    offsets = offsets[..., :oh, :ow]
+                    probs = probs[..., :oh, :ow]
+                level_boxes = _generate_bboxes(probs[0, 1].numpy(),
+                                               offsets.numpy(), scale, 0.4)
+                if len(level_boxes) > 0:
+                    boxes.append((level, level_boxes))
+        levels = np.concatenate([np.full(len(b), level) for level, b in boxes])
+        expected = np.vstack([b for _, b in boxes])
+        keep = batched_nms(
+            expected[:, :4], expected[:, 4], levels, 0.5, offset=1)
+
+        actual = run_first_stage([img],
+                                 self.detector.pnet,
+                                 0.4,
+                                 min_face_size=10)[0]
+        np.testing.assert_allclose(
+            actual, expected[keep], rtol=1e-4, atol=1e-5)
+
+    def test_get_image_boxes(self):
+        img = self.images[0]
+        boxes = np.array([[10, 5, 29, 24, 1.], [30, 20, 65, 55, 1.]])
+        cutouts = get_image_boxes(
+            boxes, torch.from_numpy(img).permute(2, 0, 1).float(), size=24)
+        self.assertEqual(cutouts.shape, (2, 3, 24, 24))
+        for box, cutout in zip(boxes.astype(int), cutouts):
+            x1, y1, x2, y2 = box[:4]
+            expected = Image.fromarray(img[y1:y2 + 1, x1:x2 + 1]).resize(
+                (24, 24), Image.BILINEAR)
+            expected = _preprocess(
+                torch.from_numpy(np.asarray(expected, dtype=np.float32)))
+            diff = (cutout.permute(1, 2, 0) - expected).abs()
+            self.assertLess(diff.mean().item(), 0.1)
+
+    def test_detect_batch(self):
+        thresholds = (0.4, 0.4, 0.4)
+        results = self.detector.detect(self.images, thresholds=thresholds)
+        self.assertEqual(len(results), 2)
+        for img, (boxes, landmarks) in zip(self.images, results):
+            expected_boxes, expected_landmarks = self.detector.detect(
+                [img], thresholds=thresholds)[0]
+            np.testing.assert_allclose(boxes, expected_boxes, rtol=1e-5)
+            np.testing.assert_allclose(
+                landmarks, expected_landmarks, rtol=1e-5)
+
+        results = self.detector({'img': self.images})
+        self.assertEqual(len(results), 2)
+        boxes, landmarks = self.detector({'img': self.images[1]})
+        self.assertEqual((boxes.shape[1], landmarks.shape[1]), (5, 10))
+        boxes, landmarks = self.detector.detect([self.images[0]],
+                                                thresholds=(1.1, 1.1, 1.1))[0]
+        self.assertEqual(boxes.shape, (0, 5))
+        self.assertEqual(landmarks.shape, (0, 10))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+# Copyright (c) Alibaba, Inc. and its affiliates.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from modelscope.models.audio.tts.models.datasets.units import \
+    KanTtsLinguisticUnit
+
+UNITS = {
+    'sy': ['ka', 'ni'],
+    'tone': ['tone1', 'tone2'],
+    'syllable_flag': ['s_begin', 's_end'],
+    'word_segment': ['word_begin', 'word_end'],
+    'emo_category': ['emotion_neutral', 'emotion_happy'],
+    'speaker_category': ['F7', 'M7'],
+}
+
+
+class KanTtsLinguisticUnitTest(unittest.TestCase):
+
+    def setUp(self):
+        print(('Testing %s.%s' % (type(self).__name__, self._testMethodName)))
+        self.tmp_dir = tempfile.mkdtemp()
+        config = {
+            'cleaners': 'english_cleaners',
+            'lfeat_type_list': ','.join(UNITS.keys()),
+        }
+        for name, entries in UNITS.items():
+            config[name] = f'{name}_dict.txt'
+            with open(os.path.join(self.tmp_dir, config[name]), 'w') as f:
+                f.write('\n'.join(entries))
+        self.unit = KanTtsLinguisticUnit(config, self.tmp_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+        super().tearDown()
+
+    def test_dummy_symbol_sequence(self):
+        symbols = self.unit.dummy_symbol_sequence(3)
+        self.assertEqual(
+            symbols.split(' ')[0],
+            '{ka$tone1$s_begin$word_begin$emotion_neutral$F7}')
+        feats = self.unit.encode_symbol_sequence(symbols)
+        self.assertEqual(len(feats), len(UNITS))
+        for feat in feats:
+            # the symbols and the eos
+            self.assertEqual(len(feat), 4)
+        self.assertEqual(feats[0].tolist(), [self.unit.sy.index('@ka')] * 3
+                         + [self.unit.sy.index('~')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,14 +1,25 @@
 # Copyright (c) Alibaba, Inc. and its affiliates.
 
+import os
+import shutil
+import tempfile
+import time
 import unittest
 from typing import Any, Dict, Union
+from unittest import mock
 
+import json
 import numpy as np
+import torch
 from PIL import Image
+from torch import nn
 
+from modelscope.models.base import TorchModel
 from modelscope.outputs import OutputKeys
 from modelscope.pipelines import Pipeline, pipeline
+from modelscope.pipelines.base import batch_collate_fn, split_batch
 from modelscope.pipelines.builder import PIPELINES, add_default_pipeline_info
+from modelscope.utils.constant import Frameworks, ModelFile
 from modelscope.utils.logger import get_logger
 
 logger = get_logger()
@@ -16,6 +27,50 @@ logger = get_logger()
 Input = Union[str, 'PIL.Image', 'numpy.ndarray']
 
 
+class _PoolingModel(TorchModel):
+
+    def __init__(self, model_dir):
+        super().__init__(model_dir)
+        self.embedding = nn.Embedding(10, 8)
+        self.classifier = nn.Linear(8, 3)
+        self.forward_sizes = []
+
+    def forward(self, input_ids, attention_mask):
+        self.forward_sizes.append(len(input_ids))
+        mask = attention_mask.unsqueeze(-1).float()
+        hidden = (self.embedding(input_ids) * mask).sum(1) / mask.sum(1)
+        return {OutputKeys.LOGITS: self.classifier(hidden)}
+
+
+class _PoolingPipeline(Pipeline):
+    """Classify a string of digits, the tokenized samples are padded and masked
+    in micro batches."""
+
+    group_key = 'dummy-batch-task'
+    _support_batch = True
+    _batch_padding_keys = ('input_ids', 'attention_mask')
+    _preprocessing = False
+
+    def preprocess(self, input: str) -> Dict[str, Any]:
+        # like a fast tokenizer, which fails if called by multiple threads
+        if self._preprocessing and not self._thread_safe_preprocess:
+            raise RuntimeError('Already borrowed')
+        self._preprocessing = True
+        time.sleep(0.01)
+        self._preprocessing = False
+        input_ids = torch.tensor([[int(c) for c in input]])
+        return {
+            'input_ids': input_ids,
+            'attention_mask': torch.ones_like(input_ids)
+        }
+
+    def forward(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        return self.model(**inputs)
+
+    def postprocess(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        return {OutputKeys.LOGITS: inputs[OutputKeys.LOGITS][0]}
+
+
 class CustomPipelineTest(unittest.TestCase):
 
     def test_abstract(self):
@@ -90,6 +145,145 @@ class CustomPipelineTest(unittest.TestCase):
             self.assertEqual(out['filename'], img_url)
             self.assertEqual(out[OutputKeys.OUTPUT_IMG].shape, (318, 512, 3))
 
+        outputs = pipe([img_url for i in range(4)], num_workers=2)
+        self.assertEqual(len(outputs), 4)
+        for out in outputs:
+            self.assertEqual(out['filename'], img_url)
+            self.assertEqual(out[OutputKeys.OUTPUT_IMG].shape, (318, 512, 3))
+
+
+class BatchCollateTest(unittest.TestCase):
+
+    def test_batch_and_split(self):
+        samples = [{
+            'input_ids': torch.ones(1, 3, dtype=torch.long),
+            'task': 'cls'
+        }, {
+            'input_ids': np.ones((2, 5), dtype=np.int64),
+            'task': 'cls'
+        }]
+        batch, sizes = batch_collate_fn(
+            samples, torch.device('cpu'), padding_keys=('input_ids', ))
+        self.assertEqual(sizes, [1, 2])
+        self.assertEqual(tuple(batch['input_ids'].shape), (3, 5))
+        self.assertEqual(batch['input_ids'][0, 3:].sum().item(), 0)
+        self.assertEqual(batch['task'], 'cls')
+
+        outputs = {'logits': torch.rand(3, 2), 'hidden': (torch.rand(3, 4), )}
+        outputs = split_batch(outputs, sizes)
+        self.assertEqual(len(outputs), 2)
+        self.assertEqual(tuple(outputs[0]['logits'].shape), (1, 2))
+        self.assertEqual(tuple(outputs[1]['hidden'][0].shape), (2, 4))
+
+    def test_unbatchable(self):
+        with self.assertRaises(ValueError):
+            batch_collate_fn([{
+                'input_ids': torch.ones(1, 3),
+                'text': 'a'
+            }, {
+                'input_ids': torch.ones(1, 3),
+                'text': 'b'
+            }], torch.device('cpu'))
+        # images of different sizes are not padded into one batch
+        with self.assertRaises(ValueError):
+            batch_collate_fn([{
+                'img': np.zeros((100, 120, 3))
+            }, {
+                'img': np.zeros((80, 150, 3))
+            }], torch.device('cpu'))
+        with self.assertRaises(ValueError):
+            batch_collate_fn([{
+                'input_ids': torch.ones(1, 3),
+                'pixels': torch.ones(2, 3)
+            }], torch.device('cpu'))
+        with self.assertRaises(ValueError):
+            split_batch({'logits': torch.rand(4, 2)}, [1, 2])
+
+
+class BatchPipelineTest(unittest.TestCase):
+
+    def setUp(self):
+        print(('Testing %s.%s' % (type(self).__name__, self._testMethodName)))
+        self.tmp_dir = tempfile.mkdtemp()
+        with open(os.path.join(self.tmp_dir, ModelFile.CONFIGURATION),
+                  'w') as f:
+            json.dump({'framework': Frameworks.torch}, f)
+        torch.manual_seed(0)
+        self.model = _PoolingModel(self.tmp_dir)
+        self.pipeline = _PoolingPipeline(model=self.model, device='cpu')
+        self.inputs = ['123', '45', '6789012', '1', '3141']
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+        super().tearDown()
+
+    def assertOutputsEqual(self, outputs, expected):
+        self.assertEqual(len(outputs), len(expected))
+        for output, expected_output in zip(outputs, expected):
+            torch.testing.assert_close(output[OutputKeys.LOGITS],
+                                       expected_output[OutputKeys.LOGITS])
+
+    def test_batch_size(self):
+        expected = [self.pipeline(input) for input in self.inputs]
+        self.model.forward_sizes.clear()
+        outputs = self.pipeline(self.inputs, batch_size=2)
+        self.assertEqual(self.model.forward_sizes, [2, 2, 1])
+        self.assertOutputsEqual(outputs, expected)
+
+    def test_fallback(self):
+        expected = [self.pipeline(input) for input in self.inputs]
+        # the samples of different lengths can not be batched without padding
+        self.pipeline._batch_padding_keys = ()
+        self.model.forward_sizes.clear()
+        outputs = self.pipeline(self.inputs, batch_size=2)
+        self.assertEqual(self.model.forward_sizes, [1] * 5)
+        self.assertOutputsEqual(outputs, expected)
+
+        self.pipeline._support_batch = False
+        self.model.forward_sizes.clear()
+        outputs = self.pipeline(self.inputs[1::2], batch_size=2)
+        self.assertEqual(self.model.forward_sizes, [1, 1])
+        self.assertOutputsEqual(outputs, expected[1::2])
+
+    def test_forward_error(self):
+        # the errors of the model are raised, not taken as unbatchable samples
+        self.model.forward = mock.Mock(side_effect=ValueError('bad input'))
+        with self.assertRaisesRegex(ValueError, 'bad input'):
+            self.pipeline(self.inputs, batch_size=2)
+        self.assertEqual(self.model.forward.call_count, 1)
+
+    def test_max_wait_ms(self):
+
+        def slow_source():
+            yield from self.inputs[:2]
+            time.sleep(0.5)
+            yield from self.inputs[2:]
+
+        expected = [self.pipeline(input) for input in self.inputs]
+        self.model.forward_sizes.clear()
+        outputs = list(
+            self.pipeline._process_batch_iterator(slow_source(), 4, None))
+        self.assertEqual(self.model.forward_sizes, [4, 1])
+        self.assertOutputsEqual(outputs, expected)
+
+        self.model.forward_sizes.clear()
+        outputs = list(
+            self.pipeline._process_batch_iterator(slow_source(), 4, 100))
+        self.assertEqual(self.model.forward_sizes, [2, 3])
+        self.assertOutputsEqual(outputs, expected)
+
+    def test_num_workers(self):
+        expected = [self.pipeline(input) for input in self.inputs]
+        inputs = self.inputs * 4
+        outputs = self.pipeline(inputs, num_workers=4)
+        self.assertOutputsEqual(outputs, expected * 4)
+        outputs = self.pipeline(inputs, num_workers=4, batch_size=2)
+        self.assertOutputsEqual(outputs, expected * 4)
+
+        self.pipeline._thread_safe_preprocess = True
+        outputs = self.pipeline(inputs, num_workers=4)
+        self.assertOutputsEqual(outputs, expected * 4)
+
 
 if __name__ == '__main__':
     unittest.main()
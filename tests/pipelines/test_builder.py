@@ -1,13 +1,17 @@
 # Copyright (c) Alibaba, Inc. and its affiliates.
 
 import os
+import threading
+import time
 import unittest
 from typing import Any, Dict, List, Union
+from unittest import mock
 
 from modelscope.fileio import io
 from modelscope.models.base import Model
-from modelscope.pipelines import Pipeline, pipeline
+from modelscope.pipelines import Pipeline, get_pipeline_cache, pipeline
 from modelscope.pipelines.builder import PIPELINES
+from modelscope.pipelines.cache import PipelineCache
 from modelscope.utils.constant import (ConfigFields, Frameworks, ModelFile,
                                        Tasks)
 from modelscope.utils.logger import get_logger
@@ -81,6 +85,80 @@ class PipelineInterfaceTest(unittest.TestCase):
             Tasks.image_classification, model=['/tmp/model1', '/tmp/model2'])
         assert isinstance(pipe, CustomMultiModelPipeline)
 
+    def test_pipeline_cache(self):
+        cache = get_pipeline_cache()
+        cache.clear()
+        pipe1 = pipeline(
+            Tasks.image_classification,
+            model='/tmp/custom_single_model',
+            use_cache=True)
+        pipe2 = pipeline(
+            Tasks.image_classification,
+            model='/tmp/custom_single_model',
+            use_cache=True)
+        pipe3 = pipeline(
+            Tasks.image_classification,
+            model='/tmp/custom_single_model',
+            device='cpu',
+            use_cache=True)
+        self.assertIs(pipe1, pipe2)
+        self.assertIsNot(pipe1, pipe3)
+        stats = cache.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['entries'], 2)
+
+        self.assertEqual(cache.evict(model='/tmp/custom_single_model'), 2)
+        self.assertEqual(len(cache), 0)
+
+    def test_pipeline_cache_model_id(self):
+        cache = get_pipeline_cache()
+        cache.clear()
+        with mock.patch('modelscope.pipelines.builder.is_official_hub_path',
+                        return_value=True), \
+                mock.patch('modelscope.pipelines.builder.snapshot_download',
+                           return_value='/tmp/custom_single_model'):
+            pipe1 = pipeline(
+                Tasks.image_classification,
+                model='damo/custom_single_model',
+                use_cache=True)
+        pipe2 = pipeline(
+            Tasks.image_classification,
+            model='/tmp/custom_single_model',
+            use_cache=True)
+        self.assertIs(pipe1, pipe2)
+        self.assertEqual(len(cache), 1)
+        cache.clear()
+
+    def test_pipeline_cache_concurrent_create(self):
+        cache = PipelineCache()
+        created = []
+        barrier = threading.Barrier(8)
+
+        def factory():
+            time.sleep(0.05)
+            created.append(object())
+            return created[-1]
+
+        def get():
+            barrier.wait()
+            results.append(cache.get_or_create('key', factory))
+
+        results = []
+        threads = [threading.Thread(target=get) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(created), 1)
+        self.assertTrue(all(r is created[0] for r in results))
+        self.assertEqual(cache._key_locks, {})
+
+        with self.assertRaises(RuntimeError):
+            cache.get_or_create('failed', mock.Mock(side_effect=RuntimeError))
+        self.assertNotIn('failed', cache)
+        self.assertEqual(cache._key_locks, {})
+
 
 if __name__ == '__main__':
     unittest.main()
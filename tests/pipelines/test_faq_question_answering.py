@@ -1,4 +1,6 @@
 # Copyright (c) Alibaba, Inc. and its affiliates.
+import os
+import tempfile
 import unittest
 
 import numpy as np
@@ -7,6 +9,7 @@ from modelscope.hub.api import HubApi
 from modelscope.hub.snapshot_download import snapshot_download
 from modelscope.models import Model
 from modelscope.models.nlp import SbertForFaqQuestionAnswering
+from modelscope.outputs import OutputKeys
 from modelscope.pipelines import pipeline
 from modelscope.pipelines.nlp import FaqQuestionAnsweringPipeline
 from modelscope.preprocessors import FaqQuestionAnsweringPreprocessor
@@ -78,6 +81,28 @@ class FaqQuestionAnsweringTest(unittest.TestCase, DemoCompatibilityCheck):
         pipeline_ins = pipeline(task=Tasks.faq_question_answering)
         print(pipeline_ins(self.param, max_seq_length=20))
 
+    @unittest.skipUnless(test_level() >= 1, 'skip test in current test level')
+    def test_run_with_registered_support_set(self):
+        pipeline_ins = pipeline(
+            task=Tasks.faq_question_answering, model=self.model_id)
+        result = pipeline_ins(self.param)
+        pipeline_ins.register_support_set(self.param['support_set'])
+        query = {'query_set': self.param['query_set']}
+        cached_result = pipeline_ins(query)
+        for output, cached_output in zip(result[OutputKeys.OUTPUT],
+                                         cached_result[OutputKeys.OUTPUT]):
+            self.assertEqual([item[OutputKeys.LABEL] for item in output],
+                             [item[OutputKeys.LABEL]
+                              for item in cached_output])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'support_set.pt')
+            pipeline_ins.save_support_set(path)
+            pipeline_ins = pipeline(
+                task=Tasks.faq_question_answering, model=self.model_id)
+            pipeline_ins.load_support_set(path)
+            self.assertEqual(pipeline_ins(query), cached_result)
+
     @unittest.skipUnless(test_level() >= 2, 'skip test in current test level')
     def test_sentence_embedding(self):
         pipeline_ins = pipeline(task=Tasks.faq_question_answering)
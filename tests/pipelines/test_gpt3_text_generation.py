@@ -1,9 +1,20 @@
 # Copyright (c) Alibaba, Inc. and its affiliates.
 import unittest
+from unittest import mock
+
+import torch
 
 from modelscope.hub.snapshot_download import snapshot_download
+from modelscope.models.nlp.gpt3 import GPT3Config, GPT3Model
+from modelscope.models.nlp.gpt3.distributed_gpt3 import DistributedGPT3
+from modelscope.models.nlp.gpt3.generation_scheduler import \
+    ContinuousBatchingScheduler
+from modelscope.outputs import OutputKeys
 from modelscope.pipelines import pipeline
-from modelscope.utils.constant import Tasks
+from modelscope.pipelines.nlp.distributed_gpt3_pipeline import \
+    DistributedGPT3Pipeline
+from modelscope.utils.constant import Frameworks, Tasks
+from modelscope.utils.device import create_device
 from modelscope.utils.test_utils import test_level
 
 
@@ -54,5 +65,114 @@ class TextGPT3GenerationTest(unittest.TestCase):
         print(pipe(self.input))
 
 
+class _ModelPool:
+    """Run the model rank in the calling process."""
+
+    def map(self, func, iterable):
+        return [func(x) for x in iterable]
+
+    def terminate(self):
+        pass
+
+
+class _RankModel:
+    """A single rank model of a small random GPT3 backbone on cpu."""
+
+    generate_batch = DistributedGPT3.generate_batch
+
+    def __init__(self, backbone):
+        self.backbone = backbone
+        self.config = backbone.config
+
+    def _scheduler_forward_step(self, tokens, visible_mask, position_ids,
+                                inference_params):
+        return self.backbone(
+            tokens,
+            visible_mask,
+            position_ids,
+            inference_params=inference_params).logits
+
+    def generate(self, tokens, **kwargs):
+        raise AssertionError('the prompts should be generated in a batch')
+
+
+class _Tokenizer:
+
+    def tokenize(self, text):
+        return [int(t) for t in text.split()]
+
+    def detokenize(self, tokens):
+        return ' '.join(str(t) for t in tokens)
+
+
+class _Preprocessor:
+
+    tokenizer = _Tokenizer()
+
+    def __call__(self, text):
+        return {'input_ids': torch.tensor([self.tokenizer.tokenize(text)])}
+
+
+class DistributedGPT3PipelineBatchTest(unittest.TestCase):
+
+    def setUp(self):
+        print(('Testing %s.%s' % (type(self).__name__, self._testMethodName)))
+        config = GPT3Config(
+            vocab_size=50,
+            hidden_size=32,
+            num_hidden_layers=2,
+            num_attention_heads=4,
+            max_position_embeddings=64,
+            eod_id=0,
+            tokens_to_generate=5,
+            top_k=1)
+        torch.manual_seed(0)
+        self.backbone = GPT3Model(config).double().eval()
+        # skip the model pool of the ranks in __init__
+        pipe = DistributedGPT3Pipeline.__new__(DistributedGPT3Pipeline)
+        pipe.preprocessor = _Preprocessor()
+        pipe._model_prepare = True
+        pipe._auto_collate = True
+        pipe.model_pool = _ModelPool()
+        pipe.world_size = 1
+        pipe.device_name = 'cpu'
+        pipe.device = create_device('cpu')
+        pipe.has_multiple_models = False
+        pipe.models = []
+        pipe.framework = Frameworks.torch
+        self.pipe = pipe
+
+    def _greedy(self, tokens, tokens_to_generate, eod_id):
+        tokens = list(tokens)
+        for _ in range(tokens_to_generate):
+            logits = self.backbone(torch.tensor([tokens])).logits
+            tokens.append(logits[0, -1].argmax().item())
+            if tokens[-1] == eod_id:
+                break
+        return tokens
+
+    @unittest.skipUnless(test_level() >= 0, 'skip test in current test level')
+    def test_continuous_batching(self):
+        prompts = ['1 2 3', '4 5 6 7 8 9', '10', '11 12 13 14']
+        run = ContinuousBatchingScheduler.run
+        with mock.patch.object(DistributedGPT3Pipeline, 'model',
+                               _RankModel(self.backbone)), \
+                mock.patch('torch.cuda.current_device', return_value='cpu'), \
+                mock.patch.object(ContinuousBatchingScheduler, 'run',
+                                  autospec=True, side_effect=run) as run:
+            outputs = self.pipe(
+                prompts, batch_size=4, max_batch_size=2, tokens_to_generate=3)
+            with torch.no_grad():
+                expected = [
+                    self._greedy([int(t) for t in p.split()], 3, eod_id=0)
+                    for p in prompts
+                ]
+        # all the prompts of the list are generated by one scheduler
+        self.assertEqual(run.call_count, 1)
+        self.assertEqual(len(run.call_args[0][1]), len(prompts))
+        self.assertEqual([output[OutputKeys.TEXT] for output in outputs],
+                         [_Tokenizer().detokenize(t) for t in expected])
+
+
 if __name__ == '__main__':
     unittest.main()
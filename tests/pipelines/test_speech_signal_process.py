@@ -3,8 +3,12 @@
 import os.path
 import unittest
 
+import numpy as np
+import torch
+
 from modelscope.metainfo import Pipelines
 from modelscope.pipelines import pipeline
+from modelscope.pipelines.audio.ans_pipeline import ANSPipeline
 from modelscope.utils.constant import Tasks
 from modelscope.utils.demo_utils import DemoCompatibilityCheck
 from modelscope.utils.test_utils import test_level
@@ -112,10 +116,75 @@ class SpeechSignalProcessTest(unittest.TestCase, DemoCompatibilityCheck):
             ans(data, output_path=output_path)
         print(f'Processed audio saved to {output_path}')
 
+    @unittest.skipUnless(test_level() >= 1, 'skip test in current test level')
+    def test_ans_stream(self):
+        import soundfile as sf
+        model_id = 'damo/speech_frcrn_ans_cirm_16k'
+        ans = pipeline(Tasks.acoustic_noise_suppression, model=model_id)
+        data, fs = sf.read(
+            os.path.join(os.getcwd(), NOISE_SPEECH_FILE), dtype='float32')
+        blocks = [data[i:i + 3200] for i in range(0, len(data), 3200)]
+        pcm = b''.join(ans.stream(blocks, segment_batch_size=4))
+        self.assertEqual(len(pcm), len(data) * 2)
+
     @unittest.skip('demo compatibility test is only enabled on a needed-basis')
     def test_demo_compatibility(self):
         self.compatibility_check()
 
 
+class _WindowModel:
+    """Scale the samples by their positions in the window, so the outputs tell
+    which window each sample is taken from."""
+
+    def __init__(self):
+        self.ramp = torch.linspace(0.5, 1.5, ANSPipeline.WINDOW)
+
+    def __call__(self, inputs):
+        return {'wav_l2': inputs['noisy'] * self.ramp}
+
+
+class ANSWindowingTest(unittest.TestCase):
+
+    def setUp(self):
+        print(('Testing %s.%s' % (type(self).__name__, self._testMethodName)))
+        # the windowing only needs the model and the device
+        self.ans = ANSPipeline.__new__(ANSPipeline)
+        self.ans.model = _WindowModel()
+        self.ans.device = torch.device('cpu')
+        rng = np.random.RandomState(0)
+        self.audio = (rng.rand(5 * ANSPipeline.WINDOW) - 0.5).astype(
+            np.float32)
+
+    def _expected(self, audio):
+        # the center of each window, and the head of the first one
+        p = np.arange(len(audio))
+        g, stride = ANSPipeline.GIVE_UP_LENGTH, ANSPipeline.STRIDE
+        window_start = np.maximum(p - g, 0) // stride * stride
+        return audio * self.ans.model.ramp.numpy()[p - window_start]
+
+    @unittest.skipUnless(test_level() >= 0, 'skip test in current test level')
+    def test_denoise_segments(self):
+        window, stride = ANSPipeline.WINDOW, ANSPipeline.STRIDE
+        for t in [1000, window, 2 * stride + 7, len(self.audio)]:
+            outputs = self.ans._denoise_segments(self.audio[:t], 4)
+            self.assertEqual(outputs.shape, (t, ))
+            np.testing.assert_allclose(
+                outputs, self._expected(self.audio[:t]), rtol=1e-6)
+
+    @unittest.skipUnless(test_level() >= 0, 'skip test in current test level')
+    def test_stream(self):
+        for t, block_size, batch_size in [(len(self.audio), 3200, 4),
+                                          (len(self.audio) - 123, 7777, 1),
+                                          (2 * ANSPipeline.STRIDE, 1000, 2),
+                                          (500, 3200, 1)]:
+            audio = self.audio[:t]
+            expected = self.ans._denoise_segments(audio, batch_size)
+            blocks = [audio[i:i + block_size] for i in range(0, t, block_size)]
+            pcm = b''.join(self.ans.stream(blocks, batch_size))
+            np.testing.assert_array_equal(
+                np.frombuffer(pcm, dtype=np.int16),
+                (expected * 32768).astype(np.int16))
+
+
 if __name__ == '__main__':
     unittest.main()
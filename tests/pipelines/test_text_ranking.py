@@ -57,6 +57,31 @@ class TextRankingTest(unittest.TestCase):
             pipeline_ins = pipeline(task=Tasks.text_ranking, model=model_id)
             print(pipeline_ins(input=self.inputs))
 
+    @unittest.skipUnless(test_level() >= 1, 'skip test in current test level')
+    def test_rerank(self):
+        for model_id in self.models:
+            pipeline_ins = pipeline(task=Tasks.text_ranking, model=model_id)
+            query = self.inputs['source_sentence'][0]
+            passages = self.inputs['sentences_to_compare']
+            scores = pipeline_ins(input=self.inputs)['scores']
+            ranking = pipeline_ins.rerank(query, passages, batch_size=2)
+            self.assertEqual([index for index, _ in ranking],
+                             sorted(
+                                 range(len(passages)),
+                                 key=lambda i: scores[i],
+                                 reverse=True))
+            for index, score in ranking:
+                self.assertAlmostEqual(score, scores[index], places=4)
+
+            ranking = pipeline_ins.rerank(
+                query,
+                passages,
+                top_k=1,
+                first_stage_scores=[0.1, 0.3, 0.2],
+                first_stage_top_m=2)
+            self.assertEqual(len(ranking), 1)
+            self.assertIn(ranking[0][0], [1, 2])
+
     @unittest.skipUnless(test_level() >= 2, 'skip test in current test level')
     def test_run_with_default_model(self):
         pipeline_ins = pipeline(task=Tasks.text_ranking)
@@ -69,6 +69,22 @@ class TextToSpeechSambertHifigan16kPipelineTest(unittest.TestCase,
             pcm = output[OutputKeys.OUTPUT_PCM]
             write('output_%s.wav' % self.en_voices[i], 16000, pcm)
 
+    @unittest.skipUnless(test_level() >= 1, 'skip test in current test level')
+    def test_pipeline_stream(self):
+        text = '今天北京天气怎么样。明天北京天气怎么样。后天呢？'
+        sambert_hifigan_tts = pipeline(
+            task=self.task, model=self.zhcn_models[-1])
+        pcm = sambert_hifigan_tts(input=text)[OutputKeys.OUTPUT_PCM]
+        chunks = [
+            output[OutputKeys.OUTPUT_PCM]
+            for output in sambert_hifigan_tts.stream(text)
+        ]
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(sum(len(chunk) for chunk in chunks), len(pcm))
+        batched_pcm = sambert_hifigan_tts(
+            input=text, sentence_batch_size=4)[OutputKeys.OUTPUT_PCM]
+        self.assertEqual(len(batched_pcm), len(pcm))
+
     @unittest.skip('demo compatibility test is only enabled on a needed-basis')
     def test_demo_compatibility(self):
         self.compatibility_check()
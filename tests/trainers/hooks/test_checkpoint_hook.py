@@ -13,6 +13,7 @@ from modelscope.metainfo import Trainers
 from modelscope.metrics.builder import METRICS, MetricKeys
 from modelscope.models.base import Model
 from modelscope.trainers import build_trainer
+from modelscope.utils.checkpoint import load_checkpoint
 from modelscope.utils.constant import LogKeys, ModelFile
 from modelscope.utils.registry import default_group
 from modelscope.utils.test_utils import create_dummy_test_dataset
@@ -135,6 +136,59 @@ class CheckpointHookTest(unittest.TestCase):
         self.assertIn(copy_src_files[0], output_files)
         self.assertIn(copy_src_files[-1], output_files)
 
+    def test_async_checkpoint_hook(self):
+        json_cfg = {
+            'task': 'image_classification',
+            'train': {
+                'work_dir': self.tmp_dir,
+                'dataloader': {
+                    'batch_size_per_gpu': 2,
+                    'workers_per_gpu': 1
+                },
+                'optimizer': {
+                    'type': 'SGD',
+                    'lr': 0.01
+                },
+                'lr_scheduler': {
+                    'type': 'StepLR',
+                    'step_size': 2
+                },
+                'hooks': [{
+                    'type': 'CheckpointHook',
+                    'interval': 1,
+                    'async_save': True,
+                    'max_keep': 2
+                }]
+            }
+        }
+
+        config_path = os.path.join(self.tmp_dir, ModelFile.CONFIGURATION)
+        with open(config_path, 'w') as f:
+            json.dump(json_cfg, f)
+
+        trainer_name = Trainers.default
+        kwargs = dict(
+            cfg_file=config_path,
+            model=DummyModel(),
+            data_collator=None,
+            train_dataset=dummy_dataset,
+            max_epochs=3)
+
+        trainer = build_trainer(trainer_name, kwargs)
+        trainer.train()
+        results_files = os.listdir(self.tmp_dir)
+        self.assertNotIn(f'{LogKeys.EPOCH}_1.pth', results_files)
+        self.assertIn(f'{LogKeys.EPOCH}_2.pth', results_files)
+        self.assertIn(f'{LogKeys.EPOCH}_3.pth', results_files)
+        self.assertFalse(any(f.endswith('.tmp') for f in results_files))
+
+        model = DummyModel()
+        meta = load_checkpoint(
+            os.path.join(self.tmp_dir, f'{LogKeys.EPOCH}_3.pth'), model)
+        self.assertEqual(meta['epoch'], 2)
+        for key, val in trainer.model.state_dict().items():
+            self.assertTrue(torch.equal(model.state_dict()[key], val))
+
 
 class BestCkptSaverHookTest(unittest.TestCase):
 
@@ -438,6 +438,62 @@ class TrainerTest(unittest.TestCase):
         for i in [2, 5, 8]:
             self.assertIn(MetricKeys.ACCURACY, lines[i])
 
+    @unittest.skipUnless(test_level() >= 0, 'skip test in current test level')
+    def test_resume_skip_ahead(self):
+        json_cfg = {
+            'task': Tasks.image_classification,
+            'train': {
+                'work_dir': self.tmp_dir,
+                'dataloader': {
+                    'batch_size_per_gpu': 2,
+                    'workers_per_gpu': 0
+                },
+                'hooks': [{
+                    'type': 'CheckpointHook',
+                    'interval': 3,
+                    'by_epoch': False
+                }]
+            }
+        }
+        config_path = os.path.join(self.tmp_dir, ModelFile.CONFIGURATION)
+        with open(config_path, 'w') as f:
+            json.dump(json_cfg, f)
+
+        class RecordedDataset(torch.utils.data.Dataset):
+
+            def __init__(self):
+                self.indices = []
+
+            def __len__(self):
+                return len(dummy_dataset_small)
+
+            def __getitem__(self, index):
+                self.indices.append(index)
+                return dummy_dataset_small[index]
+
+        def _build_trainer(dataset):
+            model = DummyModel()
+            optimmizer = SGD(model.parameters(), lr=0.01)
+            lr_scheduler = StepLR(optimmizer, 2)
+            return build_trainer(
+                Trainers.default,
+                dict(
+                    cfg_file=config_path,
+                    model=model,
+                    data_collator=None,
+                    optimizers=(optimmizer, lr_scheduler),
+                    train_dataset=dataset,
+                    max_epochs=2,
+                    device='cpu'))
+
+        _build_trainer(RecordedDataset()).train()
+        dataset = RecordedDataset()
+        trainer = _build_trainer(dataset)
+        trainer.train(os.path.join(self.tmp_dir, f'{LogKeys.ITER}_12.pth'))
+        # only the samples after iter 12 are loaded
+        self.assertEqual(dataset.indices, list(range(4, 20)))
+        self.assertEqual(trainer.iter, 20)
+
 
 class DummyTrainerTest(unittest.TestCase):
 
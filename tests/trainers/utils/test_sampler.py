@@ -0,0 +1,39 @@
+# Copyright (c) Alibaba, Inc. and its affiliates.
+import unittest
+
+from modelscope.trainers.utils.sampler import ResumableSampler
+
+
+class ResumableSamplerTest(unittest.TestCase):
+
+    def test_skip_ahead(self):
+        dataset = list(range(20))
+        sampler = ResumableSampler(dataset, shuffle=True, seed=42)
+        sampler.set_epoch(1)
+        indices = list(sampler)
+        self.assertEqual(sorted(indices), dataset)
+
+        # only the next iteration is skipped
+        sampler.set_start_index(6)
+        self.assertEqual(list(sampler), indices[6:])
+        self.assertEqual(list(sampler), indices)
+        self.assertEqual(len(sampler), 20)
+
+        resumed = ResumableSampler(dataset, shuffle=True, seed=0)
+        resumed.load_state_dict(sampler.state_dict())
+        resumed.set_start_index(6)
+        self.assertEqual(list(resumed), indices[6:])
+
+    def test_distributed(self):
+        dataset = list(range(10))
+        samplers = [
+            ResumableSampler(dataset, num_replicas=2, rank=rank, shuffle=False)
+            for rank in range(2)
+        ]
+        self.assertEqual(list(samplers[0]), [0, 2, 4, 6, 8])
+        samplers[1].set_start_index(2)
+        self.assertEqual(list(samplers[1]), [5, 7, 9])
+
+
+if __name__ == '__main__':
+    unittest.main()
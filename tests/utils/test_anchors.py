@@ -0,0 +1,66 @@
+# Copyright (c) Alibaba, Inc. and its affiliates.
+
+import unittest
+
+import torch
+
+from modelscope.utils.cv.anchors import (AnchorCache, bucket_size,
+                                         cached_anchors, pad_to_bucket)
+
+
+class AnchorsTest(unittest.TestCase):
+
+    def test_anchor_cache(self):
+        cache = AnchorCache(maxsize=2)
+        calls = []
+
+        def generate(height, width):
+
+            def _generate():
+                calls.append((height, width))
+                return torch.zeros(height, width)
+
+            return _generate
+
+        config = {'steps': [8, 16, 32], 'min_sizes': [[16, 32], [64]]}
+        first = cached_anchors(
+            generate(4, 6), config, 4, 6, 'cpu', cache=cache)
+        second = cached_anchors(
+            generate(4, 6), dict(config), 4, 6, 'cpu', cache=cache)
+        self.assertIs(first, second)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        cached_anchors(generate(8, 8), config, 8, 8, 'cpu', cache=cache)
+        cached_anchors(generate(4, 6), config, 4, 6, 'cpu', cache=cache)
+        # (8, 8) is the least recently used one and dropped
+        cached_anchors(generate(2, 2), config, 2, 2, 'cpu', cache=cache)
+        self.assertEqual(len(cache), 2)
+        cached_anchors(generate(4, 6), config, 4, 6, 'cpu', cache=cache)
+        cached_anchors(generate(8, 8), config, 8, 8, 'cpu', cache=cache)
+        self.assertEqual(calls, [(4, 6), (8, 8), (2, 2), (8, 8)])
+
+        other_config = {'steps': [8, 16], 'min_sizes': [[16, 32], [64]]}
+        cached_anchors(generate(4, 6), other_config, 4, 6, 'cpu', cache=cache)
+        self.assertEqual(len(calls), 5)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_bucket_size(self):
+        self.assertEqual(bucket_size(479, 640, 32), (480, 640))
+        self.assertEqual(bucket_size(481, 641, 32), (512, 672))
+        buckets = [(720, 1280), (480, 640), (1080, 1920)]
+        self.assertEqual(bucket_size(360, 640, buckets), (480, 640))
+        self.assertEqual(bucket_size(700, 900, buckets), (720, 1280))
+        self.assertEqual(bucket_size(1100, 1000, buckets), (1120, 1024))
+
+    def test_pad_to_bucket(self):
+        img = torch.ones(1, 3, 470, 630)
+        padded = pad_to_bucket(img, [(480, 640)])
+        self.assertEqual(padded.shape, (1, 3, 480, 640))
+        self.assertTrue(torch.equal(padded[..., :470, :630], img))
+        self.assertEqual(padded[..., 470:, :].abs().sum().item(), 0)
+        self.assertIs(pad_to_bucket(padded, 32), padded)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,8 +6,11 @@ import tempfile
 import time
 import unittest
 from pathlib import Path
+from unittest import mock
 
-from modelscope.utils.ast_utils import AstScaning, FilesAstScaning, load_index
+from modelscope.utils import ast_utils
+from modelscope.utils.ast_utils import (AstScaning, FilesAstScaning,
+                                        generate_prebuilt_index, load_index)
 
 p = Path(__file__)
 
@@ -41,7 +44,7 @@ class AstScaningTest(unittest.TestCase):
         self.assertIsInstance(from_imports, dict)
         self.assertIsInstance(decorators, list)
         self.assertListEqual(list(set(imports.keys()) - set(['torch'])), [])
-        self.assertEqual(len(from_imports.keys()), 10)
+        self.assertEqual(len(from_imports.keys()), 11)
         self.assertTrue(from_imports['modelscope.metainfo'] is not None)
         self.assertEqual(from_imports['modelscope.metainfo'], ['Pipelines'])
         self.assertEqual(decorators,
@@ -90,6 +93,89 @@ class AstScaningTest(unittest.TestCase):
         self.assertNotEqual(md5_1, md5_4)
         self.assertNotEqual(md5_3, md5_4)
 
+    def test_files_scaning_incremental(self):
+        fileScaner = FilesAstScaning()
+        with open(self.test_file, 'w', encoding='utf-8') as f:
+            f.write('import os\n')
+        output = fileScaner.get_files_scan_results(self.tmp_dir, [])
+        files = output['files']
+        self.assertEqual(files[self.test_file]['imports'], ['os'])
+
+        # unchanged files are not scaned again
+        files[self.test_file]['imports'] = ['cached']
+        output = fileScaner.get_files_scan_results(
+            self.tmp_dir, [], cached_files=files)
+        self.assertEqual(output['files'][self.test_file]['imports'],
+                         ['cached'])
+
+        with open(self.test_file, 'w', encoding='utf-8') as f:
+            f.write('import os\nimport sys\n')
+        output = fileScaner.get_files_scan_results(
+            self.tmp_dir, [], cached_files=files)
+        self.assertEqual(
+            sorted(output['files'][self.test_file]['imports']), ['os', 'sys'])
+
+    def test_files_scaning_parallel(self):
+        fileScaner = FilesAstScaning()
+        serial = fileScaner.get_files_scan_results(num_workers=1)
+        parallel = fileScaner.get_files_scan_results(num_workers=4)
+        self.assertEqual(serial['index'], parallel['index'])
+        self.assertEqual(serial['requirements'], parallel['requirements'])
+        # no process is forked by default, e.g. when importing modelscope
+        with mock.patch.object(ast_utils, 'ProcessPoolExecutor') as pool:
+            fileScaner.get_files_scan_results()
+        pool.assert_not_called()
+
+    def test_prebuilt_index(self):
+        models_dir = os.path.join(self.tmp_dir, 'models')
+        os.makedirs(models_dir)
+        with open(os.path.join(models_dir, 'model.py'), 'w') as f:
+            f.write('import os\n'
+                    '@MODELS.register_module(group_key="nlp", '
+                    'module_name="bert")\n'
+                    'class Bert:\n    pass\n')
+        file_path = generate_prebuilt_index(self.tmp_dir)
+
+        with mock.patch.object(ast_utils, 'PREBUILT_INDEX_FILE', file_path), \
+                mock.patch.object(FilesAstScaning, '_files_stat',
+                                  side_effect=AssertionError):
+            index = load_index()
+        self.assertIn(('MODELS', 'nlp', 'bert'), index['index'])
+        self.assertEqual(list(index['requirements'].values()), [['os']])
+
+        # a corrupted prebuilt index is ignored
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        with open(file_path, 'wb') as f:
+            f.write(data[:-10])
+        self.assertIsNone(ast_utils._load_index(file_path))
+
+    def test_legacy_json_index_kept(self):
+        # the json index read by the older versions sharing the cache dir
+        json_file = os.path.join(self.tmp_dir, 'ast_indexer')
+        with open(json_file, 'w') as f:
+            f.write('{"version": "1.0.0"}')
+        index = {
+            'version': ast_utils.__version__,
+            'md5': 'md5',
+            'index': {
+                ('MODELS', 'nlp', 'bert'): {}
+            },
+            'requirements': {},
+            'files': {}
+        }
+        with mock.patch.dict(os.environ, {'MODELSCOPE_CACHE': self.tmp_dir}), \
+                mock.patch.object(ast_utils, 'TRUST_PREBUILT_INDEX', False), \
+                mock.patch.object(ast_utils.file_scanner,
+                                  'get_files_scan_results',
+                                  return_value=index):
+            load_index(force_rebuild=True)
+        with open(json_file) as f:
+            self.assertEqual(f.read(), '{"version": "1.0.0"}')
+        index = ast_utils._load_index(
+            os.path.join(self.tmp_dir, ast_utils.INDEXER_FILE))
+        self.assertIn(('MODELS', 'nlp', 'bert'), index['index'])
+
 
 if __name__ == '__main__':
     unittest.main()
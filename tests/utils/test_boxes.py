@@ -0,0 +1,251 @@
+# Copyright (c) Alibaba, Inc. and its affiliates.
+
+import time
+import unittest
+
+import numpy as np
+import torch
+
+from modelscope.utils.cv.boxes import (batched_nms, box_iou, decode_boxes,
+                                       decode_landmarks, nms, soft_nms)
+from modelscope.utils.test_utils import test_level
+
+# The per-model implementations replaced by `modelscope.utils.cv.boxes`, as the
+# references of the results and the baselines of the benchmark.
+
+
+def legacy_py_cpu_nms(dets, thresh):
+    # retinaface, mogface and the item detection of product retrieval
+    x1, y1, x2, y2, scores = [dets[:, i] for i in range(5)]
+    areas = (x2 - x1 + 1) * (y2 - y1 + 1)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        xx1 = np.maximum(x1[i], x1[order[1:]])
+        yy1 = np.maximum(y1[i], y1[order[1:]])
+        xx2 = np.minimum(x2[i], x2[order[1:]])
+        yy2 = np.minimum(y2[i], y2[order[1:]])
+        w = np.maximum(0.0, xx2 - xx1 + 1)
+        h = np.maximum(0.0, yy2 - yy1 + 1)
+        inter = w * h
+        ovr = inter / (areas[i] + areas[order[1:]] - inter)
+        inds = np.where(ovr <= thresh)[0]
+        order = order[inds + 1]
+    return keep
+
+
+def legacy_mtcnn_nms(boxes, overlap_threshold=0.5, mode='union'):
+    if len(boxes) == 0:
+        return []
+    pick = []
+    x1, y1, x2, y2, score = [boxes[:, i] for i in range(5)]
+    area = (x2 - x1 + 1.0) * (y2 - y1 + 1.0)
+    ids = np.argsort(score)
+    while len(ids) > 0:
+        last = len(ids) - 1
+        i = ids[last]
+        pick.append(i)
+        ix1 = np.maximum(x1[i], x1[ids[:last]])
+        iy1 = np.maximum(y1[i], y1[ids[:last]])
+        ix2 = np.minimum(x2[i], x2[ids[:last]])
+        iy2 = np.minimum(y2[i], y2[ids[:last]])
+        w = np.maximum(0.0, ix2 - ix1 + 1.0)
+        h = np.maximum(0.0, iy2 - iy1 + 1.0)
+        inter = w * h
+        if mode == 'min':
+            overlap = inter / np.minimum(area[i], area[ids[:last]])
+        elif mode == 'union':
+            overlap = inter / (area[i] + area[ids[:last]] - inter)
+        ids = np.delete(
+            ids,
+            np.concatenate([[last],
+                            np.where(overlap > overlap_threshold)[0]]))
+    return pick
+
+
+def legacy_hard_nms(box_scores, iou_threshold, top_k=-1, candidate_size=200):
+    # ulfd_slim
+
+    def area_of(left_top, right_bottom):
+        hw = torch.clamp(right_bottom - left_top, min=0.0)
+        return hw[..., 0] * hw[..., 1]
+
+    def iou_of(boxes0, boxes1, eps=1e-5):
+        overlap_left_top = torch.max(boxes0[..., :2], boxes1[..., :2])
+        overlap_right_bottom = torch.min(boxes0[..., 2:], boxes1[..., 2:])
+        overlap_area = area_of(overlap_left_top, overlap_right_bottom)
+        area0 = area_of(boxes0[..., :2], boxes0[..., 2:])
+        area1 = area_of(boxes1[..., :2], boxes1[..., 2:])
+        return overlap_area / (area0 + area1 - overlap_area + eps)
+
+    scores = box_scores[:, -1]
+    boxes = box_scores[:, :-1]
+    picked = []
+    _, indexes = scores.sort(descending=True)
+    indexes = indexes[:candidate_size]
+    while len(indexes) > 0:
+        current = indexes[0]
+        picked.append(current.item())
+        if 0 < top_k == len(picked) or len(indexes) == 1:
+            break
+        current_box = boxes[current, :]
+        indexes = indexes[1:]
+        rest_boxes = boxes[indexes, :]
+        iou = iou_of(rest_boxes, current_box.unsqueeze(0))
+        indexes = indexes[iou <= iou_threshold]
+    return picked
+
+
+def legacy_decode(loc, priors, variances):
+    boxes = torch.cat(
+        (priors[:, :2] + loc[:, :2] * variances[0] * priors[:, 2:],
+         priors[:, 2:] * torch.exp(loc[:, 2:] * variances[1])), 1)
+    boxes[:, :2] -= boxes[:, 2:] / 2
+    boxes[:, 2:] += boxes[:, :2]
+    return boxes
+
+
+def legacy_mogdecode(loc, anchors):
+    boxes = torch.cat((anchors[:, :2] + loc[:, :2] * anchors[:, 2:],
+                       anchors[:, 2:] * torch.exp(loc[:, 2:])), 1)
+    boxes[:, 0] -= (boxes[:, 2] - 1) / 2
+    boxes[:, 1] -= (boxes[:, 3] - 1) / 2
+    boxes[:, 2] += boxes[:, 0] - 1
+    boxes[:, 3] += boxes[:, 1] - 1
+    return boxes
+
+
+def legacy_decode_landm(pre, priors, variances):
+    landms = [
+        priors[:, :2] + pre[:, i:i + 2] * variances[0] * priors[:, 2:]
+        for i in range(0, 10, 2)
+    ]
+    return torch.cat(landms, dim=1)
+
+
+def crowded_detections(num_boxes, seed=0):
+    """Random boxes with scores, crowded in a 640x640 image."""
+    rng = np.random.RandomState(seed)
+    corners = rng.rand(num_boxes, 2) * 600
+    sizes = 20 + rng.rand(num_boxes, 2) * 60
+    scores = rng.rand(num_boxes, 1)
+    return np.concatenate([corners, corners + sizes, scores],
+                          1).astype(np.float32)
+
+
+class BoxesTest(unittest.TestCase):
+
+    def test_nms(self):
+        dets = crowded_detections(3000)
+        for threshold in [0.3, 0.5, 0.7]:
+            keep = nms(dets[:, :4], dets[:, 4], threshold, offset=1)
+            self.assertEqual(keep.tolist(), legacy_py_cpu_nms(dets, threshold))
+            for mode in ['union', 'min']:
+                keep = nms(
+                    dets[:, :4], dets[:, 4], threshold, offset=1, mode=mode)
+                self.assertEqual(keep.tolist(),
+                                 legacy_mtcnn_nms(dets, threshold, mode))
+        self.assertEqual(len(nms(dets[:0, :4], dets[:0, 4], 0.5)), 0)
+
+    def test_nms_tensor(self):
+        box_scores = torch.from_numpy(crowded_detections(1000)) / 640
+        keep = nms(
+            box_scores[:, :4],
+            box_scores[:, 4],
+            0.3,
+            top_k=20,
+            max_candidates=200)
+        self.assertIsInstance(keep, torch.Tensor)
+        self.assertEqual(keep.tolist(),
+                         legacy_hard_nms(box_scores, 0.3, 20, 200))
+        keep = nms(box_scores[:, :4], box_scores[:, 4], 0.3, top_k=5)
+        self.assertEqual(keep.tolist(),
+                         legacy_hard_nms(box_scores, 0.3, 5, 1000))
+
+    def test_batched_nms(self):
+        dets = crowded_detections(1000)
+        labels = np.random.RandomState(0).randint(0, 3, len(dets))
+        keep = batched_nms(dets[:, :4], dets[:, 4], labels, 0.5, offset=1)
+        expected = []
+        for label in range(3):
+            indices = np.flatnonzero(labels == label)
+            expected.extend(indices[legacy_py_cpu_nms(dets[indices], 0.5)])
+        self.assertEqual(sorted(keep.tolist()), sorted(expected))
+        self.assertTrue(np.all(np.diff(dets[keep, 4]) <= 0))
+
+    def test_soft_nms(self):
+        boxes = np.array([[0, 0, 10, 10], [0, 0, 10, 5], [20, 20, 30, 30]],
+                         dtype=np.float32)
+        scores = np.array([0.9, 0.8, 0.7], dtype=np.float32)
+        keep, keep_scores = soft_nms(boxes, scores, sigma=0.5)
+        self.assertEqual(keep.tolist(), [0, 2, 1])
+        np.testing.assert_allclose(
+            keep_scores, [0.9, 0.7, 0.8 * np.exp(-0.25 / 0.5)], rtol=1e-6)
+        keep, keep_scores = soft_nms(
+            boxes, scores, iou_threshold=0.4, method='linear')
+        np.testing.assert_allclose(keep_scores, [0.9, 0.7, 0.4], rtol=1e-6)
+        keep, _ = soft_nms(torch.from_numpy(boxes), torch.from_numpy(scores))
+        self.assertIsInstance(keep, torch.Tensor)
+
+    def test_box_iou(self):
+        boxes = torch.tensor([[0., 0., 10., 10.], [5., 5., 15., 15.]])
+        iou = box_iou(boxes, boxes)
+        self.assertAlmostEqual(iou[0, 1].item(), 25 / 175)
+        self.assertAlmostEqual(
+            box_iou(boxes, boxes, mode='min')[0, 1].item(), 0.25)
+        np.testing.assert_allclose(box_iou(boxes.numpy(), boxes.numpy()), iou)
+
+    def test_decode(self):
+        torch.manual_seed(0)
+        priors = torch.rand(100, 4)
+        loc = torch.randn(100, 4) * 0.5
+        landms = torch.randn(100, 10)
+        variances = [0.1, 0.2]
+        torch.testing.assert_close(
+            decode_boxes(loc, priors, variances),
+            legacy_decode(loc.clone(), priors, variances))
+        torch.testing.assert_close(
+            decode_boxes(loc, priors * 100, (1., 1.), offset=1),
+            legacy_mogdecode(loc.clone(), priors * 100))
+        torch.testing.assert_close(
+            decode_landmarks(landms, priors, variances),
+            legacy_decode_landm(landms, priors, variances))
+        np.testing.assert_allclose(
+            decode_boxes(loc.numpy()[None], priors.numpy(), variances)[0],
+            legacy_decode(loc.clone(), priors, variances).numpy(),
+            rtol=1e-5)
+
+    @unittest.skipUnless(test_level() >= 1, 'skip test in current test level')
+    def test_benchmark(self):
+
+        def timeit(fn, *args, repeat=3, **kwargs):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                fn(*args, **kwargs)
+            return (time.perf_counter() - start) / repeat * 1000
+
+        print(f'{"boxes":>6} {"implementation":>22} {"legacy ms":>10} '
+              f'{"shared ms":>10}')
+        for num_boxes in [500, 2000, 8000]:
+            dets = crowded_detections(num_boxes)
+            rows = [
+                ('retinaface', timeit(legacy_py_cpu_nms, dets, 0.4),
+                 timeit(nms, dets[:, :4], dets[:, 4], 0.4, offset=1)),
+                ('mtcnn min', timeit(legacy_mtcnn_nms, dets, 0.7, 'min'),
+                 timeit(
+                     nms, dets[:, :4], dets[:, 4], 0.7, offset=1, mode='min')),
+            ]
+            box_scores = torch.from_numpy(dets) / 640
+            rows.append(
+                ('ulfd_slim',
+                 timeit(legacy_hard_nms, box_scores, 0.3, -1, num_boxes),
+                 timeit(nms, box_scores[:, :4], box_scores[:, 4], 0.3)))
+            for name, legacy_ms, shared_ms in rows:
+                print(f'{num_boxes:>6} {name:>22} {legacy_ms:>10.2f} '
+                      f'{shared_ms:>10.2f}')
+
+
+if __name__ == '__main__':
+    unittest.main()
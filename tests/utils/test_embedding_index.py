@@ -0,0 +1,104 @@
+# Copyright (c) Alibaba, Inc. and its affiliates.
+
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import torch
+
+from modelscope.outputs import OutputKeys
+from modelscope.utils.embedding_index import (FlatIndex, IVFPQIndex,
+                                              embeddings_from_outputs)
+
+
+class EmbeddingIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        print(('Testing %s.%s' % (type(self).__name__, self._testMethodName)))
+        self.tmp_dir = tempfile.mkdtemp()
+        rng = np.random.RandomState(0)
+        centers = rng.randn(50, 32).astype(np.float32)
+        self.corpus = centers[rng.randint(0, 50, 5000)] \
+            + 0.3 * rng.randn(5000, 32).astype(np.float32)
+        self.queries = centers[rng.randint(0, 50, 20)] \
+            + 0.3 * rng.randn(20, 32).astype(np.float32)
+        self.ground_truth = np.argsort(
+            -(self.queries @ self.corpus.T), axis=1)[:, :10]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+        super().tearDown()
+
+    def test_flat_index(self):
+        index = FlatIndex(32, block_size=700)
+        for start in range(0, 5000, 1200):
+            index.add(self.corpus[start:start + 1200])
+        self.assertEqual(len(index), 5000)
+        scores, ids = index.search(self.queries, k=10)
+        np.testing.assert_array_equal(ids, self.ground_truth)
+        self.assertTrue(np.all(np.diff(scores, axis=1) <= 0))
+
+        index.save(self.tmp_dir)
+        loaded = FlatIndex.load(self.tmp_dir)
+        self.assertIsInstance(loaded._vectors[0], np.memmap)
+        np.testing.assert_array_equal(
+            loaded.search(self.queries, k=10)[1], self.ground_truth)
+
+    def test_flat_index_save_to_loaded_path(self):
+        index = FlatIndex(32)
+        index.add(self.corpus[:3000])
+        index.save(self.tmp_dir)
+        # the loaded vectors are memory-mapped from the file to overwrite
+        index = FlatIndex.load(self.tmp_dir)
+        index.add(self.corpus[3000:])
+        index.save(self.tmp_dir)
+        loaded = FlatIndex.load(self.tmp_dir)
+        self.assertEqual(len(loaded), 5000)
+        np.testing.assert_array_equal(loaded._vectors[0], self.corpus)
+        np.testing.assert_array_equal(loaded._ids[0], np.arange(5000))
+
+    def test_flat_index_less_than_k(self):
+        index = FlatIndex(32, metric='cosine')
+        index.add(self.corpus[:3], ids=[7, 8, 9])
+        scores, ids = index.search(self.queries[:1], k=5)
+        self.assertEqual(sorted(ids[0, :3].tolist()), [7, 8, 9])
+        self.assertEqual(ids[0, 3:].tolist(), [-1, -1])
+        self.assertTrue(np.all(np.isneginf(scores[0, 3:])))
+
+    def test_ivfpq_index(self):
+        index = IVFPQIndex(32, nlist=16, m=8, nbits=6, nprobe=16)
+        index.train(self.corpus[:2000], iterations=10)
+        for start in range(0, 5000, 1200):
+            index.add(self.corpus[start:start + 1200])
+        _, ids = index.search(self.queries, k=100)
+        recall = np.mean([
+            len(set(found) & set(expected)) / 10
+            for found, expected in zip(ids, self.ground_truth)
+        ])
+        self.assertGreater(recall, 0.8)
+
+        index.save(self.tmp_dir)
+        loaded = IVFPQIndex.load(self.tmp_dir)
+        self.assertEqual(len(loaded), 5000)
+        np.testing.assert_array_equal(
+            loaded.search(self.queries, k=100)[1], ids)
+
+    def test_embeddings_from_outputs(self):
+        outputs = [{
+            OutputKeys.IMG_EMBEDDING: torch.ones(2, 4),
+            OutputKeys.TEXT_EMBEDDING: None
+        }, {
+            OutputKeys.IMG_EMBEDDING: torch.zeros(1, 4)
+        }]
+        embeddings = embeddings_from_outputs(outputs)
+        self.assertEqual(embeddings.shape, (3, 4))
+        with self.assertRaises(ValueError):
+            embeddings_from_outputs({
+                OutputKeys.IMG_EMBEDDING: np.ones((1, 4)),
+                OutputKeys.TEXT_EMBEDDING: np.ones((1, 4))
+            })
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+# Copyright (c) Alibaba, Inc. and its affiliates.
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+from modelscope.utils import file_utils
+from modelscope.utils.file_utils import extract_zip_once
+
+
+class ExtractZipOnceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.zip_file = os.path.join(self.tmp_dir, 'resource.zip')
+        self._make_zip('v1')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _make_zip(self, content):
+        with zipfile.ZipFile(self.zip_file, 'w') as zip_ref:
+            zip_ref.writestr('resource/data.txt', content)
+
+    def _read(self, folder):
+        with open(os.path.join(folder, 'data.txt')) as f:
+            return f.read()
+
+    def test_extract_once(self):
+        folder = extract_zip_once(self.zip_file, self.tmp_dir, 'resource')
+        self.assertEqual(folder, os.path.join(self.tmp_dir, 'resource'))
+        self.assertEqual(self._read(folder), 'v1')
+
+        # not extracted again if the zip file is not changed
+        with open(os.path.join(folder, 'data.txt'), 'w') as f:
+            f.write('modified')
+        extract_zip_once(self.zip_file, self.tmp_dir, 'resource')
+        self.assertEqual(self._read(folder), 'modified')
+
+        # only hashed once if the zip file is touched but not changed
+        mtime = os.path.getmtime(self.zip_file) + 10
+        os.utime(self.zip_file, (mtime, mtime))
+        with mock.patch.object(
+                file_utils, '_file_sha256',
+                wraps=file_utils._file_sha256) as file_sha256:
+            for _ in range(2):
+                extract_zip_once(self.zip_file, self.tmp_dir, 'resource')
+        self.assertEqual(file_sha256.call_count, 1)
+        self.assertEqual(self._read(folder), 'modified')
+
+        # extracted again if the zip file is changed
+        self._make_zip('v2')
+        extract_zip_once(self.zip_file, self.tmp_dir, 'resource')
+        self.assertEqual(self._read(folder), 'v2')
+        self.assertEqual(
+            sorted(os.listdir(self.tmp_dir)),
+            ['.resource.lock', 'resource', 'resource.zip'])
+
+
+if __name__ == '__main__':
+    unittest.main()
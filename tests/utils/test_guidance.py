@@ -0,0 +1,64 @@
+# Copyright (c) Alibaba, Inc. and its affiliates.
+
+import unittest
+
+import torch
+
+from modelscope.utils.multi_modal.guidance import (cat_guidance_kwargs,
+                                                   guided_forward)
+
+
+class _Model(torch.nn.Module):
+
+    def __init__(self):
+        super().__init__()
+        self.linear = torch.nn.Linear(4, 4)
+        self.batch_sizes = []
+
+    def forward(self, x, t, y=None, scale=1.0):
+        self.batch_sizes.append(x.size(0))
+        out = self.linear(x) * scale + t[:, None]
+        return out if y is None else out + y
+
+
+class GuidanceTest(unittest.TestCase):
+
+    def setUp(self):
+        print(('Testing %s.%s' % (type(self).__name__, self._testMethodName)))
+        torch.manual_seed(0)
+        self.model = _Model()
+        self.x = torch.randn(2, 4)
+        self.t = torch.tensor([3., 7.])
+
+    def test_cat_guidance_kwargs(self):
+        y, u = torch.randn(2, 4), torch.zeros(2, 4)
+        y_kwargs = {'y': y, 'scale': 2.0}
+        kwargs = cat_guidance_kwargs(y_kwargs, {**y_kwargs, 'y': u}, 2)
+        torch.testing.assert_close(kwargs['y'], torch.cat([y, u]))
+        self.assertEqual(kwargs['scale'], 2.0)
+
+        # different keys, shapes, batch sizes or non-tensor values
+        self.assertIsNone(cat_guidance_kwargs({'y': y}, {}, 2))
+        self.assertIsNone(cat_guidance_kwargs({'y': y}, {'y': u[:1]}, 2))
+        self.assertIsNone(cat_guidance_kwargs({'y': y}, {'y': u}, 3))
+        self.assertIsNone(
+            cat_guidance_kwargs({'scale': 2.0}, {'scale': 3.0}, 2))
+
+    def test_guided_forward(self):
+        y_kwargs = {'y': torch.randn(2, 4)}
+        with torch.no_grad():
+            y_expected = self.model(self.x, self.t, **y_kwargs)
+            u_expected = self.model(self.x, self.t)
+            # batched in one forward, or two forwards if the kwargs differ
+            cases = [({'y': torch.zeros(2, 4)}, [4]), ({}, [2, 2])]
+            for u_kwargs, batch_sizes in cases:
+                self.model.batch_sizes.clear()
+                y_out, u_out = guided_forward(self.model, self.x, self.t,
+                                              [y_kwargs, u_kwargs])
+                self.assertEqual(self.model.batch_sizes, batch_sizes)
+                torch.testing.assert_close(y_out, y_expected)
+                torch.testing.assert_close(u_out, u_expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+# Copyright (c) Alibaba, Inc. and its affiliates.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import torch
+from torch import nn
+
+from modelscope.models.base import TorchModel
+from modelscope.outputs import OutputKeys
+from modelscope.pipelines import pipeline
+from modelscope.utils.constant import Tasks
+from modelscope.utils.quantization import (QUANTIZED_MODEL_FILE,
+                                           quantization_report, quantize_model)
+from modelscope.utils.test_utils import test_level
+
+
+class _TaggerModel(TorchModel):
+
+    def __init__(self, model_dir):
+        super().__init__(model_dir)
+        self.embedding = nn.Embedding(20, 16)
+        self.lstm = nn.LSTM(16, 16, batch_first=True)
+        self.classifier = nn.Linear(16, 3)
+
+    def forward(self, input_ids):
+        hidden, _ = self.lstm(self.embedding(input_ids))
+        return {OutputKeys.LOGITS: self.classifier(hidden)}
+
+
+class QuantizationTest(unittest.TestCase):
+
+    def setUp(self):
+        print(('Testing %s.%s' % (type(self).__name__, self._testMethodName)))
+        self.tmp_dir = tempfile.mkdtemp()
+        torch.manual_seed(0)
+        self.input_ids = torch.randint(0, 20, (4, 10))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+        super().tearDown()
+
+    def test_quantize_model(self):
+        model = _TaggerModel(self.tmp_dir).eval()
+        float_logits = model(self.input_ids)[OutputKeys.LOGITS]
+        quantize_model(model, 'dynamic-int8')
+        self.assertIsInstance(model.classifier,
+                              torch.nn.quantized.dynamic.Linear)
+        self.assertIsInstance(model.lstm, torch.nn.quantized.dynamic.LSTM)
+        logits = model(self.input_ids)[OutputKeys.LOGITS]
+        self.assertLess((logits - float_logits).abs().max().item(), 0.05)
+
+        cache_file = os.path.join(
+            self.tmp_dir, QUANTIZED_MODEL_FILE.format(method='dynamic-int8'))
+        self.assertTrue(os.path.isfile(cache_file))
+        cached_model = quantize_model(_TaggerModel(self.tmp_dir).eval())
+        self.assertTrue(
+            torch.equal(
+                cached_model(self.input_ids)[OutputKeys.LOGITS], logits))
+
+        with self.assertRaises(ValueError):
+            quantize_model(_TaggerModel(self.tmp_dir), 'static-int4')
+
+    def test_quantize_changed_checkpoint(self):
+        checkpoint = os.path.join(self.tmp_dir, 'pytorch_model.bin')
+        model = _TaggerModel(self.tmp_dir).eval()
+        torch.save(model.state_dict(), checkpoint)
+        quantize_model(model)
+
+        # fine-tune into the same dir, the keys and shapes do not change
+        torch.manual_seed(1)
+        tuned = _TaggerModel(self.tmp_dir).eval()
+        torch.save(tuned.state_dict(), checkpoint)
+        os.utime(checkpoint, ns=(0, 0))
+        expected = _TaggerModel(self.tmp_dir).eval()
+        expected.load_state_dict(tuned.state_dict())
+        quantize_model(expected, cache_dir=tempfile.mkdtemp(dir=self.tmp_dir))
+        quantize_model(tuned)
+        self.assertTrue(
+            torch.equal(
+                tuned(self.input_ids)[OutputKeys.LOGITS],
+                expected(self.input_ids)[OutputKeys.LOGITS]))
+
+    def test_quantization_report(self):
+        samples = ['a', 'b', 'c', 'd']
+        labels = ['pos', 'neg', 'pos', 'pos']
+
+        def float_fn(sample):
+            return {
+                OutputKeys.SCORES: [0.9, 0.1],
+                OutputKeys.LABELS: ['pos', 'neg']
+            }
+
+        def quantized_fn(sample):
+            ranked = ['neg', 'pos'] if sample == 'b' else ['pos', 'neg']
+            return {OutputKeys.SCORES: [0.8, 0.2], OutputKeys.LABELS: ranked}
+
+        report = quantization_report(float_fn, quantized_fn, samples, labels)
+        self.assertEqual(report['num_samples'], 4)
+        self.assertEqual(report['agreement'], 0.75)
+        self.assertAlmostEqual(report['max_abs_diff'], 0.1)
+        self.assertEqual(report['float_accuracy'], 0.75)
+        self.assertEqual(report['quantized_accuracy'], 1.0)
+        self.assertEqual(report['accuracy_delta'], 0.25)
+
+    @unittest.skipUnless(test_level() >= 1, 'skip test in current test level')
+    def test_quantized_pipeline(self):
+        model_id = 'damo/nlp_structbert_sentence-similarity_chinese-base'
+        float_pipeline = pipeline(
+            Tasks.sentence_similarity, model=model_id, device='cpu')
+        quantized_pipeline = pipeline(
+            Tasks.sentence_similarity, model=model_id, quantize='dynamic-int8')
+        samples = [('这是个测试', '这也是个测试'), ('今天天气好', '明天天气好吗'),
+                   ('如何使用优惠券', '在哪里领券')]
+        report = quantization_report(float_pipeline, quantized_pipeline,
+                                     samples)
+        print(report)
+        self.assertGreaterEqual(report['agreement'], 2 / 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
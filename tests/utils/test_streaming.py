@@ -0,0 +1,57 @@
+# Copyright (c) Alibaba, Inc. and its affiliates.
+
+import unittest
+
+from modelscope.utils.nlp.streaming import (TokenStreamer, stream_decode,
+                                            stream_generate)
+
+VOCAB = ['[CLS]', '今', '天', 'good', '##bye', '�']
+
+
+def _decode(tokens):
+    # a wordpiece decoder: '##' pieces are joined to the previous word
+    text = ' '.join(VOCAB[t] for t in tokens if t != 0)
+    return text.replace(' ##', '')
+
+
+class StreamingTest(unittest.TestCase):
+
+    def test_stream_decode(self):
+        stream = [[0], [0, 1], [0, 1, 2], [0, 1, 2, 3], [0, 1, 2, 3, 4]]
+        pieces = list(stream_decode(stream, _decode))
+        self.assertEqual(''.join(pieces), _decode(stream[-1]))
+        self.assertEqual(pieces, ['今', ' 天', ' good', 'bye'])
+
+    def test_stream_decode_incomplete_character(self):
+        stream = [[1], [1, 5], [1, 2]]
+        pieces = list(stream_decode(stream, _decode))
+        self.assertEqual(pieces, ['今', ' 天'])
+
+    def test_token_streamer_skips_stale_sequences(self):
+        streamer = TokenStreamer()
+        for i in range(1, 4):
+            streamer.put(list(range(i)))
+        streamer.end()
+        self.assertEqual(list(streamer), [[0, 1, 2]])
+
+    def test_stream_generate(self):
+
+        def generate(streamer):
+            for i in range(1, 5):
+                streamer.put([0, 1, 2, 3, 4][:i + 1])
+
+        pieces = list(stream_generate(generate, _decode))
+        self.assertEqual(''.join(pieces), '今 天 goodbye')
+
+    def test_stream_generate_error(self):
+
+        def generate(streamer):
+            streamer.put([0, 1])
+            raise RuntimeError('generation failed')
+
+        with self.assertRaises(RuntimeError):
+            list(stream_generate(generate, _decode))
+
+
+if __name__ == '__main__':
+    unittest.main()